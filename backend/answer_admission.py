@@ -0,0 +1,310 @@
+"""
+Write admission for quiniela answers.
+
+Traffic peaks in the last minutes before quiniela_close_date, when every player submits at once
+and each submit held its own transaction. AnswerWriteAdmission puts answer writes in a bounded
+in-process queue and a small pool of worker threads applies them in batches: up to
+ANSWER_ADMISSION_BATCH_SIZE writes per transaction, one commit per batch. If a write of a batch
+fails, the batch is rolled back and its writes are applied one by one, so a bad submit only fails
+itself.
+
+Each write carries the server time at which its request was received. The close date is checked
+against that stamp, not against the time a worker gets to the write, so a submit received before
+the close is saved even if the queue delays it past the close.
+
+When the queue is full submit() raises AdmissionQueueFull with a Retry-After estimate (batches
+ahead x average batch time / workers) and the endpoint answers 429. metrics() reports the queue
+depth, counters and the wait and apply latencies.
+
+The queue lives in memory, so a request is only answered once its write is committed. If run()
+stops waiting while the write is still queued, the write is withdrawn (a worker skips it) and
+run() raises AnswerWriteTimeout: the endpoint answers 503 with Retry-After and the client sends
+it again. A write a worker has already started is waited for. Nothing acknowledged can be lost
+by a restart, and every success carries the saved versions.
+
+With ANSWER_ADMISSION_EAGER (defaults to TESTING) writes are applied inline, inside the request.
+"""
+import math
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from backend.models import db, Race
+
+
+class AdmissionQueueFull(Exception):
+    """The write queue is full. retry_after is the suggested wait in seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Answer write queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AnswerWriteRejected(Exception):
+    """The race was deleted or its quiniela closed before the write was received."""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class AnswerWriteTimeout(Exception):
+    """The write was still queued when the request stopped waiting; it was withdrawn and will not be applied."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Answer write not applied in time, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AnswerWrite:
+    """One queued write: apply() runs inside the worker's session and returns the result."""
+
+    __slots__ = ('race_id', 'received_at', 'apply', 'future', 'enqueued_at')
+
+    def __init__(self, race_id, received_at, apply):
+        self.race_id = race_id
+        self.received_at = received_at
+        self.apply = apply
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+def _latency_summary(samples):
+    """{'avg', 'p95', 'max'} in milliseconds of a list of durations in seconds."""
+    if not samples:
+        return {'avg': None, 'p95': None, 'max': None}
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, math.ceil(len(ordered) * 0.95) - 1)]
+    return {'avg': round(sum(ordered) / len(ordered) * 1000, 2), 'p95': round(p95 * 1000, 2),
+            'max': round(ordered[-1] * 1000, 2)}
+
+
+class AnswerWriteAdmission:
+    """Bounded queue of answer writes, applied in batched transactions by a thread pool."""
+
+    def __init__(self, app, max_queue=500, workers=2, batch_size=20, wait_timeout=20, latency_samples=500):
+        """
+        Args:
+            app (Flask): Application whose context the workers run in.
+            max_queue (int): Writes waiting at most; beyond it submit() raises AdmissionQueueFull.
+                Overridable with ANSWER_ADMISSION_MAX_QUEUE, read when the queue is created (first write).
+            workers (int): Worker threads, overridable with ANSWER_ADMISSION_WORKERS (read when they start).
+            batch_size (int): Writes applied per transaction at most, overridable with ANSWER_ADMISSION_BATCH_SIZE.
+            wait_timeout (float): Seconds run() waits for a queued write before raising AnswerWriteTimeout,
+                overridable with ANSWER_ADMISSION_WAIT_SECONDS.
+            latency_samples (int): Recent wait/apply durations kept for metrics().
+        """
+        self.app = app
+        self._max_queue = max_queue
+        self._workers = workers
+        self._batch_size = batch_size
+        self.wait_timeout = wait_timeout
+        self._queue = None # Created with the first write, once the app config is final
+        self._threads = [] # Started with the first write (never before a gunicorn fork)
+        self._lock = threading.Lock() # Queue creation, thread start and counters
+        self._counters = dict.fromkeys(('accepted', 'rejected', 'applied', 'failed', 'withdrawn', 'batches', 'batch_fallbacks'), 0)
+        self._max_depth = 0
+        self._wait_seconds = deque(maxlen=latency_samples) # Received -> batch start, per write
+        self._apply_seconds = deque(maxlen=latency_samples) # Per batch
+
+    def _is_eager(self):
+        return self.app.config.get('ANSWER_ADMISSION_EAGER', self.app.config.get('TESTING', False))
+
+    @property
+    def max_queue(self):
+        return self.app.config.get('ANSWER_ADMISSION_MAX_QUEUE', self._max_queue)
+
+    @property
+    def workers(self):
+        return self.app.config.get('ANSWER_ADMISSION_WORKERS', self._workers)
+
+    @property
+    def batch_size(self):
+        return self.app.config.get('ANSWER_ADMISSION_BATCH_SIZE', self._batch_size)
+
+    def _get_queue(self):
+        with self._lock:
+            if self._queue is None:
+                self._queue = queue.Queue(maxsize=self.max_queue)
+            return self._queue
+
+    def _queue_depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _start_workers(self):
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f'answer-write-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, race_id, received_at, apply):
+        """
+        Queues a write, or applies it inline in eager mode.
+
+        Args:
+            race_id (int): Race the answers belong to.
+            received_at (datetime): Naive UTC time the request was received; checked against the close date.
+            apply (callable): fn() -> result. Runs in a worker's session, must not commit and must not
+                use request state (current_user); capture plain ids instead.
+        Returns:
+            Future: Resolves to apply()'s result, or to its exception (AnswerWriteRejected if closed).
+        Raises:
+            AdmissionQueueFull: If the queue is full.
+        """
+        write = AnswerWrite(race_id, received_at, apply)
+        if self._is_eager():
+            self._count('accepted')
+            self.apply_batch([write])
+            return write.future
+
+        write_queue = self._get_queue()
+        self._start_workers()
+        try:
+            write_queue.put_nowait(write)
+        except queue.Full:
+            self._count('rejected')
+            retry_after = self.retry_after()
+            self.app.logger.warning(f"Answer write queue full ({self.max_queue}), race {race_id}: retry in {retry_after}s")
+            raise AdmissionQueueFull(retry_after)
+        with self._lock:
+            self._counters['accepted'] += 1
+            self._max_depth = max(self._max_depth, write_queue.qsize())
+        return write.future
+
+    def run(self, race_id, received_at, apply):
+        """
+        submit() and wait for the result (ANSWER_ADMISSION_WAIT_SECONDS at most while it is queued).
+
+        Raises:
+            AdmissionQueueFull: If the queue is full.
+            AnswerWriteTimeout: If the write was still queued after the wait; it is withdrawn, not applied.
+            AnswerWriteRejected, or whatever apply() raised.
+        """
+        future = self.submit(race_id, received_at, apply)
+        try:
+            return future.result(timeout=self.app.config.get('ANSWER_ADMISSION_WAIT_SECONDS', self.wait_timeout))
+        except FutureTimeoutError:
+            if future.cancel(): # Still queued: the worker will skip it
+                self._count('withdrawn')
+                raise AnswerWriteTimeout(self.retry_after())
+            return future.result() # A worker is applying it: its transaction decides
+
+    def retry_after(self):
+        """Seconds (1-30) until the queue has room: batches ahead x average batch time / workers."""
+        with self._lock:
+            average = sum(self._apply_seconds) / len(self._apply_seconds) if self._apply_seconds else 0.05
+        batches_ahead = math.ceil(self._queue_depth() / self.batch_size)
+        return max(1, min(30, math.ceil(batches_ahead * average / max(1, self.workers))))
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _worker(self):
+        write_queue = self._get_queue()
+        while True:
+            batch = [write_queue.get()]
+            batch_size = self.batch_size
+            while len(batch) < batch_size:
+                try:
+                    batch.append(write_queue.get_nowait())
+                except queue.Empty:
+                    break
+            with self.app.app_context():
+                try:
+                    self.apply_batch(batch)
+                except Exception as e: # apply_batch resolves every future; this is a bug guard
+                    self.app.logger.error(f"Answer write batch crashed: {e}", exc_info=True)
+                    for write in batch:
+                        if not write.future.done():
+                            write.future.set_exception(e)
+
+    def _reject_closed(self, batch):
+        """Resolves the writes received after their race closed (or of deleted races). Returns the others."""
+        race_ids = {write.race_id for write in batch}
+        close_dates = dict(db.session.query(Race.id, Race.quiniela_close_date)
+                           .filter(Race.id.in_(race_ids), Race.is_deleted == False).all())
+        accepted = []
+        for write in batch:
+            if write.race_id not in close_dates:
+                write.future.set_exception(AnswerWriteRejected("Race not found or has been deleted", 404))
+            elif close_dates[write.race_id] and close_dates[write.race_id] < write.received_at:
+                write.future.set_exception(AnswerWriteRejected(
+                    "La quiniela ya esta cerrada y no se pueden añadir nuevas predicciones", 403))
+            else:
+                accepted.append(write)
+        if len(accepted) < len(batch):
+            self._count('failed', len(batch) - len(accepted))
+        return accepted
+
+    def apply_batch(self, batch):
+        """
+        Applies a batch of writes in one transaction and resolves their futures.
+
+        If any write fails the transaction is rolled back and every write is applied again in its
+        own transaction, so only the failing ones resolve to their exception.
+        """
+        started = time.monotonic()
+        batch = [write for write in batch if write.future.set_running_or_notify_cancel()] # Withdrawn ones are skipped
+        if not batch:
+            return
+        with self._lock:
+            self._wait_seconds.extend(started - write.enqueued_at for write in batch)
+
+        writes = self._reject_closed(batch)
+        results = []
+        try:
+            for write in writes:
+                results.append(write.apply())
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if len(writes) == 1:
+                self._count('failed')
+                writes[0].future.set_exception(e)
+            else:
+                self._count('batch_fallbacks')
+                self.app.logger.warning(f"Answer write batch of {len(writes)} failed ({e}); applying one by one")
+                for write in writes:
+                    self._apply_one(write)
+        else:
+            for write, result in zip(writes, results):
+                write.future.set_result(result)
+            self._count('applied', len(writes))
+
+        with self._lock:
+            self._counters['batches'] += 1
+            self._apply_seconds.append(time.monotonic() - started)
+
+    def _apply_one(self, write):
+        try:
+            result = write.apply()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            self._count('failed')
+            write.future.set_exception(e)
+        else:
+            self._count('applied')
+            write.future.set_result(result)
+
+    def metrics(self):
+        """Queue depth, counters and wait/apply latencies (ms) of this process."""
+        with self._lock:
+            return {
+                'queue_depth': self._queue_depth(),
+                'max_queue': self.max_queue,
+                'max_depth_seen': self._max_depth,
+                'workers': self.workers,
+                'workers_started': len(self._threads),
+                'batch_size': self.batch_size,
+                **self._counters,
+                'wait_ms': _latency_summary(list(self._wait_seconds)),
+                'apply_ms': _latency_summary(list(self._apply_seconds)),
+            }
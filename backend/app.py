@@ -1,18 +1,39 @@
 import os
-import boto3
 from flask import Flask, jsonify, request, redirect, url_for, send_from_directory, flash, session
 import logging # Importación añadida
 # Updated model imports
-from backend.models import db, User, Role, Race, RaceFormat, Segment, RaceSegmentDetail, QuestionType, Question, QuestionOption, UserRaceRegistration, UserAnswer, UserAnswerMultipleChoiceOption, OfficialAnswer, OfficialAnswerMultipleChoiceOption, UserFavoriteRace, FavoriteLink, UserScore, RaceStatus, Event, EventStatus # Added UserScore, RaceStatus, Event, AND EventStatus
+from backend.models import db, User, Role, Race, RaceFormat, Segment, RaceSegmentDetail, QuestionType, Question, QuestionOption, UserRaceRegistration, UserAnswer, UserAnswerMultipleChoiceOption, OfficialAnswer, OfficialAnswerMultipleChoiceOption, UserFavoriteRace, FavoriteLink, UserScore, UserQuestionScore, ScoringJob, RaceStatus, Event, EventStatus # Added UserScore, RaceStatus, Event, AND EventStatus
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from sqlalchemy.exc import IntegrityError # Import for handling unique constraint violations
 from sqlalchemy import func # Add this import at the top of app.py if not present
+from sqlalchemy import bindparam # Bulk UPDATE ... SET score = score + delta
+from sqlalchemy import and_ # Join conditions for the league standings query
+from sqlalchemy.orm import joinedload, selectinload # Eager loading for the bulk scoring engine
 from flask_migrate import Migrate # Import Migrate
 from werkzeug.middleware.proxy_fix import ProxyFix # <--- Añade esta importación
 from flask import render_template
 from datetime import datetime, date # For event_date processing AND isinstance checks
+from backend.scoring import CompiledRaceScorer, compile_question_scorer # Compiled per-race scoring
+from backend.scoring_jobs import ScoringJobQueue # Rescoring off the request thread
+from backend.league_standings import refresh_league_standings, refresh_standings_for_race # Materialized league standings
+from backend.race_scheduler import RaceCloseScheduler # PLANNED -> ACTIVE at quiniela close
+from backend.user_answers import (user_answers_by_question, prepare_answer_rows, prefetch_race_questions, write_answer_rows,
+                                  answer_progress, stored_answer_versions, AnswerVersionConflict) # Bulk upsert / autosave of quiniela answers
+from backend.answer_admission import AnswerWriteAdmission, AdmissionQueueFull, AnswerWriteTimeout, AnswerWriteRejected # Queued, batched answer writes
+from backend.race_participants import fetch_race_participants, PARTICIPANT_SORTS # Paged participants list
+from backend.race_catalog import RaceCatalog, RaceCatalogCache, bump_catalog_version # Per-race question catalog
+from backend.reference_data import reference_data # Roles, question types, formats and segments in memory
+from backend.principals import PrincipalCache # Cached identity for load_user
+from backend.passwords import PasswordHasher, PasswordHasherBusy, TokenBucketLimiter, ThrottledError # bcrypt off the request threads
+from backend.race_cards import race_card_query, apply_race_card_filters, fetch_race_cards, fetch_dashboard_cards, DashboardCache # Race card projection
+from backend.leaderboard import fetch_leaderboard, InvalidCursorError, LeaderboardSnapshotCache, bump_score_version # Ranked, paged race leaderboards
+from backend.config_loader import BootTimer, ConfigLoader # Lazy SSM secrets, boot timings
+from backend.preload import preload, install_fork_hooks # gunicorn --preload: shared templates/reference data, pools after fork
+import hashlib # Leaderboard snapshot ETags
+import json # Serialized leaderboard snapshots
 
 app = Flask(__name__)
+boot_timer = BootTimer() # Fases del arranque del worker; se registran al final del módulo
 
 # Configuración de logging para que funcione bien con Gunicorn
 if __name__ != '__main__':
@@ -84,17 +105,6 @@ def slugify(value, separator='-'):
 
 app.jinja_env.filters['slugify'] = slugify
 
-def get_ssm_parameter(name, default=None):
-    """Función para obtener un parámetro de AWS SSM Parameter Store."""
-    try:
-        # La región se debe ajustar si es diferente.
-        ssm_client = boto3.client('ssm', region_name='eu-north-1')
-        response = ssm_client.get_parameter(Name=name, WithDecryption=True)
-        return response['Parameter']['Value']
-    except Exception as e:
-        # Si falla (ej. en local, sin credenciales), usa un valor por defecto.
-        print(f"No se pudo obtener el parámetro '{name}' de SSM. Error: {e}")
-        return default
 # Añade esta línea DESPUÉS de app = Flask(__name__)
 # Indica a Flask que confíe en los headers X-Forwarded-For, X-Forwarded-Host, X-Forwarded-Proto y X-Forwarded-Port del proxy
 app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_host=1, x_proto=1, x_port=1) # <--- Añade esta línea
@@ -102,14 +112,22 @@ app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_host=1, x_proto=1, x_port=1) #
 # Configuration
 # ==============================================================================
 # Lee los secretos desde las variables de entorno o, en su defecto, desde AWS Parameter Store
-app.secret_key = os.environ.get('FLASK_SECRET_KEY') or get_ssm_parameter('/tripredict/prod/FLASK_SECRET_KEY')
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL') or get_ssm_parameter('/tripredict/prod/DATABASE_URL')
+# (fichero local / caché cifrada antes de SSM; boto3 solo se importa si hace falta, ver config_loader.py)
+config_loader = ConfigLoader.from_environ(app.instance_path)
+boot_settings = config_loader.load({
+    'FLASK_SECRET_KEY': '/tripredict/prod/FLASK_SECRET_KEY',
+    'DATABASE_URL': '/tripredict/prod/DATABASE_URL',
+})
+app.secret_key = boot_settings['FLASK_SECRET_KEY']
+app.config['SQLALCHEMY_DATABASE_URI'] = boot_settings['DATABASE_URL']
+app.logger.info(f"Configuration sources: {config_loader.sources}")
 
 # Comprobación de que las variables se han cargado correctamente
 if not app.secret_key:
     raise ValueError("FLASK_SECRET_KEY is not set in environment or SSM Parameter Store.")
 if not app.config['SQLALCHEMY_DATABASE_URI']:
     raise ValueError("DATABASE_URL is not set in environment or SSM Parameter Store.")
+boot_timer.mark('config')
 
 # Configuración de cookies mejorada para Cloudfront
 app.config['SESSION_COOKIE_SECURE'] = True
@@ -125,6 +143,7 @@ app.config['CORS_SUPPORTS_CREDENTIALS'] = True
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
 migrate = Migrate(app, db, directory='migrations') # Initialize Flask-Migrate
+boot_timer.mark('database')
 
 # Flask-Login Configuration
 login_manager = LoginManager()
@@ -132,6 +151,71 @@ login_manager.init_app(app)
 login_manager.login_view = 'serve_login_page' # Crucial for @login_required redirection
 login_manager.session_protection = "strong"
 
+# Identidad de sesión (id, username, rol, flags) en memoria; se invalida al actualizar/borrar el usuario
+# PRINCIPAL_CACHE_TTL / PRINCIPAL_CACHE_SIZE se leen de app.config al usarse
+principal_cache = PrincipalCache(ttl_seconds=60, max_entries=2048, app=app)
+principal_cache.install_invalidation()
+
+# bcrypt en un pool acotado (503 si se satura) + cubetas de intentos por usuario e IP (429)
+# PASSWORD_BCRYPT_ROUNDS / PASSWORD_HASH_* se leen de app.config al usarse (también los de create_app)
+password_hasher = PasswordHasher(rounds=12, workers=2, max_pending=32, app=app)
+# LOGIN_ATTEMPTS_PER_USERNAME / LOGIN_ATTEMPTS_PER_IP (por minuto) y REGISTRATIONS_PER_IP (por hora) también al usarse
+login_limiter_by_username = TokenBucketLimiter(capacity=5, refill_per_second=5 / 60.0, app=app,
+                                               config_key='LOGIN_ATTEMPTS_PER_USERNAME')
+login_limiter_by_ip = TokenBucketLimiter(capacity=30, refill_per_second=30 / 60.0, app=app,
+                                         config_key='LOGIN_ATTEMPTS_PER_IP')
+registration_limiter_by_ip = TokenBucketLimiter(capacity=5, refill_per_second=5 / 3600.0, app=app,
+                                                config_key='REGISTRATIONS_PER_IP')
+
+def _auth_throttling_enabled():
+    return app.config.get('AUTH_THROTTLING_ENABLED', not app.config.get('TESTING', False))
+
+def _retry_later_response(retry_after, message, status_code):
+    """
+    Error response with a Retry-After header: 429 for a throttled login/registration, 503 when the
+    password hasher is busy or an answer save/autosave was still queued after the wait.
+    """
+    return jsonify(message=message, retry_after=retry_after), status_code, {'Retry-After': str(retry_after)}
+
+def _client_ip():
+    # ProxyFix ya ha puesto en remote_addr la IP del cliente
+    return request.remote_addr or 'unknown'
+
+# Cierre de quinielas (PLANNED -> ACTIVE) programado por fecha de cierre; se arranca con la primera petición
+race_scheduler = RaceCloseScheduler(app)
+
+# Dashboards ya montados por (usuario, filtros); DASHBOARD_CACHE_ENABLED por defecto salvo en TESTING
+# DASHBOARD_CACHE_TTL / DASHBOARD_CACHE_SIZE se leen de app.config al usarse
+dashboard_cache = DashboardCache(ttl_seconds=30, max_entries=512, app=app)
+race_scheduler.on_close(dashboard_cache.invalidate_all) # El estado de las tarjetas cambia al cerrar
+
+# Escrituras de respuestas: cola acotada + workers que aplican por lotes; 429 con Retry-After si se llena
+# ANSWER_ADMISSION_MAX_QUEUE / _WORKERS / _BATCH_SIZE se leen de app.config con la primera escritura
+answer_admission = AnswerWriteAdmission(app, max_queue=500, workers=2, batch_size=20)
+
+# Catálogo de preguntas por carrera (inmutable), por (carrera, catalog_version)
+race_catalogs = RaceCatalogCache(max_entries=128, app=app) # RACE_CATALOG_CACHE_SIZE se lee de app.config al usarse
+
+boot_timer.mark('services')
+
+def _race_catalog(race):
+    """RaceCatalog of a race row; served from race_catalogs when RACE_CATALOG_CACHE_ENABLED (default: not TESTING)."""
+    if app.config.get('RACE_CATALOG_CACHE_ENABLED', not app.config.get('TESTING', False)):
+        return race_catalogs.for_race(race)
+    return RaceCatalog.build(race.id, race.catalog_version)
+
+def _dashboard_cache_enabled():
+    return app.config.get('DASHBOARD_CACHE_ENABLED', not app.config.get('TESTING', False))
+
+@app.before_request
+def start_race_scheduler():
+    race_scheduler.ensure_started()
+
+@app.before_request
+def load_reference_data():
+    # Roles, tipos de pregunta, formatos y segmentos: se cargan una vez por proceso y se recargan si falta una fila que ya existe (ver reference_data.py)
+    reference_data.snapshot()
+
 @login_manager.unauthorized_handler
 def unauthorized():
     original_url = request.url
@@ -169,7 +253,10 @@ app.config['DEBUG_LOGIN'] = True      # <--- AÑADE ESTA LÍNEA TEMPORALMENTE pa
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    """Principal of the session's user; from principal_cache when PRINCIPAL_CACHE_ENABLED (default: not TESTING)."""
+    if app.config.get('PRINCIPAL_CACHE_ENABLED', not app.config.get('TESTING', False)):
+        return principal_cache.load(int(user_id))
+    return PrincipalCache.fetch(int(user_id))
 
 # Seeding functions (create_initial_roles, create_initial_race_data, create_initial_question_types)
 # have been moved to backend/seed.py and will be run via CLI.
@@ -184,7 +271,7 @@ def load_user(user_id):
 @app.route('/api/race-formats', methods=['GET'])
 def get_race_formats():
     try:
-        formats = RaceFormat.query.all()
+        formats = reference_data.race_formats()
         return jsonify([{'id': fmt.id, 'name': fmt.name} for fmt in formats]), 200
     except Exception as e:
         print(f"Error fetching race formats: {e}")
@@ -194,16 +281,16 @@ def get_race_formats():
 @login_required
 def create_race():
     # Role check
-    if current_user.role.code not in ['LEAGUE_ADMIN', 'ADMIN']:
+    if current_user.role_code not in ['LEAGUE_ADMIN', 'ADMIN']:
         return jsonify(message="Forbidden: You do not have permission to create races."), 403
 
     data = request.get_json()
 
     is_general_from_form = data.get('is_general', False) # Get value, default to False if not present
 
-    if current_user.role.code == 'ADMIN':
+    if current_user.role_code == 'ADMIN':
         is_general = bool(is_general_from_form) # Convert to boolean, respect admin's choice
-    elif current_user.role.code == 'LEAGUE_ADMIN':
+    elif current_user.role_code == 'LEAGUE_ADMIN':
         is_general = False # League admins always create local races
     else:
         # This case should ideally not happen if only ADMIN and LEAGUE_ADMIN can access this route
@@ -236,7 +323,7 @@ def create_race():
     # Validate race_format_id
     if not isinstance(race_format_id, int):
         return jsonify(message="race_format_id must be an integer."), 400
-    race_format = RaceFormat.query.get(race_format_id)
+    race_format = reference_data.race_format(race_format_id)
     if not race_format:
         return jsonify(message=f"Invalid race_format_id: {race_format_id} does not exist."), 400
 
@@ -270,7 +357,7 @@ def create_race():
 
         if not isinstance(segment_id, int):
             return jsonify(message="Each segment's segment_id must be an integer."), 400
-        segment = Segment.query.get(segment_id)
+        segment = reference_data.segment(segment_id)
         if not segment:
             return jsonify(message=f"Invalid segment_id: {segment_id} does not exist."), 400
 
@@ -330,15 +417,15 @@ def create_race():
                     app.logger.warning(f"Skipping question due to missing type: {question_payload.get('text')}")
                     continue
 
-                question_type_obj = QuestionType.query.filter_by(name=question_type_name).first()
-                if not question_type_obj:
+                question_type_id = reference_data.question_type_id(question_type_name)
+                if not question_type_id:
                     # Consider how to handle this error
                     app.logger.warning(f"Skipping question due to invalid type '{question_type_name}': {question_payload.get('text')}")
                     continue
 
                 new_question = Question(
                     race_id=new_race.id, # new_race is defined earlier in the function
-                    question_type_id=question_type_obj.id,
+                    question_type_id=question_type_id,
                     text=question_payload.get('text'),
                     is_active=question_payload.get('is_active', True)
                 )
@@ -458,6 +545,11 @@ def create_race():
                         db.session.add(new_option)
 
         db.session.commit()
+        race_scheduler.schedule(new_race.id, new_race.quiniela_close_date)
+        if new_race.is_general:
+            dashboard_cache.invalidate_all() # Aparece en las destacadas de todos los jugadores
+        else:
+            dashboard_cache.invalidate_user(current_user.id)
         return jsonify(message="Race created successfully", race_id=new_race.id), 201
     except Exception as e:
         db.session.rollback()
@@ -471,7 +563,7 @@ def update_race_details(race_id):
     data = request.get_json()
     app.logger.info(f"Received JSON data: {data}")
 
-    if current_user.role.code not in ['ADMIN', 'LEAGUE_ADMIN']:
+    if current_user.role_code not in ['ADMIN', 'LEAGUE_ADMIN']:
         app.logger.warning(f"User {current_user.username} forbidden to update race {race_id}")
         return jsonify(message="Forbidden: You do not have permission to update this race."), 403
 
@@ -553,6 +645,9 @@ def update_race_details(race_id):
 
         app.logger.info(f"Race object after modifications: {race.to_dict() if hasattr(race, 'to_dict') else race}")
         db.session.commit()
+        if race.status == RaceStatus.PLANNED:
+            race_scheduler.schedule(race.id, race.quiniela_close_date) # Reprograma el cierre si cambió la fecha
+        dashboard_cache.invalidate_all()
 
         # Use the model's to_dict() method for consistency, it now includes quiniela_close_date
         updated_race_data = race.to_dict()
@@ -574,7 +669,7 @@ def update_race_details(race_id):
 def delete_race(race_id):
     app.logger.info(f"Logically deleting race_id: {race_id}")
     # 1. Check user role
-    if current_user.role.code not in ['ADMIN', 'LEAGUE_ADMIN']:
+    if current_user.role_code not in ['ADMIN', 'LEAGUE_ADMIN']:
         app.logger.warning(f"User {current_user.username} forbidden to delete race {race_id}")
         return jsonify(message="Forbidden: You do not have permission to delete this race."), 403
 
@@ -593,7 +688,13 @@ def delete_race(race_id):
     try:
         # 3. Perform logical delete
         race.is_deleted = True
+        # Las ligas que incluían la carrera dejan de contarla en su clasificación
+        refresh_standings_for_race(race.id)
+        bump_score_version([race.id])
         db.session.commit()
+        leaderboard_snapshots.invalidate_race(race.id)
+        race_scheduler.unschedule(race.id)
+        dashboard_cache.invalidate_all()
         app.logger.info(f"Race {race_id} logically deleted and session committed successfully.")
         return jsonify(message="Race deleted successfully"), 200
     except Exception as e:
@@ -613,14 +714,14 @@ def archive_race(race_id):
         return jsonify(message="Race not found or has been deleted"), 404
 
     # Authorization check: ADMIN can archive any race. LEAGUE_ADMIN can only archive their own races.
-    if current_user.role.code == 'ADMIN':
+    if current_user.role_code == 'ADMIN':
         pass # Admin has permission
-    elif current_user.role.code == 'LEAGUE_ADMIN':
+    elif current_user.role_code == 'LEAGUE_ADMIN':
         if race.user_id != current_user.id:
             app.logger.warning(f"User {current_user.username} (LEAGUE_ADMIN) forbidden to archive race {race_id} not owned by them.")
             return jsonify(message="Forbidden: You can only archive races you created."), 403
     else: # Other roles (e.g., PLAYER) cannot archive
-        app.logger.warning(f"User {current_user.username} (Role: {current_user.role.code}) forbidden to archive race {race_id}.")
+        app.logger.warning(f"User {current_user.username} (Role: {current_user.role_code}) forbidden to archive race {race_id}.")
         return jsonify(message="Forbidden: You do not have permission to archive this race."), 403
 
     if race.status == RaceStatus.ARCHIVED:
@@ -647,82 +748,38 @@ def get_race_questions(race_id):
     if not race:
         return jsonify(message="Race not found or has been deleted"), 404
 
-    questions_query = race.questions.order_by(Question.id)
-
-    # Fetch all official answers for the race once
-    official_answers_list = OfficialAnswer.query.filter_by(race_id=race_id).all()
-    official_answers_map = {oa.question_id: oa for oa in official_answers_list}
-
-    # Pre-process official MC-multiple answers for efficiency
-    official_mc_multiple_options_map = {}
-    for oa_obj_loop in official_answers_list: # Renamed loop variable
-        q_obj_for_oa = Question.query.get(oa_obj_loop.question_id)
-        if q_obj_for_oa and q_obj_for_oa.question_type.name == 'MULTIPLE_CHOICE' and q_obj_for_oa.is_mc_multiple_correct:
-            official_mc_multiple_options_map[q_obj_for_oa.id] = {
-                sel_opt.question_option_id for sel_opt in oa_obj_loop.official_selected_mc_options
-            }
-
-    # Pre-process official ORDERING answers text map
-    official_ordering_text_map = {}
-    for q_id_loop, oa_obj_loop in official_answers_map.items(): # Renamed loop variables
-        question_for_oa = Question.query.get(q_id_loop)
-        if question_for_oa and question_for_oa.question_type.name == 'ORDERING':
-            if oa_obj_loop and oa_obj_loop.answer_text:
-                official_texts = [text.strip().lower() for text in oa_obj_loop.answer_text.split(',') if text.strip()]
-                official_ordering_text_map[q_id_loop] = official_texts
-            else:
-                official_ordering_text_map[q_id_loop] = []
+    # Catálogo de la carrera: preguntas (+tipo), opciones, respuestas oficiales, puntos máximos y scorer compilado
+    catalog = _race_catalog(race)
+    scorer = catalog.scorer
+    option_texts = catalog.option_texts # option id -> text, for every answer shown
 
-
-    # Fetch current user's answers for this race
-    user_answers_for_race_list = UserAnswer.query.filter_by(user_id=current_user.id, race_id=race_id).all()
-    user_answers_map = {ua.question_id: ua for ua in user_answers_for_race_list}
+    # Fetch current user's answers for this race (MC selections included)
+    user_answers_map = user_answers_by_question(race_id, current_user.id)
 
     output = []
-    for question in questions_query:
+    for question in catalog.questions:
         question_data = {
             "id": question.id,
             "text": question.text,
-            "question_type": question.question_type.name,
+            "question_type": question.type_name,
             "is_active": question.is_active,
             "official_answer": None,
             "max_points_possible": 0,
             "user_answer_details": None # Initialize user answer details
         }
 
-        # Add type-specific scoring fields and calculate max_points_possible
-        if question.question_type.name == 'FREE_TEXT':
+        # Add type-specific scoring fields; max_points_possible comes from the catalog (compiled scorer)
+        if question.type_name == 'FREE_TEXT':
             question_data["max_score_free_text"] = question.max_score_free_text
-            question_data["max_points_possible"] = question.max_score_free_text or 0
-        elif question.question_type.name == 'MULTIPLE_CHOICE':
+        elif question.type_name == 'MULTIPLE_CHOICE':
             question_data["is_mc_multiple_correct"] = question.is_mc_multiple_correct
             question_data["points_per_correct_mc"] = question.points_per_correct_mc
             question_data["points_per_incorrect_mc"] = question.points_per_incorrect_mc
             question_data["total_score_mc_single"] = question.total_score_mc_single
-            if question.is_mc_multiple_correct:
-                # Max points is sum of points_per_correct_mc for all *actually correct* options.
-                # This requires knowing which options are officially correct.
-                correct_option_ids_for_this_q = official_mc_multiple_options_map.get(question.id, set())
-                question_data["max_points_possible"] = len(correct_option_ids_for_this_q) * (question.points_per_correct_mc or 0)
-            else:
-                question_data["max_points_possible"] = question.total_score_mc_single or 0
-        elif question.question_type.name == 'ORDERING':
+        elif question.type_name == 'ORDERING':
             question_data["points_per_correct_order"] = question.points_per_correct_order
             question_data["bonus_for_full_order"] = question.bonus_for_full_order
-            # Max points = (points_per_correct_order * num_items) + bonus_for_full_order
-
-            official_answer_obj_for_ordering = official_answers_map.get(question.id)
-            if official_answer_obj_for_ordering and official_answer_obj_for_ordering.answer_text:
-                # Assuming answer_text is a comma-separated string of option IDs or texts
-                num_items_to_order = len(official_answer_obj_for_ordering.answer_text.split(','))
-            else:
-                num_items_to_order = len(question.options.all()) # Get all options for this question
-
-            max_pts_ordering = (question.points_per_correct_order or 0) * num_items_to_order
-            if num_items_to_order > 0: # Only add bonus if there are items to order
-                 max_pts_ordering += (question.bonus_for_full_order or 0)
-            question_data["max_points_possible"] = max_pts_ordering
-        elif question.question_type.name == 'SLIDER':
+        elif question.type_name == 'SLIDER':
             question_data["slider_unit"] = question.slider_unit
             question_data["slider_min_value"] = question.slider_min_value
             question_data["slider_max_value"] = question.slider_max_value
@@ -730,11 +787,10 @@ def get_race_questions(race_id):
             question_data["slider_points_exact"] = question.slider_points_exact
             question_data["slider_threshold_partial"] = question.slider_threshold_partial
             question_data["slider_points_partial"] = question.slider_points_partial
-            question_data["max_points_possible"] = question.slider_points_exact or 0 # Max is typically for exact match
+        question_data["max_points_possible"] = question.max_points
 
         options_output = []
-        options_query_for_q = question.options.order_by(QuestionOption.id)
-        for opt in options_query_for_q:
+        for opt in question.options:
             option_data = {
                 "id": opt.id,
                 "option_text": opt.option_text,
@@ -747,14 +803,13 @@ def get_race_questions(race_id):
             options_output.append(option_data)
         question_data["options"] = options_output
 
-        # Fetch and format official answer for this question
-        official_answer_obj = official_answers_map.get(question.id)
+        # Format official answer for this question (option texts from the catalog)
+        official_answer_obj = question.official
         official_answer_formatted = None  # Initialize here
         if official_answer_obj:
-            # official_answer_formatted = None # No longer needed here
-            if question.question_type.name == 'FREE_TEXT':
+            if question.type_name == 'FREE_TEXT':
                 official_answer_formatted = official_answer_obj.answer_text
-            elif question.question_type.name == 'ORDERING':
+            elif question.type_name == 'ORDERING':
                 # OfficialAnswer.answer_text for ORDERING questions stores comma-separated option IDs.
                 # We need to convert these IDs to their corresponding texts.
                 if official_answer_obj and official_answer_obj.answer_text:
@@ -763,9 +818,9 @@ def get_race_questions(race_id):
                     for opt_id_str in ordered_option_ids_str:
                         try:
                             opt_id = int(opt_id_str.strip())
-                            option_obj = QuestionOption.query.get(opt_id)
-                            if option_obj and option_obj.question_id == question.id: # Ensure option belongs to the question
-                                ordered_option_texts.append(option_obj.option_text)
+                            option_text = option_texts.text(opt_id, question.id) # Ensure option belongs to the question
+                            if option_text is not None:
+                                ordered_option_texts.append(option_text)
                             else:
                                 ordered_option_texts.append(f"[ID de opción inválido: {opt_id_str}]")
                         except ValueError:
@@ -773,30 +828,18 @@ def get_race_questions(race_id):
                     official_answer_formatted = ", ".join(ordered_option_texts) # Join texts with comma and space for display
                 else:
                     official_answer_formatted = None # No official answer or empty answer_text
-            elif question.question_type.name == 'MULTIPLE_CHOICE':
+            elif question.type_name == 'MULTIPLE_CHOICE':
                 if question.is_mc_multiple_correct:
-                    # Get set of correct option IDs from pre-processed map
-                    correct_option_ids = official_mc_multiple_options_map.get(question.id, set())
-                    # Map these IDs back to text for display (similar to get_participant_answers)
-                    formatted_mc_multiple = []
-                    for opt_id in correct_option_ids:
-                        opt_obj = QuestionOption.query.get(opt_id) # Fetch option object
-                        if opt_obj:
-                            formatted_mc_multiple.append({"id": opt_id, "text": opt_obj.option_text})
-                    official_answer_formatted = formatted_mc_multiple
+                    # Map the correct option IDs back to text for display (similar to get_participant_answers)
+                    official_answer_formatted = option_texts.options(official_answer_obj.option_ids)
                 elif official_answer_obj.selected_option_id:
-                    opt = QuestionOption.query.get(official_answer_obj.selected_option_id)
-                    if opt:
-                        official_answer_formatted = {"id": opt.id, "text": opt.option_text}
-            elif question.question_type.name == 'SLIDER':
-                if official_answer_obj: # Added check for official_answer_obj
-                     official_answer_formatted = official_answer_obj.correct_slider_value
-                else:
-                     official_answer_formatted = None
+                    official_answer_formatted = option_texts.option(official_answer_obj.selected_option_id)
+            elif question.type_name == 'SLIDER':
+                official_answer_formatted = official_answer_obj.correct_slider_value
 
 
         question_data["official_answer"] = official_answer_formatted
-        question_data["official_answer_question_type"] = question.question_type.name
+        question_data["official_answer_question_type"] = question.type_name
         question_data["official_answer_is_mc_multiple_correct"] = question.is_mc_multiple_correct
 
         # Fetch and format user's answer and points for this question
@@ -807,36 +850,26 @@ def get_race_questions(race_id):
             can_see_score = False
             if race.quiniela_close_date and race.quiniela_close_date < datetime.utcnow():
                 can_see_score = True
-            elif current_user.role.code in ['ADMIN', 'LEAGUE_ADMIN']: # Admins can always see scores
+            elif current_user.role_code in ['ADMIN', 'LEAGUE_ADMIN']: # Admins can always see scores
                 can_see_score = True
 
             points_obtained_for_q = 0
             is_correct_for_q = False
 
             if can_see_score and official_answer_obj: # Need official answer to calculate score
-                # Pass the correct map for ordering questions
-                current_official_ordering_texts_for_calc = official_ordering_text_map if question.question_type.name == 'ORDERING' else None
-                points_obtained_for_q, is_correct_for_q = _calculate_score_for_answer(
-                    current_user_answer_obj,
-                    official_answer_obj,
-                    question,
-                    official_mc_multiple_options_map,
-                    current_official_ordering_texts_for_calc
-                )
+                points_obtained_for_q, is_correct_for_q = scorer.score_answer(current_user_answer_obj)
 
             # Format user's answer for display (similar to get_participant_answers)
-            if question.question_type.name == 'FREE_TEXT':
+            if question.type_name == 'FREE_TEXT':
                 user_answer_formatted = current_user_answer_obj.answer_text
-            elif question.question_type.name == 'ORDERING':
+            elif question.type_name == 'ORDERING':
                 user_answer_formatted = current_user_answer_obj.answer_text # This is already comma-separated texts
-            elif question.question_type.name == 'MULTIPLE_CHOICE':
+            elif question.type_name == 'MULTIPLE_CHOICE':
                 if question.is_mc_multiple_correct:
-                    user_answer_formatted = [{"id": opt.question_option_id, "text": opt.question_option.option_text} for opt in current_user_answer_obj.selected_mc_options]
+                    user_answer_formatted = option_texts.options(opt.question_option_id for opt in current_user_answer_obj.selected_mc_options)
                 elif current_user_answer_obj.selected_option_id:
-                    opt_ua = QuestionOption.query.get(current_user_answer_obj.selected_option_id)
-                    if opt_ua:
-                        user_answer_formatted = {"id": opt_ua.id, "text": opt_ua.option_text}
-            elif question.question_type.name == 'SLIDER':
+                    user_answer_formatted = option_texts.option(current_user_answer_obj.selected_option_id)
+            elif question.type_name == 'SLIDER':
                 user_answer_formatted = current_user_answer_obj.slider_answer_value
 
             question_data["user_answer_details"] = {
@@ -859,8 +892,8 @@ def get_race_questions_with_answers(race_id):
         app.logger.warning(f"Race not found or deleted: {race_id} for questions_with_answers")
         return jsonify(message="Race not found or has been deleted"), 404
 
-    # Fetch active questions for the race
-    questions_query = Question.query.filter_by(race_id=race.id, is_active=True).order_by(Question.id)
+    # Active questions of the race, from the race catalog
+    questions_query = _race_catalog(race).active_questions
 
     # Fetch current user's answers for these questions
     user_answers_for_race = UserAnswer.query.filter_by(user_id=current_user.id, race_id=race.id).all()
@@ -871,24 +904,25 @@ def get_race_questions_with_answers(race_id):
         question_data = {
             "id": question.id,
             "text": question.text,
-            "question_type": question.question_type.name,
+            "question_type": question.type_name,
             "is_active": question.is_active, # Should always be true due to filter, but good to include
             "options": [], # To be populated for MC/Ordering
-            "user_answer": None # Default to null, will be populated if answer exists
+            "user_answer": None, # Default to null, will be populated if answer exists
+            "answer_version": 0 # Versión optimista para el autosave (0 = sin respuesta)
         }
 
         # Add type-specific scoring fields from Question model (similar to _serialize_question)
-        if question.question_type.name == 'FREE_TEXT':
+        if question.type_name == 'FREE_TEXT':
             question_data["max_score_free_text"] = question.max_score_free_text
-        elif question.question_type.name == 'MULTIPLE_CHOICE':
+        elif question.type_name == 'MULTIPLE_CHOICE':
             question_data["is_mc_multiple_correct"] = question.is_mc_multiple_correct
             question_data["points_per_correct_mc"] = question.points_per_correct_mc
             question_data["points_per_incorrect_mc"] = question.points_per_incorrect_mc
             question_data["total_score_mc_single"] = question.total_score_mc_single
-        elif question.question_type.name == 'ORDERING':
+        elif question.type_name == 'ORDERING':
             question_data["points_per_correct_order"] = question.points_per_correct_order
             question_data["bonus_for_full_order"] = question.bonus_for_full_order
-        elif question.question_type.name == 'SLIDER':
+        elif question.type_name == 'SLIDER':
             question_data["slider_unit"] = question.slider_unit
             question_data["slider_min_value"] = question.slider_min_value
             question_data["slider_max_value"] = question.slider_max_value
@@ -898,9 +932,8 @@ def get_race_questions_with_answers(race_id):
             question_data["slider_points_partial"] = question.slider_points_partial
 
         # Populate options for MC and Ordering questions
-        if question.question_type.name in ['MULTIPLE_CHOICE', 'ORDERING']:
-            options_query_for_q = question.options.order_by(QuestionOption.id) # Or specific order if needed
-            for opt in options_query_for_q:
+        if question.type_name in ['MULTIPLE_CHOICE', 'ORDERING']:
+            for opt in question.options: # Ordered by id in the catalog
                 question_data["options"].append({
                     "id": opt.id,
                     "option_text": opt.option_text
@@ -910,20 +943,21 @@ def get_race_questions_with_answers(race_id):
         # Check if user has an answer for this question and format it
         user_answer_obj = user_answers_map.get(question.id)
         if user_answer_obj:
+            question_data['answer_version'] = user_answer_obj.version
             formatted_user_answer = {}
-            if question.question_type.name == 'FREE_TEXT':
+            if question.type_name == 'FREE_TEXT':
                 formatted_user_answer['answer_text'] = user_answer_obj.answer_text
-            elif question.question_type.name == 'MULTIPLE_CHOICE':
+            elif question.type_name == 'MULTIPLE_CHOICE':
                 if question.is_mc_multiple_correct:
                     formatted_user_answer['selected_option_ids'] = [
                         sel_opt.question_option_id for sel_opt in user_answer_obj.selected_mc_options
                     ]
                 else:
                     formatted_user_answer['selected_option_id'] = user_answer_obj.selected_option_id
-            elif question.question_type.name == 'ORDERING':
+            elif question.type_name == 'ORDERING':
                 # UserAnswer.answer_text stores the comma-separated string of option texts for ordering
                 formatted_user_answer['ordered_options_text'] = user_answer_obj.answer_text
-            elif question.question_type.name == 'SLIDER':
+            elif question.type_name == 'SLIDER':
                 formatted_user_answer['slider_answer_value'] = user_answer_obj.slider_answer_value
 
             # Include question_id in user_answer for consistency with frontend save format, though a bit redundant here.
@@ -941,7 +975,7 @@ def get_race_questions_with_answers(race_id):
 @login_required
 def get_race_share_link(race_id):
     # 1. Role check
-    if not current_user.is_authenticated or current_user.role.code not in ['ADMIN', 'LEAGUE_ADMIN']:
+    if not current_user.is_authenticated or current_user.role_code not in ['ADMIN', 'LEAGUE_ADMIN']:
         return jsonify(message="Forbidden: You do not have permission to generate share links."), 403
 
     # 2. Fetch the Race object, ensuring it's not deleted
@@ -988,6 +1022,7 @@ def join_race_api(race_id):
     try:
         db.session.add(new_registration)
         db.session.commit()
+        dashboard_cache.invalidate_user(current_user.id)
         return jsonify(message="Successfully registered for the race!", registration_id=new_registration.id), 201
     except IntegrityError: # Should be caught by the explicit check above, but as a fallback
         db.session.rollback()
@@ -1025,6 +1060,7 @@ def join_race_by_code_api():
     try:
         db.session.add(new_registration)
         db.session.commit()
+        dashboard_cache.invalidate_user(current_user.id)
         return jsonify(message="Successfully registered for the race!", race_id=race.id), 201
     except IntegrityError: # Should be caught by the explicit check above, but as a fallback
         db.session.rollback()
@@ -1035,11 +1071,24 @@ def join_race_by_code_api():
         app.logger.error(f"Error registering user {current_user.id} for race {race.id} (Code: {access_code}): {e}", exc_info=True)
         return jsonify(message="An error occurred while trying to register for the race."), 500
 
+PARTICIPANTS_DEFAULT_LIMIT = 100
+PARTICIPANTS_MAX_LIMIT = 500
+
 @app.route('/api/races/<int:race_id>/participants', methods=['GET'])
 @login_required
 def get_race_participants(race_id):
+    """
+    Paged participants of a race with their answered question count.
+
+    Query params:
+        limit (int): Page size (default 100, max 500).
+        cursor (str): next_cursor of the previous page (keyset paging).
+        sort (str): 'username' (default) or 'answered'.
+        order (str): 'asc' or 'desc' (default asc for username, desc for answered).
+        q (str): Username prefix filter.
+    """
     # Role check
-    if current_user.role.code not in ['ADMIN', 'LEAGUE_ADMIN']:
+    if current_user.role_code not in ['ADMIN', 'LEAGUE_ADMIN']:
         return jsonify(message="Forbidden: You do not have permission to view participants."), 403
 
     # Check if race exists and is not deleted
@@ -1047,29 +1096,30 @@ def get_race_participants(race_id):
     if not race:
         return jsonify(message="Race not found or has been deleted"), 404
 
-    total_questions_in_race = Question.query.filter_by(race_id=race_id).count()
-
-    registrations = UserRaceRegistration.query.filter_by(race_id=race_id).all()
-
-    participants_list = []
-    for reg in registrations:
-        user = User.query.get(reg.user_id)
-        if not user:
-            # This case should ideally not happen if data integrity is maintained
-            app.logger.warning(f"UserRaceRegistration {reg.id} refers to a non-existent user {reg.user_id}.")
-            continue
+    try:
+        limit = int(request.args.get('limit', PARTICIPANTS_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify(message="limit must be an integer"), 400
+    if limit < 1:
+        return jsonify(message="limit must be positive"), 400
+    limit = min(limit, PARTICIPANTS_MAX_LIMIT)
+    sort = request.args.get('sort', 'username')
+    if sort not in PARTICIPANT_SORTS:
+        return jsonify(message=f"sort must be one of: {', '.join(PARTICIPANT_SORTS)}"), 400
+    order = request.args.get('order') or None
+    if order not in (None, 'asc', 'desc'):
+        return jsonify(message="order must be 'asc' or 'desc'"), 400
 
-        answered_questions_count = UserAnswer.query.filter_by(user_id=user.id, race_id=race_id).count()
-        has_answered = answered_questions_count > 0
+    total_questions_in_race = Question.query.filter_by(race_id=race_id).count()
 
-        participants_list.append({
-            "user_id": user.id,
-            "username": user.username,
-            "has_answered": has_answered,
-            "answered_questions_count": answered_questions_count
-        })
+    try:
+        page = fetch_race_participants(race_id, sort=sort, order=order, limit=limit,
+                                       cursor=request.args.get('cursor') or None,
+                                       username_prefix=request.args.get('q', '').strip() or None)
+    except InvalidCursorError:
+        return jsonify(message="Invalid cursor"), 400
 
-    return jsonify(total_questions_in_race=total_questions_in_race, participants=participants_list), 200
+    return jsonify(total_questions_in_race=total_questions_in_race, limit=limit, sort=sort, **page), 200
 
 
 # Helper function to calculate score for a single answer
@@ -1077,178 +1127,81 @@ def _calculate_score_for_answer(user_answer_obj, official_answer_obj, question_o
     """
     Calculates the score for a single user answer against an official answer.
 
+    Thin wrapper over backend.scoring.compile_question_scorer, kept for callers that score
+    one answer at a time. Bulk paths should build a CompiledRaceScorer once per race instead.
+
     Args:
         user_answer_obj (UserAnswer): The user's answer object.
-        official_answer_obj (OfficialAnswer): The official answer object. (Still needed for non-ORDERING types)
+        official_answer_obj (OfficialAnswer): The official answer object.
         question_obj (Question): The question object.
         official_mc_multiple_options_map (dict, optional): Pre-processed official MC-multiple answers.
                                                             Map of {question_id: {set of correct_option_ids}}.
         official_ordering_data_for_q_type (dict, optional): For ORDERING questions, this is official_ordering_text_map.
                                                             Map of {question_id: [list of lowercased_ordered_option_texts]}.
-                                                            For other question types, this argument can be None or ignored.
     Returns:
         tuple: (points_obtained, is_correct)
     """
-    if not user_answer_obj or not question_obj: # official_answer_obj might be None if not found, but q_obj and user_ans are essential
+    if not user_answer_obj or not question_obj:
         return 0, False
 
-    # official_answer_obj is still needed for Free Text, MC-Single, Slider where official answer is directly on it.
-    # For MC-Multiple, official_mc_multiple_options_map is used.
-    # For Ordering, official_ordering_data_for_q_type (the text map) is used.
-
-    points_obtained = 0
-    is_correct = False
-    question_type_name = question_obj.question_type.name
-
-    if official_mc_multiple_options_map is None: # Defaulting for safety, though get_participant_answers should provide it.
-        official_mc_multiple_options_map = {}
-    # No need to default official_ordering_data_for_q_type to {} if it's specifically for ordering and passed when needed.
-
     try:
-        if question_type_name == 'FREE_TEXT':
-            if official_answer_obj and official_answer_obj.answer_text and user_answer_obj.answer_text:
-                if user_answer_obj.answer_text.strip().lower() == official_answer_obj.answer_text.strip().lower():
-                    points_obtained = question_obj.max_score_free_text or 0
-                    is_correct = True
-
-        elif question_type_name == 'MULTIPLE_CHOICE':
-            if question_obj.is_mc_multiple_correct:
-                user_selected_option_ids = {opt.question_option_id for opt in user_answer_obj.selected_mc_options}
-                official_correct_option_ids = official_mc_multiple_options_map.get(question_obj.id, set())
-
-                current_question_mc_multiple_score = 0
-                correct_user_selections = 0
-
-                for user_opt_id in user_selected_option_ids:
-                    if user_opt_id in official_correct_option_ids:
-                        current_question_mc_multiple_score += (question_obj.points_per_correct_mc or 0)
-                        correct_user_selections +=1
-                    else: # User selected an incorrect option
-                        # If points_per_incorrect_mc is stored as a negative number (e.g., -5 for a penalty),
-                        # we should ADD it to the score.
-                        current_question_mc_multiple_score += (question_obj.points_per_incorrect_mc or 0)
-
-                points_obtained = current_question_mc_multiple_score
-                # Consider is_correct to be true if all selected options are correct AND all correct options are selected.
-                # Or, if any points are gained (simpler version for now: at least one correct pick and no wrong picks)
-                is_correct = (user_selected_option_ids == official_correct_option_ids) and bool(official_correct_option_ids)
-
-
-            else: # Single Correct
-                if user_answer_obj.selected_option_id and \
-                   user_answer_obj.selected_option_id == official_answer_obj.selected_option_id:
-                    points_obtained = question_obj.total_score_mc_single or 0
-                    is_correct = True
-
-        elif question_type_name == 'ORDERING':
-            user_ordered_texts = []
-            if user_answer_obj.answer_text:
-                user_ordered_texts = [text.strip().lower() for text in user_answer_obj.answer_text.split(',')]
-
-            # official_ordering_data_for_q_type is now official_ordering_text_map passed from get_participant_answers
-            # It should already contain a list of lowercased texts for the specific question_obj.id
-            official_ordered_texts_for_q = official_ordering_data_for_q_type.get(question_obj.id, []) if official_ordering_data_for_q_type else []
-            # No further lowercasing needed here if map provides already lowercased texts.
-            # For safety, if the map isn't structured as expected or not passed for ordering, this defaults to [].
-
-            if user_ordered_texts and official_ordered_texts_for_q: # Both must be non-empty
-                current_question_ordering_score = 0
-                is_full_match = True # Assume full match until proven otherwise
-
-                # Check if lengths are different first, if so, not a full match.
-                if len(user_ordered_texts) != len(official_ordered_texts_for_q):
-                    is_full_match = False
-
-                # Iterate based on the length of the official correct order
-                for i in range(len(official_ordered_texts_for_q)):
-                    if i < len(user_ordered_texts): # Check if user provided an answer for this position
-                        if user_ordered_texts[i] == official_ordered_texts_for_q[i]: # Already lowercased
-                            current_question_ordering_score += (question_obj.points_per_correct_order or 0)
-                        else:
-                            is_full_match = False # Mismatch at this position
-                    else: # User answer is shorter than official answer, so not a full match
-                        is_full_match = False
-
-                # Apply bonus with refined logic (consistent with calculate_and_store_scores)
-                if is_full_match and len(user_ordered_texts) == len(official_ordered_texts_for_q):
-                    # Ensure bonus is only added if there were items to order and points_per_correct_order was positive
-                    # or if there are zero items but a bonus is defined (edge case)
-                    if ((question_obj.points_per_correct_order or 0) > 0 and len(official_ordered_texts_for_q) > 0) or \
-                       (len(official_ordered_texts_for_q) == 0 and (question_obj.bonus_for_full_order or 0) > 0):
-                        current_question_ordering_score += (question_obj.bonus_for_full_order or 0)
-
-                points_obtained = current_question_ordering_score
-                # A response is "correct" if it's a full match and there was something to match
-                is_correct = is_full_match and bool(official_ordered_texts_for_q)
+        scorer = compile_question_scorer(
+            question_obj,
+            official_answer_obj,
+            official_option_ids=(official_mc_multiple_options_map or {}).get(question_obj.id, set()),
+            official_ordering_texts=(official_ordering_data_for_q_type or {}).get(question_obj.id, [])
+        )
+        if scorer is None:
+            return 0, False
+        selected_option_ids = ()
+        if question_obj.question_type.name == 'MULTIPLE_CHOICE' and question_obj.is_mc_multiple_correct:
+            selected_option_ids = [opt.question_option_id for opt in user_answer_obj.selected_mc_options]
+        return scorer(
+            user_answer_obj.answer_text,
+            user_answer_obj.selected_option_id,
+            user_answer_obj.slider_answer_value,
+            selected_option_ids
+        )
+    except Exception as e:
+        app.logger.error(f"Error calculating score for QID {question_obj.id}, UserAnswerID {user_answer_obj.id}: {e}", exc_info=True)
+        return 0, False # Return 0 points and False for correctness in case of an error
 
-        elif question_type_name == 'SLIDER':
-            if not official_answer_obj: # Guard against missing official_answer_obj for SLIDER type
-                return 0, False
-            epsilon = 1e-9  # For floating point comparisons
-            points_obtained = 0 # Initialize points for this question
-            is_correct = False  # Initialize correctness for this question
-
-            if user_answer_obj.slider_answer_value is None or official_answer_obj.correct_slider_value is None:
-                app.logger.debug(f"Scoring SLIDER QID {question_obj.id}: User or official answer is None. User: {user_answer_obj.slider_answer_value}, Official: {official_answer_obj.correct_slider_value}. Points: 0")
-                # points_obtained and is_correct remain 0 and False
-            else:
-                user_val = user_answer_obj.slider_answer_value
-                user_val = user_answer_obj.slider_answer_value
-                official_val = official_answer_obj.correct_slider_value
-
-                points_exact = question_obj.slider_points_exact
-                threshold_partial = question_obj.slider_threshold_partial
-                points_partial = question_obj.slider_points_partial
-
-                app.logger.debug(
-                    f"Scoring SLIDER QID {question_obj.id} - Initial values: "
-                    f"UserVal={user_val}, OfficialVal={official_val}, "
-                    f"Q.slider_points_exact={points_exact}, "
-                    f"Q.slider_threshold_partial={threshold_partial}, "
-                    f"Q.slider_points_partial={points_partial}"
-                )
 
-                diff = abs(user_val - official_val)
-                rule_met = "None"
+def _stored_question_scores(race_id, user_id):
+    """
+    Per-question points of a user in a race, as stored by calculate_and_store_scores.
 
-                if diff < epsilon:  # Exact match
-                    app.logger.debug(f"Scoring SLIDER QID {question_obj.id}: Checking Exact Match. Diff={diff}, Epsilon={epsilon}")
-                    if points_exact is not None:
-                        points_obtained = points_exact
-                        is_correct = (points_exact > 0) # Correct if points are positive
-                        rule_met = "Exact"
-                        app.logger.debug(f"Scoring SLIDER QID {question_obj.id}: Exact Match met. PointsAwarded={points_obtained}, IsCorrect={is_correct}")
-                    else:
-                        app.logger.debug(f"Scoring SLIDER QID {question_obj.id}: Exact Match condition met, but points_exact is None.")
-                elif threshold_partial is not None and threshold_partial >= 0 and \
-                     points_partial is not None and points_partial >= 0 and \
-                     diff <= (threshold_partial + epsilon):  # Partial match
-                    app.logger.debug(
-                        f"Scoring SLIDER QID {question_obj.id}: Checking Partial Match. "
-                        f"Diff={diff}, ThresholdPartial={threshold_partial}, Epsilon={epsilon}, "
-                        f"PointsPartial={points_partial}"
-                    )
-                    points_obtained = points_partial
-                    is_correct = (points_partial > 0) # Correct if points are positive
-                    rule_met = "Partial"
-                    app.logger.debug(f"Scoring SLIDER QID {question_obj.id}: Partial Match met. PointsAwarded={points_obtained}, IsCorrect={is_correct}")
-                else:
-                    app.logger.debug(f"Scoring SLIDER QID {question_obj.id}: No match (Exact or Partial). Diff={diff}")
-                # Else, no match, points_obtained remains 0, is_correct remains False
+    Returns:
+        dict: {question_id: (points, is_correct)}, or None if the race has no stored breakdown yet.
+    """
+    rows = db.session.query(UserQuestionScore.question_id, UserQuestionScore.points, UserQuestionScore.is_correct)\
+                     .filter(UserQuestionScore.race_id == race_id, UserQuestionScore.user_id == user_id).all()
+    if not rows and db.session.query(UserQuestionScore.id).filter_by(race_id=race_id).first() is None:
+        return None
+    return {row.question_id: (row.points, row.is_correct) for row in rows}
 
-                app.logger.debug(f"Scoring SLIDER QID {question_obj.id} - Final: UserVal={user_val}, OfficialVal={official_val}, Diff={diff}, RuleMet='{rule_met}', PointsAwarded={points_obtained}, IsCorrect={is_correct}")
 
-    except Exception as e:
-        app.logger.error(f"Error calculating score for QID {question_obj.id}, UserAnswerID {user_answer_obj.id}: {e}", exc_info=True)
-        return 0, False # Return 0 points and False for correctness in case of an error
+def _correct_answers_count(race_ids, user_ids=None):
+    """
+    Number of correct answers per (user, race) from the stored per-question breakdown, in one grouped query.
 
-    return points_obtained, is_correct
+    Returns:
+        dict: {(user_id, race_id): count}
+    """
+    if not race_ids:
+        return {}
+    query = db.session.query(UserQuestionScore.user_id, UserQuestionScore.race_id, func.count(UserQuestionScore.id))\
+                      .filter(UserQuestionScore.race_id.in_(list(race_ids)), UserQuestionScore.is_correct == True)
+    if user_ids is not None:
+        query = query.filter(UserQuestionScore.user_id.in_(list(user_ids)))
+    return {(user_id, race_id): count for user_id, race_id, count in
+            query.group_by(UserQuestionScore.user_id, UserQuestionScore.race_id).all()}
 
 
 @app.route('/api/races/<int:race_id>/participants/<int:user_id>/answers', methods=['GET'])
 @login_required
 def get_participant_answers(race_id, user_id):
-    app.logger.info(f"Request for participant answers: race_id={race_id}, user_id={user_id} by current_user={current_user.username} (Role: {current_user.role.code})")
+    app.logger.info(f"Request for participant answers: race_id={race_id}, user_id={user_id} by current_user={current_user.username} (Role: {current_user.role_code})")
 
     race = Race.query.filter_by(id=race_id, is_deleted=False).first()
     if not race:
@@ -1261,12 +1214,12 @@ def get_participant_answers(race_id, user_id):
         return jsonify(message="Participant not found"), 404
 
     # Permission Check
-    is_admin_or_league_admin = current_user.role.code in ['ADMIN', 'LEAGUE_ADMIN']
+    is_admin_or_league_admin = current_user.role_code in ['ADMIN', 'LEAGUE_ADMIN']
 
     # For LEAGUE_ADMIN, ensure they own the race or it's a general race if they are trying to access non-owned.
     # Admins can access any. Players can only access if quiniela is closed.
     if is_admin_or_league_admin:
-        if current_user.role.code == 'LEAGUE_ADMIN':
+        if current_user.role_code == 'LEAGUE_ADMIN':
             # Check if the league admin is the creator of the race or if the race is general (accessible by ADMINs)
             # This logic might need refinement based on exact ownership rules for league admins vs general races.
             # Assuming league admins can only see their own races' participant answers.
@@ -1278,148 +1231,85 @@ def get_participant_answers(race_id, user_id):
                  pass # League admins can view answers for races they created. Admins have blanket access.
     else: # Regular user (e.g., PLAYER)
         if race.quiniela_close_date is None or race.quiniela_close_date > datetime.utcnow():
-            app.logger.warning(f"User {current_user.username} (Role: {current_user.role.code}) attempted to access answers for race {race_id} before quiniela close date.")
+            app.logger.warning(f"User {current_user.username} (Role: {current_user.role_code}) attempted to access answers for race {race_id} before quiniela close date.")
             return jsonify(message="Answers are not available until the quiniela is closed."), 403
         # Additionally, a player should probably only be able to see their own answers unless specified otherwise.
         # The current endpoint structure /participants/<user_id>/answers implies viewing a specific user.
         # If current_user.id != participant.id, a PLAYER should be blocked.
         if current_user.id != participant.id:
-            app.logger.warning(f"User {current_user.username} (Role: {current_user.role.code}) attempted to access answers for another user {participant.id}.")
+            app.logger.warning(f"User {current_user.username} (Role: {current_user.role_code}) attempted to access answers for another user {participant.id}.")
             return jsonify(message="You are not authorized to view this participant's answers."), 403
 
 
-    # Fetch all data
-    race_questions = Question.query.filter_by(race_id=race_id).order_by(Question.id).all()
-
-    user_answers_list = UserAnswer.query.filter_by(user_id=participant.id, race_id=race_id).all()
-    user_answers_map = {ua.question_id: ua for ua in user_answers_list}
-
-    official_answers_list = OfficialAnswer.query.filter_by(race_id=race_id).all()
-    official_answers_map = {oa.question_id: oa for oa in official_answers_list}
-
-    # Pre-process official MC-multiple answers
-    official_mc_multiple_options_map = {}
-    for oa_obj in official_answers_list:
-        q_obj = Question.query.get(oa_obj.question_id)
-        if q_obj and q_obj.question_type.name == 'MULTIPLE_CHOICE' and q_obj.is_mc_multiple_correct:
-            official_mc_multiple_options_map[q_obj.id] = {sel_opt.question_option_id for sel_opt in oa_obj.official_selected_mc_options}
-
-    # Pre-process official ORDERING answers:
-    # Now, instead of building from QuestionOption.correct_order_index,
-    # we will prepare the data source that _calculate_score_for_answer expects,
-    # which is a map of question_id to a list of lowercased official ordered texts
-    # derived from OfficialAnswer.answer_text.
-    official_ordering_text_map = {}
-    for q_id, oa_obj in official_answers_map.items():
-        question_for_oa = Question.query.get(q_id) # Get the question object
-        if question_for_oa and question_for_oa.question_type.name == 'ORDERING':
-            if oa_obj and oa_obj.answer_text:
-                # Parse comma-separated texts from OfficialAnswer.answer_text
-                official_texts = [text.strip().lower() for text in oa_obj.answer_text.split(',') if text.strip()]
-                official_ordering_text_map[q_id] = official_texts
-            else:
-                official_ordering_text_map[q_id] = [] # No official answer text or empty
+    # Questions, options, official answers and max points come from the race catalog; scoring from its compiled scorer
+    catalog = _race_catalog(race)
+    scorer = catalog.scorer
+    race_questions = catalog.questions
+    option_texts = catalog.option_texts # option id -> text, for every answer shown
+
+    user_answers_map = user_answers_by_question(race_id, participant.id) # MC selections included
+
+    # Points come from the breakdown stored by the scoring engine; races never scored yet are scored on the fly
+    stored_question_scores = _stored_question_scores(race_id, participant.id)
 
     results = []
 
     for question in race_questions:
+        question_type_name = question.type_name
         user_answer_obj = user_answers_map.get(question.id)
-        official_answer_obj = official_answers_map.get(question.id) # Used for non-ordering types and general info
-
-        points, correct = 0, False
-        if user_answer_obj and official_answer_obj: # official_answer_obj ensures there's an official entry
-            # For ordering questions, _calculate_score_for_answer will now use official_ordering_text_map
-            # For other types, it will use official_answer_obj directly or official_mc_multiple_options_map
-            current_official_ordering_texts = official_ordering_text_map if question.question_type.name == 'ORDERING' else None
-
-            points, correct = _calculate_score_for_answer(
-                user_answer_obj,
-                official_answer_obj, # Still needed for other types and accessing fields like correct_slider_value
-                question,
-                official_mc_multiple_options_map,
-                current_official_ordering_texts # Pass the map of texts for ordering
-            )
+        official_answer_obj = question.official # Used for formatting the official answer
+
+        if stored_question_scores is not None:
+            points, correct = stored_question_scores.get(question.id, (0, False))
+        else:
+            points, correct = scorer.score_answer(user_answer_obj)
 
         # Format participant's answer
         participant_answer_formatted = None
         if user_answer_obj:
-            if question.question_type.name == 'FREE_TEXT':
+            if question_type_name == 'FREE_TEXT':
                 participant_answer_formatted = user_answer_obj.answer_text
-            elif question.question_type.name == 'ORDERING':
+            elif question_type_name == 'ORDERING':
                 # For ordering questions, UserAnswer.answer_text stores the comma-separated string of option texts.
                 # So, we can use it directly.
                 participant_answer_formatted = user_answer_obj.answer_text
-            elif question.question_type.name == 'MULTIPLE_CHOICE':
+            elif question_type_name == 'MULTIPLE_CHOICE':
                 if question.is_mc_multiple_correct:
-                    participant_answer_formatted = [{"id": opt.question_option_id, "text": opt.question_option.option_text} for opt in user_answer_obj.selected_mc_options]
+                    participant_answer_formatted = option_texts.options(opt.question_option_id for opt in user_answer_obj.selected_mc_options)
                 elif user_answer_obj.selected_option_id:
-                    opt = QuestionOption.query.get(user_answer_obj.selected_option_id)
-                    if opt:
-                        participant_answer_formatted = {"id": opt.id, "text": opt.option_text}
-            elif question.question_type.name == 'SLIDER':
+                    participant_answer_formatted = option_texts.option(user_answer_obj.selected_option_id)
+            elif question_type_name == 'SLIDER':
                 participant_answer_formatted = user_answer_obj.slider_answer_value
 
         # Format official answer
         official_answer_formatted = None
         if official_answer_obj:
-            if question.question_type.name == 'FREE_TEXT':
+            if question_type_name == 'FREE_TEXT':
                 official_answer_formatted = official_answer_obj.answer_text
-            elif question.question_type.name == 'ORDERING':
+            elif question_type_name == 'ORDERING':
                 # For ordering questions, OfficialAnswer.answer_text should store the comma-separated string of correct option texts.
-                if official_answer_obj and official_answer_obj.answer_text:
+                if official_answer_obj.answer_text:
                     official_answer_formatted = official_answer_obj.answer_text
                 else:
                     official_answer_formatted = None # No official answer set or answer_text is empty/None
-            elif question.question_type.name == 'MULTIPLE_CHOICE':
+            elif question_type_name == 'MULTIPLE_CHOICE':
                 if question.is_mc_multiple_correct:
-                    official_answer_formatted = [{"id": opt_id, "text": QuestionOption.query.get(opt_id).option_text} for opt_id in official_mc_multiple_options_map.get(question.id, set())]
+                    official_answer_formatted = option_texts.options(official_answer_obj.option_ids)
                 elif official_answer_obj.selected_option_id:
-                    opt = QuestionOption.query.get(official_answer_obj.selected_option_id)
-                    if opt:
-                        official_answer_formatted = {"id": opt.id, "text": opt.option_text}
-            elif question.question_type.name == 'SLIDER':
+                    official_answer_formatted = option_texts.option(official_answer_obj.selected_option_id)
+            elif question_type_name == 'SLIDER':
                 official_answer_formatted = official_answer_obj.correct_slider_value
 
-        # Calculate max_points_possible
-        max_points = 0
-        if question.question_type.name == 'FREE_TEXT':
-            max_points = question.max_score_free_text or 0
-        elif question.question_type.name == 'MULTIPLE_CHOICE':
-            if question.is_mc_multiple_correct:
-                # Sum points for all correct options as defined in official_mc_multiple_options_map
-                # This assumes points_per_correct_mc is positive.
-                # Negative points for incorrect selections are handled by points_obtained.
-                # Max points here is the sum of points for all *actually correct* options.
-                correct_option_ids = official_mc_multiple_options_map.get(question.id, set())
-                max_points = len(correct_option_ids) * (question.points_per_correct_mc or 0)
-            else: # Single correct
-                max_points = question.total_score_mc_single or 0
-        elif question.question_type.name == 'ORDERING':
-            # Max points = (points_per_correct_order * num_items) + bonus_for_full_order
-            # Use official_ordering_text_map (derived from OfficialAnswer.answer_text) for num_items_to_order
-            official_ordered_texts_for_max_points = official_ordering_text_map.get(question.id, [])
-            num_items_to_order = len(official_ordered_texts_for_max_points)
-
-            max_points = (question.points_per_correct_order or 0) * num_items_to_order
-            # Consistent bonus logic for max points:
-            # Add bonus if there are items and they would score points, or if it's the zero-item bonus case
-            if num_items_to_order > 0 and (question.points_per_correct_order or 0) > 0:
-                 max_points += (question.bonus_for_full_order or 0)
-            elif num_items_to_order == 0 and (question.bonus_for_full_order or 0) > 0: # Bonus for ordering zero items
-                 max_points += (question.bonus_for_full_order or 0)
-        elif question.question_type.name == 'SLIDER':
-            max_points = question.slider_points_exact or 0
-
         results.append({
             "question_id": question.id,
             "question_text": question.text,
-            "question_type": question.question_type.name,
+            "question_type": question_type_name,
             "question_is_mc_multiple_correct": question.is_mc_multiple_correct, # ADDED THIS LINE
             "participant_answer": participant_answer_formatted,
             "official_answer": official_answer_formatted,
             "is_correct": correct,
             "points_obtained": points,
-            "max_points_possible": max_points
+            "max_points_possible": question.max_points
         })
 
     return jsonify(results), 200
@@ -1461,6 +1351,7 @@ def favorite_race(race_id):
     try:
         db.session.add(new_favorite)
         db.session.commit()
+        dashboard_cache.invalidate_user(current_user.id)
         return jsonify(message="Race favorited successfully"), 201
     except IntegrityError: # Should ideally be caught by the check above
         db.session.rollback()
@@ -1491,6 +1382,7 @@ def unfavorite_race(race_id):
     try:
         db.session.delete(favorite_entry)
         db.session.commit()
+        dashboard_cache.invalidate_user(current_user.id)
         return jsonify(message="Race unfavorited successfully"), 200
     except Exception as e:
         db.session.rollback()
@@ -1503,8 +1395,8 @@ def unfavorite_race(race_id):
 @login_required
 def create_favorite_link(race_id):
     app.logger.info(f"User {current_user.id} attempting to create favorite link for race {race_id}")
-    if current_user.role.code not in ['ADMIN', 'LEAGUE_ADMIN']:
-        app.logger.warning(f"User {current_user.id} with role {current_user.role.code} forbidden to create favorite link for race {race_id}")
+    if current_user.role_code not in ['ADMIN', 'LEAGUE_ADMIN']:
+        app.logger.warning(f"User {current_user.id} with role {current_user.role_code} forbidden to create favorite link for race {race_id}")
         return jsonify(message="Forbidden: You do not have permission to create favorite links."), 403
 
     race = Race.query.filter_by(id=race_id, is_deleted=False).first()
@@ -1513,7 +1405,7 @@ def create_favorite_link(race_id):
         return jsonify(message="Race not found or has been deleted"), 404
 
     # LEAGUE_ADMIN can only add links to their own races
-    if current_user.role.code == 'LEAGUE_ADMIN' and race.user_id != current_user.id:
+    if current_user.role_code == 'LEAGUE_ADMIN' and race.user_id != current_user.id:
         app.logger.warning(f"LEAGUE_ADMIN {current_user.id} forbidden to create favorite link for race {race_id} they do not own.")
         return jsonify(message="Forbidden: You can only add links to races you created."), 403
 
@@ -1577,8 +1469,8 @@ def get_favorite_links_for_race(race_id):
 @login_required
 def update_favorite_link(link_id):
     app.logger.info(f"User {current_user.id} attempting to update favorite link {link_id}")
-    if current_user.role.code not in ['ADMIN', 'LEAGUE_ADMIN']:
-        app.logger.warning(f"User {current_user.id} with role {current_user.role.code} forbidden to update favorite link {link_id}")
+    if current_user.role_code not in ['ADMIN', 'LEAGUE_ADMIN']:
+        app.logger.warning(f"User {current_user.id} with role {current_user.role_code} forbidden to update favorite link {link_id}")
         return jsonify(message="Forbidden: You do not have permission to update favorite links."), 403
 
     link = FavoriteLink.query.get(link_id)
@@ -1592,7 +1484,7 @@ def update_favorite_link(link_id):
         return jsonify(message="Associated race not found, cannot update link."), 500
 
     # LEAGUE_ADMIN can only update links for their own races
-    if current_user.role.code == 'LEAGUE_ADMIN' and race.user_id != current_user.id:
+    if current_user.role_code == 'LEAGUE_ADMIN' and race.user_id != current_user.id:
         app.logger.warning(f"LEAGUE_ADMIN {current_user.id} forbidden to update favorite link {link_id} for race {race.id} they do not own.")
         return jsonify(message="Forbidden: You can only update links for races you created."), 403
 
@@ -1644,8 +1536,8 @@ def update_favorite_link(link_id):
 @login_required
 def delete_favorite_link(link_id):
     app.logger.info(f"User {current_user.id} attempting to delete favorite link {link_id}")
-    if current_user.role.code not in ['ADMIN', 'LEAGUE_ADMIN']:
-        app.logger.warning(f"User {current_user.id} with role {current_user.role.code} forbidden to delete favorite link {link_id}")
+    if current_user.role_code not in ['ADMIN', 'LEAGUE_ADMIN']:
+        app.logger.warning(f"User {current_user.id} with role {current_user.role_code} forbidden to delete favorite link {link_id}")
         return jsonify(message="Forbidden: You do not have permission to delete favorite links."), 403
 
     link = FavoriteLink.query.get(link_id)
@@ -1657,7 +1549,7 @@ def delete_favorite_link(link_id):
     if not race: # Should not happen
         app.logger.error(f"Race with id {link.race_id} associated with FavoriteLink {link_id} not found during delete.")
         # Link still exists so proceed with deletion of link, but log this anomaly.
-    elif current_user.role.code == 'LEAGUE_ADMIN' and race.user_id != current_user.id:
+    elif current_user.role_code == 'LEAGUE_ADMIN' and race.user_id != current_user.id:
         app.logger.warning(f"LEAGUE_ADMIN {current_user.id} forbidden to delete favorite link {link_id} for race {race.id} they do not own.")
         return jsonify(message="Forbidden: You can only delete links for races you created."), 403
 
@@ -1675,7 +1567,7 @@ def delete_favorite_link(link_id):
 @login_required
 def reorder_favorite_links(race_id):
     app.logger.info(f"User {current_user.id} attempting to reorder favorite links for race {race_id}")
-    if current_user.role.code not in ['ADMIN', 'LEAGUE_ADMIN']:
+    if current_user.role_code not in ['ADMIN', 'LEAGUE_ADMIN']:
         app.logger.warning(f"User {current_user.id} forbidden to reorder links for race {race_id}")
         return jsonify(message="Forbidden: You do not have permission to reorder links."), 403
 
@@ -1684,7 +1576,7 @@ def reorder_favorite_links(race_id):
         app.logger.warning(f"Race with id {race_id} not found or deleted when reordering links.")
         return jsonify(message="Race not found or has been deleted"), 404
 
-    if current_user.role.code == 'LEAGUE_ADMIN' and race.user_id != current_user.id:
+    if current_user.role_code == 'LEAGUE_ADMIN' and race.user_id != current_user.id:
         app.logger.warning(f"LEAGUE_ADMIN {current_user.id} forbidden to reorder links for race {race_id} they do not own.")
         return jsonify(message="Forbidden: You can only reorder links for races you created."), 403
 
@@ -1739,21 +1631,21 @@ def _serialize_question(question):
     question_data = {
         "id": question.id,
         "text": question.text,
-        "question_type": question.question_type.name,
+        "question_type": question.type_name,
         "is_active": question.is_active,
         "race_id": question.race_id
     }
-    if question.question_type.name == 'FREE_TEXT':
+    if question.type_name == 'FREE_TEXT':
         question_data["max_score_free_text"] = question.max_score_free_text
-    elif question.question_type.name == 'MULTIPLE_CHOICE':
+    elif question.type_name == 'MULTIPLE_CHOICE':
         question_data["is_mc_multiple_correct"] = question.is_mc_multiple_correct
         question_data["points_per_correct_mc"] = question.points_per_correct_mc
         question_data["points_per_incorrect_mc"] = question.points_per_incorrect_mc
         question_data["total_score_mc_single"] = question.total_score_mc_single
-    elif question.question_type.name == 'ORDERING':
+    elif question.type_name == 'ORDERING':
         question_data["points_per_correct_order"] = question.points_per_correct_order
         question_data["bonus_for_full_order"] = question.bonus_for_full_order
-    elif question.question_type.name == 'SLIDER':
+    elif question.type_name == 'SLIDER':
         question_data["slider_unit"] = question.slider_unit
         question_data["slider_min_value"] = question.slider_min_value
         question_data["slider_max_value"] = question.slider_max_value
@@ -1789,14 +1681,14 @@ def _create_question_and_options_from_payload(question_payload, race_id):
         app.logger.warning(f"Skipping question due to missing type: {question_payload.get('text')}")
         return None
 
-    question_type_obj = QuestionType.query.filter_by(name=question_type_name).first()
-    if not question_type_obj:
+    question_type_id = reference_data.question_type_id(question_type_name)
+    if not question_type_id:
         app.logger.warning(f"Skipping question due to invalid type '{question_type_name}': {question_payload.get('text')}")
         return None
 
     new_question = Question(
         race_id=race_id,
-        question_type_id=question_type_obj.id,
+        question_type_id=question_type_id,
         text=question_payload.get('text'),
         is_active=question_payload.get('is_active', True)
     )
@@ -1848,7 +1740,7 @@ def _create_question_and_options_from_payload(question_payload, race_id):
 @app.route('/api/races/<int:race_id>/questions/free-text', methods=['POST'])
 @login_required
 def create_free_text_question(race_id):
-    if current_user.role.code not in ['ADMIN', 'LEAGUE_ADMIN']:
+    if current_user.role_code not in ['ADMIN', 'LEAGUE_ADMIN']:
         return jsonify(message="Forbidden: Insufficient permissions"), 403
 
     race = Race.query.filter_by(id=race_id, is_deleted=False).first()
@@ -1871,13 +1763,13 @@ def create_free_text_question(race_id):
     if not isinstance(max_score_free_text, int) or max_score_free_text <= 0:
         return jsonify(message="max_score_free_text is required and must be a positive integer"), 400
 
-    question_type_ft = QuestionType.query.filter_by(name='FREE_TEXT').first()
-    if not question_type_ft:
+    free_text_type_id = reference_data.question_type_id('FREE_TEXT')
+    if not free_text_type_id:
         return jsonify(message="QuestionType 'FREE_TEXT' not found. Please seed database."), 500
 
     new_question = Question(
         race_id=race_id,
-        question_type_id=question_type_ft.id,
+        question_type_id=free_text_type_id,
         text=text,
         max_score_free_text=max_score_free_text,
         is_active=data.get('is_active', True) # Default to True if not provided
@@ -1885,7 +1777,9 @@ def create_free_text_question(race_id):
     )
     try:
         db.session.add(new_question)
+        bump_catalog_version(race_id) # El catálogo de la carrera cambia
         db.session.commit()
+        race_catalogs.invalidate_race(race_id)
         return jsonify(_serialize_question(new_question)), 201
     except Exception as e:
         db.session.rollback()
@@ -1895,13 +1789,13 @@ def create_free_text_question(race_id):
 @app.route('/api/questions/free-text/<int:question_id>', methods=['PUT'])
 @login_required
 def update_free_text_question(question_id):
-    if current_user.role.code not in ['ADMIN', 'LEAGUE_ADMIN']:
+    if current_user.role_code not in ['ADMIN', 'LEAGUE_ADMIN']:
         return jsonify(message="Forbidden: Insufficient permissions"), 403
 
     question = Question.query.get(question_id)
     if not question:
         return jsonify(message="Question not found"), 404
-    if question.question_type.name != 'FREE_TEXT':
+    if question.type_name != 'FREE_TEXT':
         return jsonify(message="Cannot update non-FREE_TEXT question via this endpoint"), 400
 
     data = request.get_json()
@@ -1927,8 +1821,15 @@ def update_free_text_question(question_id):
         question.is_active = is_active
 
     try:
+        needs_rescore = _question_needs_rescore(question, data)
+        bump_catalog_version(question.race_id) # El catálogo de la carrera cambia
         db.session.commit()
-        return jsonify(_serialize_question(question)), 200
+        race_catalogs.invalidate_race(question.race_id)
+        question_data = _serialize_question(question)
+        # Los puntos de la pregunta se recalculan con sus nuevos parámetros
+        question_data["scoring_job_id"] = _enqueue_rescore_after_question_change(
+            question.race_id, question.id, requested_by_id=current_user.id) if needs_rescore else None
+        return jsonify(question_data), 200
     except Exception as e:
         db.session.rollback()
         print(f"Error updating free text question: {e}")
@@ -1937,7 +1838,7 @@ def update_free_text_question(question_id):
 @app.route('/api/questions/<int:question_id>', methods=['DELETE'])
 @login_required
 def delete_question(question_id):
-    if current_user.role.code not in ['ADMIN', 'LEAGUE_ADMIN']:
+    if current_user.role_code not in ['ADMIN', 'LEAGUE_ADMIN']:
         return jsonify(message="Forbidden: Insufficient permissions"), 403
 
     question = Question.query.get(question_id)
@@ -1947,10 +1848,16 @@ def delete_question(question_id):
     try:
         # Delete associated options first - important for all question types
         QuestionOption.query.filter_by(question_id=question_id).delete()
+        race_id = question.race_id
+        # Con respuesta oficial la pregunta puntuaba: sus puntos deben salir de los totales
+        had_official_answer = db.session.query(OfficialAnswer.id).filter_by(question_id=question_id).first() is not None
+        bump_catalog_version(race_id) # El catálogo de la carrera cambia
         # Then delete the question itself
         db.session.delete(question)
         db.session.commit()
-        return jsonify(message="Question deleted successfully"), 200 # Or 204 No Content
+        race_catalogs.invalidate_race(race_id)
+        scoring_job_id = _enqueue_rescore_after_question_change(race_id, requested_by_id=current_user.id) if had_official_answer else None
+        return jsonify(message="Question deleted successfully", scoring_job_id=scoring_job_id), 200 # Or 204 No Content
     except Exception as e:
         db.session.rollback()
         print(f"Error deleting question: {e}")
@@ -1971,6 +1878,12 @@ def register_user():
     password = data.get('password')
     role_code = data.get('role') # Get role from request
 
+    if _auth_throttling_enabled():
+        try:
+            registration_limiter_by_ip.consume(_client_ip())
+        except ThrottledError as throttled:
+            return _retry_later_response(throttled.retry_after, "Too many registrations, please retry later.", 429)
+
     # Aseguramos que role_code también venga en la solicitud
     if not all([name, username, email, password, role_code]):
         return jsonify(message="Missing required fields"), 400
@@ -1990,7 +1903,10 @@ def register_user():
     if User.query.filter_by(email=email).first(): return jsonify(message="Email already exists"), 409
 
     new_user = User(name=name, username=username, email=email, role=user_role_obj)
-    new_user.set_password(password)
+    try:
+        new_user.password_hash = password_hasher.hash(password)
+    except PasswordHasherBusy as busy:
+        return _retry_later_response(busy.retry_after, "Server busy, please retry shortly.", 503)
     try:
         db.session.add(new_user)
         db.session.commit()
@@ -2015,8 +1931,28 @@ def login_api():
     username = data.get('username')
     password = data.get('password')
     if not username or not password: return jsonify(message="Username and password are required"), 400
+    if _auth_throttling_enabled():
+        try:
+            login_limiter_by_ip.consume(_client_ip())
+            login_limiter_by_username.consume(username.strip().lower())
+        except ThrottledError as throttled:
+            app.logger.warning(f"[login_api] Login throttled for '{username}' from {_client_ip()}")
+            return _retry_later_response(throttled.retry_after, "Too many login attempts, please retry later.", 429)
     user = User.query.filter_by(username=username).first()
-    if user and user.check_password(password) and user.is_active:
+    try:
+        password_ok = password_hasher.verify(password, user.password_hash if user else None)
+    except PasswordHasherBusy as busy:
+        return _retry_later_response(busy.retry_after, "Server busy, please retry shortly.", 503)
+    if user and password_ok and user.is_active:
+        if password_hasher.needs_rehash(user.password_hash):
+            # Coste de bcrypt cambiado: se guarda el hash con el coste actual ahora que tenemos la contraseña
+            try:
+                user.password_hash = password_hasher.hash(password)
+                db.session.commit()
+            except Exception as e: # El login no depende del rehash
+                db.session.rollback()
+                app.logger.warning(f"[login_api] Could not rehash password of user {user.id}: {e}")
+        login_limiter_by_username.reset(username.strip().lower())
         login_user(user)
         response = jsonify(message="Login successful", user_id=user.id, username=user.username)
 
@@ -2041,7 +1977,7 @@ def logout_api():
 @app.route('/api/races/<int:race_id>/questions/multiple-choice', methods=['POST'])
 @login_required
 def create_multiple_choice_question(race_id):
-    if current_user.role.code not in ['ADMIN', 'LEAGUE_ADMIN']:
+    if current_user.role_code not in ['ADMIN', 'LEAGUE_ADMIN']:
         return jsonify(message="Forbidden: Insufficient permissions"), 403
 
     race = Race.query.filter_by(id=race_id, is_deleted=False).first()
@@ -2100,13 +2036,13 @@ def create_multiple_choice_question(race_id):
         if not isinstance(total_score_mc_single, int) or total_score_mc_single <= 0:
             return jsonify(message="total_score_mc_single is required and must be a positive integer for single-correct MCQs"), 400
 
-    question_type_mc = QuestionType.query.filter_by(name='MULTIPLE_CHOICE').first()
-    if not question_type_mc:
+    mc_type_id = reference_data.question_type_id('MULTIPLE_CHOICE')
+    if not mc_type_id:
         return jsonify(message="QuestionType 'MULTIPLE_CHOICE' not found. Please seed database."), 500
 
     new_question = Question(
         race_id=race_id,
-        question_type_id=question_type_mc.id,
+        question_type_id=mc_type_id,
         text=text,
         is_active=data.get('is_active', True),
         is_mc_multiple_correct=is_mc_multiple_correct,
@@ -2139,7 +2075,9 @@ def create_multiple_choice_question(race_id):
             #     q_option.is_correct_mc_single = opt_data['is_correct']
             db.session.add(q_option) # Add option to session
 
+        bump_catalog_version(race_id) # El catálogo de la carrera cambia
         db.session.commit()
+        race_catalogs.invalidate_race(race_id)
         return jsonify(_serialize_question(new_question)), 201
     except Exception as e:
         db.session.rollback()
@@ -2150,13 +2088,13 @@ def create_multiple_choice_question(race_id):
 @app.route('/api/questions/multiple-choice/<int:question_id>', methods=['PUT'])
 @login_required
 def update_multiple_choice_question(question_id):
-    if current_user.role.code not in ['ADMIN', 'LEAGUE_ADMIN']:
+    if current_user.role_code not in ['ADMIN', 'LEAGUE_ADMIN']:
         return jsonify(message="Forbidden: Insufficient permissions"), 403
 
     question = Question.query.get(question_id)
     if not question:
         return jsonify(message="Question not found"), 404
-    if question.question_type.name != 'MULTIPLE_CHOICE':
+    if question.type_name != 'MULTIPLE_CHOICE':
         return jsonify(message="Cannot update non-MULTIPLE_CHOICE question via this endpoint"), 400
 
     data = request.get_json()
@@ -2251,8 +2189,15 @@ def update_multiple_choice_question(question_id):
             db.session.add(q_option)
 
     try:
+        needs_rescore = _question_needs_rescore(question, data)
+        bump_catalog_version(question.race_id) # El catálogo de la carrera cambia
         db.session.commit()
-        return jsonify(_serialize_question(question)), 200
+        race_catalogs.invalidate_race(question.race_id)
+        question_data = _serialize_question(question)
+        # Los puntos de la pregunta se recalculan con sus nuevos parámetros
+        question_data["scoring_job_id"] = _enqueue_rescore_after_question_change(
+            question.race_id, question.id, requested_by_id=current_user.id) if needs_rescore else None
+        return jsonify(question_data), 200
     except Exception as e:
         db.session.rollback()
         print(f"Error updating multiple choice question: {e}")
@@ -2263,7 +2208,7 @@ def update_multiple_choice_question(question_id):
 @app.route('/api/races/<int:race_id>/questions/ordering', methods=['POST'])
 @login_required
 def create_ordering_question(race_id):
-    if current_user.role.code not in ['ADMIN', 'LEAGUE_ADMIN']:
+    if current_user.role_code not in ['ADMIN', 'LEAGUE_ADMIN']:
         return jsonify(message="Forbidden: Insufficient permissions"), 403
 
     race = Race.query.filter_by(id=race_id, is_deleted=False).first()
@@ -2297,13 +2242,13 @@ def create_ordering_question(race_id):
            'option_text' not in opt_data or not isinstance(opt_data['option_text'], str) or not opt_data['option_text'].strip():
             return jsonify(message="Each option must have 'option_text' (string)"), 400
 
-    question_type_ordering = QuestionType.query.filter_by(name='ORDERING').first()
-    if not question_type_ordering:
+    ordering_type_id = reference_data.question_type_id('ORDERING')
+    if not ordering_type_id:
         return jsonify(message="QuestionType 'ORDERING' not found. Please seed database."), 500
 
     new_question = Question(
         race_id=race_id,
-        question_type_id=question_type_ordering.id,
+        question_type_id=ordering_type_id,
         text=text,
         is_active=data.get('is_active', True),
         points_per_correct_order=points_per_correct_order,
@@ -2322,7 +2267,9 @@ def create_ordering_question(race_id):
             )
             db.session.add(q_option)
 
+        bump_catalog_version(race_id) # El catálogo de la carrera cambia
         db.session.commit()
+        race_catalogs.invalidate_race(race_id)
         return jsonify(_serialize_question(new_question)), 201
     except Exception as e:
         db.session.rollback()
@@ -2332,13 +2279,13 @@ def create_ordering_question(race_id):
 @app.route('/api/questions/ordering/<int:question_id>', methods=['PUT'])
 @login_required
 def update_ordering_question(question_id):
-    if current_user.role.code not in ['ADMIN', 'LEAGUE_ADMIN']:
+    if current_user.role_code not in ['ADMIN', 'LEAGUE_ADMIN']:
         return jsonify(message="Forbidden: Insufficient permissions"), 403
 
     question = Question.query.get(question_id)
     if not question:
         return jsonify(message="Question not found"), 404
-    if question.question_type.name != 'ORDERING':
+    if question.type_name != 'ORDERING':
         return jsonify(message="Cannot update non-ORDERING question via this endpoint"), 400
 
     data = request.get_json()
@@ -2392,8 +2339,15 @@ def update_ordering_question(question_id):
             db.session.add(q_option)
 
     try:
+        needs_rescore = _question_needs_rescore(question, data)
+        bump_catalog_version(question.race_id) # El catálogo de la carrera cambia
         db.session.commit()
-        return jsonify(_serialize_question(question)), 200
+        race_catalogs.invalidate_race(question.race_id)
+        question_data = _serialize_question(question)
+        # Los puntos de la pregunta se recalculan con sus nuevos parámetros
+        question_data["scoring_job_id"] = _enqueue_rescore_after_question_change(
+            question.race_id, question.id, requested_by_id=current_user.id) if needs_rescore else None
+        return jsonify(question_data), 200
     except Exception as e:
         db.session.rollback()
         print(f"Error updating ordering question: {e}")
@@ -2403,7 +2357,7 @@ def update_ordering_question(question_id):
 @app.route('/api/races/<int:race_id>/questions/slider', methods=['POST'])
 @login_required
 def create_slider_question(race_id):
-    if current_user.role.code not in ['ADMIN', 'LEAGUE_ADMIN']:
+    if current_user.role_code not in ['ADMIN', 'LEAGUE_ADMIN']:
         return jsonify(message="Forbidden: Insufficient permissions"), 403
 
     race = Race.query.filter_by(id=race_id, is_deleted=False).first()
@@ -2470,14 +2424,14 @@ def create_slider_question(race_id):
         slider_points_partial = None
 
 
-    question_type_slider = QuestionType.query.filter_by(name='SLIDER').first()
-    if not question_type_slider:
+    slider_type_id = reference_data.question_type_id('SLIDER')
+    if not slider_type_id:
         # This case should ideally not happen if DB is seeded correctly
         return jsonify(message="QuestionType 'SLIDER' not found. Please seed database."), 500
 
     new_question = Question(
         race_id=race_id,
-        question_type_id=question_type_slider.id,
+        question_type_id=slider_type_id,
         text=text,
         is_active=data.get('is_active', True), # Default to True
         slider_unit=slider_unit if (slider_unit and slider_unit.strip()) else None, # Store None if empty string
@@ -2491,7 +2445,9 @@ def create_slider_question(race_id):
 
     try:
         db.session.add(new_question)
+        bump_catalog_version(race_id) # El catálogo de la carrera cambia
         db.session.commit()
+        race_catalogs.invalidate_race(race_id)
         return jsonify(_serialize_question(new_question)), 201
     except Exception as e:
         db.session.rollback()
@@ -2501,13 +2457,13 @@ def create_slider_question(race_id):
 @app.route('/api/questions/slider/<int:question_id>', methods=['PUT'])
 @login_required
 def update_slider_question(question_id):
-    if current_user.role.code not in ['ADMIN', 'LEAGUE_ADMIN']:
+    if current_user.role_code not in ['ADMIN', 'LEAGUE_ADMIN']:
         return jsonify(message="Forbidden: Insufficient permissions"), 403
 
     question = Question.query.get(question_id)
     if not question:
         return jsonify(message="Question not found"), 404
-    if question.question_type.name != 'SLIDER':
+    if question.type_name != 'SLIDER':
         return jsonify(message="Cannot update non-SLIDER question via this endpoint"), 400
 
     data = request.get_json()
@@ -2606,8 +2562,15 @@ def update_slider_question(question_id):
 
 
     try:
+        needs_rescore = _question_needs_rescore(question, data)
+        bump_catalog_version(question.race_id) # El catálogo de la carrera cambia
         db.session.commit()
-        return jsonify(_serialize_question(question)), 200
+        race_catalogs.invalidate_race(question.race_id)
+        question_data = _serialize_question(question)
+        # Los puntos de la pregunta se recalculan con sus nuevos parámetros
+        question_data["scoring_job_id"] = _enqueue_rescore_after_question_change(
+            question.race_id, question.id, requested_by_id=current_user.id) if needs_rescore else None
+        return jsonify(question_data), 200
     except Exception as e:
         db.session.rollback()
         app.logger.error(f"Error updating slider question {question_id}: {e}", exc_info=True)
@@ -2621,14 +2584,14 @@ def current_user_details():
     # Acceder a la descripción del rol para mostrarla en el frontend
     return jsonify(
         username=current_user.username,
-        role=current_user.role.description # CAMBIO AQUÍ: Usar .description para visualización
+        role=current_user.role_entry.description # CAMBIO AQUÍ: Usar .description para visualización
     ), 200
 
 @app.route('/api/admin/general_data', methods=['GET'])
 @login_required
 def general_admin_data():
     # Comprobación de permisos: Usar .code para la lógica de autorización
-    if current_user.role.code == 'ADMIN': # CAMBIO AQUÍ: 'admin' a 'ADMIN' (el código)
+    if current_user.role_code == 'ADMIN': # CAMBIO AQUÍ: 'admin' a 'ADMIN' (el código)
         return jsonify(message="Data for General Admin"), 200
     else:
         return jsonify(message="Forbidden: You do not have the required permissions."), 403
@@ -2637,17 +2600,33 @@ def general_admin_data():
 @login_required
 def league_admin_data():
     # Comprobación de permisos: Usar .code para la lógica de autorización
-    if current_user.role.code == 'LEAGUE_ADMIN' or \
-       current_user.role.code == 'ADMIN': # CAMBIO AQUÍ: 'admin de liga' a 'LEAGUE_ADMIN', 'admin' a 'ADMIN'
+    if current_user.role_code == 'LEAGUE_ADMIN' or \
+       current_user.role_code == 'ADMIN': # CAMBIO AQUÍ: 'admin de liga' a 'LEAGUE_ADMIN', 'admin' a 'ADMIN'
         return jsonify(message="Data for League Admin (accessible by League and General Admins)"), 200
     else:
         return jsonify(message="Forbidden: You do not have the required permissions."), 403
+
+@app.route('/api/admin/boot_timings', methods=['GET'])
+@login_required
+def boot_timings():
+    """Per-phase boot timings and configuration sources of this worker process."""
+    if current_user.role_code != 'ADMIN':
+        return jsonify(message="Forbidden: You do not have the required permissions."), 403
+    return jsonify(config_sources=config_loader.sources, preload=preload_report, **boot_timer.report()), 200
+
+@app.route('/api/admin/answer_queue_metrics', methods=['GET'])
+@login_required
+def answer_queue_metrics():
+    """Queue depth, counters and wait/apply latencies of the answer write queue (this worker process)."""
+    if current_user.role_code != 'ADMIN':
+        return jsonify(message="Forbidden: You do not have the required permissions."), 403
+    return jsonify(answer_admission.metrics()), 200
         
 @app.route('/api/user/personal_data', methods=['GET'])
 @login_required
 def user_personal_data():
     # Comprobación de permisos: Usar .code para la lógica de autorización
-    if current_user.role.code == 'PLAYER': # CAMBIO AQUÍ: 'jugador' a 'PLAYER'
+    if current_user.role_code == 'PLAYER': # CAMBIO AQUÍ: 'jugador' a 'PLAYER'
         return jsonify(message="Data for User role"), 200
     else:
         return jsonify(message="Forbidden: You do not have the required permissions for this data."), 403
@@ -2744,7 +2723,7 @@ def serve_hello_world_page():
     filter_race_format_id_str = request.args.get('filter_race_format_id')
     filter_status_str = request.args.get('filter_status') # Comma-separated e.g., "PLANNED,ACTIVE"
 
-    all_race_formats = RaceFormat.query.order_by(RaceFormat.name).all()
+    all_race_formats = reference_data.race_formats()
     all_race_statuses = [status.value for status in RaceStatus] # For the filter UI
 
     selected_statuses_for_query = []
@@ -2786,86 +2765,38 @@ def serve_hello_world_page():
             pass
 
     current_year = datetime.utcnow().year
-    app.logger.info(f"Serving dashboard for user {current_user.username} with role {current_user.role.code}")
+    app.logger.info(f"Serving dashboard for user {current_user.username} with role {current_user.role_code}")
 
     all_races = [] # Initialize all_races
 
-    # --- Race Status Update Logic ---
-    # Fetch all PLANNED races that are not deleted
-    races_to_check_status = Race.query.filter(
-        Race.status == RaceStatus.PLANNED,
-        Race.is_deleted == False
-    ).all()
+    # El paso PLANNED -> ACTIVE al cerrar la quiniela lo hace race_scheduler; esta vista solo lee
 
-    updated_races_count = 0
-    for race_to_update in races_to_check_status:
-        if race_to_update.quiniela_close_date and race_to_update.quiniela_close_date < datetime.utcnow():
-            race_to_update.status = RaceStatus.ACTIVE
-            updated_races_count += 1
-            app.logger.info(f"Race ID {race_to_update.id} status updated from PLANNED to ACTIVE.")
-
-    if updated_races_count > 0:
-        try:
-            db.session.commit()
-            app.logger.info(f"Committed status updates for {updated_races_count} races.")
-        except Exception as e:
-            db.session.rollback()
-            app.logger.error(f"Error committing race status updates: {e}", exc_info=True)
-    # --- End Race Status Update Logic ---
+    # Filtros comunes a todas las listas de tarjetas del dashboard
+    card_filters = dict(date_from=date_from_obj, date_to=date_to_obj, race_format_id=race_format_id_int,
+                        statuses=selected_statuses_for_query)
+    # Clave del dashboard ya montado en dashboard_cache: rol + conjunto de filtros
+    dashboard_variant = (current_user.role_code, date_from_obj, date_to_obj, race_format_id_int,
+                         tuple(sorted(status.value for status in selected_statuses_for_query)))
+    cached_dashboard = dashboard_cache.get(current_user.id, dashboard_variant) if _dashboard_cache_enabled() else None
 
     # Role-based rendering
-    if current_user.role.code == 'ADMIN':
-        # Query for general races (for cards), ensuring they are not deleted
-        query_general_races = Race.query.filter_by(is_general=True, is_deleted=False)
-        if date_from_obj:
-            query_general_races = query_general_races.filter(Race.event_date >= date_from_obj)
-        if date_to_obj:
-            query_general_races = query_general_races.filter(Race.event_date <= date_to_obj)
-        if race_format_id_int is not None:
-            query_general_races = query_general_races.filter(Race.race_format_id == race_format_id_int)
-        if selected_statuses_for_query:
-            query_general_races = query_general_races.filter(Race.status.in_(selected_statuses_for_query))
-
-        general_races_for_cards_query_result = []
+    if current_user.role_code == 'ADMIN':
+        # Tarjetas de carreras generales: proyección de columnas en una sola consulta (sin hidratar Race)
+        general_races_for_cards_dicts = []
         try:
-            general_races_for_cards_query_result = query_general_races.order_by(Race.event_date.desc()).all()
+            general_races_for_cards_dicts = fetch_race_cards(apply_race_card_filters(
+                race_card_query(Race.is_general == True), **card_filters
+            ))
         except Exception as e:
             app.logger.error(f"Error fetching general races for admin dashboard cards: {e}")
 
-        general_races_for_cards_dicts = []
-        for race in general_races_for_cards_query_result:
-            race_dict = race.to_dict()
-            is_quiniela_actionable = True
-            if race_dict.get('quiniela_close_date'):
-                try:
-                    qcd_str = race_dict['quiniela_close_date']
-                    if qcd_str.endswith('Z'):
-                        close_date_obj = datetime.fromisoformat(qcd_str.replace('Z', '+00:00'))
-                    else:
-                        close_date_obj = datetime.fromisoformat(qcd_str)
-                    # Assuming quiniela_close_date is stored as naive UTC
-                    if close_date_obj > datetime.utcnow():
-                        is_quiniela_actionable = False
-                except ValueError as ve:
-                    app.logger.error(f"Error parsing quiniela_close_date '{race_dict['quiniela_close_date']}' for race {race.id}: {ve}")
-                    is_quiniela_actionable = True # Defaulting to true if parsing fails
-            race_dict['is_quiniela_actionable'] = is_quiniela_actionable
-            general_races_for_cards_dicts.append(race_dict)
-
         # Query for all non-deleted races (for official answers dropdown)
-        # Status filter might not be desired for this dropdown, as admins might need to select any race.
-        # However, applying it for consistency for now. This can be revisited.
-        all_races_for_official_answers_query = Race.query.filter_by(is_deleted=False)
-        # If specific statuses are needed for this dropdown, apply them. Otherwise, remove this filter.
         # For now, let's assume it should list ALL non-deleted races regardless of status for admin tasks.
-        # if selected_statuses_for_query:
-        #     all_races_for_official_answers_query = all_races_for_official_answers_query.filter(Race.status.in_(selected_statuses_for_query))
-        all_races_for_official_answers_query_result = []
+        all_races_for_official_answers = []
         try:
-            all_races_for_official_answers_query_result = all_races_for_official_answers_query.order_by(Race.event_date.desc()).all()
+            all_races_for_official_answers = fetch_race_cards(race_card_query())
         except Exception as e:
             app.logger.error(f"Error fetching all non-deleted races for admin official answers: {e}")
-        all_races_for_official_answers = [race.to_dict() for race in all_races_for_official_answers_query_result]
 
         return render_template('admin_dashboard.html',
                                races=general_races_for_cards_dicts, # Use the new list with actionable flag
@@ -2879,115 +2810,40 @@ def serve_hello_world_page():
                                current_year=current_year,
                                auto_join_race_id=auto_join_race_id_to_template, # Mantener estos nombres para la plantilla
                                race_to_join_title=race_to_join_title_to_template) # Mantener estos nombres para la plantilla
-    elif current_user.role.code == 'LEAGUE_ADMIN':
-        # --- Active Players KPI Calculation ---
-        active_players_count = 0
-        # Get all non-deleted races created by this league admin, ordered by event date descending
-        admin_races = Race.query.filter_by(user_id=current_user.id, is_deleted=False).order_by(Race.event_date.desc()).all()
-
-        # Determine the races to consider for active players
-        if admin_races:
-            races_for_kpi = admin_races[:3] # Last 3 races (or fewer if less than 3 exist)
-            race_ids_for_kpi = [r.id for r in races_for_kpi]
-
+    elif current_user.role_code == 'LEAGUE_ADMIN':
+        if cached_dashboard is None:
+            # --- Active Players KPI Calculation ---
+            active_players_count = 0
+            # Last 3 non-deleted races created by this league admin (only their ids are needed)
+            race_ids_for_kpi = [
+                row.id for row in db.session.query(Race.id)
+                .filter(Race.user_id == current_user.id, Race.is_deleted == False)
+                .order_by(Race.event_date.desc()).limit(3).all()
+            ]
             if race_ids_for_kpi:
                 # Count unique players who submitted at least one UserAnswer in these races
                 active_players_count = db.session.query(func.count(UserAnswer.user_id.distinct())) \
                     .filter(UserAnswer.race_id.in_(race_ids_for_kpi)) \
                     .scalar() or 0 # Ensure 0 if scalar() returns None
-        # --- End of Active Players KPI Calculation ---
-
-        # 1. Organized Races (created by this league admin, not general)
-        # Re-fetch organized_races_result if admin_races was only for KPI or adapt existing logic
-        # For simplicity, we'll use the admin_races already fetched if no filters are applied,
-        # otherwise, we need to re-apply filters.
-        # The original code re-queries with filters, so we stick to that for organized_races_dicts.
-        organized_races_query_for_display = Race.query.filter_by(user_id=current_user.id, is_general=False, is_deleted=False)
-        if date_from_obj: organized_races_query_for_display = organized_races_query_for_display.filter(Race.event_date >= date_from_obj)
-        if date_to_obj: organized_races_query_for_display = organized_races_query_for_display.filter(Race.event_date <= date_to_obj)
-        if race_format_id_int is not None: organized_races_query_for_display = organized_races_query_for_display.filter(Race.race_format_id == race_format_id_int)
-        if selected_statuses_for_query:
-            organized_races_query_for_display = organized_races_query_for_display.filter(Race.status.in_(selected_statuses_for_query))
-        organized_races_result_for_display = organized_races_query_for_display.order_by(Race.event_date.desc()).all()
-
-        organized_races_dicts = []
-        for race in organized_races_result_for_display: # Use the filtered list for display
-            race_dict = race.to_dict()
-            is_quiniela_actionable = True
-            if race_dict.get('quiniela_close_date'):
-                try:
-                    qcd_str = race_dict['quiniela_close_date']
-                    if qcd_str.endswith('Z'): close_date_obj = datetime.fromisoformat(qcd_str.replace('Z', '+00:00'))
-                    else: close_date_obj = datetime.fromisoformat(qcd_str)
-                    if close_date_obj.tzinfo is None:
-                        if close_date_obj > datetime.utcnow(): is_quiniela_actionable = False
-                    else:
-                        if close_date_obj.replace(tzinfo=None) > datetime.utcnow(): is_quiniela_actionable = False
-                except ValueError as ve:
-                    app.logger.error(f"Error parsing quiniela_close_date '{race_dict['quiniela_close_date']}' for organized race {race.id}: {ve}")
-                    is_quiniela_actionable = True
-            race_dict['is_quiniela_actionable'] = is_quiniela_actionable
-            organized_races_dicts.append(race_dict)
-
-        # 2. Participating Races
-        registrations = UserRaceRegistration.query.filter_by(user_id=current_user.id).all()
-        participating_race_ids = [reg.race_id for reg in registrations]
-        participating_races_result = []
-        if participating_race_ids:
-            participating_races_query = Race.query.filter(Race.id.in_(participating_race_ids), Race.is_deleted==False)
-            if date_from_obj: participating_races_query = participating_races_query.filter(Race.event_date >= date_from_obj)
-            if date_to_obj: participating_races_query = participating_races_query.filter(Race.event_date <= date_to_obj)
-            if race_format_id_int is not None: participating_races_query = participating_races_query.filter(Race.race_format_id == race_format_id_int)
-            if selected_statuses_for_query:
-                participating_races_query = participating_races_query.filter(Race.status.in_(selected_statuses_for_query))
-            participating_races_result = participating_races_query.order_by(Race.event_date.desc()).all()
-
-        participating_races_dicts = []
-        for race in participating_races_result:
-            race_dict = race.to_dict()
-            is_quiniela_actionable = True
-            if race_dict.get('quiniela_close_date'):
-                try:
-                    qcd_str = race_dict['quiniela_close_date']
-                    if qcd_str.endswith('Z'): close_date_obj = datetime.fromisoformat(qcd_str.replace('Z', '+00:00'))
-                    else: close_date_obj = datetime.fromisoformat(qcd_str)
-                    if close_date_obj.tzinfo is None:
-                        if close_date_obj > datetime.utcnow(): is_quiniela_actionable = False
-                    else:
-                        if close_date_obj.replace(tzinfo=None) > datetime.utcnow(): is_quiniela_actionable = False
-                except ValueError: is_quiniela_actionable = True
-            race_dict['is_quiniela_actionable'] = is_quiniela_actionable
-            participating_races_dicts.append(race_dict)
-
-        # 3. Favorite Races
-        favorites = UserFavoriteRace.query.filter_by(user_id=current_user.id).all()
-        favorite_race_ids = [fav.race_id for fav in favorites]
-        favorite_races_result = []
-        if favorite_race_ids:
-            favorite_races_query = Race.query.filter(Race.id.in_(favorite_race_ids), Race.is_deleted==False)
-            if date_from_obj: favorite_races_query = favorite_races_query.filter(Race.event_date >= date_from_obj)
-            if date_to_obj: favorite_races_query = favorite_races_query.filter(Race.event_date <= date_to_obj)
-            if race_format_id_int is not None: favorite_races_query = favorite_races_query.filter(Race.race_format_id == race_format_id_int)
-            if selected_statuses_for_query:
-                favorite_races_query = favorite_races_query.filter(Race.status.in_(selected_statuses_for_query))
-            favorite_races_result = favorite_races_query.order_by(Race.event_date.desc()).all()
-
-        favorite_races_dicts = []
-        for race in favorite_races_result:
-            race_dict = race.to_dict()
-            is_quiniela_actionable = True
-            if race_dict.get('quiniela_close_date'):
-                try:
-                    qcd_str = race_dict['quiniela_close_date']
-                    if qcd_str.endswith('Z'): close_date_obj = datetime.fromisoformat(qcd_str.replace('Z', '+00:00'))
-                    else: close_date_obj = datetime.fromisoformat(qcd_str)
-                    if close_date_obj.tzinfo is None:
-                        if close_date_obj > datetime.utcnow(): is_quiniela_actionable = False
-                    else:
-                        if close_date_obj.replace(tzinfo=None) > datetime.utcnow(): is_quiniela_actionable = False
-                except ValueError: is_quiniela_actionable = True
-            race_dict['is_quiniela_actionable'] = is_quiniela_actionable
-            favorite_races_dicts.append(race_dict)
+            # --- End of Active Players KPI Calculation ---
+
+            # Carreras creadas, inscritas y favoritas en una sola consulta, cada carrera una vez con sus flags
+            dashboard_cards = fetch_dashboard_cards(current_user.id, **card_filters)
+            cached_dashboard = dict(
+                # 1. Organized Races (created by this league admin, not general)
+                organized_races=[card for card in dashboard_cards if card.is_created and not card.is_general],
+                # 2. Participating Races
+                participating_races=[card for card in dashboard_cards if card.is_registered],
+                # 3. Favorite Races
+                favorite_races=[card for card in dashboard_cards if card.is_favorite],
+                active_players_count=active_players_count
+            )
+            if _dashboard_cache_enabled():
+                dashboard_cache.put(current_user.id, dashboard_variant, cached_dashboard)
+        organized_races_dicts = cached_dashboard['organized_races']
+        participating_races_dicts = cached_dashboard['participating_races']
+        favorite_races_dicts = cached_dashboard['favorite_races']
+        active_players_count = cached_dashboard['active_players_count']
 
         return render_template('admin_dashboard.html',
                                organized_races=organized_races_dicts,
@@ -3004,136 +2860,48 @@ def serve_hello_world_page():
                                active_players_count=active_players_count, # Pass the count to the template
                                 auto_join_race_id=auto_join_race_id_to_template, # Mantener estos nombres para la plantilla
                                 race_to_join_title=race_to_join_title_to_template) # Mantener estos nombres para la plantilla
-    elif current_user.role.code == 'PLAYER':
-        # Query UserRaceRegistration for all race_ids for the current_user
-        user_registrations = UserRaceRegistration.query.filter_by(user_id=current_user.id).all()
-        registered_race_ids = [reg.race_id for reg in user_registrations]
-
-        # Query Race model for these race_ids, ensuring they are not deleted
-        query = Race.query.filter(Race.id.in_(registered_race_ids), Race.is_deleted==False)
-
-        # Apply existing filters
-        if date_from_obj:
-            query = query.filter(Race.event_date >= date_from_obj)
-        if date_to_obj:
-            query = query.filter(Race.event_date <= date_to_obj)
-        if race_format_id_int is not None:
-            query = query.filter(Race.race_format_id == race_format_id_int)
-        if selected_statuses_for_query:
-            query = query.filter(Race.status.in_(selected_statuses_for_query))
-
-        registered_races_query_result = []
-        try:
-            registered_races_query_result = query.order_by(Race.event_date.desc()).all()
-        except Exception as e:
-            app.logger.error(f"Error fetching registered races for player {current_user.id}: {e}")
-
-        registered_races_dicts = []
-        for race in registered_races_query_result:
-            race_dict = race.to_dict()
-            is_quiniela_actionable = True
-            if race_dict.get('quiniela_close_date'):
-                try:
-                    qcd_str = race_dict['quiniela_close_date']
-                    if qcd_str.endswith('Z'):
-                        close_date_obj = datetime.fromisoformat(qcd_str.replace('Z', '+00:00'))
-                    else:
-                        close_date_obj = datetime.fromisoformat(qcd_str)
-                    if close_date_obj > datetime.utcnow():
-                        is_quiniela_actionable = False
-                except ValueError as ve:
-                    app.logger.error(f"Error parsing quiniela_close_date '{race_dict['quiniela_close_date']}' for race {race.id}: {ve}")
-                    is_quiniela_actionable = True
-            race_dict['is_quiniela_actionable'] = is_quiniela_actionable
-            registered_races_dicts.append(race_dict)
-
-        # Fetch Favorite Races for Player
-        favorites = UserFavoriteRace.query.filter_by(user_id=current_user.id).all()
-        favorite_race_ids = [fav.race_id for fav in favorites]
-        favorite_races_query_result = []
-        if favorite_race_ids:
-            query_fav_races = Race.query.filter(Race.id.in_(favorite_race_ids), Race.is_deleted==False)
-            # Apply same filters to favorite races if needed, or decide to show all favorites regardless of filters
-            if date_from_obj: query_fav_races = query_fav_races.filter(Race.event_date >= date_from_obj)
-            if date_to_obj: query_fav_races = query_fav_races.filter(Race.event_date <= date_to_obj)
-            if race_format_id_int is not None: query_fav_races = query_fav_races.filter(Race.race_format_id == race_format_id_int)
-            if selected_statuses_for_query:
-                query_fav_races = query_fav_races.filter(Race.status.in_(selected_statuses_for_query))
+    elif current_user.role_code == 'PLAYER':
+        if cached_dashboard is None:
+            # Registered and favorite races in one query (each race once, with its membership flags)
+            registered_races_dicts = []
+            favorite_races_dicts = []
+            try:
+                dashboard_cards = fetch_dashboard_cards(current_user.id, include_created=False, **card_filters)
+                registered_races_dicts = [card for card in dashboard_cards if card.is_registered]
+                favorite_races_dicts = [card for card in dashboard_cards if card.is_favorite]
+            except Exception as e:
+                app.logger.error(f"Error fetching registered/favorite races for player {current_user.id}: {e}")
 
+            # Fetch "Carreras Destacadas" - these are general, non-deleted races not necessarily linked to the user
+            destacadas_races_dicts = []
             try:
-                favorite_races_query_result = query_fav_races.order_by(Race.event_date.desc()).all()
+                destacadas_races_dicts = fetch_race_cards(apply_race_card_filters(
+                    race_card_query(Race.is_general == True), **card_filters
+                ), limit=6) # Example: Limit to 6
             except Exception as e:
-                app.logger.error(f"Error fetching favorite races for player {current_user.id}: {e}")
-
-        favorite_races_dicts = []
-        for race in favorite_races_query_result:
-            race_dict = race.to_dict()
-            # is_quiniela_actionable logic can be copied if needed for favorite cards too
-            is_quiniela_actionable = True
-            if race_dict.get('quiniela_close_date'):
-                try:
-                    qcd_str = race_dict['quiniela_close_date']
-                    if qcd_str.endswith('Z'): close_date_obj = datetime.fromisoformat(qcd_str.replace('Z', '+00:00'))
-                    else: close_date_obj = datetime.fromisoformat(qcd_str)
-                    if close_date_obj > datetime.utcnow(): is_quiniela_actionable = False
-                except ValueError as ve:
-                    app.logger.error(f"Error parsing quiniela_close_date '{race_dict['quiniela_close_date']}' for fav race {race.id}: {ve}")
-                    is_quiniela_actionable = True
-            race_dict['is_quiniela_actionable'] = is_quiniela_actionable
-            favorite_races_dicts.append(race_dict)
-
-        # Fetch "Carreras Destacadas" - these are general, non-deleted races not necessarily linked to the user
-        # This logic is similar to the 'else' block's fallback, but specifically for the PLAYER role
-        query_destacadas = Race.query.filter_by(is_general=True, is_deleted=False)
-        if date_from_obj: query_destacadas = query_destacadas.filter(Race.event_date >= date_from_obj)
-        if date_to_obj: query_destacadas = query_destacadas.filter(Race.event_date <= date_to_obj)
-        if race_format_id_int is not None: query_destacadas = query_destacadas.filter(Race.race_format_id == race_format_id_int)
-        if selected_statuses_for_query:
-            query_destacadas = query_destacadas.filter(Race.status.in_(selected_statuses_for_query))
-
-        destacadas_races_query_result = []
-        try:
-            destacadas_races_query_result = query_destacadas.order_by(Race.event_date.desc()).limit(6).all() # Example: Limit to 6
-        except Exception as e:
-            app.logger.error(f"Error fetching destacadas races for player {current_user.id}: {e}")
-
-        destacadas_races_dicts = []
-        for race in destacadas_races_query_result:
-            race_dict = race.to_dict()
-            # is_quiniela_actionable logic can be copied if needed
-            is_quiniela_actionable = True
-            if race_dict.get('quiniela_close_date'):
-                try:
-                    qcd_str = race_dict['quiniela_close_date']
-                    if qcd_str.endswith('Z'): close_date_obj = datetime.fromisoformat(qcd_str.replace('Z', '+00:00'))
-                    else: close_date_obj = datetime.fromisoformat(qcd_str)
-                    if close_date_obj > datetime.utcnow(): is_quiniela_actionable = False
-                except ValueError as ve:
-                    app.logger.error(f"Error parsing quiniela_close_date '{race_dict['quiniela_close_date']}' for destacada race {race.id}: {ve}")
-                    is_quiniela_actionable = True
-            race_dict['is_quiniela_actionable'] = is_quiniela_actionable
-            destacadas_races_dicts.append(race_dict)
-
-        # Fetch Enrolled Leagues for Player
-        enrolled_leagues_dicts = []
-        try:
-            player_league_participations = LeagueParticipant.query.filter_by(user_id=current_user.id).all()
-            enrolled_league_ids = [lp.league_id for lp in player_league_participations]
-            if enrolled_league_ids:
+                app.logger.error(f"Error fetching destacadas races for player {current_user.id}: {e}")
+
+            # Fetch Enrolled Leagues for Player
+            enrolled_leagues_dicts = []
+            try:
+                enrolled_league_ids = db.session.query(LeagueParticipant.league_id).filter(LeagueParticipant.user_id == current_user.id)
                 leagues_query_result = League.query.filter(
                     League.id.in_(enrolled_league_ids),
                     League.is_deleted == False,
                     League.is_active == True # Only show active leagues
                 ).order_by(League.name).all() # Order by name or creation date
-                enrolled_leagues_dicts = [league.to_dict() for league in leagues_query_result] # Assuming League model has to_dict()
-                # If no to_dict(), manually create dicts:
-                # enrolled_leagues_dicts = [{
-                #     'id': l.id, 'name': l.name, 'description': l.description,
-                #     # Add other fields as needed by the template
-                # } for l in leagues_query_result]
-        except Exception as e:
-            app.logger.error(f"Error fetching enrolled leagues for player {current_user.id}: {e}")
+                enrolled_leagues_dicts = [league.to_dict() for league in leagues_query_result]
+            except Exception as e:
+                app.logger.error(f"Error fetching enrolled leagues for player {current_user.id}: {e}")
 
+            cached_dashboard = dict(registered_races=registered_races_dicts, favorite_races=favorite_races_dicts,
+                                    destacadas_races=destacadas_races_dicts, enrolled_leagues=enrolled_leagues_dicts)
+            if _dashboard_cache_enabled():
+                dashboard_cache.put(current_user.id, dashboard_variant, cached_dashboard)
+        registered_races_dicts = cached_dashboard['registered_races']
+        favorite_races_dicts = cached_dashboard['favorite_races']
+        destacadas_races_dicts = cached_dashboard['destacadas_races']
+        enrolled_leagues_dicts = cached_dashboard['enrolled_leagues']
 
         return render_template('player.html',
                                registered_races=registered_races_dicts,
@@ -3153,41 +2921,15 @@ def serve_hello_world_page():
     else:
         # Fallback for any other authenticated role, or if roles are added in the future
         # Defaulting to player view (general, non-deleted races) - This part remains unchanged
-        app.logger.warning(f"User {current_user.username} with unhandled role {current_user.role.code} accessing dashboard. Defaulting to player view (general races).")
-        query = Race.query.filter_by(is_general=True, is_deleted=False)
-        if date_from_obj:
-            query = query.filter(Race.event_date >= date_from_obj)
-        if date_to_obj:
-            query = query.filter(Race.event_date <= date_to_obj)
-        if race_format_id_int is not None:
-            query = query.filter(Race.race_format_id == race_format_id_int)
-        if selected_statuses_for_query:
-            query = query.filter(Race.status.in_(selected_statuses_for_query))
-        all_races_query_result = []
+        app.logger.warning(f"User {current_user.username} with unhandled role {current_user.role_code} accessing dashboard. Defaulting to player view (general races).")
+        all_races_dicts_fallback = []
         try:
-            all_races_query_result = query.order_by(Race.event_date.desc()).all() # Keep variable name all_races for consistency in this block
+            all_races_dicts_fallback = fetch_race_cards(apply_race_card_filters(
+                race_card_query(Race.is_general == True), **card_filters
+            ))
         except Exception as e:
             app.logger.error(f"Error fetching general races for fallback/unhandled role: {e}")
 
-        all_races_dicts_fallback = []
-        for race_obj in all_races_query_result: # Renamed to avoid conflict with outer all_races
-            race_dict = race_obj.to_dict()
-            is_quiniela_actionable = True
-            if race_dict.get('quiniela_close_date'):
-                try:
-                    qcd_str = race_dict['quiniela_close_date']
-                    if qcd_str.endswith('Z'):
-                        close_date_obj = datetime.fromisoformat(qcd_str.replace('Z', '+00:00'))
-                    else:
-                        close_date_obj = datetime.fromisoformat(qcd_str)
-                    if close_date_obj > datetime.utcnow():
-                        is_quiniela_actionable = False
-                except ValueError as ve:
-                    app.logger.error(f"Error parsing quiniela_close_date '{race_dict['quiniela_close_date']}' for race {race_obj.id}: {ve}")
-                    is_quiniela_actionable = True
-            race_dict['is_quiniela_actionable'] = is_quiniela_actionable
-            all_races_dicts_fallback.append(race_dict)
-
         return render_template('player.html',
                                races=all_races_dicts_fallback, # Use new list
                                all_race_formats=all_race_formats,
@@ -3208,7 +2950,7 @@ def serve_races_list_page():
     filter_date_to_str = request.args.get('filter_date_to')
     filter_race_format_id_str = request.args.get('filter_race_format_id')
 
-    all_race_formats = RaceFormat.query.order_by(RaceFormat.name).all()
+    all_race_formats = reference_data.race_formats()
 
     date_from_obj = None
     date_to_obj = None
@@ -3236,50 +2978,16 @@ def serve_races_list_page():
             app.logger.warning(f"Invalid 'race_format_id' format received for /races: {filter_race_format_id_str}")
             pass
 
-    # Query all public, non-deleted races
-    query = Race.query.filter_by(is_general=True, is_deleted=False)
-
-    if date_from_obj:
-        query = query.filter(Race.event_date >= date_from_obj)
-    if date_to_obj:
-        query = query.filter(Race.event_date <= date_to_obj)
-    if race_format_id_int is not None:
-        query = query.filter(Race.race_format_id == race_format_id_int)
-
-    races_query_result = []
+    # Query all public, non-deleted races (proyección de tarjeta, una sola consulta)
+    processed_races = []
     try:
-        races_query_result = query.order_by(Race.event_date.desc()).all()
+        processed_races = fetch_race_cards(apply_race_card_filters(
+            race_card_query(Race.is_general == True),
+            date_from=date_from_obj, date_to=date_to_obj, race_format_id=race_format_id_int
+        ))
     except Exception as e:
         app.logger.error(f"Error fetching public races for /races page: {e}")
 
-    processed_races = []
-    for race in races_query_result:
-        race_dict = race.to_dict()
-        is_quiniela_actionable = True
-        if race_dict.get('quiniela_close_date'):
-            try:
-                qcd_str = race_dict['quiniela_close_date']
-                if qcd_str.endswith('Z'):
-                    close_date_obj = datetime.fromisoformat(qcd_str.replace('Z', '+00:00'))
-                else:
-                    close_date_obj = datetime.fromisoformat(qcd_str)
-
-                if close_date_obj.tzinfo is None:
-                    if close_date_obj > datetime.utcnow():
-                        is_quiniela_actionable = False
-                else:
-                    # This part might need `from datetime import timezone`
-                    # For now, assuming quiniela_close_date is stored as naive UTC based on existing patterns
-                    # If it's truly offset-aware, then `datetime.now(timezone.utc)` would be needed.
-                    # Sticking to `datetime.utcnow()` for naive comparison as per existing code.
-                    if close_date_obj.replace(tzinfo=None) > datetime.utcnow(): # Convert to naive for comparison
-                        is_quiniela_actionable = False
-            except ValueError as ve:
-                app.logger.error(f"Error parsing quiniela_close_date '{race_dict['quiniela_close_date']}' for race {race.id} on /races: {ve}")
-                is_quiniela_actionable = True
-        race_dict['is_quiniela_actionable'] = is_quiniela_actionable
-        processed_races.append(race_dict)
-
     current_year = datetime.utcnow().year
 
     return render_template('races_list.html',
@@ -3293,13 +3001,13 @@ def serve_races_list_page():
 @app.route('/create-race')
 @login_required
 def serve_create_race_page():
-    if current_user.role.code not in ['LEAGUE_ADMIN', 'ADMIN']:
+    if current_user.role_code not in ['LEAGUE_ADMIN', 'ADMIN']:
         # For a page serving route, redirecting to an error page or flashing a message might be better
         # For now, returning JSON as per existing possible pattern, but could be improved for UX.
         return jsonify(message="Forbidden: You do not have permission to access this page."), 403
 
-    race_formats = RaceFormat.query.all()
-    all_segments = Segment.query.all()
+    race_formats = reference_data.race_formats()
+    all_segments = reference_data.segments()
 
     # Prepare data for JavaScript
     # This will be converted to JSON array of objects by |tojson filter in template
@@ -3325,7 +3033,7 @@ def serve_race_detail_page(race_id):
     num_answered_questions_pool = 0 # Initialize
 
     if current_user and current_user.is_authenticated:
-        user_role_code = current_user.role.code
+        user_role_code = current_user.role_code
         # Check if the current user is registered for this race
         registration = UserRaceRegistration.query.filter_by(user_id=current_user.id, race_id=race_id).first()
         if registration:
@@ -3371,43 +3079,68 @@ def serve_race_detail_page(race_id):
                            current_time_utc=current_time_utc) # Pass current_time_utc to template
 
 # --- API Endpoint for Saving User Answers ---
-@app.route('/api/races/<int:race_id>/answers', methods=['POST'])
-@login_required
-def save_user_answers(race_id):
-    app.logger.info(f"User {current_user.id} attempting to save answers for race {race_id}")
+def _check_answer_write_access(race_id, received_at):
+    """
+    Checks that the current user can write answers for a race (exists, quiniela open, registered).
+
+    LEAGUE_ADMIN users are auto-registered (added to the session; the caller's commit saves it).
 
+    Args:
+        race_id (int): Race id.
+        received_at (datetime): Time the request was received; the quiniela must be open at that time.
+
+    Returns:
+        tuple: (race, auto_registered, None) or (None, False, (response, status_code)).
+    """
     # 1. Permissions Check: Fetch Race, ensuring it's not deleted
     race = Race.query.filter_by(id=race_id, is_deleted=False).first()
     if not race:
         app.logger.warning(f"Attempt to save answers for non-existent or deleted race {race_id} by user {current_user.id}")
-        return jsonify(message="Race not found or has been deleted"), 404
+        return None, False, (jsonify(message="Race not found or has been deleted"), 404)
 
     # Check quiniela close date
-    if race.quiniela_close_date and race.quiniela_close_date < datetime.utcnow():
+    if race.quiniela_close_date and race.quiniela_close_date < received_at:
         app.logger.warning(f"Attempt to save answers for closed quiniela race {race_id} by user {current_user.id}")
-        return jsonify(message="La quiniela ya esta cerrada y no se pueden añadir nuevas predicciones"), 403
+        return None, False, (jsonify(message="La quiniela ya esta cerrada y no se pueden añadir nuevas predicciones"), 403)
 
     # 2. Permissions Check: User Registration for this Race
     registration = UserRaceRegistration.query.filter_by(user_id=current_user.id, race_id=race_id).first()
 
     # Auto-register LEAGUE_ADMIN if they are not already registered
-    if current_user.role.code == 'LEAGUE_ADMIN' and not registration:
+    auto_registered = False
+    if current_user.role_code == 'LEAGUE_ADMIN' and not registration:
         app.logger.info(f"LEAGUE_ADMIN {current_user.id} is not registered for race {race_id}. Auto-registering.")
         try:
             new_registration = UserRaceRegistration(user_id=current_user.id, race_id=race.id)
             db.session.add(new_registration)
-            # The main db.session.commit() at the end of the function will handle saving this.
+            # The caller's db.session.commit() will handle saving this.
             registration = new_registration # Update the local 'registration' variable for the check below
+            auto_registered = True
         except IntegrityError: # Should not happen if 'not registration' check is correct, but as safeguard
             db.session.rollback()
             app.logger.error(f"IntegrityError during auto-registration of LEAGUE_ADMIN {current_user.id} for race {race_id}.")
-            return jsonify(message="Error during auto-registration process."), 500
+            return None, False, (jsonify(message="Error during auto-registration process."), 500)
 
     # Now, perform the standard registration check
     if not registration:
         app.logger.warning(f"User {current_user.id} not registered for race {race_id}, cannot save answers.")
         # For non-LEAGUE_ADMINs, or if LEAGUE_ADMIN auto-registration failed unexpectedly.
-        return jsonify(message="User not registered for this race"), 403
+        return None, False, (jsonify(message="User not registered for this race"), 403)
+
+    return race, auto_registered, None
+
+
+@app.route('/api/races/<int:race_id>/answers', methods=['POST'])
+@login_required
+def save_user_answers(race_id):
+    app.logger.info(f"User {current_user.id} attempting to save answers for race {race_id}")
+
+    received_at = datetime.utcnow() # La fecha de cierre se comprueba contra la recepción, no contra la escritura
+
+    # 1-2. Permissions Check: race open and user registered (LEAGUE_ADMIN auto-registered)
+    race, auto_registered, error_response = _check_answer_write_access(race_id, received_at)
+    if error_response:
+        return error_response
 
     # 3. Data Reception
     answers_payload = request.get_json()
@@ -3417,129 +3150,131 @@ def save_user_answers(race_id):
 
     app.logger.debug(f"Received answers payload for race {race_id} from user {current_user.id}: {answers_payload}")
 
-    try:
-        # 4. Processing Answers
-        for question_id_str, answer_data in answers_payload.items():
-            try:
-                question_id = int(question_id_str)
-            except ValueError:
-                app.logger.warning(f"Invalid question_id format '{question_id_str}' in payload for race {race_id}.")
-                # Decide: skip this answer or fail the whole request? For now, skip.
-                continue
-
-            question = Question.query.get(question_id)
-            if not question:
-                app.logger.warning(f"Question with id {question_id} not found while saving answers for race {race_id}.")
-                # Decide: skip or fail? For now, skip.
-                continue
-
-            # Check if the question belongs to the given race_id to prevent misuse
-            if question.race_id != race_id:
-                app.logger.warning(f"Question {question_id} does not belong to race {race_id}. User {current_user.id} attempting to answer.")
-                continue
-
-
-            # Fetch and delete existing answer and its MC options to ensure clean state and proper cascade
-            existing_answer = UserAnswer.query.filter_by(user_id=current_user.id, question_id=question.id).first()
-            if existing_answer:
-                # Explicitly delete related UserAnswerMultipleChoiceOption records
-                # This is belt-and-suspenders; cascade="all, delete-orphan" should handle it,
-                # but direct deletion ensures it if there are any session synchronization issues.
-                UserAnswerMultipleChoiceOption.query.filter_by(user_answer_id=existing_answer.id).delete()
-                db.session.delete(existing_answer)
-                db.session.flush() # Ensure deletion is processed before adding new answer
-
-            new_user_answer = UserAnswer(
-                user_id=current_user.id,
-                race_id=race_id, # or race.id
-                question_id=question.id
-            )
-
-            question_type_name = question.question_type.name
-            app.logger.info(f"Processing answer for question {question.id} (type: {question_type_name})")
-
+    if not isinstance(answers_payload, dict):
+        return jsonify(message="Answers must be an object keyed by question id"), 400
 
-            if question_type_name == 'FREE_TEXT':
-                new_user_answer.answer_text = answer_data.get('answer_text')
-                if new_user_answer.answer_text is None: # Explicitly check for None if empty string is valid
-                    app.logger.debug(f"No answer_text provided for FREE_TEXT question {question.id}")
-
-            elif question_type_name == 'MULTIPLE_CHOICE':
-                if question.is_mc_multiple_correct:
-                    selected_ids = answer_data.get('selected_option_ids', [])
-                    if not isinstance(selected_ids, list): # Basic validation
-                        app.logger.warning(f"selected_option_ids for Q {question.id} is not a list: {selected_ids}")
-                        selected_ids = [] # Default to empty list to avoid iteration error
-
-                    app.logger.debug(f"MC Multiple for Q {question.id}: selected_ids = {selected_ids}")
-                    for opt_id in selected_ids:
-                        # Optional: Validate if opt_id actually belongs to this question
-                        option_exists = QuestionOption.query.filter_by(id=opt_id, question_id=question.id).first()
-                        if option_exists:
-                            mc_option = UserAnswerMultipleChoiceOption(question_option_id=opt_id)
-                            new_user_answer.selected_mc_options.append(mc_option)
-                        else:
-                            app.logger.warning(f"Invalid option_id {opt_id} for question {question.id} submitted by user {current_user.id}")
-                else: # Single correct
-                    selected_id = answer_data.get('selected_option_id')
-                    app.logger.debug(f"MC Single for Q {question.id}: selected_option_id = {selected_id}")
-                    if selected_id is not None:
-                        # Optional: Validate if selected_id actually belongs to this question
-                        option_exists = QuestionOption.query.filter_by(id=selected_id, question_id=question.id).first()
-                        if option_exists:
-                            new_user_answer.selected_option_id = selected_id
-                        else:
-                            app.logger.warning(f"Invalid selected_option_id {selected_id} for question {question.id} submitted by user {current_user.id}")
-                            new_user_answer.selected_option_id = None # Or skip setting it
-                    else: # No option selected
-                        new_user_answer.selected_option_id = None
+    user_id = current_user.id
+    try:
+        # 4. Processing Answers: validadas contra una sola carga de las preguntas de la carrera
+        rows, mc_option_ids_by_question = prepare_answer_rows(race_id, user_id, answers_payload,
+                                                              prefetch_race_questions(race_id))
+        # Guarda la auto-inscripción y cierra la transacción de lectura antes de esperar en la cola
+        db.session.commit()
+        if auto_registered:
+            dashboard_cache.invalidate_user(user_id) # LEAGUE_ADMIN auto-inscrito
 
+        # 5. Write: upsert en bloque aplicado por answer_admission (por lotes, fuera de la petición salvo en modo eager)
+        # Las respuestas sin cambios (mismo digest) no se escriben
+        save_result = answer_admission.run(
+            race_id, received_at, lambda: write_answer_rows(user_id, rows, mc_option_ids_by_question)
+        )
+        app.logger.info(f"Answers for race {race_id} by user {user_id}: {len(save_result.created)} created, "
+                        f"{len(save_result.updated)} updated, {len(save_result.unchanged)} unchanged")
+        return jsonify(message="Answers saved successfully", created=len(save_result.created),
+                       updated=len(save_result.updated), unchanged=len(save_result.unchanged)), 201 # 201 Created (or 200 OK if updating)
+
+    except AdmissionQueueFull as full:
+        return _answer_queue_full_response(full)
+    except AnswerWriteTimeout as timeout:
+        app.logger.warning(f"Answers for race {race_id} by user {user_id} still queued after the wait; withdrawn")
+        return _retry_later_response(timeout.retry_after, "Your answers could not be saved in time, please retry.", 503)
+    except AnswerWriteRejected as rejected:
+        return jsonify(message=rejected.message), rejected.status_code
+    except IntegrityError as ie:
+        db.session.rollback()
+        app.logger.error(f"IntegrityError saving answers for race {race_id}, user {current_user.id}: {ie}", exc_info=True)
+        return jsonify(message="Database integrity error while saving answers."), 500
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Exception saving answers for race {race_id}, user {current_user.id}: {e}", exc_info=True)
+        return jsonify(message="An error occurred while saving answers."), 500
 
-            elif question_type_name == 'ORDERING':
-                # Currently, frontend sends ordered_options_text
-                new_user_answer.answer_text = answer_data.get('ordered_options_text')
-                if new_user_answer.answer_text is None:
-                     app.logger.debug(f"No ordered_options_text provided for ORDERING question {question.id}")
+def _answer_queue_full_response(full):
+    """429 with Retry-After for a submit shed by answer_admission."""
+    return jsonify(message="Too many answer submissions right now, please retry shortly.",
+                   retry_after=full.retry_after), 429, {'Retry-After': str(full.retry_after)}
 
-            elif question_type_name == 'SLIDER':
-                slider_value = answer_data.get('slider_answer_value')
-                if slider_value is not None:
-                    try:
-                        new_user_answer.slider_answer_value = float(slider_value)
-                        # Ensure other fields are None for slider questions
-                        new_user_answer.answer_text = None
-                        new_user_answer.selected_option_id = None
-                        # No UserAnswerMultipleChoiceOption for slider type
-                    except (ValueError, TypeError):
-                        app.logger.warning(f"Invalid slider_answer_value '{slider_value}' for SLIDER question {question.id}. Storing as None.")
-                        new_user_answer.slider_answer_value = None
-                else:
-                    app.logger.debug(f"No slider_answer_value provided for SLIDER question {question.id}")
-                    new_user_answer.slider_answer_value = None # Explicitly set to None if not provided or invalid
+AUTOSAVE_MAX_QUESTIONS = 25
 
-            else:
-                app.logger.warning(f"Unsupported question type '{question_type_name}' encountered for question {question.id}")
-                # Skip adding this answer if type is unknown or unhandled by this logic
-                continue
+@app.route('/api/races/<int:race_id>/answers', methods=['PATCH'])
+@login_required
+def autosave_user_answers(race_id):
+    """
+    Autosave of one or a few questions of the quiniela wizard, with optimistic versions.
 
-            db.session.add(new_user_answer)
-            app.logger.info(f"UserAnswer prepared for question {question.id} by user {current_user.id}")
+    Body: {"answers": {"<question_id>": {<answer fields as in POST>, "version": <last seen version, 0 if none>}}}
 
+    Returns 200 with the status and new version of every question plus the progress counts, or
+    409 with the stored versions if any changed answer was saved meanwhile (nothing is written).
+    """
+    received_at = datetime.utcnow()
+    race, auto_registered, error_response = _check_answer_write_access(race_id, received_at)
+    if error_response:
+        return error_response
+
+    data = request.get_json(silent=True)
+    answers_payload = data.get('answers') if isinstance(data, dict) else None
+    if not isinstance(answers_payload, dict) or not answers_payload:
+        return jsonify(message="'answers' must be a non-empty object keyed by question id"), 400
+    if len(answers_payload) > AUTOSAVE_MAX_QUESTIONS:
+        return jsonify(message=f"At most {AUTOSAVE_MAX_QUESTIONS} questions per autosave"), 400
+
+    expected_versions = {}
+    for question_id_str, answer_data in answers_payload.items():
+        version = answer_data.get('version') if isinstance(answer_data, dict) else None
+        if not isinstance(version, int) or isinstance(version, bool) or version < 0:
+            return jsonify(message=f"A non-negative integer 'version' is required for question {question_id_str}"), 400
+        try:
+            expected_versions[int(question_id_str)] = version
+        except ValueError:
+            return jsonify(message=f"Invalid question id '{question_id_str}'"), 400
 
-        # 5. Commit and Respond
-        db.session.commit()
-        app.logger.info(f"Answers successfully saved for race {race_id} by user {current_user.id}")
-        return jsonify(message="Answers saved successfully"), 201 # 201 Created (or 200 OK if updating)
+    user_id = current_user.id
+    try:
+        rows, mc_option_ids_by_question = prepare_answer_rows(race_id, user_id, answers_payload,
+                                                              prefetch_race_questions(race_id))
+        unknown_question_ids = sorted(set(expected_versions) - set(rows))
+        if unknown_question_ids:
+            db.session.rollback()
+            return jsonify(message="Unknown questions for this race", question_ids=unknown_question_ids), 400
+        db.session.commit() # Auto-inscripción guardada; sin transacción abierta mientras espera en la cola
 
-    except IntegrityError as ie:
+        save_result = answer_admission.run(
+            race_id, received_at,
+            lambda: write_answer_rows(user_id, rows, mc_option_ids_by_question, expected_versions)
+        )
+    except AdmissionQueueFull as full:
+        return _answer_queue_full_response(full)
+    except AnswerWriteTimeout as timeout:
+        return _retry_later_response(timeout.retry_after, "Autosave could not be saved in time, please retry.", 503)
+    except AnswerWriteRejected as rejected:
+        return jsonify(message=rejected.message), rejected.status_code
+    except AnswerVersionConflict as conflict:
         db.session.rollback()
-        app.logger.error(f"IntegrityError saving answers for race {race_id}, user {current_user.id}: {ie}", exc_info=True)
-        return jsonify(message="Database integrity error while saving answers."), 500
+        app.logger.info(f"Autosave conflict for race {race_id}, user {current_user.id}: questions {sorted(conflict.conflicts)}")
+        stored_versions = stored_answer_versions(current_user.id, list(conflict.conflicts))
+        return jsonify(message="Some answers were saved from elsewhere; reload them before saving again.",
+                       conflicts={str(question_id): {"version": version} for question_id, version in stored_versions.items()}), 409
     except Exception as e:
         db.session.rollback()
-        app.logger.error(f"Exception saving answers for race {race_id}, user {current_user.id}: {e}", exc_info=True)
+        app.logger.error(f"Exception autosaving answers for race {race_id}, user {current_user.id}: {e}", exc_info=True)
         return jsonify(message="An error occurred while saving answers."), 500
 
+    if auto_registered:
+        dashboard_cache.invalidate_user(current_user.id) # LEAGUE_ADMIN auto-inscrito
+
+    statuses = dict.fromkeys(save_result.created, 'created')
+    statuses.update(dict.fromkeys(save_result.updated, 'updated'))
+    statuses.update(dict.fromkeys(save_result.unchanged, 'unchanged'))
+    num_answered_questions, num_total_questions = answer_progress(race_id, current_user.id)
+    return jsonify(
+        answers={str(question_id): {"status": status, "version": save_result.versions[question_id]}
+                 for question_id, status in statuses.items()},
+        created=len(save_result.created), updated=len(save_result.updated), unchanged=len(save_result.unchanged),
+        num_answered_questions=num_answered_questions, num_total_questions=num_total_questions
+    ), 200
+
+
 @app.route('/api/races/<int:race_id>/user_answers', methods=['GET'])
 @login_required
 def get_user_answers(race_id):
@@ -3547,8 +3282,10 @@ def get_user_answers(race_id):
     if not race:
         return jsonify(message="Race not found or has been deleted"), 404
 
-    user_answers = UserAnswer.query.filter_by(user_id=current_user.id, race_id=race_id).all()
-    num_total_questions_pool = Question.query.filter_by(race_id=race_id, is_active=True).count()
+    catalog = _race_catalog(race)
+    option_texts = catalog.option_texts # option id -> text, for every answer shown
+    user_answers = list(user_answers_by_question(race_id, current_user.id).values()) # MC selections included
+    num_total_questions_pool = len(catalog.active_questions)
     num_answered_questions_pool = len(user_answers)
 
     if not user_answers:
@@ -3561,22 +3298,21 @@ def get_user_answers(race_id):
 
     processed_answers_list = []
     for ua in user_answers:
-        question = ua.question
+        question = catalog.question(ua.question_id)
         if not question:
             app.logger.error(f"UserAnswer {ua.id} has no associated question. Skipping.")
             continue
 
         all_q_options_list = []
-        # Fetch all options for context, especially for MC and Ordering
-        if question.question_type.name == "MULTIPLE_CHOICE" or question.question_type.name == "ORDERING":
-            all_q_options = QuestionOption.query.filter_by(question_id=question.id).order_by(QuestionOption.id).all()
-            all_q_options_list = [{"id": opt.id, "option_text": opt.option_text, "correct_order_index": opt.correct_order_index if question.question_type.name == "ORDERING" else None} for opt in all_q_options]
+        # All options for context, especially for MC and Ordering (from the race catalog)
+        if question.type_name == "MULTIPLE_CHOICE" or question.type_name == "ORDERING":
+            all_q_options_list = [{"id": opt.id, "option_text": opt.option_text, "correct_order_index": opt.correct_order_index if question.type_name == "ORDERING" else None} for opt in question.options]
 
 
         answer_data = {
             "question_id": question.id,
             "question_text": question.text,
-            "question_type": question.question_type.name,
+            "question_type": question.type_name,
             "user_answer_id": ua.id,
             "answer_text": ua.answer_text,
             "selected_option_id": ua.selected_option_id,
@@ -3586,23 +3322,16 @@ def get_user_answers(race_id):
             "all_question_options": all_q_options_list
         }
 
-        if question.question_type.name == "MULTIPLE_CHOICE":
+        if question.type_name == "MULTIPLE_CHOICE":
             if not question.is_mc_multiple_correct and ua.selected_option_id:
                 # Single-choice MC: get the text of the selected option
-                selected_option = QuestionOption.query.get(ua.selected_option_id)
-                if selected_option:
-                    answer_data["selected_option_text"] = selected_option.option_text
+                answer_data["selected_option_text"] = option_texts.text(ua.selected_option_id)
             elif question.is_mc_multiple_correct:
-                # Multiple-choice MC: get text for all selected options
-                selected_mc_options_list = []
-                for mc_opt_assoc in ua.selected_mc_options: # This is UserAnswerMultipleChoiceOption
-                    option = QuestionOption.query.get(mc_opt_assoc.question_option_id)
-                    if option:
-                        selected_mc_options_list.append({
-                            "option_id": option.id,
-                            "option_text": option.option_text
-                        })
-                answer_data["selected_mc_options"] = selected_mc_options_list
+                # Multiple-choice MC: get text for all selected options (UserAnswerMultipleChoiceOption rows)
+                answer_data["selected_mc_options"] = [
+                    {"option_id": option["id"], "option_text": option["text"]}
+                    for option in option_texts.options(mc_opt_assoc.question_option_id for mc_opt_assoc in ua.selected_mc_options)
+                ]
 
         # For ORDERING, the user's raw answer (sequence of texts) is already in ua.answer_text.
         # all_question_options provides the list of original items that were ordered.
@@ -3646,7 +3375,7 @@ def update_user_answer(user_answer_id):
             app.logger.error(f"UserAnswer {user_answer_id} is orphaned or its question was deleted.")
             return jsonify(message="Internal error: Question associated with this answer not found."), 500
 
-        question_type_name = question.question_type.name
+        question_type_name = question.type_name
         app.logger.info(f"Attempting to update UserAnswer ID: {user_answer_id} for Question ID: {question.id} (Type: {question_type_name}) by User ID: {current_user.id}")
 
 
@@ -3731,6 +3460,8 @@ def update_user_answer(user_answer_id):
             app.logger.error(f"Unsupported question type '{question_type_name}' for update on UserAnswer {user_answer_id}")
             return jsonify(message=f"Unsupported question type for update: {question_type_name}"), 400
 
+        user_answer.answer_digest = None # El próximo guardado completo la vuelve a escribir y recalcula
+        user_answer.version = (user_answer.version or 0) + 1
         db.session.commit()
         app.logger.info(f"UserAnswer {user_answer_id} updated successfully by User {current_user.id}")
         return jsonify(message="Answer updated successfully", userAnswerId=user_answer.id), 200 # Matched key from spec
@@ -3759,230 +3490,393 @@ def get_quiniela_leaderboard(race_id):
         app.logger.warning(f"Quiniela leaderboard request for non-existent or deleted race {race_id}")
         return jsonify(message="Race not found or has been deleted"), 404
 
-    # 2. Query UserScore, join with User, filter by race_id, and order by score
+    # 2. Full leaderboard, ranked by the database (RANK()/DENSE_RANK()). Paged reads go through /leaderboard.
     try:
-        leaderboard_data = db.session.query(
-            UserScore.user_id,
-            User.username,
-            UserScore.score
-        ).join(User, UserScore.user_id == User.id)\
-         .filter(UserScore.race_id == race_id)\
-         .order_by(UserScore.score.desc())\
-         .all()
-
-        # 3. Format the results into a list of dictionaries
-        leaderboard_list = [
-            {"user_id": item.user_id, "username": item.username, "score": item.score}
-            for item in leaderboard_data
-        ]
-
-        app.logger.info(f"Successfully fetched quiniela leaderboard for race_id: {race_id}, found {len(leaderboard_list)} entries.")
-        return jsonify(leaderboard_list), 200
-
+        return _leaderboard_snapshot_response(race, 'full', lambda: fetch_leaderboard(race_id)['entries'])
     except Exception as e:
         db.session.rollback() # Rollback in case of query errors or other exceptions
         app.logger.error(f"Error fetching quiniela leaderboard for race_id {race_id}: {e}", exc_info=True)
         return jsonify(message="Error fetching quiniela leaderboard"), 500
 
-# --- Scoring Algorithm ---
-def calculate_and_store_scores(race_id):
-    app.logger.info(f"Starting score calculation for race_id: {race_id}")
+# Respuestas de clasificación serializadas, por (carrera, versión de puntuaciones, variante de la consulta)
+leaderboard_snapshots = LeaderboardSnapshotCache(max_entries=256, app=app) # LEADERBOARD_CACHE_SIZE se lee de app.config al usarse
+
+def _leaderboard_snapshot_response(race, variant, build_payload):
+    """
+    Serves a leaderboard from its snapshot for the race's current score_version.
+
+    Answers 304 when the client's If-None-Match/If-Modified-Since is still current; otherwise returns
+    the cached JSON, building it with build_payload() on a miss.
+    """
+    variant_digest = hashlib.sha1(variant.encode('utf-8')).hexdigest()[:12]
+    etag = f"lb-{race.id}-{race.score_version}-{variant_digest}"
+    last_modified = race.scores_updated_at or race.created_at
+
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        body = leaderboard_snapshots.get(race.id, race.score_version, variant)
+        if body is None:
+            body = json.dumps(build_payload(), separators=(',', ':'))
+            leaderboard_snapshots.put(race.id, race.score_version, variant, body)
+        response = app.response_class(body, status=200, mimetype='application/json')
+
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True # Siempre revalidar: barato gracias al ETag
+    return response.make_conditional(request)
+
+LEADERBOARD_DEFAULT_LIMIT = 50
+LEADERBOARD_MAX_LIMIT = 200
+LEADERBOARD_MAX_AROUND = 50
+
+@app.route('/api/races/<int:race_id>/leaderboard', methods=['GET'])
+@login_required
+def get_race_leaderboard(race_id):
+    """
+    Paged race leaderboard with database-computed ranks.
+
+    Query params:
+        limit (int): Page size (default 50, max 200).
+        offset (int): Entries to skip.
+        cursor (str): next_cursor of the previous page (keyset paging).
+        around_me (bool): Only the entries around the current user's position.
+        around (int): Radius of the around_me window (default 5, max 50).
+    """
+    race = Race.query.filter_by(id=race_id, is_deleted=False).first()
+    if not race:
+        return jsonify(message="Race not found or has been deleted"), 404
+
     try:
-        race = Race.query.filter_by(id=race_id, is_deleted=False).first()
-        if not race:
-            app.logger.error(f"Scoring calculation: Race with id {race_id} not found or has been deleted.")
-            return {"success": False, "message": "Race not found or has been deleted"}
+        limit = int(request.args.get('limit', LEADERBOARD_DEFAULT_LIMIT))
+        offset = int(request.args.get('offset', 0))
+        around = int(request.args.get('around', 5))
+    except ValueError:
+        return jsonify(message="limit, offset and around must be integers"), 400
+    if limit < 1 or offset < 0 or around < 0:
+        return jsonify(message="limit must be positive; offset and around cannot be negative"), 400
+    limit = min(limit, LEADERBOARD_MAX_LIMIT)
+    around = min(around, LEADERBOARD_MAX_AROUND)
+    around_me = request.args.get('around_me', '').lower() in ('1', 'true', 'yes')
+
+    cursor = request.args.get('cursor') or None
+    around_user_id = current_user.id if around_me else None
+    # "around me" depende del usuario: forma parte de la variante cacheada
+    variant = f"limit={limit}&offset={offset}&cursor={cursor or ''}&around_user={around_user_id or ''}&around={around}"
+
+    def build_page():
+        page = fetch_leaderboard(race_id, limit=limit, offset=offset, cursor=cursor,
+                                 around_user_id=around_user_id, around=around)
+        return dict(race_id=race_id, limit=limit, offset=offset, **page)
 
-        questions = Question.query.filter_by(race_id=race.id).all()
-        if not questions:
-            app.logger.info(f"Scoring calculation: No questions found for race_id: {race_id}. No scores to calculate.")
-            return {"success": True, "message": "No questions found for race, no scores calculated."}
+    try:
+        return _leaderboard_snapshot_response(race, variant, build_page)
+    except InvalidCursorError:
+        return jsonify(message="Invalid cursor"), 400
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Error fetching leaderboard page for race_id {race_id}: {e}", exc_info=True)
+        return jsonify(message="Error fetching leaderboard"), 500
 
-        official_answers_list = OfficialAnswer.query.filter_by(race_id=race.id).all()
-        official_answers_map = {oa.question_id: oa for oa in official_answers_list}
-
-        # Pre-process official MC-multiple answers
-        official_mc_multiple_options_map = {}
-        for oa in official_answers_list:
-            question = Question.query.get(oa.question_id) # Get question to check type
-            if question and question.question_type.name == 'MULTIPLE_CHOICE' and question.is_mc_multiple_correct:
-                options_set = set()
-                for selected_opt in oa.official_selected_mc_options:
-                    options_set.add(selected_opt.question_option_id)
-                official_mc_multiple_options_map[oa.question_id] = options_set
-
-        # Pre-process official ORDERING answers - REMOVED as official_answer.answer_text for ORDERING questions
-        # now stores comma-separated option IDs, which will be resolved to texts within the loop.
-        # official_ordering_answers_map = {}
-        # for q in questions:
-        #     if q.question_type.name == 'ORDERING':
-        #         correctly_ordered_options = QuestionOption.query.filter_by(question_id=q.id)\
-        #                                                       .order_by(QuestionOption.correct_order_index.asc())\
-        #                                                       .all()
-        #         if correctly_ordered_options:
-        #             official_ordering_answers_map[q.id] = [opt.option_text for opt in correctly_ordered_options]
-
-        registrations = UserRaceRegistration.query.filter_by(race_id=race.id).all()
-        if not registrations:
-            app.logger.info(f"Scoring calculation: No users registered for race_id: {race_id}. No scores to calculate.")
-            return {"success": True, "message": "No registered users for race, no scores calculated."}
+# --- Scoring Algorithm ---
+def _upsert_user_scores(race_id, totals_by_user):
+    """
+    Writes the race total of every user in a single statement.
 
-        for reg in registrations:
-            user_id = reg.user_id
-            total_user_score_for_race = 0
+    Uses INSERT ... ON CONFLICT (user_id, race_id) DO UPDATE on PostgreSQL and SQLite.
+    Other dialects fall back to one SELECT of the existing rows plus bulk insert/update mappings.
 
-            user_answers_list = UserAnswer.query.filter_by(user_id=user_id, race_id=race.id).all()
-            user_answers_map = {ua.question_id: ua for ua in user_answers_list}
+    Args:
+        race_id (int): The race the totals belong to.
+        totals_by_user (dict): Map of {user_id: total_score}.
+    """
+    if not totals_by_user:
+        return
 
-            for q in questions:
-                question_score = 0
-                user_answer = user_answers_map.get(q.id)
-                official_answer = official_answers_map.get(q.id)
+    now = datetime.utcnow()
+    rows = [
+        {"user_id": user_id, "race_id": race_id, "score": total, "created_at": now, "updated_at": now}
+        for user_id, total in totals_by_user.items()
+    ]
 
-                if not user_answer or not official_answer:
-                    # If user didn't answer or no official answer, score for this question is 0
-                    total_user_score_for_race += question_score
-                    continue
+    dialect_name = db.session.get_bind().dialect.name
+    if dialect_name in ('postgresql', 'sqlite'):
+        if dialect_name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(UserScore.__table__).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UserScore.__table__.c.user_id, UserScore.__table__.c.race_id],
+            set_={"score": stmt.excluded.score, "updated_at": stmt.excluded.updated_at}
+        )
+        db.session.execute(stmt)
+        return
+
+    # Fallback genérico: una sola consulta para los existentes + escrituras en bloque
+    existing_ids = dict(
+        db.session.query(UserScore.user_id, UserScore.id)
+        .filter(UserScore.race_id == race_id, UserScore.user_id.in_(list(totals_by_user.keys())))
+        .all()
+    )
+    to_update = [
+        {"id": existing_ids[row["user_id"]], "score": row["score"], "updated_at": now}
+        for row in rows if row["user_id"] in existing_ids
+    ]
+    to_insert = [row for row in rows if row["user_id"] not in existing_ids]
+    if to_update:
+        db.session.bulk_update_mappings(UserScore, to_update)
+    if to_insert:
+        db.session.bulk_insert_mappings(UserScore, to_insert)
 
-                question_type_name = q.question_type.name
 
-                if question_type_name == 'FREE_TEXT':
-                    if official_answer.answer_text and user_answer.answer_text:
-                        if user_answer.answer_text.strip().lower() == official_answer.answer_text.strip().lower():
-                            question_score = q.max_score_free_text or 0
+def _replace_user_question_scores(race_id, breakdown, question_ids=None, user_ids=None):
+    """
+    Replaces the per-question points (UserQuestionScore) of a race with a new breakdown.
 
-                elif question_type_name == 'MULTIPLE_CHOICE':
-                    if q.is_mc_multiple_correct:
-                        # Multiple Correct
-                        user_selected_option_ids = set()
-                        for selected_opt in user_answer.selected_mc_options:
-                            user_selected_option_ids.add(selected_opt.question_option_id)
-
-                        official_correct_option_ids = official_mc_multiple_options_map.get(q.id, set())
-
-                        current_question_mc_multiple_score = 0
-                        for user_opt_id in user_selected_option_ids:
-                            if user_opt_id in official_correct_option_ids:
-                                current_question_mc_multiple_score += (q.points_per_correct_mc or 0)
-                            else:
-                                current_question_mc_multiple_score -= (q.points_per_incorrect_mc or 0)
-                        # Consider if points should be deducted for *missed* correct options - current spec doesn't say so.
-                        question_score = current_question_mc_multiple_score
-                    else:
-                        # Single Correct
-                        if user_answer.selected_option_id and \
-                           user_answer.selected_option_id == official_answer.selected_option_id:
-                            question_score = q.total_score_mc_single or 0
+    Args:
+        race_id (int): The race being scored.
+        breakdown (list): (user_id, question_id, points, is_correct) tuples from the compiled scorer.
+        question_ids (iterable, optional): Only replace the rows of these questions. Defaults to the whole race.
+        user_ids (iterable, optional): Only replace the rows of these users. Defaults to every user.
+    """
+    delete_query = UserQuestionScore.query.filter(UserQuestionScore.race_id == race_id)
+    if question_ids is not None:
+        delete_query = delete_query.filter(UserQuestionScore.question_id.in_(list(question_ids)))
+    if user_ids is not None:
+        delete_query = delete_query.filter(UserQuestionScore.user_id.in_(list(user_ids)))
+    delete_query.delete(synchronize_session=False)
+
+    if breakdown:
+        now = datetime.utcnow()
+        db.session.bulk_insert_mappings(UserQuestionScore, [
+            {"user_id": user_id, "race_id": race_id, "question_id": question_id,
+             "points": points, "is_correct": is_correct, "updated_at": now}
+            for user_id, question_id, points, is_correct in breakdown
+        ])
+
+
+def _fetch_scorable_answers(race_id, scorer, question_ids, user_ids=None):
+    """
+    Answers of a race to the given questions as plain column tuples (no ORM hydration), plus the
+    MC-multiple selections among them, in at most two queries.
 
-                elif question_type_name == 'ORDERING':
-                    user_ordered_texts = []
-                    if user_answer.answer_text:
-                        # User answers for ordering questions are comma-separated texts
-                        user_ordered_texts = [text.strip().lower() for text in user_answer.answer_text.split(',')]
-
-                    # Official answers for ordering questions are stored as comma-separated texts.
-                    official_ordered_texts = []
-                    if official_answer and official_answer.answer_text:
-                        official_ordered_texts = [text.strip().lower() for text in official_answer.answer_text.split(',')]
-
-                    if user_ordered_texts and official_ordered_texts: # Both must be non-empty to score
-                        current_question_ordering_score = 0
-                        is_full_match = True # Assume full match until proven otherwise
-
-                        # Check if lengths are different first, if so, not a full match.
-                        if len(user_ordered_texts) != len(official_ordered_texts):
-                            is_full_match = False
-
-                        # Iterate based on the length of the official correct order
-                        for i in range(len(official_ordered_texts)):
-                            if i < len(user_ordered_texts): # Check if user provided an answer for this position
-                                if user_ordered_texts[i].lower() == official_ordered_texts[i].lower():
-                                    current_question_ordering_score += (q.points_per_correct_order or 0)
-                                else:
-                                    is_full_match = False # Mismatch at this position
-                            else: # User answer is shorter than official answer, so not a full match
-                                is_full_match = False
-
-                        # If after checking all items, it's still considered a full match and lengths were initially same
-                        if is_full_match and len(user_ordered_texts) == len(official_ordered_texts):
-                             # Ensure bonus is only added if there were items to order and points_per_correct_order was positive
-                            if (q.points_per_correct_order or 0) > 0 and len(official_ordered_texts) > 0:
-                                current_question_ordering_score += (q.bonus_for_full_order or 0)
-                            elif len(official_ordered_texts) == 0 and (q.bonus_for_full_order or 0) > 0: # Edge case: bonus for ordering zero items?
-                                current_question_ordering_score += (q.bonus_for_full_order or 0)
-
-
-                        question_score = current_question_ordering_score
+    Args:
+        race_id (int): The race.
+        scorer (CompiledRaceScorer): The race's scorer (tells which questions are MC-multiple).
+        question_ids (list): Questions to fetch answers for.
+        user_ids (list, optional): Only the answers of these users. Defaults to every user.
+    Returns:
+        tuple: ([answer rows], {user_answer_id: {question_option_id, ...}})
+    """
+    if not question_ids:
+        return [], {}
+    answer_query = db.session.query(
+        UserAnswer.id,
+        UserAnswer.user_id,
+        UserAnswer.question_id,
+        UserAnswer.answer_text,
+        UserAnswer.selected_option_id,
+        UserAnswer.slider_answer_value
+    ).filter(
+        UserAnswer.race_id == race_id,
+        UserAnswer.question_id.in_(question_ids)
+    )
+    if user_ids is not None:
+        answer_query = answer_query.filter(UserAnswer.user_id.in_(list(user_ids)))
+    answer_rows = answer_query.all()
+
+    # MC-multiple selections of those answers, in one query
+    mc_selections = {} # {user_answer_id: {question_option_id, ...}}
+    mc_multiple_question_ids = [question_id for question_id in scorer.official_option_ids if question_id in question_ids]
+    if mc_multiple_question_ids:
+        mc_query = db.session.query(
+            UserAnswerMultipleChoiceOption.user_answer_id,
+            UserAnswerMultipleChoiceOption.question_option_id
+        ).join(UserAnswer, UserAnswer.id == UserAnswerMultipleChoiceOption.user_answer_id)\
+         .filter(
+            UserAnswer.race_id == race_id,
+            UserAnswer.question_id.in_(mc_multiple_question_ids)
+         )
+        if user_ids is not None:
+            mc_query = mc_query.filter(UserAnswer.user_id.in_(list(user_ids)))
+        for mc_row in mc_query.all():
+            mc_selections.setdefault(mc_row.user_answer_id, set()).add(mc_row.question_option_id)
+    return answer_rows, mc_selections
+
+
+def _users_with_stale_breakdown(race_id, question_ids, user_ids):
+    """
+    Registered users whose stored per-question points do not cover their current answers to the
+    given questions: an answer without a UserQuestionScore row (the user registered or answered
+    after the last rescore) or changed after its row was written.
 
-                elif question_type_name == 'SLIDER':
-                    app.logger.debug(f"SLIDER DIAGNOSTIC - QID {q.id}, User {user_id}: Processing. Initial total_user_score_for_race for this question: {total_user_score_for_race}")
-                    app.logger.debug(f"SLIDER DIAGNOSTIC - QID {q.id}, User {user_id}: User answer: {user_answer.slider_answer_value}, Official answer: {official_answer.correct_slider_value if official_answer else 'N/A'}")
-                    app.logger.debug(f"SLIDER DIAGNOSTIC - QID {q.id}, User {user_id}: Question config - points_exact: {q.slider_points_exact}, threshold_partial: {q.slider_threshold_partial}, points_partial: {q.slider_points_partial}")
-
-                    if user_answer.slider_answer_value is not None and official_answer and official_answer.correct_slider_value is not None:
-                        user_val = user_answer.slider_answer_value
-                        official_val = official_answer.correct_slider_value
-                        epsilon = 1e-9
-
-                        points_exact = q.slider_points_exact
-                        threshold_partial = q.slider_threshold_partial
-                        points_partial = q.slider_points_partial
-
-                        # This existing log is good
-                        app.logger.debug(
-                            f"calculate_and_store_scores - SLIDER QID {q.id} for User {user_id}: "
-                            f"UserVal={user_val}, OfficialVal={official_val}, "
-                            f"Q.slider_points_exact={points_exact}, "
-                            f"Q.slider_threshold_partial={threshold_partial}, "
-                            f"Q.slider_points_partial={points_partial}"
-                        )
+    Args:
+        race_id (int): The race.
+        question_ids (list): Questions whose stored points would be kept (the unchanged ones).
+        user_ids (list): Registered users of the race.
+    Returns:
+        list: The user ids, in one query.
+    """
+    if not question_ids or not user_ids:
+        return []
+    rows = db.session.query(UserAnswer.user_id).distinct().outerjoin(
+        UserQuestionScore, and_(
+            UserQuestionScore.race_id == UserAnswer.race_id,
+            UserQuestionScore.user_id == UserAnswer.user_id,
+            UserQuestionScore.question_id == UserAnswer.question_id
+        )
+    ).filter(
+        UserAnswer.race_id == race_id,
+        UserAnswer.question_id.in_(question_ids),
+        UserAnswer.user_id.in_(list(user_ids)),
+        (UserQuestionScore.id.is_(None)) | (UserQuestionScore.updated_at < UserAnswer.updated_at)
+    ).all()
+    return [row.user_id for row in rows]
 
-                        diff = abs(user_val - official_val)
-
-                        if diff < epsilon:  # Exact match
-                            if points_exact is not None:
-                                app.logger.debug(f"SLIDER DIAGNOSTIC - QID {q.id}, User {user_id}: Exact match condition met. Configured points_exact: {points_exact}")
-                                question_score = points_exact
-                                app.logger.debug(f"SLIDER DIAGNOSTIC - QID {q.id}, User {user_id}: Exact Match. Assigned question_score = {question_score}")
-                        elif threshold_partial is not None and threshold_partial >= 0 and \
-                             points_partial is not None and points_partial >= 0 and \
-                             diff <= (threshold_partial + epsilon):  # Partial match
-                            app.logger.debug(f"SLIDER DIAGNOSTIC - QID {q.id}, User {user_id}: Partial match condition met. Configured points_partial: {points_partial}")
-                            question_score = points_partial
-                            app.logger.debug(f"SLIDER DIAGNOSTIC - QID {q.id}, User {user_id}: Partial Match. Assigned question_score = {question_score}")
-                        else:
-                            app.logger.debug(f"calculate_and_store_scores - SLIDER QID {q.id} User {user_id}: No Match. Diff={diff}. Assigned question_score = 0 (implicitly)")
-                    else:
-                        app.logger.debug(
-                            f"calculate_and_store_scores - SLIDER QID {q.id} for User {user_id}: "
-                            f"User or official slider value is None or official_answer missing. UserVal: {user_answer.slider_answer_value}, OfficialVal: {official_answer.correct_slider_value if official_answer else 'N/A'}. Assigned question_score = 0 (implicitly)"
-                        )
 
-                app.logger.debug(f"SLIDER DIAGNOSTIC - QID {q.id}, User {user_id}: Final question_score for this question (type {question_type_name}) before adding to total: {question_score}")
-                app.logger.debug(f"SLIDER DIAGNOSTIC - QID {q.id}, User {user_id}: total_user_score_for_race BEFORE '{question_type_name}' Q_Score addition: {total_user_score_for_race}")
-                app.logger.debug(f"SLIDER DIAGNOSTIC - QID {q.id}, User {user_id}: question_score ('{question_type_name}') to be added: {question_score}")
-                total_user_score_for_race += question_score
-                app.logger.debug(f"SLIDER DIAGNOSTIC - QID {q.id}, User {user_id}: total_user_score_for_race AFTER '{question_type_name}' Q_Score addition: {total_user_score_for_race}")
-                # Existing general log line after processing all question types.
-                # app.logger.debug(f"User {user_id}, Q {q.id}, Type {question_type_name}, Q_Score {question_score}, Total_Score {total_user_score_for_race}") # This is a bit redundant now but harmless
-
-
-            # Store or update UserScore
-            user_score_entry = UserScore.query.filter_by(user_id=user_id, race_id=race.id).first()
-            if user_score_entry:
-                user_score_entry.score = total_user_score_for_race
-                user_score_entry.updated_at = datetime.utcnow()
-                app.logger.info(f"Updating UserScore for user_id {user_id}, race_id {race.id} to {total_user_score_for_race}")
-            else:
-                user_score_entry = UserScore(
-                    user_id=user_id,
-                    race_id=race.id,
-                    score=total_user_score_for_race,
-                    created_at=datetime.utcnow(),
-                    updated_at=datetime.utcnow()
-                )
-                db.session.add(user_score_entry)
-                app.logger.info(f"Creating UserScore for user_id {user_id}, race_id {race.id} with score {total_user_score_for_race}")
+def _apply_user_score_deltas(race_id, deltas_by_user):
+    """
+    Adds a per-user delta to the stored race totals (UPDATE ... SET score = score + delta).
+    Users without a UserScore row get one with the sum of their stored per-question points.
+
+    Args:
+        race_id (int): The race the totals belong to.
+        deltas_by_user (dict): Map of {user_id: points to add}.
+    """
+    if not deltas_by_user:
+        return
+
+    existing_user_ids = {
+        row.user_id for row in db.session.query(UserScore.user_id)
+        .filter(UserScore.race_id == race_id, UserScore.user_id.in_(list(deltas_by_user.keys()))).all()
+    }
+
+    now = datetime.utcnow()
+    updates = [
+        {"b_user_id": user_id, "b_delta": delta, "b_updated_at": now}
+        for user_id, delta in deltas_by_user.items() if user_id in existing_user_ids and delta
+    ]
+    if updates:
+        user_scores = UserScore.__table__
+        db.session.execute(
+            user_scores.update()
+            .where(user_scores.c.user_id == bindparam('b_user_id'), user_scores.c.race_id == race_id)
+            .values(score=user_scores.c.score + bindparam('b_delta'), updated_at=bindparam('b_updated_at')),
+            updates
+        )
+
+    missing_user_ids = [user_id for user_id in deltas_by_user if user_id not in existing_user_ids]
+    if missing_user_ids:
+        stored_totals = dict(
+            db.session.query(UserQuestionScore.user_id, func.sum(UserQuestionScore.points))
+            .filter(UserQuestionScore.race_id == race_id, UserQuestionScore.user_id.in_(missing_user_ids))
+            .group_by(UserQuestionScore.user_id).all()
+        )
+        _upsert_user_scores(race_id, {user_id: stored_totals.get(user_id) or 0 for user_id in missing_user_ids})
+
+
+def calculate_and_store_scores(race_id, question_ids=None):
+    """
+    Scores the race and stores the per-question points (UserQuestionScore) and the totals (UserScore).
+
+    Args:
+        race_id (int): The race to score.
+        question_ids (iterable, optional): Questions whose official answer or scoring changed. Only their
+            contribution is recomputed and every UserScore is updated by delta. When omitted, or
+            when the race has no stored per-question points yet, the whole race is rescored.
+    Returns:
+        dict: {"success": bool, "message": str}
+    """
+    app.logger.info(f"Starting score calculation for race_id: {race_id}" + (f" (questions {sorted(question_ids)})" if question_ids is not None else ""))
+    try:
+        race = Race.query.filter_by(id=race_id, is_deleted=False).first()
+        if not race:
+            app.logger.error(f"Scoring calculation: Race with id {race_id} not found or has been deleted.")
+            return {"success": False, "message": "Race not found or has been deleted"}
+
+        # Everything is loaded in a fixed number of queries, independent of the number of users:
+        # compiled scorer (questions, official answers, option counts), registrations, answers and answer MC selections.
+        scorer = CompiledRaceScorer.for_race(race.id)
+        # A full rescore goes on without questions: the last one may have been deleted and its points must be cleared
+        if not scorer.questions and question_ids is not None:
+            app.logger.info(f"Scoring calculation: No questions found for race_id: {race_id}. No scores to calculate.")
+            return {"success": True, "message": "No questions found for race, no scores calculated."}
+
+        registered_user_ids = [
+            row.user_id for row in db.session.query(UserRaceRegistration.user_id).filter_by(race_id=race.id).all()
+        ]
+        if not registered_user_ids:
+            app.logger.info(f"Scoring calculation: No users registered for race_id: {race_id}. No scores to calculate.")
+            return {"success": True, "message": "No registered users for race, no scores calculated."}
+
+        # Delta only if the race already has its per-question points stored; otherwise there is nothing to subtract from
+        if question_ids is not None and db.session.query(UserQuestionScore.id).filter_by(race_id=race.id).first() is None:
+            app.logger.info(f"Scoring calculation: No per-question scores stored for race_id: {race_id}. Falling back to a full rescore.")
+            question_ids = None
+
+        if question_ids is not None:
+            race_question_ids = {question.id for question in scorer.questions}
+            question_ids = [question_id for question_id in set(question_ids) if question_id in race_question_ids]
+            if not question_ids:
+                return {"success": True, "message": "No changed questions, scores left untouched."}
+
+        # Only answers to questions with an official answer can score
+        scorable_question_ids = [
+            question_id for question_id in scorer.official_answers
+            if question_ids is None or question_id in question_ids
+        ]
+        stale_user_ids = set()
+        if question_ids is not None:
+            # Users whose stored breakdown misses answers to the unchanged questions (registered or
+            # answered after the last rescore) can not be adjusted by delta: they are fully rescored
+            unchanged_question_ids = [question_id for question_id in scorer.official_answers if question_id not in question_ids]
+            stale_user_ids = set(_users_with_stale_breakdown(race.id, unchanged_question_ids, registered_user_ids))
+        delta_user_ids = [user_id for user_id in registered_user_ids if user_id not in stale_user_ids]
+
+        answer_rows, user_mc_selections_map = _fetch_scorable_answers(race.id, scorer, scorable_question_ids)
+
+        # SLIDER / MC-single answers are scored column-wise (numpy), the rest through the compiled closures.
+        # Every registered user gets a total, even if they did not answer anything; answers from users
+        # no longer registered are not scored.
+        totals_by_user, breakdown = scorer.score_breakdown(answer_rows, delta_user_ids, user_mc_selections_map)
+
+        if question_ids is None:
+            # Full rescore: rebuild the per-question table and store every UserScore in one bulk upsert
+            _replace_user_question_scores(race.id, breakdown)
+            _upsert_user_scores(race.id, totals_by_user)
+            app.logger.info(f"Upserted {len(totals_by_user)} UserScore rows for race_id {race.id} ({len(answer_rows)} answers scored)")
+        else:
+            # Delta: old contribution of the changed questions, per user, before replacing their rows
+            previous_points = dict(
+                db.session.query(UserQuestionScore.user_id, func.sum(UserQuestionScore.points))
+                .filter(UserQuestionScore.race_id == race.id, UserQuestionScore.question_id.in_(question_ids))
+                .group_by(UserQuestionScore.user_id).all()
+            )
+            _replace_user_question_scores(race.id, breakdown, question_ids)
+            deltas_by_user = {
+                user_id: total - (previous_points.get(user_id) or 0) for user_id, total in totals_by_user.items()
+            }
+            _apply_user_score_deltas(race.id, deltas_by_user)
+            app.logger.info(f"Applied score deltas for race_id {race.id}: {len(question_ids)} changed question(s), {len(answer_rows)} answers rescored")
+
+            if stale_user_ids:
+                # Every scorable question of these users, replacing their whole breakdown and total
+                stale_user_ids = sorted(stale_user_ids)
+                stale_rows, stale_mc_selections = _fetch_scorable_answers(race.id, scorer, list(scorer.official_answers), stale_user_ids)
+                stale_totals, stale_breakdown = scorer.score_breakdown(stale_rows, stale_user_ids, stale_mc_selections)
+                _replace_user_question_scores(race.id, stale_breakdown, user_ids=stale_user_ids)
+                _upsert_user_scores(race.id, stale_totals)
+                app.logger.info(f"Fully rescored {len(stale_user_ids)} user(s) of race_id {race.id} whose per-question scores were incomplete")
+
+        # Nueva versión de la clasificación de la carrera (invalida snapshots y ETags)
+        bump_score_version([race.id])
+
+        # Clasificaciones materializadas de las ligas que incluyen la carrera, en la misma transacción
+        refreshed_league_ids = refresh_standings_for_race(race.id)
+        if refreshed_league_ids:
+            app.logger.info(f"Refreshed standings of leagues {refreshed_league_ids} after scoring race_id {race.id}")
 
         db.session.commit()
         app.logger.info(f"Successfully calculated and stored scores for race_id: {race_id}")
@@ -3993,39 +3887,79 @@ def calculate_and_store_scores(race_id):
         app.logger.error(f"Error during score calculation for race_id {race_id}: {e}", exc_info=True)
         return {"success": False, "message": f"An error occurred: {str(e)}"}
 
+# Cola de recálculos: save_official_answers encola un ScoringJob y responde sin esperar al cálculo
+scoring_job_queue = ScoringJobQueue(app, calculate_and_store_scores)
+
+# Campos de Question que intervienen en la puntuación (ver backend/scoring.py); 'options' cambia el número de opciones
+QUESTION_SCORING_FIELDS = ('max_score_free_text', 'is_mc_multiple_correct', 'points_per_correct_mc', 'points_per_incorrect_mc',
+                           'total_score_mc_single', 'points_per_correct_order', 'bonus_for_full_order', 'slider_points_exact',
+                           'slider_threshold_partial', 'slider_points_partial', 'options')
+
+def _enqueue_rescore_after_question_change(race_id, question_id=None, requested_by_id=None):
+    """
+    Queues the rescore a committed question change needs: a delta for an edited question, or the
+    whole race when question_id is None (a deleted question, whose points must leave the totals).
+    A failure to queue is logged, not raised: the question change is already committed.
+
+    Returns:
+        int | None: The id of the new or coalesced ScoringJob, or None if it could not be queued.
+    """
+    question_ids = [question_id] if question_id is not None else None
+    try:
+        scoring_job = scoring_job_queue.enqueue(race_id, question_ids=question_ids, requested_by_id=requested_by_id)
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Could not queue the rescore of race {race_id} after a question change: {e}", exc_info=True)
+        return None
+    app.logger.info(f"Scoring job {scoring_job.id} queued for race {race_id} after a question change" +
+                    (f" (question {question_id})" if question_id is not None else " (whole race)"))
+    return scoring_job.id
+
+def _question_needs_rescore(question, data):
+    """An edit changes scores if the question has an official answer or the payload touches its scoring fields."""
+    if any(field in data for field in QUESTION_SCORING_FIELDS):
+        return True
+    return db.session.query(OfficialAnswer.id).filter_by(question_id=question.id).first() is not None
+
+@app.before_request
+def recover_scoring_jobs():
+    # Jobs huérfanos de un worker que se paró (reinicio, caída, despliegue): una vez por proceso
+    scoring_job_queue.ensure_recovered()
+
 # --- Official Answer Endpoints ---
 
 @app.route('/api/races/<int:race_id>/official_answers', methods=['GET'])
 @login_required
 def get_official_answers(race_id):
-    if current_user.role.code not in ['ADMIN', 'LEAGUE_ADMIN']:
+    if current_user.role_code not in ['ADMIN', 'LEAGUE_ADMIN']:
         return jsonify(message="Forbidden: You do not have permission to view official answers."), 403
 
     race = Race.query.filter_by(id=race_id, is_deleted=False).first()
     if not race:
         return jsonify(message="Race not found or has been deleted"), 404
 
-    official_answers_query = OfficialAnswer.query.filter_by(race_id=race_id).all()
+    # Official answers, questions and options come from the race catalog
+    catalog = _race_catalog(race)
+    option_texts = catalog.option_texts
 
     output = []
-    for oa in official_answers_query:
-        question = oa.question
-        if not question:
-            app.logger.error(f"OfficialAnswer {oa.id} has no associated question. Skipping.")
+    for question in catalog.questions:
+        oa = question.official
+        if oa is None:
             continue
 
         all_q_options_list = []
-        for opt in question.options.order_by(QuestionOption.id): # Ensure consistent order
+        for opt in question.options: # Ordered by id in the catalog
             all_q_options_list.append({
                 "id": opt.id,
                 "option_text": opt.option_text,
-                "correct_order_index": opt.correct_order_index if question.question_type.name == "ORDERING" else None
+                "correct_order_index": opt.correct_order_index if question.type_name == "ORDERING" else None
             })
 
         answer_details = {
             "question_id": question.id,
             "question_text": question.text,
-            "question_type": question.question_type.name,
+            "question_type": question.type_name,
             "answer_text": oa.answer_text,
             "selected_option_id": oa.selected_option_id,
             "correct_slider_value": oa.correct_slider_value, # Added for slider questions
@@ -4034,31 +3968,88 @@ def get_official_answers(race_id):
             "all_question_options": all_q_options_list
         }
 
-        if question.question_type.name == "MULTIPLE_CHOICE":
+        if question.type_name == "MULTIPLE_CHOICE":
             if not question.is_mc_multiple_correct and oa.selected_option_id:
-                selected_option = QuestionOption.query.get(oa.selected_option_id)
-                if selected_option:
-                    answer_details["selected_option_text"] = selected_option.option_text
+                answer_details["selected_option_text"] = option_texts.text(oa.selected_option_id)
             elif question.is_mc_multiple_correct:
-                selected_mc_options_list = []
-                for mc_opt_assoc in oa.official_selected_mc_options: # Relationship name from OfficialAnswer model
-                    option = mc_opt_assoc.question_option # Relationship from OfficialAnswerMultipleChoiceOption to QuestionOption
-                    if option:
-                        selected_mc_options_list.append({
-                            "option_id": option.id,
-                            "option_text": option.option_text
-                        })
-                answer_details["selected_mc_options"] = selected_mc_options_list
+                answer_details["selected_mc_options"] = [
+                    {"option_id": option["id"], "option_text": option["text"]} for option in option_texts.options(oa.option_ids)
+                ]
 
         output.append(answer_details)
 
     return jsonify(output), 200
 
 
+def _official_answer_values(official_answer):
+    """Comparable snapshot of a stored OfficialAnswer."""
+    return {
+        "answer_text": official_answer.answer_text,
+        "selected_option_id": official_answer.selected_option_id,
+        "correct_slider_value": official_answer.correct_slider_value,
+        "mc_option_ids": sorted(sel.question_option_id for sel in official_answer.official_selected_mc_options),
+    }
+
+
+def _official_answer_values_from_payload(question, answer_data, valid_option_ids):
+    """
+    Validates one question's official answer payload into the same snapshot as _official_answer_values.
+
+    Args:
+        question (Question): The question being answered.
+        answer_data (dict): Payload for this question.
+        valid_option_ids (set): Ids of the question's options.
+    Returns:
+        dict: The values to store, or None for unsupported question types.
+    """
+    values = {"answer_text": None, "selected_option_id": None, "correct_slider_value": None, "mc_option_ids": []}
+    question_type_name = question.type_name
+
+    if question_type_name == 'FREE_TEXT':
+        values["answer_text"] = answer_data.get('answer_text')
+    elif question_type_name == 'ORDERING':
+        # Assuming payload provides 'ordered_options_text' similar to user answers
+        values["answer_text"] = answer_data.get('ordered_options_text')
+    elif question_type_name == 'MULTIPLE_CHOICE':
+        if question.is_mc_multiple_correct:
+            selected_ids = answer_data.get('selected_option_ids', [])
+            if not isinstance(selected_ids, list):
+                app.logger.warning(f"selected_option_ids for official answer Q {question.id} is not a list: {selected_ids}")
+                selected_ids = []
+            mc_option_ids = set()
+            for opt_id in selected_ids:
+                if not isinstance(opt_id, int): continue # Skip non-integer ids
+                if opt_id in valid_option_ids:
+                    mc_option_ids.add(opt_id)
+                else:
+                    app.logger.warning(f"Invalid option_id {opt_id} for official answer to question {question.id}")
+            values["mc_option_ids"] = sorted(mc_option_ids)
+        else: # Single correct
+            selected_id = answer_data.get('selected_option_id')
+            if selected_id is not None:
+                if not isinstance(selected_id, int):
+                    app.logger.warning(f"selected_option_id for official answer Q {question.id} is not an int: {selected_id}")
+                elif selected_id in valid_option_ids:
+                    values["selected_option_id"] = selected_id
+                else:
+                    app.logger.warning(f"Invalid selected_option_id {selected_id} for official answer to question {question.id}")
+    elif question_type_name == 'SLIDER':
+        correct_value = answer_data.get('correct_slider_value')
+        if correct_value is not None: # If null is sent, store null.
+            try:
+                values["correct_slider_value"] = float(correct_value)
+            except (ValueError, TypeError):
+                app.logger.warning(f"Invalid correct_slider_value '{correct_value}' for SLIDER question {question.id}. Storing as None.")
+    else:
+        return None
+
+    return values
+
+
 @app.route('/api/races/<int:race_id>/official_answers', methods=['POST'])
 @login_required
 def save_official_answers(race_id):
-    if current_user.role.code not in ['ADMIN', 'LEAGUE_ADMIN']:
+    if current_user.role_code not in ['ADMIN', 'LEAGUE_ADMIN']:
         return jsonify(message="Forbidden: You do not have permission to save official answers."), 403
 
     race = Race.query.filter_by(id=race_id, is_deleted=False).first()
@@ -4073,13 +4064,21 @@ def save_official_answers(race_id):
     app.logger.debug(f"Received official answers payload for race {race_id}: {answers_payload}")
 
     try:
-        # Delete existing official answers for this race
-        existing_official_answers = OfficialAnswer.query.filter_by(race_id=race_id).all()
-        for old_oa in existing_official_answers:
-            # Delete associated OfficialAnswerMultipleChoiceOption first
-            OfficialAnswerMultipleChoiceOption.query.filter_by(official_answer_id=old_oa.id).delete()
-            db.session.delete(old_oa)
-        db.session.flush() # Process deletes before adds
+        # Stored official answers, to diff the payload against them: only changed questions are rewritten and rescored
+        existing_by_question = {
+            oa.question_id: oa for oa in OfficialAnswer.query.options(selectinload(OfficialAnswer.official_selected_mc_options))
+                                                            .filter_by(race_id=race_id).all()
+        }
+        questions_by_id = {
+            q.id: q for q in Question.query.filter_by(race_id=race_id).all()
+        }
+        option_ids_by_question = {}
+        for opt_question_id, opt_id in db.session.query(QuestionOption.question_id, QuestionOption.id)\
+                                                 .filter(QuestionOption.question_id.in_(list(questions_by_id.keys()))).all():
+            option_ids_by_question.setdefault(opt_question_id, set()).add(opt_id)
+
+        changed_question_ids = set()
+        submitted_question_ids = set()
 
         for question_id_str, answer_data in answers_payload.items():
             try:
@@ -4088,90 +4087,57 @@ def save_official_answers(race_id):
                 app.logger.warning(f"Invalid question_id format '{question_id_str}' in official answers payload for race {race_id}.")
                 continue
 
-            question = Question.query.get(question_id)
-            if not question or question.race_id != race_id:
+            question = questions_by_id.get(question_id)
+            if not question:
                 app.logger.warning(f"Invalid or mismatched question_id {question_id} for race {race_id}.")
                 continue
 
-            new_official_answer = OfficialAnswer(
-                race_id=race_id,
-                question_id=question.id
-            )
-
-            question_type_name = question.question_type.name
-            app.logger.info(f"Processing official answer for question {question.id} (type: {question_type_name})")
-
-            if question_type_name == 'FREE_TEXT':
-                new_official_answer.answer_text = answer_data.get('answer_text')
-            elif question_type_name == 'ORDERING':
-                # Assuming payload provides 'ordered_options_text' similar to user answers
-                new_official_answer.answer_text = answer_data.get('ordered_options_text')
-            elif question_type_name == 'MULTIPLE_CHOICE':
-                if question.is_mc_multiple_correct:
-                    selected_ids = answer_data.get('selected_option_ids', [])
-                    if not isinstance(selected_ids, list):
-                        app.logger.warning(f"selected_option_ids for official answer Q {question.id} is not a list: {selected_ids}")
-                        selected_ids = []
-
-                    for opt_id in selected_ids:
-                        if not isinstance(opt_id, int): continue # Skip non-integer ids
-                        option_exists = QuestionOption.query.filter_by(id=opt_id, question_id=question.id).first()
-                        if option_exists:
-                            mc_option = OfficialAnswerMultipleChoiceOption(question_option_id=opt_id)
-                            new_official_answer.official_selected_mc_options.append(mc_option)
-                        else:
-                            app.logger.warning(f"Invalid option_id {opt_id} for official answer to question {question.id}")
-                else: # Single correct
-                    selected_id = answer_data.get('selected_option_id')
-                    if selected_id is not None:
-                        if not isinstance(selected_id, int):
-                            app.logger.warning(f"selected_option_id for official answer Q {question.id} is not an int: {selected_id}")
-                            new_official_answer.selected_option_id = None
-                        else:
-                            option_exists = QuestionOption.query.filter_by(id=selected_id, question_id=question.id).first()
-                            if option_exists:
-                                new_official_answer.selected_option_id = selected_id
-                            else:
-                                app.logger.warning(f"Invalid selected_option_id {selected_id} for official answer to question {question.id}")
-                                new_official_answer.selected_option_id = None
-                    else:
-                        new_official_answer.selected_option_id = None
-            elif question_type_name == 'SLIDER':
-                correct_value = answer_data.get('correct_slider_value')
-                if correct_value is not None:
-                    try:
-                        new_official_answer.correct_slider_value = float(correct_value)
-                    except (ValueError, TypeError):
-                        app.logger.warning(f"Invalid correct_slider_value '{correct_value}' for SLIDER question {question.id}. Storing as None.")
-                        new_official_answer.correct_slider_value = None
-                else: # If null is sent, store null.
-                    new_official_answer.correct_slider_value = None
-
-                # Ensure other type-specific fields are None
-                new_official_answer.answer_text = None
-                new_official_answer.selected_option_id = None
-                # Clear any potential OfficialAnswerMultipleChoiceOption if type changed
-                OfficialAnswerMultipleChoiceOption.query.filter_by(official_answer_id=new_official_answer.id).delete()
-
-            else:
-                app.logger.warning(f"Unsupported question type '{question_type_name}' for official answer to question {question.id}")
+            new_values = _official_answer_values_from_payload(question, answer_data or {}, option_ids_by_question.get(question.id, set()))
+            if new_values is None:
+                app.logger.warning(f"Unsupported question type '{question.type_name}' for official answer to question {question.id}")
                 continue
-
-            db.session.add(new_official_answer)
+            submitted_question_ids.add(question.id)
+
+            official_answer = existing_by_question.get(question.id)
+            if official_answer is not None and _official_answer_values(official_answer) == new_values:
+                continue # Unchanged: no write, no rescore
+
+            if official_answer is None:
+                official_answer = OfficialAnswer(race_id=race_id, question_id=question.id)
+                db.session.add(official_answer)
+            official_answer.answer_text = new_values["answer_text"]
+            official_answer.selected_option_id = new_values["selected_option_id"]
+            official_answer.correct_slider_value = new_values["correct_slider_value"]
+            # delete-orphan cascade removes the previous MC selections
+            official_answer.official_selected_mc_options = [
+                OfficialAnswerMultipleChoiceOption(question_option_id=opt_id) for opt_id in new_values["mc_option_ids"]
+            ]
+            changed_question_ids.add(question.id)
             app.logger.info(f"OfficialAnswer prepared for question {question.id} for race {race_id}")
 
-        db.session.commit()
-        app.logger.info(f"Official answers successfully saved for race {race_id} by user {current_user.id}")
+        # The payload replaces the whole set: official answers not submitted again are removed
+        for question_id, old_oa in existing_by_question.items():
+            if question_id not in submitted_question_ids:
+                db.session.delete(old_oa)
+                changed_question_ids.add(question_id)
 
-        # Trigger score calculation
-        app.logger.info(f"Attempting to trigger score calculation for race {race_id} after saving official answers.")
-        scoring_result = calculate_and_store_scores(race_id)
-        if not scoring_result.get("success"):
-            app.logger.error(f"Scoring calculation failed for race {race_id} after official answers were saved. Reason: {scoring_result.get('message')}")
+        if changed_question_ids:
+            bump_catalog_version(race_id) # Las respuestas oficiales forman parte del catálogo
+        db.session.commit()
+        if changed_question_ids:
+            race_catalogs.invalidate_race(race_id)
+        app.logger.info(f"Official answers successfully saved for race {race_id} by user {current_user.id} ({len(changed_question_ids)} changed)")
+
+        # Queue the score calculation: only the questions whose official answer changed, or the whole
+        # race when nothing changed (re-saving is how an admin rescores, e.g. after a failed job)
+        if changed_question_ids:
+            scoring_job = scoring_job_queue.enqueue(race_id, question_ids=changed_question_ids, requested_by_id=current_user.id)
+            app.logger.info(f"Scoring job {scoring_job.id} queued for race {race_id} after saving official answers.")
         else:
-            app.logger.info(f"Scoring calculation triggered successfully for race {race_id}. Message: {scoring_result.get('message')}")
+            scoring_job = scoring_job_queue.enqueue(race_id, requested_by_id=current_user.id)
+            app.logger.info(f"Official answers for race {race_id} unchanged. Full rescore queued as job {scoring_job.id}.")
 
-        return jsonify(message="Official answers saved successfully. Scoring process initiated."), 201
+        return jsonify(message="Official answers saved successfully. Scoring process initiated.", scoring_job_id=scoring_job.id), 201
 
     except IntegrityError as ie:
         db.session.rollback()
@@ -4182,6 +4148,18 @@ def save_official_answers(race_id):
         app.logger.error(f"Exception saving official answers for race {race_id}, user {current_user.id}: {e}", exc_info=True)
         return jsonify(message="An error occurred while saving official answers."), 500
 
+@app.route('/api/races/<int:race_id>/scoring_jobs/<int:job_id>', methods=['GET'])
+@login_required
+def get_scoring_job(race_id, job_id):
+    if current_user.role_code not in ['ADMIN', 'LEAGUE_ADMIN']:
+        return jsonify(message="Forbidden: You do not have permission to view scoring jobs."), 403
+
+    job = ScoringJob.query.filter_by(id=job_id, race_id=race_id).first()
+    if not job:
+        return jsonify(message="Scoring job not found"), 404
+
+    return jsonify(job.to_dict()), 200
+
 @app.route('/api/events', methods=['GET'])
 def get_events():
     """
@@ -4219,7 +4197,7 @@ def get_events():
 @app.route('/api/events/<int:event_id>', methods=['PUT'])
 @login_required
 def update_event_api(event_id):
-    if current_user.role.code != 'ADMIN':
+    if current_user.role_code != 'ADMIN':
         return jsonify(message="Forbidden: Solo los administradores pueden actualizar eventos."), 403
 
     event = Event.query.get(event_id)
@@ -4290,7 +4268,7 @@ def update_event_api(event_id):
 @app.route('/admin/events_management')
 @login_required
 def serve_events_management_page():
-    if current_user.role.code != 'ADMIN':
+    if current_user.role_code != 'ADMIN':
         flash("Acceso denegado. Esta sección es solo para administradores.", "error")
         return redirect(url_for('serve_hello_world_page'))
 
@@ -4303,7 +4281,7 @@ def serve_events_management_page():
         current_year=datetime.utcnow().year,
         races=[], # Para la tabla principal de carreras en admin_dashboard si se renderiza
         races_for_official_answers=[], # Para el modal de respuestas oficiales
-        all_race_formats=RaceFormat.query.order_by(RaceFormat.name).all(), # Necesario para filtros
+        all_race_formats=reference_data.race_formats(), # Necesario para filtros
         filter_date_from_str=None,
         filter_date_to_str=None,
         filter_race_format_id_str=None,
@@ -4324,7 +4302,7 @@ def serve_events_management_page():
 @app.route('/api/events', methods=['POST'])
 @login_required
 def create_event_api():
-    if current_user.role.code != 'ADMIN':
+    if current_user.role_code != 'ADMIN':
         return jsonify(message="Forbidden: Solo los administradores pueden crear eventos."), 403
 
     data = request.get_json()
@@ -4401,7 +4379,7 @@ def create_event_api():
 @login_required # Opcional, dependiendo si quieres que solo admins vean detalles por API
 def get_event_detail_api(event_id):
     try:
-        if current_user.role.code != 'ADMIN':
+        if current_user.role_code != 'ADMIN':
             return jsonify(message="Forbidden: Insufficient permissions"), 403
 
         event = Event.query.get(event_id)
@@ -4436,7 +4414,7 @@ def get_event_detail_api(event_id):
 @app.route('/api/events/<int:event_id>', methods=['DELETE']) # API para eliminar evento
 @login_required
 def delete_event_api(event_id): # Renombrado para evitar conflicto con delete_event
-    if current_user.role.code != 'ADMIN':
+    if current_user.role_code != 'ADMIN':
         return jsonify(message="Forbidden: Insufficient permissions"), 403
 
     event = Event.query.get(event_id)
@@ -4537,7 +4515,7 @@ def sugerir_evento_api():
 @app.route('/admin/event_suggestions') # Cambiado de /admin/sugerencias para seguir el plan
 @login_required
 def admin_event_suggestions_page(): # Renombrado de admin_sugerencias_page
-    if not current_user.is_authenticated or current_user.role.code != 'ADMIN':
+    if not current_user.is_authenticated or current_user.role_code != 'ADMIN':
         flash("Acceso denegado. Esta sección es solo para administradores.", "error")
         return redirect(url_for('serve_hello_world_page'))
 
@@ -4552,7 +4530,7 @@ def admin_event_suggestions_page(): # Renombrado de admin_sugerencias_page
         'current_year': datetime.utcnow().year,
         'races': [],
         'races_for_official_answers': [],
-        'all_race_formats': RaceFormat.query.order_by(RaceFormat.name).all(),
+        'all_race_formats': reference_data.race_formats(),
         'filter_date_from_str': None,
         'filter_date_to_str': None,
         'filter_race_format_id_str': None,
@@ -4571,7 +4549,7 @@ def admin_event_suggestions_page(): # Renombrado de admin_sugerencias_page
 @app.route('/admin/event_suggestions/<int:event_id>/validate', methods=['POST']) # Cambiado de /api/admin/sugerencias/...
 @login_required
 def admin_validate_event_suggestion(event_id): # Renombrado de admin_validar_sugerencia
-    if not current_user.is_authenticated or current_user.role.code != 'ADMIN':
+    if not current_user.is_authenticated or current_user.role_code != 'ADMIN':
         flash("Acceso denegado.", "error") # Usar flash para redirecciones GET
         return redirect(url_for('admin_event_suggestions_page'))
 
@@ -4596,7 +4574,7 @@ def admin_validate_event_suggestion(event_id): # Renombrado de admin_validar_sug
 @app.route('/admin/event_suggestions/<int:event_id>/discard', methods=['POST']) # Cambiado de /api/admin/sugerencias/...
 @login_required
 def admin_discard_event_suggestion(event_id): # Renombrado de admin_rechazar_sugerencia y acción cambiada a eliminar
-    if not current_user.is_authenticated or current_user.role.code != 'ADMIN':
+    if not current_user.is_authenticated or current_user.role_code != 'ADMIN':
         flash("Acceso denegado.", "error")
         return redirect(url_for('admin_event_suggestions_page'))
 
@@ -4633,7 +4611,7 @@ def admin_discard_event_suggestion(event_id): # Renombrado de admin_rechazar_sug
 # @app.route('/api/admin/sugerencias/<int:event_id>/validar', methods=['POST'])
 # @login_required
 # def api_admin_validar_sugerencia(event_id):
-#     if not current_user.is_authenticated or current_user.role.code != 'ADMIN':
+#     if not current_user.is_authenticated or current_user.role_code != 'ADMIN':
 #         return jsonify(message="Acceso denegado."), 403
 #     event = Event.query.get_or_404(event_id)
 #     if event.status != EventStatus.PENDIENTE:
@@ -4651,7 +4629,7 @@ def admin_discard_event_suggestion(event_id): # Renombrado de admin_rechazar_sug
 # @app.route('/api/admin/sugerencias/<int:event_id>/rechazar', methods=['POST'])
 # @login_required
 # def api_admin_rechazar_sugerencia(event_id):
-#     if not current_user.is_authenticated or current_user.role.code != 'ADMIN':
+#     if not current_user.is_authenticated or current_user.role_code != 'ADMIN':
 #         return jsonify(message="Acceso denegado."), 403
 #     event = Event.query.get_or_404(event_id)
 #     if event.status != EventStatus.PENDIENTE:
@@ -4671,7 +4649,7 @@ def admin_discard_event_suggestion(event_id): # Renombrado de admin_rechazar_sug
 # @app.route('/admin/sugerencias', methods=['GET'])
 # @login_required
 # def admin_sugerencias_page():
-#     if not current_user.is_authenticated or current_user.role.code != 'ADMIN':
+#     if not current_user.is_authenticated or current_user.role_code != 'ADMIN':
 #         flash("Acceso denegado. Esta sección es solo para administradores.", "error")
 #         return redirect(url_for('serve_hello_world_page'))
 #
@@ -4701,7 +4679,7 @@ def admin_discard_event_suggestion(event_id): # Renombrado de admin_rechazar_sug
 # @app.route('/api/admin/sugerencias/<int:event_id>/validar', methods=['POST'])
 # @login_required
 # def admin_validar_sugerencia(event_id):
-#     if not current_user.is_authenticated or current_user.role.code != 'ADMIN':
+#     if not current_user.is_authenticated or current_user.role_code != 'ADMIN':
 #         return jsonify(message="Acceso denegado."), 403
 #
 #     event = Event.query.get_or_404(event_id)
@@ -4721,7 +4699,7 @@ def admin_discard_event_suggestion(event_id): # Renombrado de admin_rechazar_sug
 # @app.route('/api/admin/sugerencias/<int:event_id>/rechazar', methods=['POST'])
 # @login_required
 # def admin_rechazar_sugerencia(event_id):
-#     if not current_user.is_authenticated or current_user.role.code != 'ADMIN':
+#     if not current_user.is_authenticated or current_user.role_code != 'ADMIN':
 #         return jsonify(message="Acceso denegado."), 403
 #
 #     event = Event.query.get_or_404(event_id)
@@ -4741,7 +4719,7 @@ def admin_discard_event_suggestion(event_id): # Renombrado de admin_rechazar_sug
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 # +++++++++++++++++++++ RUTAS PARA LAS LIGAS ++++++++++++++++++++++++++++++++++
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
-from backend.models import League, LeagueParticipant, LeagueInvitationCode, RaceStatus # Asegurarse que League está importado y los nuevos modelos + RaceStatus
+from backend.models import League, LeagueParticipant, LeagueStanding, LeagueInvitationCode, RaceStatus, league_races_table # Asegurarse que League está importado y los nuevos modelos + RaceStatus
 import uuid # Para generar códigos de invitación
 from datetime import datetime, timedelta # Para la expiración del código y obtener datetime.utcnow()
 
@@ -4749,7 +4727,7 @@ def check_league_permission(user):
     """Helper function to check if a user has league admin or admin permissions."""
     if not user.is_authenticated:
         return False
-    return user.role.code in ['ADMIN', 'LEAGUE_ADMIN']
+    return user.role_code in ['ADMIN', 'LEAGUE_ADMIN']
 
 @app.route('/leagues', methods=['GET'])
 @login_required
@@ -4851,6 +4829,8 @@ def create_league():
 
         try:
             db.session.add(new_league)
+            db.session.flush() # Asigna new_league.id
+            refresh_league_standings(new_league.id)
             db.session.commit()
             flash(f"Liga '{new_league.name}' creada exitosamente.", "success")
             return redirect(url_for('list_leagues'))
@@ -4904,6 +4884,14 @@ def create_league():
 #     return render_template('league_detail.html', league=league, current_year=datetime.utcnow().year)
 
 
+def _league_standing_rows(league_id):
+    """LeagueStanding rows of a league with the participant's username, ordered by rank."""
+    return db.session.query(LeagueStanding, User.username)\
+        .join(User, User.id == LeagueStanding.user_id)\
+        .filter(LeagueStanding.league_id == league_id)\
+        .order_by(LeagueStanding.rank, User.username).all()
+
+
 @app.route('/league/<int:league_id>/view', methods=['GET'])
 @login_required
 def view_league_detail(league_id):
@@ -4913,64 +4901,38 @@ def view_league_detail(league_id):
     # Ordenar por fecha de evento, por ejemplo
     league_races_query = league.races.filter_by(is_deleted=False).order_by(Race.event_date.asc())
 
-    # Añadir el conteo de preguntas a cada carrera
-    league_races_detailed_list = []
-    for race_obj in league_races_query.all():
-        # Contar preguntas activas para la carrera
-        # race.questions es una relación `lazy='dynamic'`, por lo que .count() hace una query.
+    league_races_detailed = league_races_query.all()
+    race_ids_in_league = [race.id for race in league_races_detailed]
+
+    # Conteo de preguntas activas de todas las carreras en una sola consulta agrupada
+    questions_count_by_race = dict(
+        db.session.query(Question.race_id, func.count(Question.id))
+        .filter(Question.race_id.in_(race_ids_in_league), Question.is_active == True)
+        .group_by(Question.race_id).all()
+    ) if race_ids_in_league else {}
+    for race_obj in league_races_detailed:
+        # La plantilla usa race.questions_count; se añade como atributo temporal al objeto Race
+        setattr(race_obj, 'questions_count', questions_count_by_race.get(race_obj.id, 0))
+
+    # Clasificación materializada (league_standings), ya ordenada por puesto
+    standing_rows = _league_standing_rows(league.id)
+    if not standing_rows and LeagueParticipant.query.filter_by(league_id=league.id).first() is not None:
+        # Liga con participantes pero sin clasificación materializada todavía (p. ej. datos anteriores a la tabla)
         try:
-            # Asegurarse que accedemos a la relación questions del objeto race_obj SQLAlchemy
-            questions_count_for_race = race_obj.questions.filter_by(is_active=True).count()
-        except Exception as e_qc:
-            app.logger.error(f"Error al contar preguntas para la carrera ID {race_obj.id}: {e_qc}")
-            questions_count_for_race = 0 # Default a 0 en caso de error
-
-        # Crear un objeto o diccionario para pasar a la plantilla, añadiendo questions_count
-        # Si race_obj ya es un objeto que se puede modificar (no siempre es buena idea modificarlo directamente si viene de SQLAlchemy)
-        # o si se convierte a un diccionario, se puede añadir ahí.
-        # Por simplicidad, si asumimos que la plantilla puede acceder a race_obj.questions_count,
-        # podemos intentar añadirlo como un atributo temporal.
-        # Sin embargo, es más seguro y limpio si league_races_detailed es una lista de diccionarios.
-        # Vamos a crear una lista de diccionarios para asegurar.
-
-        # Convertir el objeto Race a un diccionario y añadir questions_count
-        # Esto asume que Race tiene un método to_dict() o se construye manualmente.
-        # Si no, se puede crear un objeto simple o usar el objeto Race y confiar en que el atributo se pueda añadir.
-        # Para este caso, intentaremos añadir el atributo directamente al objeto si la plantilla lo permite,
-        # o lo pasaremos como parte de una estructura de datos más compleja si es necesario.
-        # La forma más segura es crear una nueva estructura.
-
-        # race_obj.questions_count = questions_count_for_race # Esto modificaría el objeto SQLAlchemy, no siempre ideal
-
-        # Creamos una estructura de datos para cada carrera
-        # Esto es mejor si no queremos modificar el objeto SQLAlchemy directamente
-        # o si necesitamos más datos procesados.
-        # Por ahora, vamos a asumir que podemos añadir `questions_count` al objeto `race`
-        # que se pasa a la plantilla, o que la plantilla puede accederlo a través de `race.questions.count()`.
-        # El plan original sugiere `race.questions_count`.
-
-        # Para que la plantilla pueda usar `race.questions_count`, lo añadimos aquí.
-        # Esto es una práctica común pero hay que ser consciente de que se está añadiendo un atributo
-        # dinámicamente a un objeto SQLAlchemy.
-        setattr(race_obj, 'questions_count', questions_count_for_race)
-        league_races_detailed_list.append(race_obj)
-
-    league_races_detailed = league_races_detailed_list # Reemplazar la lista original
-
-    # Participantes de la liga - Data fetching for this section is no longer needed as the section is removed.
-    # league_participants_query = league.participants.order_by(LeagueParticipant.joined_at.desc())
-    # league_participants_count = league_participants_query.count()
-    # league_participants_sample = league_participants_query.limit(10).all()
+            refresh_league_standings(league.id)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Error materializing standings for league {league.id}: {e}", exc_info=True)
+        standing_rows = _league_standing_rows(league.id)
+    league_participant_ids = {row.LeagueStanding.user_id for row in standing_rows}
 
     current_user_is_creator_or_admin = False
     if current_user.is_authenticated:
-        if league.creator_id == current_user.id or current_user.role.code == 'ADMIN':
+        if league.creator_id == current_user.id or current_user.role_code == 'ADMIN':
             current_user_is_creator_or_admin = True
 
-    current_user_is_participant = False
-    if current_user.is_authenticated:
-        if LeagueParticipant.query.filter_by(user_id=current_user.id, league_id=league.id).first():
-            current_user_is_participant = True
+    current_user_is_participant = current_user.is_authenticated and current_user.id in league_participant_ids
 
     # Código de invitación activo (el más reciente, por ejemplo)
     active_invitation_code = LeagueInvitationCode.query.filter_by(
@@ -4981,128 +4943,37 @@ def view_league_detail(league_id):
     # Propiedad para descripción con fallback (puedes añadirla al modelo League si prefieres)
     league.description_or_default = league.description if league.description and league.description.strip() else "Esta liga aún no tiene una descripción detallada."
 
-    # --- Calcular Clasificación de la Liga y Detalles por Carrera ---
-    league_standings = []
-    participant_race_details = {} # Nueva estructura: {user_id: {race_id: {'points': X, 'rank': Y}}}
-    all_league_participants = LeagueParticipant.query.filter_by(league_id=league.id).all()
-    race_ids_in_league = [race.id for race in league_races_detailed]
-
-    # Para calcular el puesto, necesitamos los puntajes de todos los participantes por carrera
-    scores_by_race = {} # {race_id: [(user_id, score), ...]}
-    if race_ids_in_league:
-        for race_id_for_scores in race_ids_in_league:
-            # Obtener todos los UserScore para esta carrera específica
-            race_scores = UserScore.query.filter_by(race_id=race_id_for_scores).all()
-            # Guardar solo los participantes de la liga actual
-            scores_by_race[race_id_for_scores] = []
-            for score_entry in race_scores:
-                # Verificar si el usuario del UserScore es participante de ESTA liga
-                is_participant_of_this_league = any(lp.user_id == score_entry.user_id for lp in all_league_participants)
-                if is_participant_of_this_league:
-                    scores_by_race[race_id_for_scores].append({'user_id': score_entry.user_id, 'score': score_entry.score})
-
-            # Ordenar los puntajes para esta carrera para determinar el ranking
-            scores_by_race[race_id_for_scores].sort(key=lambda x: x['score'], reverse=True)
-
-    for lp_index, lp in enumerate(all_league_participants):
-        user = User.query.get(lp.user_id)
-        if not user:
-            app.logger.warning(f"LeagueParticipant {lp.id} refers to a non-existent user {lp.user_id}.")
-            continue
-
-        participant_race_details[user.id] = {}
-        total_league_score = 0
-
-        for race_detail_obj in league_races_detailed: # Iterar sobre el objeto Race, no solo el ID
-            race_id = race_detail_obj.id
-            user_score_for_race = 0
-            user_rank_for_race = "-" # Default si no participa o no hay puntaje
-
-            # Obtener puntos del UserScore
-            user_score_obj = UserScore.query.filter_by(user_id=user.id, race_id=race_id).first()
-            if user_score_obj:
-                user_score_for_race = user_score_obj.score
-                total_league_score += user_score_for_race
-
-                # Calcular puesto en la carrera
-                if race_id in scores_by_race:
-                    race_specific_scores = scores_by_race[race_id]
-                    # Encontrar el puesto del usuario actual
-                    # Manejo de empates: varios usuarios pueden tener el mismo puesto
-                    rank = 0
-                    last_score = -1 # Asumir que los puntajes no son negativos
-                    for i, score_info in enumerate(race_specific_scores):
-                        if score_info['score'] != last_score:
-                            rank = i + 1
-                            last_score = score_info['score']
-                        if score_info['user_id'] == user.id:
-                            user_rank_for_race = rank
-                            break
-
-            participant_race_details[user.id][race_id] = {
-                'points': user_score_for_race,
-                'rank': user_rank_for_race
-            }
-
-        league_standings.append({
-            'user_id': user.id,
-            'username': user.username,
-            'total_score': total_league_score
-        })
-
-    # Ordenar la clasificación general de la liga por puntuación total descendente
-    league_standings.sort(key=lambda x: x['total_score'], reverse=True)
-    # --- Fin Calcular Clasificación y Detalles ---
+    # --- Clasificación de la Liga ---
+    league_standings = [
+        {'user_id': row.LeagueStanding.user_id, 'username': row.username,
+         'total_score': row.LeagueStanding.total_score, 'rank': row.LeagueStanding.rank}
+        for row in standing_rows
+    ]
+    # --- Fin Clasificación ---
 
-    # --- Transformar participant_race_details para el JS ---
+    # --- Detalle por carrera para el JS ---
+    # Aciertos por usuario y carrera, desde el desglose por pregunta (una sola consulta agrupada)
+    correct_answers_by_user_race = _correct_answers_count(race_ids_in_league, league_participant_ids)
     race_analysis_details_for_js = {}
     for race_in_league in league_races_detailed:
-        race_id_key = str(race_in_league.id) # Asegurar que la clave sea string para JS
-        race_analysis_details_for_js[race_id_key] = []
-        # Obtener los scores para esta carrera específica, ya ordenados por score desc.
-        current_race_scores = scores_by_race.get(race_in_league.id, [])
-
-        # Crear la lista de participantes con su ranking y puntos para esta carrera
-        # La lógica de ranking ya se aplicó al crear participant_race_details
-        # Ahora necesitamos mapear user_id a username y obtener los datos correctos
-
-        # Primero, obtener todos los participantes de la liga para mapear user_id a username
-        league_participant_users = {lp.user_id: User.query.get(lp.user_id) for lp in all_league_participants}
-
-        temp_race_participants_data = []
-        for user_id_in_league, details_by_race in participant_race_details.items():
-            user_obj = league_participant_users.get(user_id_in_league)
-            if not user_obj:
-                continue # Skip si el usuario no se encuentra (debería ser raro)
-
-            if race_in_league.id in details_by_race:
-                race_specific_detail = details_by_race[race_in_league.id]
-                temp_race_participants_data.append({
-                    'user_id': user_obj.id, # Podría ser útil para el futuro
-                    'username': user_obj.username,
-                    'points': race_specific_detail['points'],
-                    'rank': race_specific_detail['rank']
-                    # 'avatar_url': user_obj.avatar_url # Descomentar si se quiere usar en JS
-                })
-
-        # Ordenar por ranking (ascendente, '-' al final) y luego por puntos (descendente) como desempate
-        temp_race_participants_data.sort(key=lambda x: (float('inf') if x['rank'] == '-' else x['rank'], -x['points']))
-
-        # Reasignar 'pos' basado en el ordenamiento final
-        final_ranked_data = []
-        for i, participant_data in enumerate(temp_race_participants_data):
-            final_ranked_data.append({
-                'pos': participant_data['rank'], # Usamos el rank calculado previamente
-                'name': participant_data['username'],
-                'points': participant_data['points']
-                # 'avatar_url': participant_data['avatar_url'] # Descomentar si se usa
+        race_key = str(race_in_league.id) # per_race usa claves string (JSON)
+        race_participants_data = []
+        for row in standing_rows:
+            race_standing = row.LeagueStanding.per_race.get(race_key, {})
+            race_participants_data.append({
+                'pos': race_standing.get('rank', '-'), # '-' si no tiene puntuación en esta carrera
+                'name': row.username,
+                'points': race_standing.get('points', 0),
+                'correct': correct_answers_by_user_race.get((row.LeagueStanding.user_id, race_in_league.id), 0)
             })
-        race_analysis_details_for_js[race_id_key] = final_ranked_data
-    # --- Fin Transformación ---
+        # Ordenar por ranking (ascendente, '-' al final) y luego por puntos (descendente) como desempate
+        race_participants_data.sort(key=lambda x: (float('inf') if x['pos'] == '-' else x['pos'], -x['points'], x['name']))
+        race_analysis_details_for_js[race_key] = race_participants_data # Clave string para JS
+    # --- Fin Detalle ---
 
 
     # --- Calcular Próximo Cierre de Quiniela y Número de Participantes ---
-    league_participants_count = league.participants.count() # Contar participantes
+    league_participants_count = len(standing_rows) # Una fila de clasificación por participante
 
     next_race_close_date_isoformat = None
     now = datetime.utcnow()
@@ -5193,20 +5064,15 @@ def view_league_detail(league_id):
     # Fetch user predictions map and pending question counts for the current user in this league
     user_predictions_status = {} # New map: race.id -> {'exists': bool, 'pending_count': int}
     if current_user.is_authenticated:
+        answered_count_by_race = dict(
+            db.session.query(UserAnswer.race_id, func.count(UserAnswer.id))
+            .filter(UserAnswer.user_id == current_user.id, UserAnswer.race_id.in_(race_ids_in_league))
+            .group_by(UserAnswer.race_id).all()
+        ) if race_ids_in_league else {}
         for race_in_league in league_races_detailed:
-            answered_count = UserAnswer.query.filter_by(
-                user_id=current_user.id,
-                race_id=race_in_league.id
-            ).count()
-
-            prediction_exists = answered_count > 0
-
-            if prediction_exists:
-                total_questions = Question.query.filter_by(
-                    race_id=race_in_league.id,
-                    is_active=True
-                ).count()
-                pending_count = total_questions - answered_count
+            answered_count = answered_count_by_race.get(race_in_league.id, 0)
+            if answered_count > 0:
+                pending_count = questions_count_by_race.get(race_in_league.id, 0) - answered_count
                 user_predictions_status[race_in_league.id] = {
                     'exists': True,
                     'pending_count': pending_count if pending_count > 0 else 0 # Ensure non-negative
@@ -5235,27 +5101,27 @@ def view_league_detail(league_id):
                            current_time_utc=now) # Use 'now' which was defined as datetime.utcnow()
 
 
+RESULTS_MODAL_LIMIT = 100
+
 @app.route('/race/<int:race_id>/results_modal_content', methods=['GET'])
 @login_required
 def get_race_results_modal_content(race_id):
     race = Race.query.filter_by(id=race_id, is_deleted=False).first_or_404()
-    # Similar logic to get_quiniela_leaderboard, but might need more details or different formatting
-    # For now, let's assume it's the same as the leaderboard structure.
-    # You might want to pass the race object to the template as well if needed.
-
-    leaderboard_data = db.session.query(
-        UserScore.user_id,
-        User.username,
-        UserScore.score
-    ).join(User, UserScore.user_id == User.id)\
-     .filter(UserScore.race_id == race_id)\
-     .order_by(UserScore.score.desc(), User.username.asc())\
-     .all()
-
-    race_results = [
-        {"user_id": item.user_id, "username": item.username, "score": item.score}
-        for item in leaderboard_data
-    ]
+
+    # Cabeza de la clasificación y, si el usuario queda fuera, su entorno ("around me")
+    top_entries = fetch_leaderboard(race_id, limit=RESULTS_MODAL_LIMIT)['entries']
+    around_entries = []
+    if not any(entry['user_id'] == current_user.id for entry in top_entries):
+        last_top_position = top_entries[-1]['position'] if top_entries else 0
+        around_entries = [
+            entry for entry in fetch_leaderboard(race_id, around_user_id=current_user.id, around=2)['entries']
+            if entry['position'] > last_top_position
+        ]
+
+    race_results = top_entries + around_entries
+    correct_counts = _correct_answers_count([race_id], [entry['user_id'] for entry in race_results])
+    for entry in race_results:
+        entry['correct_answers'] = correct_counts.get((entry['user_id'], race_id), 0)
     # Render a PARTIAL template that only contains the content for the modal's body
     return render_template('_race_results_modal_content.html', race=race, results=race_results)
 
@@ -5265,12 +5131,12 @@ def get_race_results_modal_content(race_id):
 def get_user_predictions_modal_content(race_id):
     race = Race.query.filter_by(id=race_id, is_deleted=False).first_or_404()
 
-    user_answers_data = UserAnswer.query.filter_by(user_id=current_user.id, race_id=race_id).all()
-
-    questions_in_race = Question.query.filter_by(race_id=race_id, is_active=True).order_by(Question.id).all()
+    catalog = _race_catalog(race)
+    questions_in_race = catalog.active_questions
+    option_texts = catalog.option_texts # option id -> text, for every answer shown
 
     questions_and_answers_list = []
-    user_answers_map = {ua.question_id: ua for ua in user_answers_data}
+    user_answers_map = user_answers_by_question(race_id, current_user.id) # MC selections included
 
     question_type_display_map = {
         'FREE_TEXT': 'Texto Libre',
@@ -5285,22 +5151,17 @@ def get_user_predictions_modal_content(race_id):
         is_mc_multiple_correct_val = None # For passing to template if question is MC
 
         if user_answer_obj:
-            if q.question_type.name == 'MULTIPLE_CHOICE':
+            if q.type_name == 'MULTIPLE_CHOICE':
                 is_mc_multiple_correct_val = q.is_mc_multiple_correct
                 if q.is_mc_multiple_correct:
-                    # Fetch selected options text
-                    selected_options = []
-                    for sel_opt_assoc in user_answer_obj.selected_mc_options:
-                        option_obj = QuestionOption.query.get(sel_opt_assoc.question_option_id)
-                        if option_obj:
-                            selected_options.append({"id": option_obj.id, "text": option_obj.option_text})
-                    user_answer_formatted = selected_options # List of dicts
+                    # Selected options text
+                    user_answer_formatted = option_texts.options(
+                        sel_opt_assoc.question_option_id for sel_opt_assoc in user_answer_obj.selected_mc_options
+                    ) # List of dicts
                 else: # Single choice
                     if user_answer_obj.selected_option_id:
-                        option_obj = QuestionOption.query.get(user_answer_obj.selected_option_id)
-                        if option_obj:
-                            user_answer_formatted = {"id": option_obj.id, "text": option_obj.option_text} # Dict
-            elif q.question_type.name == 'ORDERING':
+                        user_answer_formatted = option_texts.option(user_answer_obj.selected_option_id) # Dict
+            elif q.type_name == 'ORDERING':
                 if user_answer_obj.answer_text:
                     ordered_items = user_answer_obj.answer_text.split(',')
                     resolved_ordered_texts = []
@@ -5309,9 +5170,9 @@ def get_user_predictions_modal_content(race_id):
                         try:
                             # Attempt to treat as an ID first
                             opt_id = int(item_str_stripped)
-                            option_obj = QuestionOption.query.filter_by(id=opt_id, question_id=q.id).first()
-                            if option_obj:
-                                resolved_ordered_texts.append(option_obj.option_text)
+                            option_text = option_texts.text(opt_id, q.id)
+                            if option_text is not None:
+                                resolved_ordered_texts.append(option_text)
                             else:
                                 # If ID doesn't match any option for this question, or it's not an ID
                                 # treat it as text (original behavior)
@@ -5322,7 +5183,7 @@ def get_user_predictions_modal_content(race_id):
                     user_answer_formatted = ", ".join(resolved_ordered_texts) # Join with comma and space for better readability
                 else:
                     user_answer_formatted = None # No answer provided
-            elif q.question_type.name == 'SLIDER':
+            elif q.type_name == 'SLIDER':
                 user_answer_formatted = user_answer_obj.slider_answer_value # Float or None
             else: # FREE_TEXT
                 user_answer_formatted = user_answer_obj.answer_text
@@ -5330,11 +5191,11 @@ def get_user_predictions_modal_content(race_id):
         questions_and_answers_list.append({
             "question_id": q.id,
             "question_text": q.text,
-            "question_type": q.question_type.name,
-            "question_type_display": question_type_display_map.get(q.question_type.name, q.question_type.name),
+            "question_type": q.type_name,
+            "question_type_display": question_type_display_map.get(q.type_name, q.type_name),
             "user_answer_formatted": user_answer_formatted,
             "is_mc_multiple_correct": is_mc_multiple_correct_val,
-            "slider_unit": q.slider_unit if q.question_type.name == 'SLIDER' else None
+            "slider_unit": q.slider_unit if q.type_name == 'SLIDER' else None
         })
 
 
@@ -5346,7 +5207,7 @@ def get_user_predictions_modal_content(race_id):
                                    quiniela_closed=(race.quiniela_close_date and race.quiniela_close_date < datetime.utcnow())
                                   )
 
-    total_questions = Question.query.filter_by(race_id=race.id, is_active=True).count()
+    total_questions = len(questions_in_race)
     quiniela_close_date_iso = race.quiniela_close_date.isoformat() if race.quiniela_close_date else None
     is_quiniela_closed_bool = (race.quiniela_close_date and race.quiniela_close_date < datetime.utcnow())
 
@@ -5372,7 +5233,7 @@ def get_quiniela_form_content(race_id):
         return jsonify(message="La quiniela para esta carrera no está activa o planificada."), 403
 
 
-    questions_query = Question.query.filter_by(race_id=race.id, is_active=True).order_by(Question.id).all()
+    questions_query = _race_catalog(race).active_questions
 
     user_answers_query = UserAnswer.query.filter_by(user_id=current_user.id, race_id=race.id).all()
     user_answers_map = {ua.question_id: ua for ua in user_answers_query}
@@ -5382,7 +5243,7 @@ def get_quiniela_form_content(race_id):
         question_info = {
             "id": q.id,
             "text": q.text,
-            "question_type": q.question_type.name,
+            "question_type": q.type_name,
             "options": [],
             "user_answer": None, # Will hold the user's specific answer for this question
             # Add type-specific attributes needed for rendering the form (e.g., slider params)
@@ -5394,30 +5255,28 @@ def get_quiniela_form_content(race_id):
         }
 
         # Add options if MC or Ordering
-        if q.question_type.name == "MULTIPLE_CHOICE" or q.question_type.name == "ORDERING":
+        if q.type_name == "MULTIPLE_CHOICE" or q.type_name == "ORDERING":
             # For ordering, options are the items to be ordered. For MC, they are choices.
-            # Order options by ID for consistent rendering, or by a specific order if available.
+            # Options come ordered by ID from the race catalog, for consistent rendering.
             # For Ordering questions, `correct_order_index` is for the *official* answer, not user display order.
-            # We'll just present options by their ID or creation order for the user to interact with.
-            q_options = QuestionOption.query.filter_by(question_id=q.id).order_by(QuestionOption.id).all()
-            question_info["options"] = [{"id": opt.id, "option_text": opt.option_text} for opt in q_options]
+            question_info["options"] = [{"id": opt.id, "option_text": opt.option_text} for opt in q.options]
 
         # Populate user's existing answer for this question
         user_answer_obj = user_answers_map.get(q.id)
         if user_answer_obj:
-            if q.question_type.name == 'FREE_TEXT':
+            if q.type_name == 'FREE_TEXT':
                 question_info["user_answer"] = user_answer_obj.answer_text
-            elif q.question_type.name == 'MULTIPLE_CHOICE':
+            elif q.type_name == 'MULTIPLE_CHOICE':
                 if q.is_mc_multiple_correct:
                     question_info["user_answer"] = [sel_opt.question_option_id for sel_opt in user_answer_obj.selected_mc_options]
                 else:
                     question_info["user_answer"] = user_answer_obj.selected_option_id
-            elif q.question_type.name == 'ORDERING':
+            elif q.type_name == 'ORDERING':
                 # User's answer_text for ordering is a comma-separated string of option *texts*.
                 # The form will need to handle this, perhaps by re-matching texts to option IDs if IDs are submitted.
                 # Or, the form could submit texts directly as per current UserAnswer model for ordering.
                 question_info["user_answer"] = user_answer_obj.answer_text
-            elif q.question_type.name == 'SLIDER':
+            elif q.type_name == 'SLIDER':
                 question_info["user_answer"] = user_answer_obj.slider_answer_value
 
         questions_data_for_form.append(question_info)
@@ -5489,7 +5348,9 @@ def process_join_league_with_code():
     # invitation_code.is_active = False
 
     try:
+        refresh_league_standings(league_to_join.id) # Nuevo participante en la clasificación
         db.session.commit()
+        dashboard_cache.invalidate_user(current_user.id)
         flash(f"¡Te has unido a la liga '{league_to_join.name}' exitosamente! Se te ha inscrito en {races_joined_count} carrera(s) de la liga.", "success")
     except IntegrityError: # Podría ocurrir si hay una condición de carrera en la creación del participante
         db.session.rollback()
@@ -5507,7 +5368,7 @@ def generate_league_invitation_code(league_id):
     league = League.query.filter_by(id=league_id, is_deleted=False).first_or_404()
 
     if not current_user.is_authenticated or \
-       (league.creator_id != current_user.id and current_user.role.code != 'ADMIN'):
+       (league.creator_id != current_user.id and current_user.role_code != 'ADMIN'):
         flash("No tienes permiso para generar un código de invitación para esta liga.", "danger")
         return redirect(url_for('view_league_detail', league_id=league.id))
 
@@ -5554,7 +5415,7 @@ def edit_league(league_id):
 
     league = League.query.filter_by(id=league_id, is_deleted=False).first_or_404()
 
-    if league.creator_id != current_user.id and current_user.role.code != 'ADMIN':
+    if league.creator_id != current_user.id and current_user.role_code != 'ADMIN':
         flash("No tienes permiso para editar esta liga específica.", "danger")
         return redirect(url_for('list_leagues'))
 
@@ -5639,7 +5500,9 @@ def edit_league(league_id):
         league.updated_at = datetime.utcnow()
 
         try:
+            refresh_league_standings(league.id) # Cambian las carreras que cuentan en la clasificación
             db.session.commit()
+            dashboard_cache.invalidate_all() # Nombre/estado de la liga en los dashboards de sus jugadores
             flash(f"Liga '{league.name}' actualizada exitosamente.", "success")
             return redirect(url_for('view_league_detail', league_id=league.id))
         except Exception as e:
@@ -5679,7 +5542,7 @@ def delete_league(league_id):
 
     league = League.query.filter_by(id=league_id, is_deleted=False).first_or_404()
 
-    if league.creator_id != current_user.id and current_user.role.code != 'ADMIN':
+    if league.creator_id != current_user.id and current_user.role_code != 'ADMIN':
         flash("No tienes permiso para eliminar esta liga específica.", "danger")
         return redirect(url_for('list_leagues'))
 
@@ -5697,6 +5560,7 @@ def delete_league(league_id):
 
     try:
         db.session.commit()
+        dashboard_cache.invalidate_all()
         flash(f"Liga '{league.name}' eliminada (marcada como inactiva y borrada lógicamente).", "success")
     except Exception as e:
         db.session.rollback()
@@ -5757,7 +5621,9 @@ def join_league_by_code_api():
             app.logger.info(f"API join_league_by_code: Usuario {current_user.id} inscrito en carrera {race_obj.id} de la liga {league_to_join.id}.")
 
     try:
+        refresh_league_standings(league_to_join.id) # Nuevo participante en la clasificación
         db.session.commit()
+        dashboard_cache.invalidate_user(current_user.id)
         app.logger.info(f"API join_league_by_code: Commit exitoso. Usuario {current_user.id} unido a liga {league_to_join.id} e inscrito en {races_joined_count} carreras.")
         return jsonify(message=f"¡Te has unido a la liga '{league_to_join.name}' exitosamente! Se te ha inscrito en {races_joined_count} carrera(s) de la liga.", league_id=league_to_join.id), 201 # 201 Created
     except IntegrityError:
@@ -5768,3 +5634,36 @@ def join_league_by_code_api():
         db.session.rollback()
         app.logger.error(f"API join_league_by_code: Excepción al procesar unión a liga {league_to_join.id} con código {access_code_str} por user {current_user.id}: {e}", exc_info=True)
         return jsonify(message="Ocurrió un error al procesar tu solicitud para unirte a la liga."), 500
+
+boot_timer.mark('routes')
+boot_timer.log(app.logger, budget_seconds=app.config.get('BOOT_TIME_BUDGET_SECONDS', 10))
+
+# Resultado de preload() si create_app() lo ha hecho en este proceso (o en el master antes del fork)
+preload_report = None
+
+def create_app(config=None, preload_enabled=None):
+    """
+    Application factory, the gunicorn entry point: gunicorn --preload 'backend.app:create_app()'
+    (see gunicorn.conf.py).
+
+    The routes are registered on the module-level app as this module is imported, so there is a
+    single app per process; create_app() configures it for serving and returns it. Importing
+    backend.app directly (manage.py, seed_events.py, the tests) keeps working as before.
+
+    Args:
+        config (dict, optional): Config overrides applied before anything else.
+        preload_enabled (bool, optional): Preload templates and reference data and freeze them for
+            the forked workers. Defaults to PRELOAD_ENABLED (default: not TESTING).
+    Returns:
+        Flask: The application.
+    """
+    global preload_report
+    if config:
+        app.config.update(config)
+    install_fork_hooks(app) # Cada worker descarta los pools heredados y abre los suyos
+    if preload_enabled is None:
+        preload_enabled = app.config.get('PRELOAD_ENABLED', not app.config.get('TESTING', False))
+    if preload_enabled and preload_report is None:
+        preload_report = preload(app, freeze=app.config.get('PRELOAD_GC_FREEZE', True))
+        app.logger.info(f"Preloaded for the workers: {preload_report}")
+    return app
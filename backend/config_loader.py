@@ -0,0 +1,225 @@
+"""
+Configuration loading and boot timings.
+
+Secrets (FLASK_SECRET_KEY, DATABASE_URL) come from environment variables or, when they are
+missing, from AWS SSM Parameter Store. app.py used to import boto3 at import time and build a
+new boto3 client per secret with the default timeouts and retries, so every process importing
+the app (workers, manage.py, seed_events.py) paid the boto3 import, and a worker without the
+env vars could block on network timeouts while booting.
+
+ConfigLoader.load() resolves a set of settings in order:
+    1. Environment variables (nothing else is touched when they are all set).
+    2. A local JSON file ({"parameter name": "value"}), the stand-in for SSM in offline runs
+       (CONFIG_LOCAL_FILE).
+    3. An encrypted local cache of earlier SSM reads, fresh for CONFIG_CACHE_TTL seconds
+       (CONFIG_CACHE_PATH, encrypted with the Fernet key in CONFIG_CACHE_KEY; no key, no cache).
+    4. SSM, with every missing parameter fetched in one GetParameters call. boto3 is imported on
+       the first remote read only, the client is created once and reused, and it uses short
+       connect/read timeouts and a single attempt so a boot can not hang on the network.
+
+BootTimer records how long each boot phase takes (config, database, services, routes). app.py
+logs them once the module is loaded, warns when the total goes over BOOT_TIME_BUDGET_SECONDS,
+and exposes them to admins.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class BootTimer:
+    """Durations of consecutive boot phases. mark(name) closes the phase that ends now."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.phases = OrderedDict() # {phase: seconds}
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0) + (now - self._last)
+        self._last = now
+
+    @property
+    def total(self):
+        return self._last - self.started
+
+    def report(self):
+        """{'phases_ms': {phase: ms}, 'total_ms': ms}"""
+        return {'phases_ms': {phase: round(seconds * 1000, 2) for phase, seconds in self.phases.items()},
+                'total_ms': round(self.total * 1000, 2)}
+
+    def log(self, log, budget_seconds=None):
+        """Logs the phases; a warning if the total is over budget_seconds."""
+        summary = ", ".join(f"{phase}={ms}ms" for phase, ms in self.report()['phases_ms'].items())
+        if budget_seconds is not None and self.total > budget_seconds:
+            log.warning(f"Boot took {self.total:.2f}s, over the {budget_seconds}s budget ({summary})")
+        else:
+            log.info(f"Boot took {self.total:.2f}s ({summary})")
+
+
+class LocalFileProvider:
+    """Parameters from a local JSON file, {"parameter name": "value"}; stand-in for SSM offline."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def get_many(self, names):
+        try:
+            with open(self.path, encoding='utf-8') as handle:
+                values = json.load(handle)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read local config file {self.path}: {e}")
+            return {}
+        return {name: values[name] for name in names if values.get(name) is not None}
+
+
+class SSMProvider:
+    """AWS SSM Parameter Store through one lazily created boto3 client."""
+
+    def __init__(self, region_name='eu-north-1', connect_timeout=2, read_timeout=3, client_factory=None):
+        """
+        Args:
+            region_name (str): SSM region.
+            connect_timeout, read_timeout (float): Seconds; a single attempt is made (no retries).
+            client_factory (callable, optional): fn() -> client. Defaults to a boto3 SSM client,
+                importing boto3 on first use.
+        """
+        self.region_name = region_name
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._client_factory = client_factory or self._boto3_client
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _boto3_client(self):
+        import boto3 # Only when a parameter really has to come from SSM
+        from botocore.config import Config
+        return boto3.client('ssm', region_name=self.region_name, config=Config(
+            connect_timeout=self.connect_timeout, read_timeout=self.read_timeout,
+            retries={'max_attempts': 1, 'mode': 'standard'}
+        ))
+
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = self._client_factory()
+            return self._client
+
+    def get_many(self, names):
+        """{name: value} of the parameters found (decrypted); missing ones are left out. Errors are logged."""
+        values = {}
+        names = list(names)
+        try:
+            for start in range(0, len(names), 10): # GetParameters takes 10 names at most
+                response = self.client().get_parameters(Names=names[start:start + 10], WithDecryption=True)
+                values.update({parameter['Name']: parameter['Value'] for parameter in response['Parameters']})
+                if response.get('InvalidParameters'):
+                    logger.warning(f"SSM parameters not found: {response['InvalidParameters']}")
+        except Exception as e:
+            # Si falla (ej. en local, sin credenciales) se sigue con lo que haya
+            logger.warning(f"Could not read parameters from SSM: {e}")
+        return values
+
+
+class EncryptedFileCache:
+    """SSM values cached in a local file encrypted with Fernet, each one fresh for ttl_seconds."""
+
+    def __init__(self, path, key, ttl_seconds=3600):
+        from cryptography.fernet import Fernet # Only needed when the cache is configured
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._fernet = Fernet(key)
+
+    def _read(self):
+        try:
+            with open(self.path, 'rb') as handle:
+                return json.loads(self._fernet.decrypt(handle.read()))
+        except FileNotFoundError:
+            return {}
+        except Exception as e: # Corrupt file or another key: ignore it, it is rewritten
+            logger.warning(f"Ignoring unreadable config cache {self.path}: {e}")
+            return {}
+
+    def get_many(self, names):
+        entries = self._read()
+        now = time.time()
+        return {name: entries[name]['value'] for name in names
+                if name in entries and entries[name]['fetched_at'] + self.ttl_seconds > now}
+
+    def put_many(self, values):
+        entries = self._read()
+        now = time.time()
+        entries.update({name: {'value': value, 'fetched_at': now} for name, value in values.items()})
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with open(os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as handle:
+            handle.write(self._fernet.encrypt(json.dumps(entries).encode('utf-8')))
+        os.replace(temporary, self.path) # Atomic: concurrent workers never read half a file
+
+
+class ConfigLoader:
+    """Resolves settings from the environment, a local file, the encrypted cache and SSM, in that order."""
+
+    def __init__(self, environ=None, local_file=None, cache=None, remote=None):
+        self.environ = os.environ if environ is None else environ
+        self.local_file = local_file
+        self.cache = cache
+        self.remote = remote if remote is not None else SSMProvider()
+        self.sources = {} # {setting: 'env' | 'local_file' | 'cache' | 'ssm' | None}, for the boot log
+
+    @classmethod
+    def from_environ(cls, instance_path, environ=None):
+        """Loader configured by CONFIG_LOCAL_FILE, CONFIG_CACHE_KEY, CONFIG_CACHE_PATH, CONFIG_CACHE_TTL and AWS_REGION."""
+        environ = os.environ if environ is None else environ
+        local_file = LocalFileProvider(environ['CONFIG_LOCAL_FILE']) if environ.get('CONFIG_LOCAL_FILE') else None
+        cache = None
+        if environ.get('CONFIG_CACHE_KEY'):
+            try:
+                cache = EncryptedFileCache(
+                    environ.get('CONFIG_CACHE_PATH') or os.path.join(instance_path, 'config_cache.bin'),
+                    environ['CONFIG_CACHE_KEY'],
+                    ttl_seconds=int(environ.get('CONFIG_CACHE_TTL', 3600))
+                )
+            except Exception as e: # cryptography missing or a bad key: run without the cache
+                logger.warning(f"Config cache disabled: {e}")
+        return cls(environ, local_file, cache, SSMProvider(region_name=environ.get('AWS_REGION', 'eu-north-1')))
+
+    def load(self, settings):
+        """
+        Args:
+            settings (dict): {setting: SSM parameter name}; the setting name is also the env var.
+        Returns:
+            dict: {setting: value, or None if no source has it}
+        """
+        values = {}
+        for setting in settings:
+            if self.environ.get(setting):
+                values[setting] = self.environ[setting]
+                self.sources[setting] = 'env'
+        missing = {settings[setting]: setting for setting in settings if setting not in values}
+
+        for source, provider in (('local_file', self.local_file), ('cache', self.cache), ('ssm', self.remote)):
+            if not missing or provider is None:
+                continue
+            found = provider.get_many(list(missing))
+            for parameter, value in found.items():
+                setting = missing.pop(parameter)
+                values[setting] = value
+                self.sources[setting] = source
+            if source == 'ssm' and found and self.cache is not None:
+                try:
+                    self.cache.put_many(found)
+                except OSError as e:
+                    logger.warning(f"Could not write the config cache: {e}")
+
+        for setting in missing.values():
+            values[setting] = None
+            self.sources[setting] = None
+        return values
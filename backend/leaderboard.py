@@ -0,0 +1,252 @@
+"""
+Race leaderboards.
+
+The leaderboard of a race is its UserScore rows ordered by score (descending), then username and
+user id, so the order is total and stable between pages. Every entry carries:
+    - rank: competition rank, RANK() (ties share the position and the next one skips: 1, 1, 3)
+    - dense_rank: DENSE_RANK() (ties share the position, no gaps: 1, 1, 2)
+    - position: ROW_NUMBER() in the leaderboard order
+
+Ranks are computed by the database with window functions, over the whole race, before paging, so
+a page never changes the ranks. Pages can be read by limit/offset, by keyset cursor (the opaque
+next_cursor of the previous page; stable while scores are being inserted) or as a window of
+positions around a user ("around me").
+
+SQLite builds without window functions (< 3.25) use a Python fallback that returns the same
+entries in the same order.
+
+Leaderboards only change when scores do, so every race has a score_version that is bumped in the
+same transaction as the change (rescore, rename of a user with scores in the race, race deletion).
+Serialized responses are kept in a LeaderboardSnapshotCache keyed by (race_id, score_version,
+variant) and the version is also the ETag, so a poll with a current If-None-Match costs one
+primary-key read of the race.
+"""
+import base64
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import event, func, and_, or_, inspect, select, update
+
+from backend.models import db, Race, User, UserScore
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a paging cursor (leaderboard, participants list) cannot be decoded."""
+
+
+def encode_cursor(entry):
+    """Opaque keyset cursor pointing right after `entry`."""
+    raw = json.dumps([entry['score'], entry['username'], entry['user_id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Returns the (score, username, user_id) key of a cursor built by encode_cursor."""
+    try:
+        score, username, user_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise InvalidCursorError(f"Invalid leaderboard cursor: {cursor}") from e
+    if not isinstance(score, int) or not isinstance(username, str) or not isinstance(user_id, int):
+        raise InvalidCursorError(f"Invalid leaderboard cursor: {cursor}")
+    return score, username, user_id
+
+
+def supports_window_functions():
+    """True unless the database is a SQLite build older than 3.25 (no RANK()/DENSE_RANK())."""
+    if db.engine.dialect.name == 'sqlite':
+        return sqlite3.sqlite_version_info >= (3, 25, 0)
+    return True
+
+
+def _entry(row):
+    return {
+        'user_id': row.user_id,
+        'username': row.username,
+        'score': row.score,
+        'rank': row.rank,
+        'dense_rank': row.dense_rank,
+        'position': row.position,
+    }
+
+
+def _after_key(score, username, user_id, key):
+    """True if (score, username, user_id) comes after `key` in leaderboard order."""
+    key_score, key_username, key_user_id = key
+    return score < key_score or (score == key_score and (username, user_id) > (key_username, key_user_id))
+
+
+def _sql_entries(race_id, limit, offset, after_key, around_user_id, around):
+    ranked = db.session.query(
+        UserScore.user_id.label('user_id'),
+        User.username.label('username'),
+        UserScore.score.label('score'),
+        func.rank().over(order_by=UserScore.score.desc()).label('rank'),
+        func.dense_rank().over(order_by=UserScore.score.desc()).label('dense_rank'),
+        func.row_number().over(order_by=(UserScore.score.desc(), User.username.asc(), UserScore.user_id.asc())).label('position')
+    ).join(User, User.id == UserScore.user_id)\
+     .filter(UserScore.race_id == race_id).subquery()
+
+    query = db.session.query(ranked)
+    if around_user_id is not None:
+        my_position = db.session.query(ranked.c.position).filter(ranked.c.user_id == around_user_id).scalar()
+        if my_position is None:
+            return []
+        query = query.filter(ranked.c.position.between(my_position - around, my_position + around))
+    if after_key is not None:
+        key_score, key_username, key_user_id = after_key
+        query = query.filter(or_(
+            ranked.c.score < key_score,
+            and_(ranked.c.score == key_score, or_(
+                ranked.c.username > key_username,
+                and_(ranked.c.username == key_username, ranked.c.user_id > key_user_id)
+            ))
+        ))
+    query = query.order_by(ranked.c.position)
+    if offset:
+        query = query.offset(offset)
+    if limit is not None:
+        query = query.limit(limit)
+    return [_entry(row) for row in query.all()]
+
+
+def _python_entries(race_id, limit, offset, after_key, around_user_id, around):
+    rows = db.session.query(UserScore.user_id, User.username, UserScore.score)\
+        .join(User, User.id == UserScore.user_id)\
+        .filter(UserScore.race_id == race_id).all()
+    rows.sort(key=lambda row: (-row.score, row.username, row.user_id))
+
+    entries = []
+    rank = dense_rank = 0
+    last_score = None
+    for position, row in enumerate(rows, start=1):
+        if row.score != last_score:
+            rank = position
+            dense_rank += 1
+            last_score = row.score
+        entries.append({'user_id': row.user_id, 'username': row.username, 'score': row.score,
+                        'rank': rank, 'dense_rank': dense_rank, 'position': position})
+
+    if around_user_id is not None:
+        my_position = next((entry['position'] for entry in entries if entry['user_id'] == around_user_id), None)
+        if my_position is None:
+            return []
+        entries = [entry for entry in entries if abs(entry['position'] - my_position) <= around]
+    if after_key is not None:
+        entries = [entry for entry in entries if _after_key(entry['score'], entry['username'], entry['user_id'], after_key)]
+    entries = entries[offset or 0:]
+    if limit is not None:
+        entries = entries[:limit]
+    return entries
+
+
+def fetch_leaderboard(race_id, limit=None, offset=0, cursor=None, around_user_id=None, around=5, use_window_functions=None):
+    """
+    Reads one page of a race leaderboard.
+
+    Args:
+        race_id (int): The race.
+        limit (int, optional): Max entries in the page. None returns everything from the start point.
+        offset (int): Entries to skip (after the cursor, if any).
+        cursor (str, optional): next_cursor of the previous page; the page starts right after it.
+        around_user_id (int, optional): Restrict the leaderboard to the positions within `around`
+            of this user's. Empty if the user has no score in the race.
+        around (int): Radius of the "around me" window.
+        use_window_functions (bool, optional): Force the SQL (True) or Python (False) ranking.
+            Defaults to what the database supports.
+    Returns:
+        dict: {"entries": [...], "total": int, "next_cursor": str or None}
+    Raises:
+        InvalidCursorError: If the cursor cannot be decoded.
+    """
+    after_key = decode_cursor(cursor) if cursor else None
+    if use_window_functions is None:
+        use_window_functions = supports_window_functions()
+    read_entries = _sql_entries if use_window_functions else _python_entries
+
+    # Una entrada de más para saber si hay página siguiente
+    entries = read_entries(race_id, limit + 1 if limit is not None else None, offset, after_key, around_user_id, around)
+    has_more = limit is not None and len(entries) > limit
+    if has_more:
+        entries = entries[:limit]
+
+    total = db.session.query(func.count(UserScore.id)).filter(UserScore.race_id == race_id).scalar()
+    return {
+        'entries': entries,
+        'total': total,
+        'next_cursor': encode_cursor(entries[-1]) if has_more and entries else None,
+    }
+
+
+# --- Score versions and snapshot cache ---
+
+def bump_score_version(race_ids):
+    """Marks the leaderboards of the races as changed. Runs in the current transaction; does not commit."""
+    race_ids = list(race_ids)
+    if not race_ids:
+        return
+    db.session.query(Race).filter(Race.id.in_(race_ids)).update({
+        Race.score_version: Race.score_version + 1,
+        Race.scores_updated_at: datetime.utcnow()
+    }, synchronize_session=False)
+
+
+@event.listens_for(User, 'after_update')
+def _bump_score_versions_on_rename(mapper, connection, target):
+    """Usernames are part of the leaderboards: a rename invalidates every race the user has a score in."""
+    if not inspect(target).attrs.username.history.has_changes():
+        return
+    races = Race.__table__
+    connection.execute(
+        update(races)
+        .where(races.c.id.in_(select(UserScore.race_id).where(UserScore.user_id == target.id)))
+        .values(score_version=races.c.score_version + 1, scores_updated_at=datetime.utcnow())
+    )
+
+
+class LeaderboardSnapshotCache:
+    """Thread-safe LRU of serialized leaderboard responses, keyed by (race_id, score_version, variant)."""
+
+    def __init__(self, max_entries=256, app=None):
+        """
+        Args:
+            max_entries (int): Snapshots kept at most (least recently used dropped).
+            app (Flask, optional): When given, LEADERBOARD_CACHE_SIZE in its config overrides
+                max_entries, read on every put.
+        """
+        self.app = app
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def max_entries(self):
+        return self.app.config.get('LEADERBOARD_CACHE_SIZE', self._max_entries) if self.app is not None else self._max_entries
+
+    def get(self, race_id, score_version, variant):
+        key = (race_id, score_version, variant)
+        with self._lock:
+            snapshot = self._entries.get(key)
+            if snapshot is not None:
+                self._entries.move_to_end(key)
+            return snapshot
+
+    def put(self, race_id, score_version, variant, snapshot):
+        max_entries = self.max_entries
+        with self._lock:
+            self._entries[(race_id, score_version, variant)] = snapshot
+            self._entries.move_to_end((race_id, score_version, variant))
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_race(self, race_id):
+        """Drops every snapshot of a race (older versions would only age out of the LRU otherwise)."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == race_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
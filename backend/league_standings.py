@@ -0,0 +1,134 @@
+"""
+Materialized league standings.
+
+The league_standings table keeps, per league and participant, the total score over the league's
+(non deleted) races, the dense rank in the league and the points and rank on every race
+(per_race JSON). The league page reads it instead of aggregating UserScore on every hit.
+
+Standings are rebuilt from UserScore whenever one of their inputs changes:
+    - the scores of a race in the league (calculate_and_store_scores)
+    - the league membership (join endpoints)
+    - the races of the league (create/edit league, race deletion)
+
+The refresh functions only stage the changes in the current session; the caller commits them
+together with the change that triggered the refresh.
+"""
+from datetime import datetime
+
+from sqlalchemy import and_
+
+from backend.models import db, League, LeagueParticipant, LeagueStanding, Race, UserScore, league_races_table
+
+
+def dense_ranks(scores_by_user):
+    """
+    Dense ranking of {user_id: score}: ties share a position and no positions are skipped (1, 1, 2).
+
+    Returns:
+        dict: {user_id: rank}
+    """
+    ranks = {}
+    rank = 0
+    last_score = None
+    for user_id, score in sorted(scores_by_user.items(), key=lambda item: -item[1]):
+        if score != last_score:
+            rank += 1
+            last_score = score
+        ranks[user_id] = rank
+    return ranks
+
+
+def compute_league_standings(league_id):
+    """
+    Computes the standings of a league from UserScore, with a fixed number of queries.
+
+    Returns:
+        list: One dict per participant: {user_id, total_score, rank, per_race}, where per_race is
+              {"<race_id>": {"points": int, "rank": int}} for the races the participant has a score on.
+    """
+    participant_ids = [row.user_id for row in db.session.query(LeagueParticipant.user_id)
+                       .filter(LeagueParticipant.league_id == league_id).all()]
+    if not participant_ids:
+        return []
+
+    # Puntuaciones de los participantes de la liga en las carreras (no borradas) de la liga
+    score_rows = db.session.query(UserScore.user_id, UserScore.race_id, UserScore.score)\
+        .join(LeagueParticipant, and_(LeagueParticipant.user_id == UserScore.user_id, LeagueParticipant.league_id == league_id))\
+        .join(league_races_table, and_(league_races_table.c.race_id == UserScore.race_id, league_races_table.c.league_id == league_id))\
+        .join(Race, Race.id == UserScore.race_id)\
+        .filter(Race.is_deleted == False).all()
+
+    scores_by_race = {} # {race_id: {user_id: score}}
+    total_score_by_user = {user_id: 0 for user_id in participant_ids}
+    for score_row in score_rows:
+        scores_by_race.setdefault(score_row.race_id, {})[score_row.user_id] = score_row.score
+        total_score_by_user[score_row.user_id] += score_row.score
+
+    per_race_by_user = {user_id: {} for user_id in participant_ids}
+    for race_id, race_scores in scores_by_race.items():
+        for user_id, rank in dense_ranks(race_scores).items():
+            per_race_by_user[user_id][str(race_id)] = {'points': race_scores[user_id], 'rank': rank}
+
+    overall_ranks = dense_ranks(total_score_by_user)
+    return [
+        {'user_id': user_id, 'total_score': total, 'rank': overall_ranks[user_id], 'per_race': per_race_by_user[user_id]}
+        for user_id, total in total_score_by_user.items()
+    ]
+
+
+def refresh_league_standings(league_id):
+    """
+    Writes freshly computed standings over the LeagueStanding rows of a league. Does not commit.
+
+    Refreshes run concurrently (scoring jobs, league edits, joins, the lazy materialization in the
+    league view), so the rows are upserted with INSERT ... ON CONFLICT (league_id, user_id) DO UPDATE
+    on PostgreSQL and SQLite and only the rows of users no longer in the league are deleted: a
+    refresh never re-inserts a row another one has just written. Other dialects lock the league
+    row and replace the rows.
+
+    Returns:
+        int: The number of standings written.
+    """
+    standings = compute_league_standings(league_id)
+    user_ids = [standing['user_id'] for standing in standings]
+    now = datetime.utcnow()
+    rows = [dict(standing, league_id=league_id, updated_at=now) for standing in standings]
+
+    dialect_name = db.session.get_bind().dialect.name
+    if dialect_name in ('postgresql', 'sqlite'):
+        if dialect_name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        if rows:
+            stmt = dialect_insert(LeagueStanding.__table__).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[LeagueStanding.__table__.c.league_id, LeagueStanding.__table__.c.user_id],
+                set_={column: stmt.excluded[column] for column in ('total_score', 'rank', 'per_race', 'updated_at')}
+            )
+            db.session.execute(stmt)
+        LeagueStanding.query.filter(LeagueStanding.league_id == league_id, LeagueStanding.user_id.notin_(user_ids))\
+                            .delete(synchronize_session=False)
+        return len(standings)
+
+    # Fallback genérico: las actualizaciones de la misma liga se serializan en la fila de la liga
+    db.session.query(League.id).filter(League.id == league_id).with_for_update().first()
+    LeagueStanding.query.filter_by(league_id=league_id).delete(synchronize_session=False)
+    if rows:
+        db.session.bulk_insert_mappings(LeagueStanding, rows)
+    return len(standings)
+
+
+def refresh_standings_for_race(race_id):
+    """
+    Refreshes the standings of every (non deleted) league that includes the race. Does not commit.
+
+    Returns:
+        list: The ids of the refreshed leagues.
+    """
+    league_ids = [row.league_id for row in db.session.query(league_races_table.c.league_id)
+                  .join(League, League.id == league_races_table.c.league_id)
+                  .filter(league_races_table.c.race_id == race_id, League.is_deleted == False).all()]
+    for league_id in league_ids:
+        refresh_league_standings(league_id)
+    return league_ids
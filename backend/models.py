@@ -18,6 +18,12 @@ class EventStatus(enum.Enum):
     VALIDADO = "validado"
     RECHAZADO = "rechazado"
 
+class ScoringJobStatus(enum.Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
 # New Role Model
 class Role(db.Model):
     __tablename__ = 'roles'
@@ -54,6 +60,19 @@ class User(db.Model, UserMixin):
     def check_password(self, password):
         return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
 
+    @property
+    def role_entry(self):
+        """The user's role (.code, .description) from the reference-data registry (no Role load)."""
+        if self.role_id is None: # Not flushed yet: only the relationship is set
+            return self.role
+        from backend.reference_data import reference_data # Imports this module
+        return reference_data.role(self.role_id)
+
+    @property
+    def role_code(self):
+        role = self.role_entry
+        return role.code if role else None
+
     def __repr__(self):
         return f'<User {self.username}>'
 
@@ -101,6 +120,11 @@ class Race(db.Model):
     access_code = db.Column(db.String(36), unique=True, nullable=False, default=lambda: str(uuid.uuid4())) # New access code field
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    # Versión de la clasificación: se incrementa cada vez que cambian las puntuaciones (ver backend/leaderboard.py)
+    score_version = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    scores_updated_at = db.Column(db.DateTime, nullable=True)
+    # Versión del catálogo de preguntas (preguntas, opciones, respuestas oficiales; ver backend/race_catalog.py)
+    catalog_version = db.Column(db.Integer, default=0, server_default='0', nullable=False)
 
     # Relationship for UserRaceRegistration
     registrations = db.relationship('UserRaceRegistration', backref='race', lazy=True, cascade="all, delete-orphan")
@@ -143,7 +167,7 @@ class UserRaceRegistration(db.Model):
     __tablename__ = 'user_race_registrations'
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    race_id = db.Column(db.Integer, db.ForeignKey('races.id'), nullable=False)
+    race_id = db.Column(db.Integer, db.ForeignKey('races.id'), nullable=False, index=True)
     registered_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
     # Unique constraint to prevent duplicate registrations
@@ -170,6 +194,63 @@ class UserScore(db.Model):
         return f'<UserScore user_id={self.user_id} race_id={self.race_id} score={self.score}>'
 
 
+class UserQuestionScore(db.Model):
+    __tablename__ = 'user_question_scores'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    race_id = db.Column(db.Integer, db.ForeignKey('races.id'), nullable=False, index=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), nullable=False)
+    points = db.Column(db.Integer, nullable=False, default=0)
+    is_correct = db.Column(db.Boolean, nullable=False, default=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    # Relationships (los puntos por pregunta desaparecen con el usuario, la carrera o la pregunta)
+    user = db.relationship('User', backref=db.backref('question_scores', lazy=True, cascade="all, delete-orphan"))
+    race = db.relationship('Race', backref=db.backref('question_scores', lazy=True, cascade="all, delete-orphan"))
+    question = db.relationship('Question', backref=db.backref('user_scores', lazy=True, cascade="all, delete-orphan"))
+
+    # Desglose por pregunta de UserScore: la suma de points de un usuario en una carrera es su UserScore.score
+    __table_args__ = (db.UniqueConstraint('user_id', 'question_id', name='_user_question_score_uc'),)
+
+    def __repr__(self):
+        return f'<UserQuestionScore user_id={self.user_id} question_id={self.question_id} points={self.points}>'
+
+
+class ScoringJob(db.Model):
+    """Rescoring request for a race, processed off the request thread (see backend/scoring_jobs.py)."""
+    __tablename__ = 'scoring_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    race_id = db.Column(db.Integer, db.ForeignKey('races.id'), nullable=False, index=True)
+    requested_by_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    status = db.Column(SQLAlchemyEnum(ScoringJobStatus), default=ScoringJobStatus.PENDING, nullable=False, index=True)
+    question_ids = db.Column(db.JSON, nullable=True) # Preguntas cambiadas; NULL = recalcular la carrera entera
+    message = db.Column(db.Text, nullable=True) # Resultado o error del cálculo
+    coalesced_requests = db.Column(db.Integer, default=1, nullable=False) # Peticiones agrupadas en este job
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    race = db.relationship('Race', backref=db.backref('scoring_jobs', lazy='dynamic', cascade="all, delete-orphan"))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'race_id': self.race_id,
+            'status': self.status.value if self.status else None,
+            'question_ids': self.question_ids,
+            'message': self.message,
+            'coalesced_requests': self.coalesced_requests,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    def __repr__(self):
+        return f'<ScoringJob id={self.id} race_id={self.race_id} status={self.status}>'
+
+
 class UserFavoriteRace(db.Model):
     __tablename__ = 'user_favorite_races'
     id = db.Column(db.Integer, primary_key=True)
@@ -253,6 +334,14 @@ class Question(db.Model):
     options = db.relationship('QuestionOption', backref='question', lazy='dynamic', cascade="all, delete-orphan") # Added cascade
     answers = db.relationship('UserAnswer', backref='question', lazy=True, cascade="all, delete-orphan")
 
+    @property
+    def type_name(self):
+        """Name of the question type, from the reference-data registry (no QuestionType load)."""
+        if self.question_type_id is None: # Not flushed yet: only the relationship is set
+            return self.question_type.name if self.question_type else None
+        from backend.reference_data import reference_data # Imports this module
+        return reference_data.question_type_name(self.question_type_id)
+
     def __repr__(self):
         return f'<Question {self.id}: {self.text[:50]}...>'
 
@@ -289,6 +378,8 @@ class UserAnswer(db.Model):
     answer_text = db.Column(Text, nullable=True)
     selected_option_id = db.Column(db.Integer, db.ForeignKey('question_options.id'), nullable=True)
     slider_answer_value = db.Column(db.Float, nullable=True) # New field for slider answer
+    answer_digest = db.Column(db.String(64), nullable=True) # Hash canónico de la respuesta; NULL = desconocido
+    version = db.Column(db.Integer, default=1, server_default='1', nullable=False) # Versión optimista (autosave)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
@@ -297,7 +388,10 @@ class UserAnswer(db.Model):
     selected_mc_options = db.relationship('UserAnswerMultipleChoiceOption', backref='user_answer', lazy=True, cascade="all, delete-orphan")
 
 
-    __table_args__ = (db.UniqueConstraint('user_id', 'question_id', name='_user_question_uc'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'question_id', name='_user_question_uc'),
+        db.Index('ix_user_answers_race_id_user_id', 'race_id', 'user_id'), # Recuento de respuestas por participante
+    )
 
     def __repr__(self):
         return f'<UserAnswer id={self.id} user_id={self.user_id} question_id={self.question_id}>'
@@ -515,6 +609,25 @@ class LeagueParticipant(db.Model):
     def __repr__(self):
         return f'<LeagueParticipant user_id={self.user_id} league_id={self.league_id}>'
 
+class LeagueStanding(db.Model):
+    """Clasificación materializada de una liga (ver backend/league_standings.py)."""
+    __tablename__ = 'league_standings'
+    id = db.Column(db.Integer, primary_key=True)
+    league_id = db.Column(db.Integer, db.ForeignKey('leagues.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    total_score = db.Column(db.Integer, nullable=False, default=0)
+    rank = db.Column(db.Integer, nullable=False)
+    per_race = db.Column(db.JSON, nullable=False, default=dict) # {"<race_id>": {"points": int, "rank": int}}
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    user = db.relationship('User', backref=db.backref('league_standings', lazy='dynamic', cascade="all, delete-orphan"))
+    league = db.relationship('League', backref=db.backref('standings', lazy='dynamic', cascade="all, delete-orphan"))
+
+    __table_args__ = (db.UniqueConstraint('league_id', 'user_id', name='_league_standing_user_uc'),)
+
+    def __repr__(self):
+        return f'<LeagueStanding league_id={self.league_id} user_id={self.user_id} rank={self.rank} total={self.total_score}>'
+
 class LeagueInvitationCode(db.Model):
     __tablename__ = 'league_invitation_codes'
     id = db.Column(db.Integer, primary_key=True)
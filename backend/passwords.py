@@ -0,0 +1,216 @@
+"""
+Password hashing off the request threads, and login/registration throttling.
+
+bcrypt is CPU-bound on purpose. login_api and register_user ran it (User.check_password and
+set_password) with the default cost on the request thread, so a login burst (everybody arriving
+right before a quiniela closes) took every worker's CPU and starved the other endpoints.
+
+PasswordHasher runs hashpw/checkpw in a small thread pool (bcrypt releases the GIL while
+hashing) with a bounded number of pending jobs: past it, hash()/verify() raise PasswordHasherBusy
+and the endpoint answers 503 with Retry-After instead of queueing more CPU work. The work
+factor is configurable (PASSWORD_BCRYPT_ROUNDS); needs_rehash() tells whether a stored hash was
+made with another cost, so login can rehash it once the password has been verified. The settings
+are read from the app config when used, not when the hasher is built.
+
+TokenBucketLimiter throttles attempts per key: login uses one bucket per username and one per
+client IP, registration one per IP. A bucket holds `capacity` attempts and refills at
+`refill_per_second`; an empty bucket means 429 with the seconds until the next token.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import bcrypt
+
+
+class PasswordHasherBusy(Exception):
+    """Too many hashes pending. retry_after is the suggested wait in seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Password hasher is busy, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class ThrottledError(Exception):
+    """A token bucket is empty. retry_after is the wait in seconds until the next attempt."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Too many attempts, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+def hash_rounds(password_hash):
+    """Work factor of a bcrypt hash ('$2b$12$...' -> 12), or None if it is not one."""
+    parts = (password_hash or '').split('$')
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+class PasswordHasher:
+    """bcrypt hashing and verification in a bounded thread pool."""
+
+    def __init__(self, rounds=12, workers=2, max_pending=32, timeout=10, app=None):
+        """
+        Args:
+            rounds (int): bcrypt work factor for new hashes.
+            workers (int): Threads hashing at the same time.
+            max_pending (int): Hashes running or waiting at most; beyond it PasswordHasherBusy.
+            timeout (float): Seconds a request waits for its hash before giving up (PasswordHasherBusy).
+            app (Flask, optional): When given, PASSWORD_BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS,
+                PASSWORD_HASH_MAX_PENDING and PASSWORD_HASH_TIMEOUT in its config override these
+                values. They are read when used (the pool and its slots on the first hash), so
+                config set after import, e.g. through create_app(), applies.
+        """
+        self.app = app
+        self._defaults = {'PASSWORD_BCRYPT_ROUNDS': rounds, 'PASSWORD_HASH_WORKERS': workers,
+                          'PASSWORD_HASH_MAX_PENDING': max_pending, 'PASSWORD_HASH_TIMEOUT': timeout}
+        self._slots = None
+        self._executor = None # Se crea con el primer hash (nunca antes de un fork de gunicorn)
+        self._lock = threading.Lock()
+        self._dummy_hash = None # (rounds, hash)
+
+    def _setting(self, key):
+        default = self._defaults[key]
+        return self.app.config.get(key, default) if self.app is not None else default
+
+    @property
+    def rounds(self):
+        return self._setting('PASSWORD_BCRYPT_ROUNDS')
+
+    @property
+    def workers(self):
+        return self._setting('PASSWORD_HASH_WORKERS')
+
+    @property
+    def max_pending(self):
+        return self._setting('PASSWORD_HASH_MAX_PENDING')
+
+    @property
+    def timeout(self):
+        return self._setting('PASSWORD_HASH_TIMEOUT')
+
+    def _pool(self):
+        """(slots semaphore, executor), created together on first use."""
+        with self._lock:
+            if self._executor is None:
+                self._slots = threading.BoundedSemaphore(self.max_pending)
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+            return self._slots, self._executor
+
+    def _run(self, fn, *args):
+        slots, executor = self._pool()
+        if not slots.acquire(blocking=False):
+            raise PasswordHasherBusy(self.retry_after())
+        try:
+            future = executor.submit(fn, *args)
+        except Exception:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise PasswordHasherBusy(self.retry_after())
+
+    def retry_after(self):
+        """Seconds (1-30) to wait when the pool is saturated."""
+        return max(1, min(30, math.ceil(self.max_pending / max(1, self.workers) * 0.25)))
+
+    def hash(self, password):
+        """bcrypt hash (str) of a password with the configured work factor."""
+        rounds = self.rounds
+        return self._run(lambda: bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8'))
+
+    def verify(self, password, password_hash):
+        """
+        Checks a password against a stored hash.
+
+        Args:
+            password (str): Password sent by the client.
+            password_hash (str): Stored hash, or None for an unknown user: a dummy hash is checked
+                instead, so unknown usernames take as long as wrong passwords.
+        Returns:
+            bool: True if the password matches.
+        """
+        if password_hash is None:
+            self._run(bcrypt.checkpw, password.encode('utf-8'), self._dummy().encode('utf-8'))
+            return False
+        try:
+            return self._run(bcrypt.checkpw, password.encode('utf-8'), password_hash.encode('utf-8'))
+        except ValueError: # Not a bcrypt hash
+            return False
+
+    def needs_rehash(self, password_hash):
+        """True if a stored hash was made with another work factor than the configured one."""
+        return hash_rounds(password_hash) != self.rounds
+
+    def _dummy(self):
+        rounds = self.rounds
+        if self._dummy_hash is None or self._dummy_hash[0] != rounds: # Same cost as real hashes
+            self._dummy_hash = (rounds, bcrypt.hashpw(b'dummy-password', bcrypt.gensalt(rounds)).decode('utf-8'))
+        return self._dummy_hash[1]
+
+
+class TokenBucketLimiter:
+    """Thread-safe token buckets per key, with a bounded number of keys (least recently used dropped)."""
+
+    def __init__(self, capacity, refill_per_second, max_keys=10000, app=None, config_key=None):
+        """
+        Args:
+            capacity (int): Tokens a bucket holds (burst size).
+            refill_per_second (float): Tokens added back per second.
+            max_keys (int): Buckets kept at most.
+            app (Flask, optional): With config_key, the capacity is read from app.config[config_key]
+                when used, so config set after import (e.g. through create_app()) applies. The
+                bucket keeps refilling over the same period (capacity / refill_per_second).
+            config_key (str, optional): Setting overriding the capacity.
+        """
+        self.app = app
+        self.config_key = config_key
+        self._capacity = capacity
+        self._refill_period = capacity / refill_per_second
+        self.max_keys = max_keys
+        self._buckets = OrderedDict() # {key: (tokens, updated_at)}
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self):
+        if self.app is not None and self.config_key:
+            return self.app.config.get(self.config_key, self._capacity)
+        return self._capacity
+
+    @property
+    def refill_per_second(self):
+        return self.capacity / self._refill_period
+
+    def consume(self, key):
+        """
+        Takes one token from the bucket of `key`.
+
+        Raises:
+            ThrottledError: If the bucket is empty, with the seconds until the next token.
+        """
+        capacity, refill_per_second = self.capacity, self.refill_per_second
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                self._buckets.move_to_end(key)
+                raise ThrottledError(max(1, math.ceil((1 - tokens) / refill_per_second)))
+            self._buckets[key] = (tokens - 1, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
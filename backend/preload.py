@@ -0,0 +1,102 @@
+"""
+Preloading in the gunicorn master and per-process state after a fork.
+
+app.py builds the app at import time, so without --preload every gunicorn worker imported the
+whole module itself and compiled each template and loaded the reference data on its first
+requests. With --preload the master imports it once and forks the workers, but then whatever
+the master opened is shared: a SQLAlchemy pool holding connections would hand the same socket
+to several workers.
+
+preload(app) runs in the master, before forking:
+    - compiles every template into the Jinja cache and loads the reference-data registry, so
+      the workers inherit them copy-on-write instead of building their own copies;
+    - disposes the engines, closing the connections it opened, so no socket crosses the fork;
+    - gc.freeze()s what has been loaded: the collector of each worker then never touches those
+      objects, which would otherwise copy the shared pages into every worker.
+
+install_fork_hooks(app) registers after_fork_in_child(), which drops the inherited pools
+without closing them (engine.dispose(close=False): the connections belong to the parent), so
+each worker opens its own. Background threads (scheduler, scoring jobs, answer writes, password
+hashing) already start lazily in each worker and need nothing here.
+
+In-memory SQLite engines (tests) are never disposed: their database lives in the pool.
+"""
+import gc
+import logging
+import os
+import time
+
+from backend.models import db
+
+logger = logging.getLogger(__name__)
+
+
+def _engines(app):
+    with app.app_context():
+        return [engine for engine in db.engines.values() if not _is_memory_sqlite(engine)]
+
+
+def _is_memory_sqlite(engine):
+    return engine.url.get_backend_name() == 'sqlite' and engine.url.database in (None, '', ':memory:')
+
+
+def preload_templates(app):
+    """Compiles every template into the Jinja cache. Returns the number of templates loaded."""
+    env = app.jinja_env
+    names = env.list_templates()
+    if env.cache is not None and getattr(env.cache, 'capacity', len(names)) < len(names):
+        logger.warning(f"Jinja cache holds {env.cache.capacity} templates, {len(names)} found; not all stay preloaded")
+    loaded = 0
+    for name in names:
+        try:
+            env.get_template(name)
+            loaded += 1
+        except Exception as e: # Una plantilla rota no debe impedir el arranque; falla al renderizarla
+            logger.warning(f"Could not preload template {name}: {e}")
+    return loaded
+
+
+def preload(app, freeze=True):
+    """
+    Loads templates and reference data in the current (master) process before the workers fork.
+
+    Args:
+        app (Flask): The application.
+        freeze (bool): gc.freeze() the loaded objects so the workers share them.
+    Returns:
+        dict: {'templates': int, 'reference_data': bool, 'seconds': float}
+    """
+    from backend.reference_data import reference_data
+    started = time.perf_counter()
+    templates = preload_templates(app)
+
+    reference_loaded = True
+    try:
+        with app.app_context():
+            reference_data.refresh()
+            db.session.remove()
+    except Exception as e: # Ej. tablas aún sin migrar: se cargan con la primera petición
+        logger.warning(f"Could not preload reference data: {e}")
+        reference_loaded = False
+
+    for engine in _engines(app):
+        engine.dispose() # Ninguna conexión del master pasa a los workers
+    if freeze:
+        gc.collect()
+        gc.freeze()
+    return {'templates': templates, 'reference_data': reference_loaded,
+            'seconds': round(time.perf_counter() - started, 3)}
+
+
+def after_fork_in_child(app):
+    """Gives the process its own connection pools, leaving the parent's connections open for the parent."""
+    for engine in _engines(app):
+        engine.dispose(close=False)
+
+
+def install_fork_hooks(app):
+    """Calls after_fork_in_child(app) in every child forked from now on (once per app)."""
+    if app.extensions.get('preload_fork_hooks'):
+        return
+    app.extensions['preload_fork_hooks'] = True
+    os.register_at_fork(after_in_child=lambda: after_fork_in_child(app))
@@ -0,0 +1,158 @@
+"""
+Cached user principals for Flask-Login.
+
+load_user runs on every authenticated request. It used to load the whole User row, and
+current_user.role then lazily loaded the Role: two queries per API call, wizard autosaves and
+leaderboard polls included.
+
+A Principal is the identity a request needs: id, username, role code and the active/deleted
+flags, as plain values. PrincipalCache keeps them in a thread-safe TTL + LRU keyed by user id,
+so an authenticated request normally costs no identity query at all. Anything else read from
+current_user (name, email, relationships...) falls through to the User row of the request's
+session, loaded on demand.
+
+Entries are dropped when a User row is updated or deleted through the ORM (mapper events, and
+again when the transaction ends, so a concurrent request can not re-cache the old values before
+the commit). Bulk query updates bypass the mapper events: call invalidate() after them. The
+cache is per process; the TTL bounds how long another worker keeps a changed user.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from backend.models import db, User
+
+
+class Principal(UserMixin):
+    """Identity of an authenticated user, detached from any session."""
+
+    def __init__(self, id, username, role_id, role_code, active, deleted):
+        self.id = id
+        self.username = username
+        self.role_id = role_id
+        self.role_code = role_code
+        self._active = active
+        self.is_deleted = deleted
+
+    @property
+    def is_active(self):
+        return self._active
+
+    @property
+    def role_entry(self):
+        """The user's role (.code, .description) from the reference-data registry."""
+        from backend.reference_data import reference_data
+        return reference_data.role(self.role_id)
+
+    def user(self):
+        """The User row in the current session (one query the first time per request)."""
+        return db.session.get(User, self.id)
+
+    def __getattr__(self, name):
+        # Only called for attributes a Principal does not hold
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.user(), name)
+
+    def __repr__(self):
+        return f'<Principal {self.id} {self.username} {self.role_code}>'
+
+
+class PrincipalCache:
+    """Thread-safe TTL + LRU cache of Principal objects, keyed by user id."""
+
+    def __init__(self, ttl_seconds=60, max_entries=2048, app=None):
+        """
+        Args:
+            ttl_seconds (float): Seconds a principal is served from the cache.
+            max_entries (int): Principals kept at most (least recently used dropped).
+            app (Flask, optional): When given, PRINCIPAL_CACHE_TTL and PRINCIPAL_CACHE_SIZE in its
+                config override these values, read on every use.
+        """
+        self.app = app
+        self._ttl_seconds = ttl_seconds
+        self._max_entries = max_entries
+        self._entries = OrderedDict() # {user_id: (expires_at, principal)}
+        self._lock = threading.Lock()
+        self._generation = 0 # Bumped by every invalidation; a load started before one is not cached
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def ttl_seconds(self):
+        return self.app.config.get('PRINCIPAL_CACHE_TTL', self._ttl_seconds) if self.app is not None else self._ttl_seconds
+
+    @property
+    def max_entries(self):
+        return self.app.config.get('PRINCIPAL_CACHE_SIZE', self._max_entries) if self.app is not None else self._max_entries
+
+    @staticmethod
+    def fetch(user_id):
+        """Principal of a user id read from the database (one query), or None if the user does not exist."""
+        from backend.reference_data import reference_data
+        row = db.session.query(User.id, User.username, User.role_id, User.is_active, User.is_deleted)\
+                        .filter(User.id == user_id).first()
+        if row is None:
+            return None
+        return Principal(row.id, row.username, row.role_id, reference_data.role_code(row.role_id),
+                         row.is_active, row.is_deleted)
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def load(self, user_id):
+        """Cached principal of a user id, fetched on a miss. None if the user does not exist."""
+        principal = self.get(user_id)
+        if principal is not None:
+            return principal
+        with self._lock:
+            generation = self._generation
+        principal = self.fetch(user_id)
+        if principal is not None:
+            with self._lock:
+                if generation == self._generation: # Nobody invalidated while we were reading
+                    self._entries[user_id] = (time.monotonic() + self.ttl_seconds, principal)
+                    self._entries.move_to_end(user_id)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+        return principal
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def install_invalidation(self):
+        """Drops a user's entry whenever its User row is updated or deleted through the ORM."""
+        def _changed(mapper, connection, target):
+            self.invalidate(target.id)
+            session = Session.object_session(target)
+            if session is not None:
+                session.info.setdefault('changed_principals', set()).add(target.id)
+
+        def _transaction_ended(session):
+            for user_id in session.info.pop('changed_principals', ()):
+                self.invalidate(user_id)
+
+        event.listen(User, 'after_update', _changed)
+        event.listen(User, 'after_delete', _changed)
+        event.listen(Session, 'after_commit', _transaction_ended)
+        event.listen(Session, 'after_rollback', _transaction_ended)
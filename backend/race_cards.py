@@ -0,0 +1,207 @@
+"""
+Race card projection.
+
+Dashboards and the /races list render race cards. Building them from Race.to_dict() hydrates
+every Race and lazily loads its format and creator (two queries per card), and then the quiniela
+close date is serialized to ISO and parsed back to decide whether the card is actionable.
+
+race_card_query() selects only the columns a card needs, with the format name and the creator
+username joined in, and fetch_race_cards() turns the rows into RaceCard objects (__slots__, no
+ORM identity map). A page of cards is a single query.
+
+Templates read cards like the old dicts (race['title'], race.status, race['race_format']['name']):
+Jinja falls back to attribute lookup when subscripting fails.
+
+The player and league-admin dashboards show the races a user created, registered for and
+favorited. fetch_dashboard_cards() gets all of them in one query: a CTE unions the three
+memberships and is grouped per race, so each race comes back once with is_created /
+is_registered / is_favorite flags and the dashboard splits the list in Python.
+DashboardCache keeps the assembled dashboard per (user, filter set) for a short TTL.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+
+from sqlalchemy import func, literal, select, union_all
+
+from backend.models import db, Race, RaceFormat, User, UserRaceRegistration, UserFavoriteRace
+
+RaceFormatRef = namedtuple('RaceFormatRef', ['id', 'name'])
+
+
+class RaceCard:
+    """Read-only race card row. Field names match Race.to_dict() so templates work unchanged."""
+
+    __slots__ = (
+        'id', 'title', 'description', 'race_format', 'race_format_name', 'event_date', 'event_date_formatted',
+        'location', 'promo_image_url', 'category', 'gender_category', 'user_id', 'user_username', 'is_general',
+        'quiniela_close_date', 'status', 'is_quiniela_actionable', 'is_created', 'is_registered', 'is_favorite'
+    )
+
+    def __init__(self, row, now):
+        self.id = row.id
+        self.title = row.title
+        self.description = row.description
+        self.race_format = RaceFormatRef(row.race_format_id, row.race_format_name)
+        self.race_format_name = row.race_format_name
+        self.event_date = row.event_date
+        self.event_date_formatted = row.event_date.strftime('%d %b %Y') if row.event_date else 'Fecha no disp.'
+        self.location = row.location
+        self.promo_image_url = row.promo_image_url
+        self.category = row.category
+        self.gender_category = row.gender_category
+        self.user_id = row.user_id
+        self.user_username = row.user_username
+        self.is_general = row.is_general
+        self.quiniela_close_date = row.quiniela_close_date
+        self.status = row.status.value if row.status else None
+        # Misma regla que antes, directamente sobre el datetime (naive UTC): accionable salvo cierre futuro
+        self.is_quiniela_actionable = not (row.quiniela_close_date and row.quiniela_close_date > now)
+        # Flags de pertenencia: solo vienen en las filas de fetch_dashboard_cards()
+        self.is_created = bool(getattr(row, 'is_created', False))
+        self.is_registered = bool(getattr(row, 'is_registered', False))
+        self.is_favorite = bool(getattr(row, 'is_favorite', False))
+
+    def __repr__(self):
+        return f'<RaceCard {self.id} {self.title!r}>'
+
+
+def race_card_query(*criteria):
+    """Card columns of the non deleted races matching `criteria`, format and creator joined in."""
+    return db.session.query(
+        Race.id, Race.title, Race.description, Race.race_format_id, RaceFormat.name.label('race_format_name'),
+        Race.event_date, Race.location, Race.promo_image_url, Race.category, Race.gender_category,
+        Race.user_id, User.username.label('user_username'), Race.is_general, Race.quiniela_close_date, Race.status
+    ).join(RaceFormat, RaceFormat.id == Race.race_format_id)\
+     .outerjoin(User, User.id == Race.user_id)\
+     .filter(Race.is_deleted == False, *criteria)
+
+
+def apply_race_card_filters(query, date_from=None, date_to=None, race_format_id=None, statuses=None):
+    """Applies the dashboard filters (event date range, format, statuses) to a card query."""
+    if date_from:
+        query = query.filter(Race.event_date >= date_from)
+    if date_to:
+        query = query.filter(Race.event_date <= date_to)
+    if race_format_id is not None:
+        query = query.filter(Race.race_format_id == race_format_id)
+    if statuses:
+        query = query.filter(Race.status.in_(statuses))
+    return query
+
+
+def fetch_race_cards(query, limit=None):
+    """Runs a card query ordered by event date (newest first) and returns RaceCard rows."""
+    query = query.order_by(Race.event_date.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    now = datetime.utcnow()
+    return [RaceCard(row, now) for row in query.all()]
+
+
+def dashboard_card_query(user_id, include_created=True):
+    """
+    Card query over the races `user_id` created, registered for or favorited, each race once.
+
+    Args:
+        user_id (int): Dashboard owner.
+        include_created (bool): Whether the races the user created are part of the dashboard.
+
+    Returns:
+        Query: race_card_query() columns plus the is_created, is_registered and is_favorite flags.
+    """
+    memberships = [
+        select(UserRaceRegistration.race_id.label('race_id'), literal(0).label('created'),
+               literal(1).label('registered'), literal(0).label('favorite'))
+        .where(UserRaceRegistration.user_id == user_id),
+        select(UserFavoriteRace.race_id.label('race_id'), literal(0).label('created'),
+               literal(0).label('registered'), literal(1).label('favorite'))
+        .where(UserFavoriteRace.user_id == user_id),
+    ]
+    if include_created:
+        memberships.append(
+            select(Race.id.label('race_id'), literal(1).label('created'),
+                   literal(0).label('registered'), literal(0).label('favorite'))
+            .where(Race.user_id == user_id)
+        )
+    membership_cte = union_all(*memberships).cte('dashboard_memberships')
+    flags = select(
+        membership_cte.c.race_id,
+        func.max(membership_cte.c.created).label('is_created'),
+        func.max(membership_cte.c.registered).label('is_registered'),
+        func.max(membership_cte.c.favorite).label('is_favorite'),
+    ).group_by(membership_cte.c.race_id).subquery('dashboard_flags')
+
+    return race_card_query()\
+        .join(flags, flags.c.race_id == Race.id)\
+        .add_columns(flags.c.is_created, flags.c.is_registered, flags.c.is_favorite)
+
+
+def fetch_dashboard_cards(user_id, include_created=True, **filters):
+    """Runs dashboard_card_query() with the dashboard filters (see apply_race_card_filters) applied."""
+    return fetch_race_cards(apply_race_card_filters(dashboard_card_query(user_id, include_created), **filters))
+
+
+class DashboardCache:
+    """
+    Thread-safe TTL + LRU cache of assembled dashboards, keyed by (user_id, variant).
+
+    The variant is whatever identifies one rendering of the dashboard (role and filter set).
+    Entries are dropped for a user when their memberships change (join, favorite) and for
+    everybody when races or leagues change. The cache is per process: the TTL bounds how
+    stale another worker's entry can get.
+    """
+
+    def __init__(self, ttl_seconds=30, max_entries=512, app=None):
+        """
+        Args:
+            ttl_seconds (float): Seconds an entry is served.
+            max_entries (int): Entries kept at most (least recently used dropped).
+            app (Flask, optional): When given, DASHBOARD_CACHE_TTL and DASHBOARD_CACHE_SIZE in its
+                config override these values, read on every put.
+        """
+        self.app = app
+        self._ttl_seconds = ttl_seconds
+        self._max_entries = max_entries
+        self._entries = OrderedDict() # {(user_id, variant): (expires_at, value)}
+        self._lock = threading.Lock()
+
+    @property
+    def ttl_seconds(self):
+        return self.app.config.get('DASHBOARD_CACHE_TTL', self._ttl_seconds) if self.app is not None else self._ttl_seconds
+
+    @property
+    def max_entries(self):
+        return self.app.config.get('DASHBOARD_CACHE_SIZE', self._max_entries) if self.app is not None else self._max_entries
+
+    def get(self, user_id, variant):
+        key = (user_id, variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, user_id, variant, value):
+        key = (user_id, variant)
+        ttl_seconds, max_entries = self.ttl_seconds, self.max_entries
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+
+    def invalidate_all(self, *_):
+        """Drops every entry. Extra arguments are ignored so it can be registered as a hook."""
+        with self._lock:
+            self._entries.clear()
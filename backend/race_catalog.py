@@ -0,0 +1,183 @@
+"""
+Per-race question catalog.
+
+The quiniela form, the wizard, the questions API, the predictions modal and the participant
+answers API all render the same things: the questions of a race with their type, options,
+official answer and max points. Each of them used to reload the Question rows, lazily load
+question_type per question and run one QuestionOption query per question.
+
+A RaceCatalog is built once per race in a fixed number of queries (questions with their type,
+options, official answers with their MC selections) and holds only plain, immutable values
+(namedtuples and tuples): it can be shared between requests and threads and rendering from it
+never touches the ORM. It also carries the race's CompiledRaceScorer (its closures only hold
+plain values too).
+
+Answer formatting (official answers, a user's MC selections, ORDERING items stored as option ids)
+resolves option ids through catalog.option_texts, an OptionTextResolver built with the catalog: a
+dict lookup per option instead of one QuestionOption query per option shown.
+
+RaceCatalogCache keeps catalogs in a bounded LRU keyed by (race_id, catalog_version).
+Race.catalog_version is bumped (bump_catalog_version) in the transaction of every write that
+changes what a catalog holds: question create/update/delete and official answers. Readers
+already load the Race row, so a changed version is seen by every worker process without an
+extra query, and stale catalogs just age out of the LRU.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+
+from sqlalchemy.orm import joinedload, selectinload
+
+from backend.models import db, Race, Question, QuestionOption, OfficialAnswer
+from backend.scoring import CompiledRaceScorer
+
+# Question columns copied into the catalog; entries keep the Question attribute names
+QUESTION_COLUMNS = (
+    'id', 'text', 'is_active', 'is_mc_multiple_correct', 'max_score_free_text',
+    'points_per_correct_mc', 'points_per_incorrect_mc', 'total_score_mc_single',
+    'points_per_correct_order', 'bonus_for_full_order',
+    'slider_unit', 'slider_min_value', 'slider_max_value', 'slider_step',
+    'slider_points_exact', 'slider_threshold_partial', 'slider_points_partial',
+)
+
+OptionEntry = namedtuple('OptionEntry', ['id', 'option_text', 'is_correct_mc_single', 'is_correct_mc_multiple',
+                                         'correct_order_index'])
+OfficialEntry = namedtuple('OfficialEntry', ['answer_text', 'selected_option_id', 'correct_slider_value', 'option_ids'])
+QuestionEntry = namedtuple('QuestionEntry', QUESTION_COLUMNS + ('type_name', 'options', 'official', 'max_points'))
+
+
+def bump_catalog_version(race_id):
+    """Marks the catalog of a race as changed. Runs in the current transaction; does not commit."""
+    db.session.query(Race).filter(Race.id == race_id).update(
+        {Race.catalog_version: Race.catalog_version + 1}, synchronize_session=False
+    )
+
+
+class OptionTextResolver:
+    """option id -> option text over every option of a race, built once per catalog."""
+
+    def __init__(self, questions):
+        self._options = {option.id: (question.id, option.option_text)
+                         for question in questions for option in question.options}
+
+    def text(self, option_id, question_id=None):
+        """Text of an option; None if unknown or, when `question_id` is given, an option of another question."""
+        entry = self._options.get(option_id)
+        if entry is None or (question_id is not None and entry[0] != question_id):
+            return None
+        return entry[1]
+
+    def option(self, option_id, question_id=None):
+        """{"id", "text"} of an option, as the answer APIs render it, or None (see text())."""
+        text = self.text(option_id, question_id)
+        return {"id": option_id, "text": text} if text is not None else None
+
+    def options(self, option_ids, question_id=None):
+        """option() of each id, skipping the unknown ones."""
+        return [option for option in (self.option(option_id, question_id) for option_id in option_ids) if option]
+
+
+class RaceCatalog:
+    """Immutable snapshot of a race's questions (all of them, ordered by id), options and official answers."""
+
+    def __init__(self, race_id, catalog_version, questions, scorer):
+        self.race_id = race_id
+        self.catalog_version = catalog_version
+        self.questions = tuple(questions)
+        self.active_questions = tuple(question for question in self.questions if question.is_active)
+        self._by_id = {question.id: question for question in self.questions}
+        self.option_texts = OptionTextResolver(self.questions)
+        self.scorer = scorer
+
+    @classmethod
+    def build(cls, race_id, catalog_version=0):
+        """Loads the catalog of a race: questions (+type), options and official answers (+MC selections)."""
+        questions = Question.query.options(joinedload(Question.question_type))\
+                                  .filter_by(race_id=race_id).order_by(Question.id).all()
+        options_by_question = {}
+        for option in QuestionOption.query.join(Question, Question.id == QuestionOption.question_id)\
+                                          .filter(Question.race_id == race_id).order_by(QuestionOption.id):
+            options_by_question.setdefault(option.question_id, []).append(OptionEntry(
+                option.id, option.option_text, option.is_correct_mc_single, option.is_correct_mc_multiple,
+                option.correct_order_index
+            ))
+        official_answers = OfficialAnswer.query.options(selectinload(OfficialAnswer.official_selected_mc_options))\
+                                               .filter_by(race_id=race_id).all()
+
+        scorer = CompiledRaceScorer(race_id, questions, official_answers,
+                                    {question_id: len(options) for question_id, options in options_by_question.items()})
+        entries = []
+        for question in questions:
+            official_answer = scorer.official_answers.get(question.id)
+            official = None
+            if official_answer is not None:
+                official = OfficialEntry(
+                    official_answer.answer_text, official_answer.selected_option_id, official_answer.correct_slider_value,
+                    tuple(sorted(sel.question_option_id for sel in official_answer.official_selected_mc_options))
+                )
+            entries.append(QuestionEntry(
+                *(getattr(question, column) for column in QUESTION_COLUMNS),
+                type_name=scorer.question_types[question.id],
+                options=tuple(options_by_question.get(question.id, ())),
+                official=official,
+                max_points=scorer.max_points.get(question.id, 0)
+            ))
+        scorer.release_rows() # Shared between requests: no ORM rows kept
+        return cls(race_id, catalog_version, entries, scorer)
+
+    def question(self, question_id):
+        return self._by_id.get(question_id)
+
+
+class RaceCatalogCache:
+    """Thread-safe LRU of RaceCatalog objects, keyed by (race_id, catalog_version)."""
+
+    def __init__(self, max_entries=128, app=None):
+        """
+        Args:
+            max_entries (int): Catalogs kept at most (least recently used dropped).
+            app (Flask, optional): When given, RACE_CATALOG_CACHE_SIZE in its config overrides
+                max_entries, read on every put.
+        """
+        self.app = app
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def max_entries(self):
+        return self.app.config.get('RACE_CATALOG_CACHE_SIZE', self._max_entries) if self.app is not None else self._max_entries
+
+    def get(self, race_id, catalog_version):
+        key = (race_id, catalog_version)
+        with self._lock:
+            catalog = self._entries.get(key)
+            if catalog is not None:
+                self._entries.move_to_end(key)
+            return catalog
+
+    def put(self, catalog):
+        key = (catalog.race_id, catalog.catalog_version)
+        max_entries = self.max_entries
+        with self._lock:
+            self._entries[key] = catalog
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def for_race(self, race):
+        """Catalog of `race` (a Race row) at its current catalog_version, built on a miss."""
+        catalog = self.get(race.id, race.catalog_version)
+        if catalog is None:
+            catalog = RaceCatalog.build(race.id, race.catalog_version)
+            self.put(catalog)
+        return catalog
+
+    def invalidate_race(self, race_id):
+        """Drops every catalog of a race (older versions would only age out of the LRU otherwise)."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == race_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,114 @@
+"""
+Race participants list.
+
+The participants of a race are its UserRaceRegistration rows. The list shows, for each one, the
+username and how many questions of the race they have answered. fetch_race_participants() reads a
+page of it in one query: registrations joined with users and with the per-user answer count of the
+race (one GROUP BY over user_answers, served by the (race_id, user_id) index).
+
+Pages are read by keyset: next_cursor is the sort key of the last entry of the page, so the next
+page is an indexed range scan instead of an OFFSET over every participant before it. The list can
+be sorted by username or by answered count (username and user id break ties, so the order is total)
+and filtered by a username prefix.
+"""
+import base64
+import json
+
+from sqlalchemy import and_, func, or_, select
+
+from backend.leaderboard import InvalidCursorError
+from backend.models import db, User, UserAnswer, UserRaceRegistration
+
+# sort -> default direction
+PARTICIPANT_SORTS = {'username': 'asc', 'answered': 'desc'}
+
+
+def _encode_cursor(sort, order, entry):
+    key = [entry['username'], entry['user_id']]
+    if sort == 'answered':
+        key.insert(0, entry['answered_questions_count'])
+    raw = json.dumps([sort, order, key], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(cursor, sort, order):
+    """Returns the sort key stored in `cursor`. The cursor must belong to the same sort and order."""
+    try:
+        cursor_sort, cursor_order, key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise InvalidCursorError(f"Invalid participants cursor: {cursor}") from e
+    expected_types = (int, str, int) if sort == 'answered' else (str, int)
+    if (cursor_sort, cursor_order) != (sort, order) or not isinstance(key, list) or len(key) != len(expected_types) \
+            or not all(isinstance(value, value_type) for value, value_type in zip(key, expected_types)):
+        raise InvalidCursorError(f"Invalid participants cursor: {cursor}")
+    return key
+
+
+def _after_key(columns, key):
+    """Keyset condition: rows strictly after `key` for an ORDER BY over `columns` [(column, descending)]."""
+    condition = None
+    for (column, descending), value in reversed(list(zip(columns, key))):
+        beyond = column < value if descending else column > value
+        condition = beyond if condition is None else or_(beyond, and_(column == value, condition))
+    return condition
+
+
+def fetch_race_participants(race_id, sort='username', order=None, limit=50, cursor=None, username_prefix=None):
+    """
+    One page of the participants of a race with their answered question count.
+
+    Args:
+        race_id (int): Race id.
+        sort (str): 'username' or 'answered'.
+        order (str): 'asc' or 'desc'; defaults to PARTICIPANT_SORTS[sort]. Equal counts are ordered by username, user id.
+        limit (int): Page size.
+        cursor (str): next_cursor of the previous page (same sort and order).
+        username_prefix (str): Only usernames starting with it (matched literally, case sensitive).
+
+    Returns:
+        dict: {'participants': [{user_id, username, has_answered, answered_questions_count}],
+               'total': participants matching the filter, 'next_cursor': str or None}
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed or belongs to another sort.
+    """
+    order = order or PARTICIPANT_SORTS[sort]
+    answered_counts = select(UserAnswer.user_id, func.count(UserAnswer.id).label('answered_count'))\
+        .where(UserAnswer.race_id == race_id)\
+        .group_by(UserAnswer.user_id)\
+        .subquery('answered_counts')
+    answered_count = func.coalesce(answered_counts.c.answered_count, 0)
+
+    criteria = [UserRaceRegistration.race_id == race_id]
+    if username_prefix:
+        criteria.append(User.username.startswith(username_prefix, autoescape=True))
+
+    descending = order == 'desc'
+    if sort == 'answered':
+        sort_columns = [(answered_count, descending), (User.username, False), (User.id, False)]
+    else:
+        sort_columns = [(User.username, descending), (User.id, descending)]
+
+    query = db.session.query(
+        User.id.label('user_id'), User.username, answered_count.label('answered_count')
+    ).select_from(UserRaceRegistration)\
+     .join(User, User.id == UserRaceRegistration.user_id)\
+     .outerjoin(answered_counts, answered_counts.c.user_id == UserRaceRegistration.user_id)\
+     .filter(*criteria)
+    if cursor:
+        query = query.filter(_after_key(sort_columns, _decode_cursor(cursor, sort, order)))
+    query = query.order_by(*[column.desc() if is_desc else column.asc() for column, is_desc in sort_columns])
+
+    rows = query.limit(limit + 1).all()
+    participants = [{
+        'user_id': row.user_id,
+        'username': row.username,
+        'has_answered': row.answered_count > 0,
+        'answered_questions_count': row.answered_count,
+    } for row in rows[:limit]]
+    next_cursor = _encode_cursor(sort, order, participants[-1]) if len(rows) > limit else None
+
+    total = db.session.query(func.count(UserRaceRegistration.id))\
+        .join(User, User.id == UserRaceRegistration.user_id)\
+        .filter(*criteria).scalar()
+    return {'participants': participants, 'total': total, 'next_cursor': next_cursor}
@@ -0,0 +1,185 @@
+"""
+Quiniela close scheduler.
+
+A PLANNED race becomes ACTIVE when its quiniela_close_date passes. Instead of sweeping every
+PLANNED race on each dashboard load, the scheduler keeps a min-heap of (quiniela_close_date,
+race_id), loaded from the database when it starts and updated when races are created, edited or
+deleted, and arms a single timer for the earliest close date.
+
+When the timer fires, every due race is flipped in one bulk UPDATE (conditioned on status PLANNED,
+so several worker processes can run a scheduler safely) and the close hooks registered with
+on_close() receive the ids of the races that this process transitioned.
+
+The heap only decides when to wake up: the UPDATE selects due races in the database, so races
+created by other processes are still closed on time, at the latest after RACE_SCHEDULER_RESYNC_SECONDS,
+when the heap is reloaded.
+
+The scheduler starts on the first request (never before a gunicorn fork). With
+RACE_SCHEDULER_ENABLED (defaults to not TESTING) set to False no timer is armed; run_due() can
+still be called directly.
+"""
+import heapq
+import threading
+from datetime import datetime
+
+from sqlalchemy import update
+
+from backend.models import db, Race, RaceStatus
+
+
+class RaceCloseScheduler:
+    """Min-heap of quiniela close dates with a timer for the earliest one."""
+
+    def __init__(self, app, resync_seconds=300):
+        """
+        Args:
+            app (Flask): Application whose context the timer runs in.
+            resync_seconds (int): Max sleep between wake-ups, overridable with RACE_SCHEDULER_RESYNC_SECONDS.
+        """
+        self.app = app
+        self.resync_seconds = resync_seconds
+        self._heap = [] # [(quiniela_close_date, race_id)]
+        self._close_dates = {} # {race_id: quiniela_close_date}; heap entries that disagree are stale
+        self._hooks = []
+        self._lock = threading.RLock()
+        self._timer = None
+        self._started = False
+
+    def _is_enabled(self):
+        return self.app.config.get('RACE_SCHEDULER_ENABLED', not self.app.config.get('TESTING', False))
+
+    # --- Hooks ---
+
+    def on_close(self, hook):
+        """Registers hook(race_ids) to run after races are transitioned to ACTIVE. Usable as a decorator."""
+        self._hooks.append(hook)
+        return hook
+
+    # --- Heap maintenance ---
+
+    def schedule(self, race_id, close_date):
+        """Schedules (or reschedules) the close of a race. A None close date unschedules it."""
+        with self._lock:
+            if close_date is None:
+                self._close_dates.pop(race_id, None)
+            else:
+                self._close_dates[race_id] = close_date
+                heapq.heappush(self._heap, (close_date, race_id))
+        self._rearm()
+
+    def unschedule(self, race_id):
+        self.schedule(race_id, None)
+
+    def next_close(self):
+        """(close_date, race_id) of the earliest scheduled close, or None. Drops stale heap entries."""
+        with self._lock:
+            while self._heap:
+                close_date, race_id = self._heap[0]
+                if self._close_dates.get(race_id) == close_date:
+                    return close_date, race_id
+                heapq.heappop(self._heap)
+            return None
+
+    def load(self):
+        """(Re)builds the heap from the PLANNED, non deleted races that have a close date."""
+        rows = db.session.query(Race.id, Race.quiniela_close_date).filter(
+            Race.status == RaceStatus.PLANNED,
+            Race.is_deleted == False,
+            Race.quiniela_close_date.isnot(None)
+        ).all()
+        with self._lock:
+            self._close_dates = {row.id: row.quiniela_close_date for row in rows}
+            self._heap = [(close_date, race_id) for race_id, close_date in self._close_dates.items()]
+            heapq.heapify(self._heap)
+        return len(rows)
+
+    # --- Transitions ---
+
+    def run_due(self, now=None):
+        """
+        Flips every PLANNED race whose close date has passed to ACTIVE in one bulk UPDATE and runs the close hooks.
+
+        Returns:
+            list: Ids of the races transitioned by this call.
+        """
+        now = now or datetime.utcnow()
+        due_filter = (
+            Race.status == RaceStatus.PLANNED,
+            Race.is_deleted == False,
+            Race.quiniela_close_date.isnot(None),
+            Race.quiniela_close_date <= now
+        )
+        try:
+            if db.engine.dialect.update_returning:
+                result = db.session.execute(
+                    update(Race).where(*due_filter).values(status=RaceStatus.ACTIVE).returning(Race.id)
+                )
+                closed_race_ids = [row.id for row in result]
+            else:
+                closed_race_ids = [row.id for row in db.session.query(Race.id).filter(*due_filter).all()]
+                if closed_race_ids:
+                    db.session.query(Race).filter(Race.id.in_(closed_race_ids), *due_filter)\
+                        .update({Race.status: RaceStatus.ACTIVE}, synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            self.app.logger.error(f"Error closing due quinielas: {e}", exc_info=True)
+            return []
+
+        with self._lock:
+            for race_id in closed_race_ids:
+                self._close_dates.pop(race_id, None)
+            # Las entradas vencidas que otro proceso ya cerró tampoco hacen falta
+            for race_id, close_date in list(self._close_dates.items()):
+                if close_date <= now:
+                    self._close_dates.pop(race_id)
+
+        if closed_race_ids:
+            self.app.logger.info(f"Quiniela closed for races {closed_race_ids}: status PLANNED -> ACTIVE")
+            for hook in self._hooks:
+                try:
+                    hook(closed_race_ids)
+                except Exception as e:
+                    self.app.logger.error(f"Race close hook {getattr(hook, '__name__', hook)} failed: {e}", exc_info=True)
+        return closed_race_ids
+
+    # --- Timer ---
+
+    def ensure_started(self):
+        """Loads the heap, closes anything already due and arms the timer. Only the first call does work."""
+        if self._started or not self._is_enabled():
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self._tick()
+
+    def _rearm(self):
+        if not self._started:
+            return
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            next_close = self.next_close()
+            max_delay = self.app.config.get('RACE_SCHEDULER_RESYNC_SECONDS', self.resync_seconds)
+            delay = max_delay
+            if next_close is not None:
+                delay = min(max_delay, max(0.0, (next_close[0] - datetime.utcnow()).total_seconds()))
+            self._timer = threading.Timer(delay, self._run_in_app_context)
+            self._timer.daemon = True
+            self._timer.name = 'race-close-scheduler'
+            self._timer.start()
+
+    def _tick(self):
+        self.run_due()
+        self.load()
+        self._rearm()
+
+    def _run_in_app_context(self):
+        with self.app.app_context():
+            try:
+                self._tick()
+            except Exception as e:
+                self.app.logger.error(f"Race close scheduler tick failed: {e}", exc_info=True)
+                self._rearm()
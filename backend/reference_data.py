@@ -0,0 +1,157 @@
+"""
+In-process registry of reference data: Role, QuestionType, RaceFormat and Segment.
+
+These tables are tiny and only written by the seed commands (backend/seed.py), but they are
+read everywhere: current_user.role.code on almost every request (a lazy Role load), question
+type names in the question endpoints (a lazy QuestionType load per question) and the race
+format list on every dashboard view. The scorers keep reading question.question_type (they
+also take plain objects) and load it eagerly.
+
+ReferenceData is an immutable snapshot of the four tables (read-only mappings and tuples of
+namedtuples), loaded in four queries. The registry loads it once (on the first request, see
+app.py) and swaps in a new snapshot on refresh(); readers never lock.
+
+The seed commands call refresh() after committing, but that only reloads the registry of the
+seeding process: running servers keep their snapshot. A lookup that misses checks the single
+missing row in the database (one primary key or unique column query) and reloads the snapshot
+only if the row exists, so rows seeded elsewhere are found on first use and a bogus id costs one
+small query, never a reload. The full lists (race_formats(), segments()) are not reloaded on
+their own: new formats or segments show up in other processes after one of their lookups
+misses, or on restart.
+
+User.role_entry/role_code and Question.type_name read through the registry, so templates and request
+handlers get codes and names without touching the relationships.
+"""
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+
+from backend.models import db, Role, QuestionType, RaceFormat, Segment
+
+# Rows as the templates/APIs render them (.id, .code/.name, ...)
+RoleEntry = namedtuple('RoleEntry', ['id', 'code', 'description'])
+RaceFormatEntry = namedtuple('RaceFormatEntry', ['id', 'name'])
+SegmentEntry = namedtuple('SegmentEntry', ['id', 'name'])
+
+
+class ReferenceData:
+    """Immutable snapshot of the reference tables."""
+
+    def __init__(self, roles, question_types, race_formats, segments):
+        """
+        Args:
+            roles (iterable): RoleEntry.
+            question_types (dict): {question_type_id: name}
+            race_formats (iterable): RaceFormatEntry, ordered by name.
+            segments (iterable): SegmentEntry, ordered by id.
+        """
+        self.roles = MappingProxyType({entry.id: entry for entry in roles})
+        self.role_ids = MappingProxyType({entry.code: entry.id for entry in self.roles.values()})
+        self.question_type_names = MappingProxyType(dict(question_types))
+        self.question_type_ids = MappingProxyType({name: type_id for type_id, name in question_types.items()})
+        self.race_formats = tuple(race_formats)
+        self.segments = tuple(segments)
+        self._race_formats_by_id = MappingProxyType({entry.id: entry for entry in self.race_formats})
+        self._segments_by_id = MappingProxyType({entry.id: entry for entry in self.segments})
+
+    @classmethod
+    def load(cls):
+        """Reads the four tables (one query each)."""
+        return cls(
+            [RoleEntry(*row) for row in db.session.query(Role.id, Role.code, Role.description)],
+            dict(db.session.query(QuestionType.id, QuestionType.name).all()),
+            [RaceFormatEntry(*row) for row in db.session.query(RaceFormat.id, RaceFormat.name).order_by(RaceFormat.name)],
+            [SegmentEntry(*row) for row in db.session.query(Segment.id, Segment.name).order_by(Segment.id)],
+        )
+
+    def race_format(self, race_format_id):
+        return self._race_formats_by_id.get(race_format_id)
+
+    def segment(self, segment_id):
+        return self._segments_by_id.get(segment_id)
+
+
+class ReferenceDataRegistry:
+    """Holds the current ReferenceData snapshot; lookups refresh it on a miss if the row exists."""
+
+    def __init__(self):
+        self._snapshot = None
+        self._lock = threading.Lock() # Only loads/refreshes; reads use the current snapshot
+
+    @property
+    def is_loaded(self):
+        return self._snapshot is not None
+
+    def snapshot(self):
+        """Current snapshot, loaded on first use. Needs an app context."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = ReferenceData.load()
+                snapshot = self._snapshot
+        return snapshot
+
+    def refresh(self):
+        """Reloads the snapshot (after seeding, or when a missed row exists). Returns the new one."""
+        snapshot = ReferenceData.load()
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+    def clear(self):
+        with self._lock:
+            self._snapshot = None
+
+    def _lookup(self, read, model, criterion):
+        """
+        Reads a value from the snapshot. On a miss, reloads the snapshot only if the row matching
+        `criterion` exists in the database (added after the snapshot was loaded).
+        """
+        value = read(self.snapshot())
+        if value is None and db.session.query(model.id).filter(criterion).first() is not None:
+            value = read(self.refresh())
+        return value
+
+    def role(self, role_id):
+        """RoleEntry of an id (code 'ADMIN', 'LEAGUE_ADMIN' or 'PLAYER'), or None."""
+        if role_id is None:
+            return None
+        return self._lookup(lambda snapshot: snapshot.roles.get(role_id), Role, Role.id == role_id)
+
+    def role_code(self, role_id):
+        role = self.role(role_id)
+        return role.code if role else None
+
+    def role_id(self, code):
+        return self._lookup(lambda snapshot: snapshot.role_ids.get(code), Role, Role.code == code)
+
+    def question_type_name(self, question_type_id):
+        """Name of a question type ('FREE_TEXT', 'MULTIPLE_CHOICE', ...), or None if it does not exist."""
+        if question_type_id is None:
+            return None
+        return self._lookup(lambda snapshot: snapshot.question_type_names.get(question_type_id),
+                            QuestionType, QuestionType.id == question_type_id)
+
+    def question_type_id(self, name):
+        return self._lookup(lambda snapshot: snapshot.question_type_ids.get(name), QuestionType, QuestionType.name == name)
+
+    def race_format(self, race_format_id):
+        """RaceFormatEntry of an id, or None."""
+        return self._lookup(lambda snapshot: snapshot.race_format(race_format_id), RaceFormat, RaceFormat.id == race_format_id)
+
+    def segment(self, segment_id):
+        """SegmentEntry of an id, or None."""
+        return self._lookup(lambda snapshot: snapshot.segment(segment_id), Segment, Segment.id == segment_id)
+
+    def race_formats(self):
+        """Every race format, ordered by name."""
+        return self.snapshot().race_formats
+
+    def segments(self):
+        """Every segment, ordered by id."""
+        return self.snapshot().segments
+
+
+# One registry per process (the tables are global reference data, not per app)
+reference_data = ReferenceDataRegistry()
@@ -0,0 +1,362 @@
+"""
+Compiled per-race scoring.
+
+A CompiledRaceScorer is built once from the Question and OfficialAnswer rows of a race.
+For every question that has an official answer it precompiles a small closure with the
+official values already prepared (option-id sets, lowercased ordering lists, slider thresholds),
+so scoring an answer is a dictionary lookup plus a function call: no ORM access and no
+dispatch on question_type.name per answer.
+
+Scoring rules (single source of truth for the rescore, the participant answers API and the
+questions API):
+    FREE_TEXT        case-insensitive, stripped equality -> max_score_free_text
+    MULTIPLE_CHOICE  single: selected option == official option -> total_score_mc_single
+                     multiple: +points_per_correct_mc per correct pick, and each incorrect pick
+                     is penalised with abs(points_per_incorrect_mc), whatever sign it was stored with
+    ORDERING         points_per_correct_order per matching position (comma separated texts,
+                     case-insensitive) + bonus_for_full_order on a full match
+    SLIDER           slider_points_exact on an exact match, slider_points_partial within
+                     slider_threshold_partial
+"""
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, selectinload
+
+from backend.models import db, Question, QuestionOption, OfficialAnswer
+
+try:
+    import numpy as np
+except ImportError:  # numpy es opcional: sin él total_scores usa las closures fila a fila
+    np = None
+
+SLIDER_EPSILON = 1e-9  # Para comparaciones de coma flotante en preguntas SLIDER
+
+
+def parse_ordering_list(answer_text, drop_empty=False):
+    """Splits a comma-separated ordering answer into a list of stripped, lowercased texts."""
+    if not answer_text:
+        return []
+    items = [text.strip().lower() for text in answer_text.split(',')]
+    if drop_empty:
+        items = [text for text in items if text]
+    return items
+
+
+def _ordering_bonus_applies(points_per_correct_order, bonus_for_full_order, num_items):
+    # Bonus only if there were items to order and they score points, or the zero-item bonus edge case
+    return (points_per_correct_order > 0 and num_items > 0) or (num_items == 0 and bonus_for_full_order > 0)
+
+
+def compile_question_scorer(question, official_answer, official_option_ids=None, official_ordering_texts=None):
+    """
+    Builds the scoring closure for one question.
+
+    Args:
+        question (Question): The question (only its scoring columns and question_type are read, once).
+        official_answer (OfficialAnswer): The official answer, or None.
+        official_option_ids (iterable, optional): Official option ids for MC-multiple questions.
+            Defaults to the ids in official_answer.official_selected_mc_options.
+        official_ordering_texts (list, optional): Lowercased official ordering list.
+            Defaults to parsing official_answer.answer_text.
+    Returns:
+        callable: fn(answer_text, selected_option_id, slider_value, selected_option_ids) -> (points, is_correct),
+        or None when the question has no official answer and nothing can be scored.
+    """
+    if official_answer is None:
+        return None
+
+    question_type_name = question.question_type.name
+
+    if question_type_name == 'FREE_TEXT':
+        official_text = official_answer.answer_text
+        official_normalized = official_text.strip().lower() if official_text else None
+        points = question.max_score_free_text or 0
+
+        def score_free_text(answer_text, selected_option_id, slider_value, selected_option_ids):
+            if official_text and answer_text and answer_text.strip().lower() == official_normalized:
+                return points, True
+            return 0, False
+        return score_free_text
+
+    if question_type_name == 'MULTIPLE_CHOICE':
+        if question.is_mc_multiple_correct:
+            if official_option_ids is None:
+                official_option_ids = [sel.question_option_id for sel in official_answer.official_selected_mc_options]
+            official_ids = frozenset(official_option_ids)
+            per_correct = question.points_per_correct_mc or 0
+            penalty = abs(question.points_per_incorrect_mc or 0)
+
+            def score_mc_multiple(answer_text, selected_option_id, slider_value, selected_option_ids):
+                user_ids = set(selected_option_ids or ())
+                hits = len(user_ids & official_ids)
+                points = hits * per_correct - (len(user_ids) - hits) * penalty
+                return points, (user_ids == official_ids and bool(official_ids))
+            return score_mc_multiple
+
+        official_option_id = official_answer.selected_option_id
+        points_single = question.total_score_mc_single or 0
+
+        def score_mc_single(answer_text, selected_option_id, slider_value, selected_option_ids):
+            if selected_option_id and selected_option_id == official_option_id:
+                return points_single, True
+            return 0, False
+        return score_mc_single
+
+    if question_type_name == 'ORDERING':
+        if official_ordering_texts is None:
+            official_ordering_texts = parse_ordering_list(official_answer.answer_text, drop_empty=True)
+        official_texts = tuple(official_ordering_texts)
+        num_items = len(official_texts)
+        per_position = question.points_per_correct_order or 0
+        bonus = question.bonus_for_full_order or 0
+        full_order_bonus = bonus if _ordering_bonus_applies(per_position, bonus, num_items) else 0
+
+        def score_ordering(answer_text, selected_option_id, slider_value, selected_option_ids):
+            user_texts = parse_ordering_list(answer_text)
+            if not user_texts or not official_texts:
+                return 0, False
+            matches = sum(1 for user_text, official in zip(user_texts, official_texts) if user_text == official)
+            is_full_match = matches == num_items and len(user_texts) == num_items
+            points = matches * per_position + (full_order_bonus if is_full_match else 0)
+            return points, is_full_match
+        return score_ordering
+
+    if question_type_name == 'SLIDER':
+        official_value = official_answer.correct_slider_value
+        points_exact = question.slider_points_exact
+        threshold_partial = question.slider_threshold_partial
+        points_partial = question.slider_points_partial
+        partial_enabled = threshold_partial is not None and threshold_partial >= 0 and \
+                          points_partial is not None and points_partial >= 0
+        partial_limit = (threshold_partial + SLIDER_EPSILON) if partial_enabled else None
+
+        def score_slider(answer_text, selected_option_id, slider_value, selected_option_ids):
+            if slider_value is None or official_value is None:
+                return 0, False
+            diff = abs(slider_value - official_value)
+            if diff < SLIDER_EPSILON:  # Exact match
+                if points_exact is not None:
+                    return points_exact, points_exact > 0
+                return 0, False
+            if partial_enabled and diff <= partial_limit:  # Partial match
+                return points_partial, points_partial > 0
+            return 0, False
+        return score_slider
+
+    return None
+
+
+def _columnar_params(question, official_answer):
+    """
+    Official values for the question types that can be scored column-wise (SLIDER and MC single).
+    Returns a tuple (kind, params) or None when the question must go through its closure.
+    """
+    question_type_name = question.question_type.name
+    if question_type_name == 'SLIDER':
+        points_partial = question.slider_points_partial
+        threshold_partial = question.slider_threshold_partial
+        partial_enabled = threshold_partial is not None and threshold_partial >= 0 and \
+                          points_partial is not None and points_partial >= 0
+        return 'SLIDER', (
+            official_answer.correct_slider_value,
+            question.slider_points_exact or 0,  # points_exact None -> 0 points, same as the closure
+            (threshold_partial + SLIDER_EPSILON) if partial_enabled else None,
+            points_partial if partial_enabled else 0,
+        )
+    if question_type_name == 'MULTIPLE_CHOICE' and not question.is_mc_multiple_correct:
+        return 'MC_SINGLE', (official_answer.selected_option_id, question.total_score_mc_single or 0)
+    return None
+
+
+def _score_slider_column(values, official_value, points_exact, partial_limit, points_partial):
+    # None -> NaN: NaN never compares as an exact or partial match
+    values = np.asarray(values, dtype=float)
+    diff = np.abs(values - official_value)
+    exact = diff < SLIDER_EPSILON
+    points = np.where(exact, points_exact, 0)
+    correct = exact & (points_exact > 0)
+    if partial_limit is not None:
+        partial = ~exact & (diff <= partial_limit)
+        points = np.where(partial, points_partial, points)
+        correct = correct | (partial & (points_partial > 0))
+    return points, correct
+
+
+def _score_mc_single_column(option_ids, official_option_id, points_single):
+    # None/0 (sin selección) nunca coincide con un id de opción real
+    option_ids = np.asarray([option_id or 0 for option_id in option_ids], dtype=np.int64)
+    correct = option_ids == official_option_id
+    return np.where(correct, points_single, 0), correct
+
+
+class CompiledRaceScorer:
+    """Per-race scorer compiled once from the race's questions and official answers."""
+
+    def __init__(self, race_id, questions, official_answers, option_counts=None):
+        self.race_id = race_id
+        self.question_types = {}          # {question_id: type name}
+        self.official_answers = {}        # {question_id: OfficialAnswer}
+        self.official_option_ids = {}     # {question_id: frozenset(option ids)} for MC-multiple
+        self.official_ordering_texts = {} # {question_id: [lowercased texts]} for ORDERING
+        self.max_points = {}              # {question_id: max points possible}
+        self._scorers = {}                # {question_id: compiled closure}
+        self._columnar = {}               # {question_id: (kind, params)} for SLIDER / MC single
+        self.questions = list(questions)
+
+        option_counts = option_counts or {}
+        official_by_question = {oa.question_id: oa for oa in official_answers}
+
+        for question in questions:
+            type_name = question.question_type.name
+            official_answer = official_by_question.get(question.id)
+            self.question_types[question.id] = type_name
+
+            if official_answer is not None:
+                self.official_answers[question.id] = official_answer
+                if type_name == 'MULTIPLE_CHOICE' and question.is_mc_multiple_correct:
+                    self.official_option_ids[question.id] = frozenset(
+                        sel.question_option_id for sel in official_answer.official_selected_mc_options
+                    )
+                elif type_name == 'ORDERING':
+                    self.official_ordering_texts[question.id] = parse_ordering_list(official_answer.answer_text, drop_empty=True)
+
+                scorer = compile_question_scorer(
+                    question, official_answer,
+                    official_option_ids=self.official_option_ids.get(question.id),
+                    official_ordering_texts=self.official_ordering_texts.get(question.id)
+                )
+                if scorer is not None:
+                    self._scorers[question.id] = scorer
+                columnar = _columnar_params(question, official_answer)
+                if columnar is not None and columnar[1][0] is not None:  # Sin valor oficial no hay nada que puntuar
+                    self._columnar[question.id] = columnar
+
+            self.max_points[question.id] = self._compute_max_points(question, type_name, official_answer, option_counts.get(question.id, 0))
+
+    def _compute_max_points(self, question, type_name, official_answer, option_count):
+        if type_name == 'FREE_TEXT':
+            return question.max_score_free_text or 0
+        if type_name == 'MULTIPLE_CHOICE':
+            if question.is_mc_multiple_correct:
+                return len(self.official_option_ids.get(question.id, ())) * (question.points_per_correct_mc or 0)
+            return question.total_score_mc_single or 0
+        if type_name == 'ORDERING':
+            # Sin respuesta oficial todavía, se usa el número de opciones de la pregunta
+            num_items = len(self.official_ordering_texts[question.id]) if official_answer is not None else option_count
+            per_position = question.points_per_correct_order or 0
+            bonus = question.bonus_for_full_order or 0
+            max_pts = per_position * num_items
+            if _ordering_bonus_applies(per_position, bonus, num_items):
+                max_pts += bonus
+            return max_pts
+        if type_name == 'SLIDER':
+            return question.slider_points_exact or 0
+        return 0
+
+    @classmethod
+    def for_race(cls, race_id):
+        """Loads questions (+type), official answers (+MC selections) and option counts in a fixed number of queries."""
+        questions = Question.query.options(joinedload(Question.question_type))\
+                                  .filter_by(race_id=race_id).order_by(Question.id).all()
+        official_answers = OfficialAnswer.query.options(selectinload(OfficialAnswer.official_selected_mc_options))\
+                                               .filter_by(race_id=race_id).all()
+        option_counts = dict(
+            db.session.query(QuestionOption.question_id, func.count(QuestionOption.id))
+            .join(Question, Question.id == QuestionOption.question_id)
+            .filter(Question.race_id == race_id)
+            .group_by(QuestionOption.question_id)
+            .all()
+        )
+        return cls(race_id, questions, official_answers, option_counts)
+
+    def release_rows(self):
+        """Drops the ORM rows the scorer was built from (questions, official answers); scoring only needs the compiled values."""
+        self.questions = []
+        self.official_answers = dict.fromkeys(self.official_answers)
+
+    def has_official_answer(self, question_id):
+        return question_id in self.official_answers
+
+    def score(self, question_id, answer_text=None, selected_option_id=None, slider_value=None, selected_option_ids=()):
+        """Scores raw answer values for one question. Returns (points, is_correct)."""
+        scorer = self._scorers.get(question_id)
+        if scorer is None:
+            return 0, False
+        return scorer(answer_text, selected_option_id, slider_value, selected_option_ids)
+
+    def score_answer(self, user_answer):
+        """Scores a UserAnswer ORM object. Returns (points, is_correct)."""
+        if user_answer is None:
+            return 0, False
+        scorer = self._scorers.get(user_answer.question_id)
+        if scorer is None:
+            return 0, False
+        selected_option_ids = ()
+        if user_answer.question_id in self.official_option_ids:
+            selected_option_ids = [sel.question_option_id for sel in user_answer.selected_mc_options]
+        return scorer(user_answer.answer_text, user_answer.selected_option_id, user_answer.slider_answer_value, selected_option_ids)
+
+    def score_breakdown(self, answer_rows, user_ids, mc_selections=None):
+        """
+        Scores many answers at once.
+
+        With numpy available, SLIDER and MC-single answers are gathered into one column per
+        question, scored with abs/where and reduced per user with bincount; the remaining
+        question types go through their compiled closures.
+
+        Args:
+            answer_rows (iterable): Rows exposing user_id, question_id, answer_text,
+                selected_option_id and slider_answer_value.
+            user_ids (iterable): Users to score. Rows of any other user are ignored.
+            mc_selections (dict, optional): {user_answer_id: [option ids]} for MC-multiple answers
+                (rows must then also expose id).
+        Returns:
+            tuple: ({user_id: total points}, [(user_id, question_id, points, is_correct), ...]).
+            Totals include 0 for users without scorable answers; the breakdown has one entry
+            per scored answer.
+        """
+        mc_selections = mc_selections or {}
+        user_ids = list(user_ids)
+        user_index = {user_id: index for index, user_id in enumerate(user_ids)}
+        totals = [0] * len(user_ids)
+        breakdown = []
+        columns = {}  # {question_id: ([user index], [value])}
+
+        for row in answer_rows:
+            index = user_index.get(row.user_id)
+            if index is None:
+                continue
+            question_id = row.question_id
+            if np is not None and question_id in self._columnar:
+                kind = self._columnar[question_id][0]
+                index_column, value_column = columns.setdefault(question_id, ([], []))
+                index_column.append(index)
+                value_column.append(row.slider_answer_value if kind == 'SLIDER' else row.selected_option_id)
+                continue
+            scorer = self._scorers.get(question_id)
+            if scorer is None:
+                continue
+            selected_option_ids = mc_selections.get(row.id, ()) if question_id in self.official_option_ids else ()
+            points, is_correct = scorer(row.answer_text, row.selected_option_id, row.slider_answer_value, selected_option_ids)
+            totals[index] += points
+            breakdown.append((row.user_id, question_id, points, is_correct))
+
+        if columns:
+            column_totals = np.zeros(len(user_ids))
+            for question_id, (index_column, value_column) in columns.items():
+                kind, params = self._columnar[question_id]
+                if kind == 'SLIDER':
+                    points, correct = _score_slider_column(value_column, *params)
+                else:
+                    points, correct = _score_mc_single_column(value_column, *params)
+                column_totals += np.bincount(index_column, weights=points, minlength=len(user_ids))
+                breakdown.extend(
+                    (user_ids[index], question_id, int(row_points), bool(row_correct))
+                    for index, row_points, row_correct in zip(index_column, points.tolist(), correct.tolist())
+                )
+            totals = [total + int(round(column_total)) for total, column_total in zip(totals, column_totals.tolist())]
+
+        return dict(zip(user_ids, totals)), breakdown
+
+    def total_scores(self, answer_rows, user_ids, mc_selections=None):
+        """Same as score_breakdown, returning only {user_id: total points}."""
+        return self.score_breakdown(answer_rows, user_ids, mc_selections)[0]
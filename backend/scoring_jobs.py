@@ -0,0 +1,306 @@
+"""
+Background scoring jobs.
+
+Saving official answers no longer rescores inside the request: it enqueues a ScoringJob and
+returns its id. Jobs are stored in the scoring_jobs table (status and result message, so any
+worker process can report on them) and are processed by a small in-process thread pool.
+
+While a job for a race is still PENDING, new requests for the same race are merged into it
+(coalescing): their changed question ids are added to the job, and a full rescore request
+absorbs everything. The merge locks the pending row and only writes if the job's
+coalesced_requests (its version) is still the one it read, so two processes merging at once
+never overwrite each other's questions: the loser re-reads and merges again.
+
+Jobs of the same race never run at the same time, in any process: a RUNNING job is the race's
+lease. A job is claimed (PENDING -> RUNNING) with the race row locked (SELECT ... FOR UPDATE)
+and only if no other job of the race is RUNNING; otherwise it stays PENDING and the worker
+holding the lease runs it once its own job finishes.
+
+Jobs can be orphaned by a worker that stops (restart, crash, deploy) with a job queued in its
+pool or running. recover_stale_jobs(), run once per process on its first request, resubmits the
+PENDING jobs older than SCORING_JOB_PENDING_GRACE_SECONDS and fails the RUNNING ones started
+more than SCORING_JOB_STALE_SECONDS ago, requeueing their questions. A stale lease found while
+claiming is taken over the same way, and enqueue() resubmits a stale pending job it merges into.
+
+A failed job is not retried on its own (the failure may be permanent), but its questions are
+not lost: while the last finished job of a race is FAILED, the next job claimed for the race
+rescores the whole race instead of its own questions. That is the next request already queued,
+or the next one made (saving unchanged official answers queues a full rescore).
+
+With SCORING_JOBS_EAGER (defaults to TESTING) jobs run inline, inside the enqueuing request.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from backend.models import db, Race, ScoringJob, ScoringJobStatus
+
+
+def merge_question_ids(current, new):
+    """Union of two changed-question lists. None means the whole race and absorbs the other one."""
+    if current is None or new is None:
+        return None
+    return sorted(set(current) | set(new))
+
+
+class ScoringJobQueue:
+    """Queue of ScoringJob rows, processed by an in-process thread pool and leased per race in the database."""
+
+    def __init__(self, app, score_race, max_workers=2, stale_seconds=900, pending_grace_seconds=60):
+        """
+        Args:
+            app (Flask): Application whose context the workers run in.
+            score_race (callable): fn(race_id, question_ids=None) -> {"success": bool, "message": str}.
+            max_workers (int): Pool size, overridable with the SCORING_JOBS_MAX_WORKERS setting.
+            stale_seconds (int): A RUNNING job started longer ago is considered dead
+                (SCORING_JOB_STALE_SECONDS). Must exceed the longest rescore.
+            pending_grace_seconds (int): A PENDING job created longer ago is considered orphaned
+                (SCORING_JOB_PENDING_GRACE_SECONDS).
+        """
+        self.app = app
+        self.score_race = score_race
+        self.max_workers = max_workers
+        self.stale_seconds = stale_seconds
+        self.pending_grace_seconds = pending_grace_seconds
+        self._executor = None # Created with the first job (never before a gunicorn fork)
+        self._lock = threading.Lock() # Coalescing, executor creation and recovery
+        self._recovered = False
+
+    def _is_eager(self):
+        return self.app.config.get('SCORING_JOBS_EAGER', self.app.config.get('TESTING', False))
+
+    def _stale_before(self):
+        return datetime.utcnow() - timedelta(seconds=self.app.config.get('SCORING_JOB_STALE_SECONDS', self.stale_seconds))
+
+    def _pending_before(self):
+        return datetime.utcnow() - timedelta(seconds=self.app.config.get('SCORING_JOB_PENDING_GRACE_SECONDS', self.pending_grace_seconds))
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.app.config.get('SCORING_JOBS_MAX_WORKERS', self.max_workers),
+                    thread_name_prefix='scoring-job'
+                )
+            return self._executor
+
+    def _submit(self, job_id):
+        if self._is_eager():
+            self.run_job(job_id)
+        else:
+            self._get_executor().submit(self._run_in_app_context, job_id)
+
+    def enqueue(self, race_id, question_ids=None, requested_by_id=None):
+        """
+        Queues a rescore of a race, or merges it into the race's pending job.
+
+        Args:
+            race_id (int): The race to score.
+            question_ids (iterable, optional): Questions whose official answer changed. None rescores the whole race.
+            requested_by_id (int, optional): User who triggered the rescore.
+        Returns:
+            ScoringJob: The new or coalesced job.
+        """
+        question_ids = sorted(set(question_ids)) if question_ids is not None else None
+
+        with self._lock:
+            while True:
+                # Merged with the pending row locked; the version check below covers databases without FOR UPDATE
+                pending_job = ScoringJob.query.filter_by(race_id=race_id, status=ScoringJobStatus.PENDING)\
+                                              .order_by(ScoringJob.id).with_for_update().populate_existing().first()
+                if pending_job is None:
+                    break
+                seen_requests = pending_job.coalesced_requests
+                merged_question_ids = merge_question_ids(pending_job.question_ids, question_ids)
+                # Conditional update: if a worker claimed the job, or another process merged into it
+                # (coalesced_requests is the job's version), nothing is written and the merge is retried
+                merged = db.session.query(ScoringJob).filter(
+                    ScoringJob.id == pending_job.id,
+                    ScoringJob.status == ScoringJobStatus.PENDING,
+                    ScoringJob.coalesced_requests == seen_requests
+                ).update({
+                    ScoringJob.question_ids: merged_question_ids,
+                    ScoringJob.coalesced_requests: seen_requests + 1
+                }, synchronize_session=False)
+                db.session.commit()
+                if not merged:
+                    continue
+                self.app.logger.info(f"Scoring request for race {race_id} coalesced into pending job {pending_job.id}")
+                if pending_job.created_at < self._pending_before():
+                    # Nobody picked it up in time (its worker may be gone): make sure it runs
+                    self.app.logger.warning(f"Pending scoring job {pending_job.id} is stale, resubmitting it")
+                    self._submit(pending_job.id)
+                return pending_job
+
+            job = ScoringJob(race_id=race_id, requested_by_id=requested_by_id, question_ids=question_ids,
+                             status=ScoringJobStatus.PENDING)
+            db.session.add(job)
+            db.session.commit()
+            job_id = job.id
+
+        self.app.logger.info(f"Scoring job {job_id} queued for race {race_id}")
+        self._submit(job_id)
+        return job
+
+    def _run_in_app_context(self, job_id):
+        with self.app.app_context():
+            try:
+                self.run_job(job_id)
+            except Exception as e:
+                self.app.logger.error(f"Scoring job {job_id} crashed: {e}", exc_info=True)
+
+    def _fail_stale(self, job, message):
+        """Marks a stale RUNNING job FAILED (conditionally: it may have just finished). Returns True if it did."""
+        return db.session.query(ScoringJob).filter(
+            ScoringJob.id == job.id,
+            ScoringJob.status == ScoringJobStatus.RUNNING
+        ).update({
+            ScoringJob.status: ScoringJobStatus.FAILED,
+            ScoringJob.message: message,
+            ScoringJob.finished_at: datetime.utcnow()
+        }, synchronize_session=False) > 0
+
+    def _claim(self, job_id):
+        """
+        Takes the race's lease for a PENDING job (PENDING -> RUNNING).
+
+        Returns:
+            ScoringJob | None: The claimed job, or None if it is no longer pending or another job
+            of the race is running (it stays PENDING and runs after that one).
+        """
+        job = db.session.get(ScoringJob, job_id)
+        if job is None or job.status != ScoringJobStatus.PENDING:
+            db.session.rollback()
+            return None
+
+        # Claims of the same race are serialized on the race row (SQLite serializes writers anyway)
+        db.session.query(Race.id).filter(Race.id == job.race_id).with_for_update().first()
+        running_job = ScoringJob.query.filter(
+            ScoringJob.race_id == job.race_id,
+            ScoringJob.status == ScoringJobStatus.RUNNING
+        ).first()
+        question_ids = job.question_ids
+        if running_job is not None:
+            if running_job.started_at is None or running_job.started_at >= self._stale_before():
+                db.session.rollback()
+                self.app.logger.info(f"Scoring job {job_id} waits for running job {running_job.id} of race {job.race_id}")
+                return None
+            # Its worker is gone: this job takes over the lease and the questions it did not finish
+            self._fail_stale(running_job, f"Interrupted: stale, taken over by job {job_id}")
+            question_ids = merge_question_ids(question_ids, running_job.question_ids)
+            self.app.logger.warning(f"Scoring job {running_job.id} of race {job.race_id} is stale, taken over by job {job_id}")
+
+        if question_ids is not None and self._last_run_failed(job.race_id, job_id):
+            # The questions of the failed run were never rescored: this job rescores the whole race
+            question_ids = None
+            self.app.logger.warning(f"Last scoring job of race {job.race_id} failed, job {job_id} rescores the whole race")
+
+        claimed = db.session.query(ScoringJob).filter(
+            ScoringJob.id == job_id,
+            ScoringJob.status == ScoringJobStatus.PENDING
+        ).update({
+            ScoringJob.status: ScoringJobStatus.RUNNING,
+            ScoringJob.started_at: datetime.utcnow(),
+            ScoringJob.question_ids: question_ids
+        }, synchronize_session=False)
+        db.session.commit()
+        if not claimed:
+            return None
+        # Re-read after the claim: the question ids are final once the job left PENDING
+        db.session.refresh(job)
+        return job
+
+    def _last_run_failed(self, race_id, job_id):
+        """Whether the last finished job of the race (other than job_id) failed."""
+        last_finished = ScoringJob.query.filter(
+            ScoringJob.race_id == race_id,
+            ScoringJob.id != job_id,
+            ScoringJob.status.in_([ScoringJobStatus.COMPLETED, ScoringJobStatus.FAILED])
+        ).order_by(ScoringJob.finished_at.desc(), ScoringJob.id.desc()).first()
+        return last_finished is not None and last_finished.status == ScoringJobStatus.FAILED
+
+    def _next_pending(self, race_id):
+        job = ScoringJob.query.filter_by(race_id=race_id, status=ScoringJobStatus.PENDING)\
+                              .order_by(ScoringJob.id).first()
+        return job.id if job is not None else None
+
+    def run_job(self, job_id):
+        """
+        Claims a pending job and runs it, then the jobs of the same race that were waiting for it.
+        Jobs already claimed, or whose race is leased by another running job, are skipped.
+        """
+        while job_id is not None:
+            job = self._claim(job_id)
+            if job is None:
+                return
+            race_id = job.race_id
+            try:
+                result = self.score_race(race_id, question_ids=job.question_ids)
+            except Exception as e:
+                db.session.rollback()
+                result = {"success": False, "message": f"An error occurred: {str(e)}"}
+
+            status = ScoringJobStatus.COMPLETED if result.get("success") else ScoringJobStatus.FAILED
+            # Conditional: if the job was taken over as stale meanwhile, its FAILED status is kept
+            db.session.query(ScoringJob).filter(
+                ScoringJob.id == job_id,
+                ScoringJob.status == ScoringJobStatus.RUNNING
+            ).update({
+                ScoringJob.status: status,
+                ScoringJob.message: result.get("message"),
+                ScoringJob.finished_at: datetime.utcnow()
+            }, synchronize_session=False)
+            db.session.commit()
+
+            log = self.app.logger.info if result.get("success") else self.app.logger.error
+            log(f"Scoring job {job_id} for race {race_id} finished ({status.value}): {result.get('message')}")
+            job_id = self._next_pending(race_id) # Requests that arrived while this one held the lease
+
+    def recover_stale_jobs(self):
+        """
+        Requeues the jobs left behind by stopped workers: stale RUNNING jobs are failed and their
+        questions enqueued again; PENDING jobs older than the grace period are resubmitted.
+
+        Returns:
+            list: Ids of the jobs submitted.
+        """
+        submitted = []
+        stale_running = ScoringJob.query.filter(
+            ScoringJob.status == ScoringJobStatus.RUNNING,
+            ScoringJob.started_at < self._stale_before()
+        ).all()
+        for job in stale_running:
+            race_id, question_ids = job.race_id, job.question_ids
+            if self._fail_stale(job, "Interrupted: the worker running it stopped; requeued"):
+                db.session.commit()
+                self.app.logger.warning(f"Scoring job {job.id} of race {race_id} was stale, requeueing it")
+                submitted.append(self.enqueue(race_id, question_ids=question_ids).id)
+            else:
+                db.session.rollback()
+
+        orphaned_ids = [
+            row.id for row in db.session.query(ScoringJob.id).filter(
+                ScoringJob.status == ScoringJobStatus.PENDING,
+                ScoringJob.created_at < self._pending_before()
+            ).order_by(ScoringJob.id).all()
+        ]
+        for job_id in orphaned_ids:
+            if job_id not in submitted:
+                self.app.logger.warning(f"Resubmitting orphaned pending scoring job {job_id}")
+                self._submit(job_id)
+                submitted.append(job_id)
+        return submitted
+
+    def ensure_recovered(self):
+        """Runs recover_stale_jobs() once per process (SCORING_JOBS_RECOVERY_ENABLED, default: not TESTING)."""
+        if self._recovered or not self.app.config.get('SCORING_JOBS_RECOVERY_ENABLED', not self.app.config.get('TESTING', False)):
+            return
+        with self._lock:
+            if self._recovered:
+                return
+            self._recovered = True
+        try:
+            self.recover_stale_jobs()
+        except Exception as e:
+            db.session.rollback()
+            self.app.logger.error(f"Could not recover stale scoring jobs: {e}", exc_info=True)
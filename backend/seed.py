@@ -1,6 +1,7 @@
 import os
 from flask import Flask
 from backend.models import db, Role, RaceFormat, Segment, QuestionType
+from backend.reference_data import reference_data
 
 # --- Begin: Functions moved from app.py ---
 def create_initial_roles(app):
@@ -20,6 +21,7 @@ def create_initial_roles(app):
                 print(f"Role '{role_info['description']}' with code '{role_info['code']}' already exists.")
         try:
             db.session.commit()
+            reference_data.refresh()
             print("Initial roles check and creation complete.")
         except Exception as e:
             db.session.rollback()
@@ -47,6 +49,7 @@ def create_initial_race_data(app):
         try:
             if db.session.new:
                 db.session.commit()
+                reference_data.refresh()
                 print("Initial race data seeding complete.")
             else:
                 print("Initial race data already exists or no new data was added. No commit needed for race data.")
@@ -75,6 +78,7 @@ def create_initial_question_types(app):
         try:
             if db.session.new:
                 db.session.commit()
+                reference_data.refresh()
                 print("Initial question types seeding complete.")
             else:
                 print("Initial question types already exist or no new data was added. No commit needed for question types.")
@@ -336,6 +336,8 @@ let wizardInitialQuestionIndex = null; // New global for starting index
 let wizardAllRaceQuestions = [];
 let wizardCurrentQuestionIndex = 0;
 let wizardUserAnswers = {}; // Stores answers as { question_id: { ...answer_data } }
+let wizardAnswerVersions = {}; // { question_id: versión guardada en el servidor } para el autosave
+let wizardSavedAnswerSnapshots = {}; // { question_id: JSON de la última respuesta guardada }
 
 
 // --- Function to be called from HTML to open the wizard ---
@@ -409,6 +411,9 @@ function initAndShowMainWizard() {
             }
 
             wizardUserAnswers = {}; // Reset session answers
+            wizardAnswerVersions = {};
+            wizardSavedAnswerSnapshots = {};
+            wizardAllRaceQuestions.forEach(q => { wizardAnswerVersions[q.id] = q.answer_version || 0; });
 
             // Set current question index: use wizardInitialQuestionIndex if valid, else 0
             if (wizardInitialQuestionIndex !== null && wizardInitialQuestionIndex >= 0 && wizardInitialQuestionIndex < wizardAllRaceQuestions.length) {
@@ -430,6 +435,7 @@ function initAndShowMainWizard() {
                         // or that saveCurrentWizardAnswer would produce.
                         // Example: if q.user_answer = { "answer_text": "my old text" } for a FREE_TEXT question
                         wizardUserAnswers[q.id] = q.user_answer;
+                        wizardSavedAnswerSnapshots[q.id] = JSON.stringify(q.user_answer);
                     }
                 });
             }
@@ -839,8 +845,43 @@ function saveCurrentWizardAnswer() {
     }
 }
 
+// Autosave: envía solo la pregunta que se deja si cambió desde el último guardado (PATCH con versión)
+function autosaveCurrentWizardAnswer() {
+    if (!wizardAllRaceQuestions || wizardCurrentQuestionIndex < 0 || wizardCurrentQuestionIndex >= wizardAllRaceQuestions.length) return;
+    const question = wizardAllRaceQuestions[wizardCurrentQuestionIndex];
+    const answer = question ? wizardUserAnswers[question.id] : undefined;
+    if (!answer) return;
+    const snapshot = JSON.stringify(answer);
+    if (wizardSavedAnswerSnapshots[question.id] === snapshot) return;
+
+    fetch(`/api/races/${currentRaceIdForWizard}/answers`, {
+        method: 'PATCH',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ answers: { [question.id]: { ...answer, version: wizardAnswerVersions[question.id] || 0 } } })
+    })
+    .then(response => response.json().then(data => ({ ok: response.ok, status: response.status, body: data })))
+    .then(result => {
+        if (result.status === 200) {
+            const saved = result.body.answers && result.body.answers[question.id];
+            if (saved) wizardAnswerVersions[question.id] = saved.version;
+            wizardSavedAnswerSnapshots[question.id] = snapshot;
+        } else if (result.status === 429 || result.status === 503) {
+            // Cola llena o no guardado a tiempo: sin versión nueva, se reintenta en la siguiente navegación
+            console.warn(`Autosave for question ${question.id} not applied yet (${result.status})`);
+        } else if (result.status === 409 && result.body.conflicts) {
+            // Guardada desde otra pestaña: se toma la versión actual; el guardado final decide
+            Object.entries(result.body.conflicts).forEach(([questionId, info]) => { wizardAnswerVersions[questionId] = info.version; });
+            console.warn(`Autosave conflict for question ${question.id}`, result.body);
+        } else {
+            console.warn(`Autosave failed for question ${question.id}: ${result.body.message || result.status}`);
+        }
+    })
+    .catch(error => console.error('Error autosaving wizard answer:', error));
+}
+
 function handleNextWizardQuestion() {
     saveCurrentWizardAnswer();
+    autosaveCurrentWizardAnswer();
     if (wizardCurrentQuestionIndex < wizardAllRaceQuestions.length - 1) {
         wizardCurrentQuestionIndex++;
         displayWizardQuestion(wizardCurrentQuestionIndex);
@@ -849,6 +890,7 @@ function handleNextWizardQuestion() {
 
 function handlePreviousWizardQuestion() {
     saveCurrentWizardAnswer(); // Save before going back, in case user made changes
+    autosaveCurrentWizardAnswer();
     if (wizardCurrentQuestionIndex > 0) {
         wizardCurrentQuestionIndex--;
         displayWizardQuestion(wizardCurrentQuestionIndex);
@@ -916,6 +958,7 @@ function renderWizardProgressBar() {
             const targetIndex = parseInt(this.dataset.questionIndex, 10);
             if (targetIndex !== wizardCurrentQuestionIndex) {
                 saveCurrentWizardAnswer(); // Save answer of the question we are navigating away from
+                autosaveCurrentWizardAnswer();
                 wizardCurrentQuestionIndex = targetIndex;
                 displayWizardQuestion(wizardCurrentQuestionIndex);
                 // displayWizardQuestion will call renderWizardProgressBar again to update highlights
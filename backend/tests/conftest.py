@@ -19,6 +19,7 @@ def app():
         # FLASK_SECRET_KEY is now set via FLASK_SECRET_KEY env var by app's own logic
         "LOGIN_DISABLED": False,
         "WTF_CSRF_ENABLED": False,
+        "PASSWORD_BCRYPT_ROUNDS": 4, # Fast hashes for registrations and logins
     })
 
     # Establish an application context before running the tests.
@@ -0,0 +1,161 @@
+import uuid
+import pytest
+from datetime import datetime, timedelta
+from backend.models import db, Race, RaceFormat, UserRaceRegistration
+
+
+@pytest.fixture
+def admission(app):
+    from backend.answer_admission import AnswerWriteAdmission
+    return AnswerWriteAdmission(app, max_queue=2, workers=1, batch_size=10)
+
+
+@pytest.fixture
+def open_race(db_session, admin_user):
+    def _create(close_in=timedelta(days=1), is_deleted=False):
+        race = Race(title=f"Admission {uuid.uuid4().hex[:8]}", race_format_id=RaceFormat.query.first().id,
+                    event_date=datetime.utcnow() + timedelta(days=2), user_id=admin_user.id, gender_category="Ambos",
+                    quiniela_close_date=datetime.utcnow() + close_in, is_deleted=is_deleted)
+        db_session.add(race)
+        db_session.commit()
+        return race
+    return _create
+
+
+def _queued_write(race, apply):
+    from backend.answer_admission import AnswerWrite
+    return AnswerWrite(race.id, datetime.utcnow(), apply)
+
+
+def test_batch_commits_once_and_isolates_the_failing_write(admission, open_race, admin_user):
+    race = open_race()
+    tag = uuid.uuid4().hex[:8]
+
+    def _add_race(title, fail=False):
+        def _apply():
+            db.session.add(Race(title=title, race_format_id=race.race_format_id, event_date=race.event_date,
+                                user_id=admin_user.id, gender_category="Ambos"))
+            db.session.flush()
+            if fail:
+                raise ValueError("bad submit")
+            return title
+        return _apply
+
+    batch = [_queued_write(race, _add_race(f"{tag} ok 1")),
+             _queued_write(race, _add_race(f"{tag} broken", fail=True)),
+             _queued_write(race, _add_race(f"{tag} ok 2"))]
+    admission.apply_batch(batch)
+
+    assert batch[0].future.result() == f"{tag} ok 1" and batch[2].future.result() == f"{tag} ok 2"
+    with pytest.raises(ValueError):
+        batch[1].future.result()
+    db.session.expire_all()
+    assert sorted(title for (title,) in db.session.query(Race.title).filter(Race.title.startswith(tag))) == \
+        [f"{tag} ok 1", f"{tag} ok 2"]
+
+    metrics = admission.metrics()
+    assert (metrics['batches'], metrics['batch_fallbacks'], metrics['applied'], metrics['failed']) == (1, 1, 2, 1)
+    assert metrics['apply_ms']['max'] is not None
+
+
+def test_close_date_is_checked_against_receive_time(admission, open_race):
+    from backend.answer_admission import AnswerWrite, AnswerWriteRejected
+    closed = open_race(close_in=timedelta(minutes=-1))
+    deleted = open_race(is_deleted=True)
+
+    received_before_close = AnswerWrite(closed.id, closed.quiniela_close_date - timedelta(seconds=1), lambda: "saved")
+    received_after_close = AnswerWrite(closed.id, closed.quiniela_close_date + timedelta(seconds=1), lambda: "saved")
+    for_deleted_race = AnswerWrite(deleted.id, datetime.utcnow(), lambda: "saved")
+    admission.apply_batch([received_before_close, received_after_close, for_deleted_race])
+
+    assert received_before_close.future.result() == "saved" # Applied after the close, received before it
+    with pytest.raises(AnswerWriteRejected) as rejected:
+        received_after_close.future.result()
+    assert rejected.value.status_code == 403
+    with pytest.raises(AnswerWriteRejected) as rejected:
+        for_deleted_race.future.result()
+    assert rejected.value.status_code == 404
+
+
+def test_full_queue_answers_429_with_retry_after(app, monkeypatch, authenticated_client, open_race, admission, db_session):
+    import backend.app as app_module
+    from backend.answer_admission import AdmissionQueueFull
+    client, player = authenticated_client("PLAYER")
+    race = open_race()
+    db_session.add(UserRaceRegistration(user_id=player.id, race_id=race.id))
+    db_session.commit()
+
+    monkeypatch.setitem(app.config, 'ANSWER_ADMISSION_EAGER', False)
+    monkeypatch.setattr(admission, '_start_workers', lambda: None) # Nobody drains the queue
+    monkeypatch.setattr(app_module, 'answer_admission', admission)
+    admission.submit(race.id, datetime.utcnow(), lambda: None)
+    admission.submit(race.id, datetime.utcnow(), lambda: None)
+    with pytest.raises(AdmissionQueueFull):
+        admission.submit(race.id, datetime.utcnow(), lambda: None)
+
+    response = client.post(f'/api/races/{race.id}/answers', json={"999999": {"answer_text": "x"}})
+    assert response.status_code == 429
+    assert 1 <= int(response.headers['Retry-After']) <= 30
+    assert response.get_json()['retry_after'] == int(response.headers['Retry-After'])
+
+    metrics = admission.metrics()
+    assert (metrics['queue_depth'], metrics['max_depth_seen'], metrics['accepted'], metrics['rejected']) == (2, 2, 2, 2)
+
+
+def test_worker_thread_applies_queued_writes(app, monkeypatch, admission, open_race, db_session):
+    race = open_race()
+    monkeypatch.setitem(app.config, 'ANSWER_ADMISSION_EAGER', False)
+    db_session.commit() # No open transaction on the shared in-memory connection while the worker runs
+
+    future = admission.submit(race.id, datetime.utcnow(), lambda: "applied by worker")
+    assert future.result(timeout=10) == "applied by worker"
+    assert admission.metrics()['workers_started'] == 1
+
+
+def test_write_still_queued_after_the_wait_is_withdrawn_and_answers_503(app, monkeypatch, authenticated_client,
+                                                                       open_race, admission, db_session):
+    import backend.app as app_module
+    from backend.answer_admission import AnswerWriteTimeout
+    client, player = authenticated_client("PLAYER")
+    race = open_race()
+    db_session.add(UserRaceRegistration(user_id=player.id, race_id=race.id))
+    db_session.commit()
+
+    monkeypatch.setitem(app.config, 'ANSWER_ADMISSION_EAGER', False)
+    monkeypatch.setitem(app.config, 'ANSWER_ADMISSION_WAIT_SECONDS', 0.01)
+    monkeypatch.setattr(admission, '_start_workers', lambda: None) # Nobody drains the queue
+    monkeypatch.setattr(app_module, 'answer_admission', admission)
+    applied = []
+    with pytest.raises(AnswerWriteTimeout):
+        admission.run(race.id, datetime.utcnow(), lambda: applied.append('late'))
+
+    response = client.post(f'/api/races/{race.id}/answers', json={"999999": {"answer_text": "x"}})
+    assert response.status_code == 503
+    assert int(response.headers['Retry-After']) == response.get_json()['retry_after'] >= 1
+
+    # A worker reaching the withdrawn writes later skips them: nothing the client was told failed gets applied
+    admission.apply_batch([admission._queue.get_nowait(), admission._queue.get_nowait()])
+    assert applied == [] and admission.metrics()['withdrawn'] == 2
+
+
+def test_queue_settings_are_read_from_the_app_config(app, monkeypatch, open_race):
+    from backend.answer_admission import AnswerWriteAdmission, AdmissionQueueFull
+    admission = AnswerWriteAdmission(app, max_queue=50)
+    race = open_race()
+    monkeypatch.setitem(app.config, 'ANSWER_ADMISSION_EAGER', False)
+    monkeypatch.setitem(app.config, 'ANSWER_ADMISSION_MAX_QUEUE', 1) # Set after the admission was built
+    monkeypatch.setattr(admission, '_start_workers', lambda: None)
+    admission.submit(race.id, datetime.utcnow(), lambda: None)
+    with pytest.raises(AdmissionQueueFull):
+        admission.submit(race.id, datetime.utcnow(), lambda: None)
+    assert admission.metrics()['max_queue'] == 1
+
+
+def test_answer_queue_metrics_are_admin_only(authenticated_client):
+    client, _ = authenticated_client("PLAYER")
+    assert client.get('/api/admin/answer_queue_metrics').status_code == 403
+
+    client, _ = authenticated_client("ADMIN")
+    response = client.get('/api/admin/answer_queue_metrics')
+    assert response.status_code == 200
+    assert {'queue_depth', 'accepted', 'rejected', 'apply_ms', 'wait_ms'} <= set(response.get_json())
@@ -17,10 +17,12 @@ def create_race_for_leaderboard(db_session, admin_user, title="Leaderboard Test
     db_session.commit()
     return race
 
-# Helper function to create user scores
+# Helper function to create user scores (bumping the race's score version, as the scoring engine does)
 def create_user_score(db_session, user, race, score):
+    from backend.leaderboard import bump_score_version
     user_score = UserScore(user_id=user.id, race_id=race.id, score=score)
     db_session.add(user_score)
+    bump_score_version([race.id])
     db_session.commit()
     return user_score
 
@@ -125,8 +127,162 @@ def test_get_quiniela_leaderboard_multiple_users_same_score(authenticated_client
     # Ensure the lowest score is last
     assert data[2]["username"] == player1.username
 
+@pytest.fixture
+def ranked_race(db_session, admin_user, new_user_factory):
+    """Race with 7 scores, including ties: 90, 70, 70, 70, 50, 50, 10."""
+    race = create_race_for_leaderboard(db_session, admin_user, title="Ranked Leaderboard Race")
+    players = []
+    for index, score in enumerate([70, 90, 50, 70, 10, 70, 50]):
+        player = new_user_factory(f"ranked_p{race.id}_{index}", f"ranked{race.id}_{index}@test.com", "pwpw", "PLAYER")
+        create_user_score(db_session, player, race, score)
+        players.append(player)
+    return race, players
+
+def test_leaderboard_ranks_ties_in_database(authenticated_client, ranked_race):
+    client, _ = authenticated_client("PLAYER")
+    race, _ = ranked_race
+
+    response = client.get(f"/api/races/{race.id}/leaderboard")
+    assert response.status_code == 200
+    data = response.json
+    assert data["total"] == 7
+    assert data["next_cursor"] is None
+    assert [e["score"] for e in data["entries"]] == [90, 70, 70, 70, 50, 50, 10]
+    assert [e["rank"] for e in data["entries"]] == [1, 2, 2, 2, 5, 5, 7]
+    assert [e["dense_rank"] for e in data["entries"]] == [1, 2, 2, 2, 3, 3, 4]
+    assert [e["position"] for e in data["entries"]] == list(range(1, 8))
+    # Ties are ordered by username
+    tied = [e["username"] for e in data["entries"] if e["score"] == 70]
+    assert tied == sorted(tied)
+
+    # The legacy endpoint keeps its list shape and carries the same ranks
+    legacy = client.get(f"/api/races/{race.id}/quiniela_leaderboard").json
+    assert legacy == data["entries"]
+
+def test_leaderboard_keyset_and_offset_pages(authenticated_client, ranked_race):
+    client, _ = authenticated_client("PLAYER")
+    race, _ = ranked_race
+    full = client.get(f"/api/races/{race.id}/leaderboard").json["entries"]
+
+    paged, cursor = [], None
+    while True:
+        url = f"/api/races/{race.id}/leaderboard?limit=3" + (f"&cursor={cursor}" if cursor else "")
+        page = client.get(url).json
+        paged.extend(page["entries"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert paged == full # Ranks are those of the whole race, not of the page
+
+    page = client.get(f"/api/races/{race.id}/leaderboard?limit=2&offset=3").json
+    assert page["entries"] == full[3:5]
+
+    assert client.get(f"/api/races/{race.id}/leaderboard?cursor=not-a-cursor").status_code == 400
+    assert client.get(f"/api/races/{race.id}/leaderboard?limit=0").status_code == 400
+
+def test_leaderboard_around_me(authenticated_client, db_session, ranked_race):
+    client, me = authenticated_client("PLAYER")
+    race, _ = ranked_race
+
+    # Not on the leaderboard yet: empty window
+    assert client.get(f"/api/races/{race.id}/leaderboard?around_me=1&around=1").json["entries"] == []
+
+    create_user_score(db_session, me, race, 60) # Between the 70s and the 50s: position 5
+    entries = client.get(f"/api/races/{race.id}/leaderboard?around_me=1&around=1").json["entries"]
+    assert [e["position"] for e in entries] == [4, 5, 6]
+    assert entries[1]["user_id"] == me.id
+    assert entries[1]["rank"] == 5
+
+@pytest.mark.parametrize("params", [
+    {},
+    {"limit": 3},
+    {"limit": 2, "offset": 4},
+    {"limit": 10, "around_me": True, "around": 2},
+])
+def test_leaderboard_python_fallback_matches_window_functions(app, ranked_race, params):
+    from backend.leaderboard import fetch_leaderboard
+    race, players = ranked_race
+    kwargs = {key: value for key, value in params.items() if key != "around_me"}
+    if params.get("around_me"):
+        kwargs["around_user_id"] = players[6].id
+
+    with_sql = fetch_leaderboard(race.id, use_window_functions=True, **kwargs)
+    with_python = fetch_leaderboard(race.id, use_window_functions=False, **kwargs)
+    assert with_sql == with_python
+
+    if with_sql["next_cursor"]:
+        assert fetch_leaderboard(race.id, cursor=with_sql["next_cursor"], use_window_functions=True, **kwargs) == \
+            fetch_leaderboard(race.id, cursor=with_sql["next_cursor"], use_window_functions=False, **kwargs)
+
+def test_results_modal_shows_top_and_current_user(authenticated_client, db_session, ranked_race, monkeypatch):
+    import backend.app as app_module
+    monkeypatch.setattr(app_module, "RESULTS_MODAL_LIMIT", 2)
+    client, me = authenticated_client("PLAYER")
+    race, players = ranked_race
+    create_user_score(db_session, me, race, 5) # Last place
+
+    html = client.get(f"/race/{race.id}/results_modal_content").get_data(as_text=True)
+    assert players[1].username in html # Leader (90)
+    assert players[2].username not in html # Position 5, outside both the top and the window around me
+    assert players[4].username in html # Position 7, right above me
+    assert me.username in html
+
+def test_leaderboard_conditional_get(authenticated_client, db_session, ranked_race):
+    client, _ = authenticated_client("PLAYER")
+    race, players = ranked_race
+    url = f"/api/races/{race.id}/quiniela_leaderboard"
+
+    first = client.get(url)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert first.headers["Last-Modified"]
+
+    not_modified = client.get(url, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.get_data() == b""
+
+    # Paged variants of the same version get their own ETag
+    page = client.get(f"/api/races/{race.id}/leaderboard?limit=2")
+    assert page.headers["ETag"] != etag
+
+    # Scores only reach clients through a new score version: without the bump the snapshot is served
+    UserScore.query.filter_by(user_id=players[4].id, race_id=race.id).update({UserScore.score: 100})
+    db_session.commit()
+    assert client.get(url).json[0]["user_id"] == players[1].id
+
+    from backend.leaderboard import bump_score_version
+    bump_score_version([race.id])
+    db_session.commit()
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 200
+    assert client.get(url).json[0]["user_id"] == players[4].id
+
+def test_leaderboard_invalidated_on_user_rename(authenticated_client, db_session, ranked_race):
+    client, _ = authenticated_client("PLAYER")
+    race, players = ranked_race
+    url = f"/api/races/{race.id}/quiniela_leaderboard"
+    etag = client.get(url).headers["ETag"]
+
+    players[1].username = f"renamed_leader_{race.id}"
+    db_session.commit()
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json[0]["username"] == f"renamed_leader_{race.id}"
+
+def test_leaderboard_invalidated_on_race_deletion(authenticated_client, ranked_race):
+    from backend.app import leaderboard_snapshots
+    client, _ = authenticated_client("ADMIN")
+    race, _ = ranked_race
+    url = f"/api/races/{race.id}/quiniela_leaderboard"
+    etag = client.get(url).headers["ETag"]
+    version = race.score_version
+    assert leaderboard_snapshots.get(race.id, version, "full") is not None
+
+    assert client.delete(f"/api/races/{race.id}").status_code == 200
+    assert leaderboard_snapshots.get(race.id, version, "full") is None # Dropped, not left to age out
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 404
+
 # More tests could be added:
-# - Pagination (if implemented on the endpoint)
 # - Performance with many scores (though typically out of scope for unit/integration tests like these)
 
 # Note on unauthenticated test:
@@ -144,3 +300,12 @@ def test_get_quiniela_leaderboard_multiple_users_same_score(authenticated_client
 # it might return 401. If it's a direct browser-like GET, it might redirect. Test client acts more like direct.
 # To ensure 401 for APIs, often a custom handler for `login_manager.unauthorized` is set up.
 # For now, the test assumes that a non-200 status indicates access denial.
+
+
+def test_snapshot_cache_size_is_read_from_the_app_config(app, monkeypatch):
+    from backend.leaderboard import LeaderboardSnapshotCache
+    cache = LeaderboardSnapshotCache(max_entries=256, app=app)
+    monkeypatch.setitem(app.config, 'LEADERBOARD_CACHE_SIZE', 1) # Set after the cache was built
+    cache.put(1, 0, "full", b"first")
+    cache.put(2, 0, "full", b"second")
+    assert cache.get(1, 0, "full") is None and cache.get(2, 0, "full") == b"second"
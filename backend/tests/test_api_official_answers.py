@@ -172,12 +172,10 @@ def test_post_official_answers_replace_existing(authenticated_client, sample_rac
     response = client.post(f'/api/races/{sample_race.id}/official_answers', json=new_payload)
     assert response.status_code == 201
 
-    # Verify old one is gone (or updated, depending on implementation - current is delete then create)
-    # Based on current POST logic (delete all then create new):
-    assert OfficialAnswer.query.get(initial_oa_id) is None
-
+    # Changed answers are updated in place (the payload is diffed against the stored official answers)
     oa_updated = OfficialAnswer.query.filter_by(race_id=sample_race.id, question_id=q_data["q_text"].id).first()
     assert oa_updated is not None
+    assert oa_updated.id == initial_oa_id
     assert oa_updated.answer_text == "Updated"
     assert len(OfficialAnswer.query.filter_by(race_id=sample_race.id).all()) == 1
 
@@ -350,3 +348,31 @@ def test_get_official_slider_answer(authenticated_client, sample_race, sample_sl
     assert slider_answer_detail['correct_slider_value'] == 22.75
     assert slider_answer_detail.get('answer_text') is None
     assert slider_answer_detail.get('selected_option_id') is None
+
+
+def test_post_official_answers_rescores_only_changed_questions(authenticated_client, sample_race, db_session):
+    from backend.models import ScoringJob
+    client, _ = authenticated_client("ADMIN")
+    q_data = setup_questions_for_race(db_session, sample_race.id)
+    payload = {
+        str(q_data["q_text"].id): {"answer_text": "Winner"},
+        str(q_data["q_mc_single"].id): {"selected_option_id": q_data["opts_s"][0].id},
+    }
+    response = client.post(f'/api/races/{sample_race.id}/official_answers', json=payload)
+    assert response.status_code == 201
+    first_job = ScoringJob.query.get(response.json["scoring_job_id"])
+    assert sorted(first_job.question_ids) == sorted([q_data["q_text"].id, q_data["q_mc_single"].id])
+
+    # Same payload again: nothing changed, so saving rescores the whole race (retries a failed job)
+    response = client.post(f'/api/races/{sample_race.id}/official_answers', json=payload)
+    assert response.status_code == 201
+    full_job = ScoringJob.query.get(response.json["scoring_job_id"])
+    assert full_job.id != first_job.id and full_job.question_ids is None
+
+    # Only the MC single answer changes
+    payload[str(q_data["q_mc_single"].id)] = {"selected_option_id": q_data["opts_s"][1].id}
+    response = client.post(f'/api/races/{sample_race.id}/official_answers', json=payload)
+    assert response.status_code == 201
+    assert ScoringJob.query.get(response.json["scoring_job_id"]).question_ids == [q_data["q_mc_single"].id]
+    oa = OfficialAnswer.query.filter_by(race_id=sample_race.id, question_id=q_data["q_mc_single"].id).first()
+    assert oa.selected_option_id == q_data["opts_s"][1].id
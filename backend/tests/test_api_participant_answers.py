@@ -654,3 +654,26 @@ def test_get_participant_answers_slider_question_max_points(
     assert slider_q_response_data['official_answer'] == data["oa_slider"].correct_slider_value # Official is 3.75
     assert slider_q_response_data['points_obtained'] == q_slider.slider_points_exact # Exact match points
     assert slider_q_response_data['is_correct'] is True # Exact match is correct
+
+
+def test_get_answers_reads_stored_question_scores(authenticated_client, db_session, setup_data_for_answers_test):
+    from backend.app import calculate_and_store_scores
+    from backend.models import UserQuestionScore
+    client, admin = authenticated_client("ADMIN")
+    data = setup_data_for_answers_test
+    race, player = data["race_closed"], data["player_user"]
+
+    assert calculate_and_store_scores(race.id)["success"] is True
+    stored = UserQuestionScore.query.filter_by(race_id=race.id, user_id=player.id, question_id=data["q_slider"].id).first()
+    assert (stored.points, stored.is_correct) == (20, True)
+
+    # Once the race has been scored the API serves the stored breakdown instead of re-scoring on read
+    stored.points = 7
+    db_session.commit()
+
+    response = client.get(f"/api/races/{race.id}/participants/{player.id}/answers")
+    assert response.status_code == 200
+    by_question = {item["question_id"]: item for item in response.json}
+    assert by_question[data["q_slider"].id]["points_obtained"] == 7
+    assert by_question[data["q_ft"].id]["points_obtained"] == 10
+    assert by_question[data["q_ft"].id]["is_correct"] is True
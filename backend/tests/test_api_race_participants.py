@@ -0,0 +1,103 @@
+import uuid
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from backend.models import db, Race, RaceFormat, Question, QuestionType, UserRaceRegistration, UserAnswer
+
+
+@pytest.fixture
+def participants_race(db_session, admin_user, new_user_factory):
+    """A race with 3 questions and 6 registered players; (username suffix, answered count) below."""
+    tag = uuid.uuid4().hex[:6]
+    race = Race(title=f"Participants {tag}", race_format_id=RaceFormat.query.first().id,
+                event_date=datetime.utcnow() + timedelta(days=5), user_id=admin_user.id, gender_category="Ambos")
+    db_session.add(race)
+    db_session.flush()
+    free_text, _ = QuestionType.get_or_create(name='FREE_TEXT')
+    questions = [Question(race_id=race.id, question_type_id=free_text.id, text=f"Q{index}") for index in range(3)]
+    db_session.add_all(questions)
+    db_session.flush()
+
+    answered = {'ana': 3, 'bob': 1, 'bea': 1, 'carl': 0, 'ana_x': 2, 'dan': 3}
+    players = {}
+    for suffix, count in answered.items():
+        player = new_user_factory(f"p{tag}_{suffix}", f"p{tag}_{suffix}@example.com", "pw", "PLAYER")
+        players[suffix] = player
+        db_session.add(UserRaceRegistration(user_id=player.id, race_id=race.id))
+        for question in questions[:count]:
+            db_session.add(UserAnswer(user_id=player.id, race_id=race.id, question_id=question.id, answer_text="x"))
+    db_session.commit()
+    return race, tag, players
+
+
+def _usernames(data):
+    return [participant['username'] for participant in data['participants']]
+
+
+def test_participants_sorted_by_username_with_counts(authenticated_client, participants_race):
+    client, _ = authenticated_client("ADMIN")
+    race, tag, _ = participants_race
+    data = client.get(f'/api/races/{race.id}/participants').json
+
+    assert data['total_questions_in_race'] == 3
+    assert data['total'] == 6 and data['next_cursor'] is None
+    assert _usernames(data) == [f"p{tag}_{name}" for name in ('ana', 'ana_x', 'bea', 'bob', 'carl', 'dan')]
+    carl = next(p for p in data['participants'] if p['username'].endswith('_carl'))
+    assert carl['answered_questions_count'] == 0 and carl['has_answered'] is False
+
+
+@pytest.mark.parametrize("sort, order, expected", [
+    ('answered', None, ['ana', 'dan', 'ana_x', 'bea', 'bob', 'carl']),
+    ('answered', 'asc', ['carl', 'bea', 'bob', 'ana_x', 'ana', 'dan']),
+    ('username', 'desc', ['dan', 'carl', 'bob', 'bea', 'ana_x', 'ana']),
+])
+def test_participants_keyset_pages_cover_the_list_once(authenticated_client, participants_race, sort, order, expected):
+    client, _ = authenticated_client("LEAGUE_ADMIN")
+    race, tag, _ = participants_race
+    params = f'sort={sort}&limit=4' + (f'&order={order}' if order else '')
+
+    first = client.get(f'/api/races/{race.id}/participants?{params}').json
+    assert len(first['participants']) == 4 and first['next_cursor']
+    second = client.get(f'/api/races/{race.id}/participants?{params}&cursor={first["next_cursor"]}').json
+    assert second['next_cursor'] is None
+    assert _usernames(first) + _usernames(second) == [f"p{tag}_{name}" for name in expected]
+
+
+def test_participants_username_prefix_filter(authenticated_client, participants_race):
+    client, _ = authenticated_client("ADMIN")
+    race, tag, _ = participants_race
+    data = client.get(f'/api/races/{race.id}/participants?q=p{tag}_ana').json
+    assert data['total'] == 2
+    assert _usernames(data) == [f"p{tag}_ana", f"p{tag}_ana_x"]
+    # "_" is matched literally, not as a LIKE wildcard
+    assert client.get(f'/api/races/{race.id}/participants?q=p{tag}_an_').json['total'] == 0
+
+
+def test_participants_rejects_bad_params(authenticated_client, participants_race):
+    client, _ = authenticated_client("ADMIN")
+    race, _, _ = participants_race
+    url = f'/api/races/{race.id}/participants'
+    assert client.get(f'{url}?sort=score').status_code == 400
+    assert client.get(f'{url}?order=up').status_code == 400
+    assert client.get(f'{url}?limit=0').status_code == 400
+    assert client.get(f'{url}?cursor=not-a-cursor').status_code == 400
+    # A cursor from another sort cannot be reused
+    cursor = client.get(f'{url}?limit=1').json['next_cursor']
+    assert client.get(f'{url}?sort=answered&cursor={cursor}').status_code == 400
+
+
+def test_participants_query_count_is_independent_of_participants(authenticated_client, participants_race):
+    client, _ = authenticated_client("ADMIN")
+    race, _, _ = participants_race
+    client.get(f'/api/races/{race.id}/participants') # Warm-up
+
+    statements = []
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(db.engine, "before_cursor_execute", _count)
+    try:
+        response = client.get(f'/api/races/{race.id}/participants')
+    finally:
+        event.remove(db.engine, "before_cursor_execute", _count)
+    assert response.status_code == 200 and len(response.json['participants']) == 6
+    assert len(statements) <= 6 # race, question count, page, total (+ session user/role); not 2 per participant
@@ -0,0 +1,104 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+
+
+class FakeSSMClient:
+    def __init__(self, parameters):
+        self.parameters = parameters
+        self.calls = []
+
+    def get_parameters(self, Names, WithDecryption):
+        self.calls.append(list(Names))
+        return {'Parameters': [{'Name': name, 'Value': self.parameters[name]} for name in Names if name in self.parameters],
+                'InvalidParameters': [name for name in Names if name not in self.parameters]}
+
+
+def _remote(parameters):
+    from backend.config_loader import SSMProvider
+    client = FakeSSMClient(parameters)
+    created = []
+    provider = SSMProvider(client_factory=lambda: created.append(client) or client)
+    return provider, client, created
+
+
+def test_environment_values_never_touch_remote_sources():
+    from backend.config_loader import ConfigLoader
+    remote, client, created = _remote({'/p/SECRET': 'from-ssm'})
+    loader = ConfigLoader(environ={'SECRET': 'from-env'}, remote=remote)
+    assert loader.load({'SECRET': '/p/SECRET'}) == {'SECRET': 'from-env'}
+    assert loader.sources == {'SECRET': 'env'} and created == []
+
+
+def test_local_file_then_one_batched_ssm_call(tmp_path):
+    from backend.config_loader import ConfigLoader, LocalFileProvider
+    local = tmp_path / 'config.json'
+    local.write_text(json.dumps({'/p/LOCAL': 'from-file'}))
+    settings = {'LOCAL': '/p/LOCAL', 'MISSING': '/p/MISSING'}
+    settings.update({f'S{index}': f'/p/S{index}' for index in range(11)})
+    remote, client, created = _remote({f'/p/S{index}': f'value {index}' for index in range(11)})
+
+    loader = ConfigLoader(environ={}, local_file=LocalFileProvider(str(local)), remote=remote)
+    values = loader.load(settings)
+    assert values['LOCAL'] == 'from-file' and values['S10'] == 'value 10' and values['MISSING'] is None
+    assert (loader.sources['LOCAL'], loader.sources['S0'], loader.sources['MISSING']) == ('local_file', 'ssm', None)
+    assert [len(names) for names in client.calls] == [10, 2] # GetParameters takes 10 names per call
+
+    loader.load({'S0': '/p/S0'})
+    assert len(created) == 1 # One client, reused
+
+
+def test_ssm_errors_are_logged_not_raised():
+    from backend.config_loader import ConfigLoader, SSMProvider
+    def _broken_client():
+        raise RuntimeError("no credentials")
+    loader = ConfigLoader(environ={}, remote=SSMProvider(client_factory=_broken_client))
+    assert loader.load({'SECRET': '/p/SECRET'}) == {'SECRET': None}
+
+
+def test_encrypted_cache_serves_fresh_values_without_ssm(tmp_path, monkeypatch):
+    fernet = pytest.importorskip("cryptography.fernet")
+    from backend import config_loader
+    key = fernet.Fernet.generate_key().decode()
+    environ = {'CONFIG_CACHE_KEY': key, 'CONFIG_CACHE_TTL': '60'}
+    remote, client, _ = _remote({'/p/SECRET': 'very-secret'})
+
+    first = config_loader.ConfigLoader.from_environ(str(tmp_path), environ=environ)
+    first.remote = remote
+    assert first.load({'SECRET': '/p/SECRET'}) == {'SECRET': 'very-secret'}
+    cache_file = tmp_path / 'config_cache.bin'
+    assert b'very-secret' not in cache_file.read_bytes()
+    assert oct(os.stat(cache_file).st_mode & 0o777) == '0o600'
+
+    second = config_loader.ConfigLoader.from_environ(str(tmp_path), environ=environ)
+    second.remote = remote
+    assert second.load({'SECRET': '/p/SECRET'}) == {'SECRET': 'very-secret'}
+    assert second.sources == {'SECRET': 'cache'} and len(client.calls) == 1
+
+    now = config_loader.time.time()
+    monkeypatch.setattr(config_loader.time, 'time', lambda: now + 61) # Expired
+    third = config_loader.ConfigLoader.from_environ(str(tmp_path), environ=environ)
+    third.remote = remote
+    third.load({'SECRET': '/p/SECRET'})
+    assert third.sources == {'SECRET': 'ssm'} and len(client.calls) == 2
+
+
+def test_importing_the_app_with_env_secrets_does_not_import_boto3():
+    env = dict(os.environ, FLASK_SECRET_KEY='x', DATABASE_URL='sqlite:///:memory:')
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    result = subprocess.run([sys.executable, '-c', "import sys, backend.app; print('boto3' in sys.modules)"],
+                            cwd=root, env=env, capture_output=True, text=True, timeout=120)
+    assert result.stdout.strip().splitlines()[-1] == 'False', result.stderr
+
+
+def test_boot_timings_are_reported_to_admins(authenticated_client):
+    client, _ = authenticated_client("PLAYER")
+    assert client.get('/api/admin/boot_timings').status_code == 403
+
+    client, _ = authenticated_client("ADMIN")
+    report = client.get('/api/admin/boot_timings').get_json()
+    assert set(report['phases_ms']) == {'config', 'database', 'services', 'routes'}
+    assert report['total_ms'] >= sum(report['phases_ms'].values()) - 0.1
+    assert report['config_sources'] == {'FLASK_SECRET_KEY': 'env', 'DATABASE_URL': 'env'}
@@ -0,0 +1,159 @@
+import json
+import re
+import uuid
+import pytest
+from sqlalchemy import event
+from backend.models import db, League, LeagueParticipant, LeagueStanding, Race, RaceFormat, UserScore
+from datetime import datetime, timedelta
+
+
+@pytest.fixture
+def league_factory(db_session, league_admin_user, new_user_factory):
+    """Builds a league with `num_races` races and `num_players` participants, each with a UserScore per race."""
+    def _create(num_players, num_races, score_fn=lambda player_index, race_index: player_index * 10):
+        tag = uuid.uuid4().hex[:8]
+        race_format = RaceFormat.query.filter_by(name="Triatlón").first()
+        league = League(name=f"Standings League {tag}", creator_id=league_admin_user.id)
+        db_session.add(league)
+        races = []
+        for race_index in range(num_races):
+            race = Race(title=f"Standings Race {tag} {race_index}", race_format_id=race_format.id,
+                        event_date=datetime.utcnow() + timedelta(days=race_index + 1), user_id=league_admin_user.id,
+                        gender_category="Ambos", category="Elite")
+            db_session.add(race)
+            races.append(race)
+        db_session.flush()
+        for race in races:
+            league.races.append(race)
+
+        players = []
+        for player_index in range(num_players):
+            player = new_user_factory(f"standings_{tag}_{player_index}", f"standings_{tag}_{player_index}@test.com", "pw", "PLAYER")
+            db_session.add(LeagueParticipant(user_id=player.id, league_id=league.id))
+            for race_index, race in enumerate(races):
+                db_session.add(UserScore(user_id=player.id, race_id=race.id, score=score_fn(player_index, race_index)))
+            players.append(player)
+        db_session.commit()
+        return league, races, players
+    return _create
+
+
+def _count_view_queries(client, league):
+    url = f"/league/{league.id}/view"
+    statements = []
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(db.engine, "before_cursor_execute", _count)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", _count)
+    assert response.status_code == 200
+    return len(statements)
+
+
+def test_dense_ranks_share_positions_without_gaps():
+    from backend.league_standings import dense_ranks
+    assert dense_ranks({1: 30, 2: 50, 3: 30, 4: 10}) == {2: 1, 1: 2, 3: 2, 4: 3}
+    assert dense_ranks({}) == {}
+
+
+def test_league_view_query_count_is_independent_of_league_size(authenticated_client, league_factory):
+    client, _ = authenticated_client("ADMIN")
+    small_league, _, _ = league_factory(num_players=2, num_races=1)
+    large_league, _, _ = league_factory(num_players=8, num_races=4)
+
+    # Warm-up (login user, reference data) and first materialization of both leagues' standings
+    _count_view_queries(client, small_league)
+    _count_view_queries(client, large_league)
+    assert _count_view_queries(client, large_league) == _count_view_queries(client, small_league)
+
+
+def test_league_view_standings_use_dense_ranks(authenticated_client, league_factory):
+    client, _ = authenticated_client("ADMIN")
+    # Players 0 and 1 tie on every race, player 2 scores more
+    league, races, players = league_factory(num_players=3, num_races=2,
+                                            score_fn=lambda player_index, race_index: 20 if player_index == 2 else 5)
+
+    response = client.get(f"/league/{league.id}/view")
+    html = response.get_data(as_text=True)
+    assert response.status_code == 200
+    assert html.find(players[2].username) < html.find(players[0].username)
+
+    # The race analysis data passed to the page ranks ties together
+    race_analysis = json.loads(re.search(r"const raceAnalysisData = (.*);", html).group(1))
+    positions = {entry["name"]: entry["pos"] for entry in race_analysis[str(races[0].id)]}
+    assert positions == {players[2].username: 1, players[0].username: 2, players[1].username: 2}
+
+
+def _standings(league):
+    rows = LeagueStanding.query.filter_by(league_id=league.id).all()
+    return {row.user_id: row for row in rows}
+
+
+def test_league_view_materializes_missing_standings(authenticated_client, league_factory):
+    client, _ = authenticated_client("ADMIN")
+    league, races, players = league_factory(num_players=2, num_races=2)
+    assert _standings(league) == {} # Built directly in the DB, no hook has run yet
+
+    response = client.get(f"/league/{league.id}/view")
+    assert response.status_code == 200
+
+    standings = _standings(league)
+    assert standings[players[1].id].total_score == 20
+    assert standings[players[1].id].rank == 1
+    assert standings[players[0].id].rank == 2
+    assert standings[players[1].id].per_race[str(races[0].id)] == {"points": 10, "rank": 1}
+
+
+def test_standings_refreshed_when_race_is_deleted(authenticated_client, league_factory):
+    client, _ = authenticated_client("ADMIN")
+    league, races, players = league_factory(num_players=2, num_races=2,
+                                            score_fn=lambda player_index, race_index: 50 if (player_index, race_index) == (0, 1) else 10)
+    client.get(f"/league/{league.id}/view") # Materializes: player 0 leads with 60
+    assert _standings(league)[players[0].id].rank == 1
+
+    response = client.delete(f"/api/races/{races[1].id}")
+    assert response.status_code == 200
+
+    standings = _standings(league)
+    assert standings[players[0].id].total_score == 10
+    assert standings[players[0].id].rank == 1 and standings[players[1].id].rank == 1 # Tie once race 2 no longer counts
+    assert str(races[1].id) not in standings[players[0].id].per_race
+
+
+def test_standings_include_new_participant_after_join(authenticated_client, league_factory):
+    from backend.models import LeagueInvitationCode
+    league, races, players = league_factory(num_players=1, num_races=1, score_fn=lambda player_index, race_index: 10)
+    code = LeagueInvitationCode(league_id=league.id)
+    db.session.add(code)
+    db.session.commit()
+
+    client, new_player = authenticated_client("PLAYER")
+    response = client.post("/api/leagues/join_by_code", json={"league_access_code": code.code})
+    assert response.status_code == 201
+
+    standings = _standings(league)
+    assert set(standings) == {players[0].id, new_player.id}
+    assert standings[new_player.id].total_score == 0
+    assert standings[new_player.id].rank == 2
+
+
+def test_back_to_back_refreshes_in_separate_sessions_upsert_the_same_rows(app, league_factory):
+    from backend.league_standings import refresh_league_standings
+    league, races, players = league_factory(num_players=3, num_races=1)
+    with app.app_context(): # Each app context has its own session
+        refresh_league_standings(league.id)
+        db.session.commit()
+        first_ids = {row.user_id: row.id for row in LeagueStanding.query.filter_by(league_id=league.id)}
+
+    LeagueParticipant.query.filter_by(league_id=league.id, user_id=players[0].id).delete()
+    db.session.commit()
+    with app.app_context():
+        assert refresh_league_standings(league.id) == 2
+        db.session.commit()
+        rows = {row.user_id: row for row in LeagueStanding.query.filter_by(league_id=league.id)}
+
+    assert set(rows) == {players[1].id, players[2].id} # The leaver's row is gone
+    assert all(rows[user_id].id == first_ids[user_id] for user_id in rows) # Updated in place, not re-inserted
+    assert rows[players[2].id].rank == 1 and rows[players[1].id].rank == 2
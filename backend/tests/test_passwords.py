@@ -0,0 +1,106 @@
+import threading
+import uuid
+import pytest
+from backend.models import db, User
+
+
+def test_hasher_verifies_and_detects_the_work_factor():
+    from backend.passwords import PasswordHasher, hash_rounds
+    hasher = PasswordHasher(rounds=4)
+    stored = hasher.hash("secreto")
+    assert hash_rounds(stored) == 4 and not hasher.needs_rehash(stored)
+    assert hasher.verify("secreto", stored) and not hasher.verify("otro", stored)
+    assert hasher.verify("secreto", None) is False # Unknown user: dummy check
+    assert hasher.verify("secreto", "not-a-hash") is False
+    assert PasswordHasher(rounds=5).needs_rehash(stored)
+
+
+def test_saturated_hasher_sheds_instead_of_queueing():
+    from backend.passwords import PasswordHasher, PasswordHasherBusy
+    hasher = PasswordHasher(rounds=4, workers=1, max_pending=1)
+    started, release = threading.Event(), threading.Event()
+    blocked = threading.Thread(target=lambda: hasher._run(lambda: started.set() or release.wait()))
+    blocked.start()
+    try:
+        assert started.wait(5) # The blocking job holds the only slot
+        with pytest.raises(PasswordHasherBusy) as busy:
+            hasher.hash("secreto")
+        assert 1 <= busy.value.retry_after <= 30
+    finally:
+        release.set()
+        blocked.join()
+    assert hasher.verify("secreto", hasher.hash("secreto"))
+
+
+def test_token_bucket_refills_over_time(monkeypatch):
+    from backend import passwords
+    clock = [1000.0]
+    monkeypatch.setattr(passwords.time, 'monotonic', lambda: clock[0])
+    limiter = passwords.TokenBucketLimiter(capacity=2, refill_per_second=0.5)
+    limiter.consume('ana')
+    limiter.consume('ana')
+    with pytest.raises(passwords.ThrottledError) as throttled:
+        limiter.consume('ana')
+    assert throttled.value.retry_after == 2
+    limiter.consume('bea') # Buckets are per key
+    clock[0] += 2
+    limiter.consume('ana')
+
+
+def test_login_rehashes_when_the_work_factor_changes(app, client, monkeypatch, new_user_factory):
+    from backend.app import password_hasher
+    from backend.passwords import hash_rounds
+    username = f"rehash_{uuid.uuid4().hex[:6]}"
+    user = new_user_factory(username, f"{username}@example.com", "clave-segura", "PLAYER")
+    assert hash_rounds(user.password_hash) != 5
+
+    monkeypatch.setitem(app.config, 'PASSWORD_BCRYPT_ROUNDS', 5) # Read when used, not at import
+    assert client.post('/api/login', json={'username': username, 'password': "clave-segura"}).status_code == 200
+    db.session.expire_all()
+    stored = db.session.get(User, user.id).password_hash
+    assert hash_rounds(stored) == 5 and password_hasher.verify("clave-segura", stored)
+
+
+def test_login_attempts_are_throttled_per_username(app, client, monkeypatch, new_user_factory):
+    import backend.app as app_module
+    from backend.passwords import TokenBucketLimiter
+    monkeypatch.setitem(app.config, 'AUTH_THROTTLING_ENABLED', True)
+    monkeypatch.setattr(app_module, 'login_limiter_by_username', TokenBucketLimiter(capacity=2, refill_per_second=0.01))
+    username = f"throttled_{uuid.uuid4().hex[:6]}"
+    new_user_factory(username, f"{username}@example.com", "clave-segura", "PLAYER")
+
+    for _ in range(2):
+        assert client.post('/api/login', json={'username': username, 'password': "mala"}).status_code == 401
+    response = client.post('/api/login', json={'username': username, 'password': "clave-segura"})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) == response.get_json()['retry_after'] >= 1
+    # Other usernames are not affected
+    assert client.post('/api/login', json={'username': "nadie", 'password': "mala"}).status_code == 401
+
+
+def test_hasher_settings_are_read_from_the_app_config_when_used(app, monkeypatch):
+    from backend.app import password_hasher
+    from backend.passwords import hash_rounds
+    assert password_hasher.rounds == 4 # Set by the test config after the app was imported
+    monkeypatch.setitem(app.config, 'PASSWORD_BCRYPT_ROUNDS', 6)
+    assert hash_rounds(password_hasher.hash("secreto")) == 6
+
+
+def test_login_limits_are_read_from_the_app_config_when_used(app, monkeypatch):
+    from backend.app import login_limiter_by_username, registration_limiter_by_ip
+    from backend.passwords import ThrottledError
+    assert login_limiter_by_username.capacity == 5
+    monkeypatch.setitem(app.config, 'LOGIN_ATTEMPTS_PER_USERNAME', 2) # Set after import, e.g. by create_app()
+    monkeypatch.setitem(app.config, 'REGISTRATIONS_PER_IP', 10)
+    assert login_limiter_by_username.capacity == 2
+    assert login_limiter_by_username.refill_per_second == pytest.approx(2 / 60.0) # Still per minute
+    assert registration_limiter_by_ip.refill_per_second == pytest.approx(10 / 3600.0)
+
+    key = f"config-{uuid.uuid4().hex[:6]}"
+    try:
+        login_limiter_by_username.consume(key)
+        login_limiter_by_username.consume(key)
+        with pytest.raises(ThrottledError):
+            login_limiter_by_username.consume(key)
+    finally:
+        login_limiter_by_username.reset(key)
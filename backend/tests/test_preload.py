@@ -0,0 +1,66 @@
+import pytest
+from flask import Flask
+from sqlalchemy import text
+from backend.models import db, Role
+
+
+@pytest.fixture
+def file_db_app(tmp_path):
+    """A second app on a file SQLite database, whose engine may be disposed."""
+    other = Flask(__name__)
+    other.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'preload.db'}"
+    db.init_app(other)
+    with other.app_context():
+        db.session.execute(text("SELECT 1"))
+        db.session.remove()
+    return other
+
+
+def test_create_app_returns_the_configured_app_without_preloading_in_tests(app, monkeypatch):
+    from backend import app as app_module
+    registered = []
+    monkeypatch.setattr(app_module, 'install_fork_hooks', lambda flask_app: registered.append(flask_app))
+    try:
+        assert app_module.create_app({'PRELOAD_TEST_FLAG': True}) is app
+        assert app.config['PRELOAD_TEST_FLAG'] is True and registered == [app]
+        assert app_module.preload_report is None
+    finally:
+        app.config.pop('PRELOAD_TEST_FLAG')
+
+
+def test_preload_compiles_templates_and_loads_reference_data(app, db_session):
+    from backend import preload as preload_module
+    from backend.reference_data import reference_data
+    reference_data.clear()
+    report = preload_module.preload(app, freeze=False)
+
+    assert report['templates'] == len(app.jinja_env.list_templates()) > 0
+    assert report['reference_data'] is True and reference_data.is_loaded
+    cached_names = {name for (_, name) in app.jinja_env.cache.keys()}
+    assert 'login.html' in cached_names
+    assert Role.query.filter_by(code='ADMIN').first() is not None # In-memory database left alone
+
+
+def test_workers_get_their_own_pool_after_fork(file_db_app):
+    from backend.preload import after_fork_in_child, preload
+    with file_db_app.app_context():
+        engine = db.engine
+    inherited = engine.pool
+    after_fork_in_child(file_db_app)
+    assert engine.pool is not inherited
+
+    preload(file_db_app, freeze=False) # The master closes what it opened before forking
+    assert engine.pool.checkedout() == 0
+    with file_db_app.app_context():
+        assert db.session.execute(text("SELECT 1")).scalar() == 1
+        db.session.remove()
+
+
+def test_fork_hooks_are_registered_once_per_app(monkeypatch):
+    from backend import preload as preload_module
+    calls = []
+    monkeypatch.setattr(preload_module.os, 'register_at_fork', lambda **hooks: calls.append(hooks))
+    other = Flask(__name__)
+    preload_module.install_fork_hooks(other)
+    preload_module.install_fork_hooks(other)
+    assert len(calls) == 1 and 'after_in_child' in calls[0]
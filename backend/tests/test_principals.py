@@ -0,0 +1,95 @@
+import pytest
+from sqlalchemy import event
+from backend.models import db, Role
+
+
+@pytest.fixture
+def principal_cache_enabled(app):
+    from backend.app import principal_cache
+    app.config['PRINCIPAL_CACHE_ENABLED'] = True
+    principal_cache.clear()
+    yield principal_cache
+    app.config.pop('PRINCIPAL_CACHE_ENABLED')
+    principal_cache.clear()
+
+
+def _identity_reads(app, client, url):
+    statements = []
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(db.engine, "before_cursor_execute", _record)
+    try:
+        with app.app_context(): # Own g: the user is not reused from an earlier request
+            response = client.get(url)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", _record)
+    return response, [statement for statement in statements if 'FROM users' in statement or 'FROM roles' in statement]
+
+
+def test_authenticated_requests_cost_no_identity_queries(app, authenticated_client, principal_cache_enabled):
+    client, user = authenticated_client("PLAYER")
+    _, first_reads = _identity_reads(app, client, '/api/user/me') # Caches the principal
+    assert len(first_reads) == 1
+
+    response, identity_reads = _identity_reads(app, client, '/api/user/me')
+    assert response.status_code == 200
+    assert response.get_json()['username'] == user.username
+    assert identity_reads == []
+    assert principal_cache_enabled.hits >= 1
+
+
+def test_user_update_invalidates_the_cached_principal(app, authenticated_client, principal_cache_enabled, db_session):
+    client, user = authenticated_client("LEAGUE_ADMIN")
+    def _metrics_status():
+        return _identity_reads(app, client, '/api/admin/answer_queue_metrics')[0].status_code
+    assert _metrics_status() == 403
+    assert principal_cache_enabled.get(user.id).role_code == 'LEAGUE_ADMIN'
+
+    user.role_id = Role.query.filter_by(code='ADMIN').first().id
+    db_session.commit()
+    try:
+        assert principal_cache_enabled.get(user.id) is None
+        assert _metrics_status() == 200
+    finally:
+        user.role_id = Role.query.filter_by(code='LEAGUE_ADMIN').first().id
+        db_session.commit()
+    assert _metrics_status() == 403
+
+
+def test_principal_holds_plain_identity_and_falls_back_to_the_row(db_session, player_user):
+    from backend.principals import PrincipalCache
+    principal = PrincipalCache.fetch(player_user.id)
+    assert (principal.id, principal.username, principal.role_code) == (player_user.id, player_user.username, 'PLAYER')
+    assert principal.is_active and not principal.is_deleted and principal.is_authenticated
+    assert principal.get_id() == str(player_user.id)
+    assert principal.email == player_user.email # Not held: read from the User row
+    assert PrincipalCache.fetch(987654) is None
+
+
+def test_load_racing_an_invalidation_is_not_cached(monkeypatch, db_session, player_user):
+    from backend.principals import PrincipalCache
+    cache = PrincipalCache(ttl_seconds=60)
+    fetch = PrincipalCache.fetch
+
+    def _fetch_then_invalidate(user_id):
+        principal = fetch(user_id)
+        cache.invalidate(user_id) # The user changed while we were reading
+        return principal
+    monkeypatch.setattr(cache, 'fetch', _fetch_then_invalidate)
+    assert cache.load(player_user.id) is not None
+    assert cache.get(player_user.id) is None
+
+    monkeypatch.setattr(cache, 'fetch', fetch)
+    cache.load(player_user.id)
+    assert cache.get(player_user.id) is not None
+    expired = PrincipalCache(ttl_seconds=0)
+    expired.load(player_user.id)
+    assert expired.get(player_user.id) is None
+
+
+def test_cache_settings_are_read_from_the_app_config(app, monkeypatch, db_session, player_user):
+    from backend.principals import PrincipalCache
+    cache = PrincipalCache(ttl_seconds=60, app=app)
+    monkeypatch.setitem(app.config, 'PRINCIPAL_CACHE_TTL', 0) # Set after the cache was built
+    cache.load(player_user.id)
+    assert cache.get(player_user.id) is None
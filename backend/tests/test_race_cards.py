@@ -0,0 +1,138 @@
+import uuid
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from backend.models import db, Race, RaceFormat
+
+
+@pytest.fixture
+def general_races(db_session, admin_user):
+    def _create(count, **overrides):
+        tag = uuid.uuid4().hex[:8]
+        race_format = RaceFormat.query.filter_by(name="Duatlón").first()
+        races = []
+        for index in range(count):
+            fields = dict(title=f"Card Race {tag} {index}", race_format_id=race_format.id, description="Card",
+                          event_date=datetime.utcnow() + timedelta(days=index + 1), location="Madrid",
+                          user_id=admin_user.id, gender_category="Ambos", is_general=True)
+            fields.update(overrides)
+            race = Race(**fields)
+            db_session.add(race)
+            races.append(race)
+        db_session.commit()
+        return races
+    return _create
+
+
+def test_race_card_matches_to_dict(general_races):
+    from backend.race_cards import race_card_query, fetch_race_cards
+    race = general_races(1, quiniela_close_date=datetime.utcnow() - timedelta(hours=1))[0]
+    card = fetch_race_cards(race_card_query(Race.id == race.id))[0]
+
+    race_dict = race.to_dict()
+    for key in ('id', 'title', 'description', 'race_format_name', 'event_date_formatted', 'location',
+                'promo_image_url', 'category', 'gender_category', 'user_username', 'is_general', 'status'):
+        assert getattr(card, key) == race_dict[key], key
+    assert card.race_format.name == race_dict['race_format']['name']
+    assert card.is_quiniela_actionable is True # Closed an hour ago
+
+
+@pytest.mark.parametrize("close_in, actionable", [
+    (None, True),
+    (timedelta(hours=-2), True),
+    (timedelta(hours=2), False),
+])
+def test_race_card_actionability_from_datetime(general_races, close_in, actionable):
+    from backend.race_cards import race_card_query, fetch_race_cards
+    close_date = datetime.utcnow() + close_in if close_in is not None else None
+    race = general_races(1, quiniela_close_date=close_date)[0]
+    assert fetch_race_cards(race_card_query(Race.id == race.id))[0].is_quiniela_actionable is actionable
+
+
+def test_races_list_page_query_count_is_independent_of_card_count(authenticated_client, general_races):
+    client, _ = authenticated_client("PLAYER")
+    client.get('/races') # Warm-up
+
+    def _queries():
+        statements = []
+        def _count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        event.listen(db.engine, "before_cursor_execute", _count)
+        try:
+            response = client.get('/races')
+        finally:
+            event.remove(db.engine, "before_cursor_execute", _count)
+        assert response.status_code == 200
+        return len(statements)
+
+    before = _queries()
+    general_races(15)
+    _queries() # Re-warm: the commit expired the logged-in user
+    assert _queries() == before # No per-card lazy loads of format or creator
+
+
+def test_dashboard_cards_return_each_race_once_with_membership_flags(general_races, new_user_factory, db_session):
+    from backend.models import UserRaceRegistration, UserFavoriteRace
+    from backend.race_cards import fetch_dashboard_cards
+    owner = new_user_factory(f"dash_{uuid.uuid4().hex[:8]}", f"dash_{uuid.uuid4().hex[:8]}@example.com", "pw", "LEAGUE_ADMIN")
+    created_everything, registered_only, favorite_only, unrelated = general_races(4)
+    created_everything.user_id = owner.id
+    created_everything.is_general = False
+    for race in (created_everything, registered_only):
+        db_session.add(UserRaceRegistration(user_id=owner.id, race_id=race.id))
+    for race in (created_everything, favorite_only):
+        db_session.add(UserFavoriteRace(user_id=owner.id, race_id=race.id))
+    db_session.commit()
+
+    cards = fetch_dashboard_cards(owner.id)
+    flags = {card.id: (card.is_created, card.is_registered, card.is_favorite) for card in cards}
+    assert len(cards) == len(flags) == 3 # One row per race, whatever the number of memberships
+    assert flags[created_everything.id] == (True, True, True)
+    assert flags[registered_only.id] == (False, True, False)
+    assert flags[favorite_only.id] == (False, False, True)
+    assert unrelated.id not in flags
+
+    assert created_everything.id not in {card.id for card in fetch_dashboard_cards(owner.id, include_created=False)
+                                         if card.is_created}
+
+
+def test_dashboard_cache_is_invalidated_when_joining_a_race(app, authenticated_client, general_races):
+    from backend.app import dashboard_cache
+    client, user = authenticated_client("PLAYER")
+    race = general_races(1, title=f"Dashboard Join {uuid.uuid4().hex[:8]}", is_general=False)[0]
+    app.config['DASHBOARD_CACHE_ENABLED'] = True
+    try:
+        dashboard_cache.invalidate_all()
+        assert race.title not in client.get('/Hello-world').get_data(as_text=True)
+        assert any(key[0] == user.id for key in dashboard_cache._entries) # Assembled dashboard cached
+
+        assert client.post(f'/api/races/{race.id}/join').status_code == 201
+        assert not any(key[0] == user.id for key in dashboard_cache._entries)
+        assert race.title in client.get('/Hello-world').get_data(as_text=True)
+    finally:
+        app.config.pop('DASHBOARD_CACHE_ENABLED')
+        dashboard_cache.invalidate_all()
+
+
+def test_dashboard_cache_expires_and_evicts():
+    from backend.race_cards import DashboardCache
+    cache = DashboardCache(ttl_seconds=0, max_entries=2)
+    cache.put(1, 'a', 'value')
+    assert cache.get(1, 'a') is None # Already expired
+
+    cache = DashboardCache(ttl_seconds=60, max_entries=2)
+    cache.put(1, 'a', 'a1')
+    cache.put(2, 'a', 'a2')
+    cache.get(1, 'a')
+    cache.put(3, 'a', 'a3') # Evicts the least recently used entry (user 2)
+    assert cache.get(2, 'a') is None and cache.get(1, 'a') == 'a1'
+    cache.invalidate_user(1)
+    assert cache.get(1, 'a') is None and cache.get(3, 'a') == 'a3'
+
+
+def test_dashboard_cache_settings_are_read_from_the_app_config(app, monkeypatch):
+    from backend.race_cards import DashboardCache
+    cache = DashboardCache(ttl_seconds=60, max_entries=2, app=app)
+    monkeypatch.setitem(app.config, 'DASHBOARD_CACHE_TTL', 0) # Set after the cache was built
+    cache.put(1, 'a', 'value')
+    assert cache.get(1, 'a') is None
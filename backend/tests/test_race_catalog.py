@@ -0,0 +1,196 @@
+import uuid
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from backend.models import db, Race, RaceFormat, Question, QuestionType, QuestionOption, UserRaceRegistration
+
+
+@pytest.fixture
+def catalog_race(db_session, admin_user):
+    """Open race with `num_mc` multiple choice questions (3 options each) and one free text question."""
+    def _create(num_mc=2, registered=None):
+        race = Race(title=f"Catalog {uuid.uuid4().hex[:6]}", race_format_id=RaceFormat.query.first().id,
+                    event_date=datetime.utcnow() + timedelta(days=5), user_id=admin_user.id, gender_category="Ambos",
+                    quiniela_close_date=datetime.utcnow() + timedelta(days=4))
+        db_session.add(race)
+        db_session.flush()
+        free_text = QuestionType.get_or_create(name='FREE_TEXT')[0]
+        multiple_choice = QuestionType.get_or_create(name='MULTIPLE_CHOICE')[0]
+        text_question = Question(race_id=race.id, question_type_id=free_text.id, text="Ganador", max_score_free_text=10)
+        db_session.add(text_question)
+        for index in range(num_mc):
+            question = Question(race_id=race.id, question_type_id=multiple_choice.id, text=f"MC {index}",
+                                is_mc_multiple_correct=True, points_per_correct_mc=2, points_per_incorrect_mc=1)
+            db_session.add(question)
+            db_session.flush()
+            db_session.add_all([QuestionOption(question_id=question.id, option_text=f"MC {index} opt {opt}") for opt in range(3)])
+        if registered is not None:
+            db_session.add(UserRaceRegistration(user_id=registered.id, race_id=race.id))
+        db_session.commit()
+        return race, text_question
+    return _create
+
+
+@pytest.fixture
+def catalog_cache_enabled(app):
+    from backend.app import race_catalogs
+    app.config['RACE_CATALOG_CACHE_ENABLED'] = True
+    race_catalogs.clear()
+    yield race_catalogs
+    app.config.pop('RACE_CATALOG_CACHE_ENABLED')
+    race_catalogs.clear()
+
+
+def _statements(fn):
+    statements = []
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(db.engine, "before_cursor_execute", _record)
+    try:
+        result = fn()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", _record)
+    return result, statements
+
+
+def test_catalog_is_built_in_constant_queries_and_holds_plain_values(catalog_race):
+    from backend.race_catalog import RaceCatalog
+    small_race, _ = catalog_race(num_mc=1)
+    big_race, text_question = catalog_race(num_mc=8)
+
+    _, small_statements = _statements(lambda: RaceCatalog.build(small_race.id))
+    catalog, big_statements = _statements(lambda: RaceCatalog.build(big_race.id))
+    assert len(big_statements) == len(small_statements)
+
+    assert [question.id for question in catalog.questions] == sorted(question.id for question in catalog.questions)
+    mc_question = catalog.questions[1]
+    assert mc_question.type_name == 'MULTIPLE_CHOICE'
+    assert [option.option_text for option in mc_question.options] == ["MC 0 opt 0", "MC 0 opt 1", "MC 0 opt 2"]
+    assert catalog.question(text_question.id).max_points == 10
+    assert isinstance(catalog.questions, tuple) and isinstance(mc_question.options, tuple)
+    assert not any(isinstance(value, db.Model) for question in catalog.questions for value in question)
+    assert catalog.scorer.questions == [] # No ORM rows kept by the shared scorer
+
+
+def test_read_endpoints_render_from_the_cached_catalog(authenticated_client, catalog_race, catalog_cache_enabled):
+    client, player = authenticated_client("PLAYER")
+    race, _ = catalog_race(num_mc=3, registered=player)
+
+    first = client.get(f'/race/{race.id}/quiniela_form_content')
+    assert first.status_code == 200
+    response, statements = _statements(lambda: client.get(f'/race/{race.id}/quiniela_form_content'))
+    assert response.get_json() == first.get_json()
+    assert not [statement for statement in statements if 'FROM questions' in statement or 'FROM question_options' in statement]
+
+    # The other endpoints share the catalog: no question or option reads either
+    for url in (f'/api/races/{race.id}/questions_with_answers', f'/api/races/{race.id}/questions',
+                f'/race/{race.id}/user_predictions_modal_content'):
+        response, statements = _statements(lambda: client.get(url))
+        assert response.status_code == 200, url
+        assert not [statement for statement in statements if 'FROM questions' in statement or 'FROM question_options' in statement], url
+
+
+def test_question_update_and_official_answers_invalidate_the_catalog(authenticated_client, catalog_race, catalog_cache_enabled):
+    client, admin = authenticated_client("ADMIN")
+    race, text_question = catalog_race(num_mc=1)
+    assert client.get(f'/api/races/{race.id}/questions').status_code == 200
+    version = db.session.get(Race, race.id).catalog_version
+
+    assert client.put(f'/api/questions/free-text/{text_question.id}', json={"text": "Ganadora"}).status_code == 200
+    db.session.expire_all()
+    assert db.session.get(Race, race.id).catalog_version == version + 1
+    questions = {question['id']: question for question in client.get(f'/api/races/{race.id}/questions').get_json()}
+    assert questions[text_question.id]['text'] == "Ganadora"
+    assert questions[text_question.id]['official_answer'] is None
+
+    response = client.post(f'/api/races/{race.id}/official_answers', json={str(text_question.id): {"answer_text": "Flora"}})
+    assert response.status_code == 201
+    questions = {question['id']: question for question in client.get(f'/api/races/{race.id}/questions').get_json()}
+    assert questions[text_question.id]['official_answer'] == "Flora"
+    assert [key[1] for key in catalog_cache_enabled._entries if key[0] == race.id] == [version + 2] # Older versions dropped
+
+
+def test_catalog_cache_is_a_bounded_lru():
+    from backend.race_catalog import RaceCatalog, RaceCatalogCache
+    cache = RaceCatalogCache(max_entries=2)
+    for race_id in (1, 2):
+        cache.put(RaceCatalog(race_id, 0, [], None))
+    cache.get(1, 0)
+    cache.put(RaceCatalog(3, 0, [], None)) # Evicts the least recently used catalog (race 2)
+    assert cache.get(2, 0) is None and cache.get(1, 0) is not None
+    assert cache.get(1, 1) is None # Another version of the race is a miss
+    cache.invalidate_race(1)
+    assert cache.get(1, 0) is None and cache.get(3, 0) is not None
+
+
+def test_catalog_cache_size_is_read_from_the_app_config(app, monkeypatch):
+    from backend.race_catalog import RaceCatalog, RaceCatalogCache
+    cache = RaceCatalogCache(max_entries=128, app=app)
+    monkeypatch.setitem(app.config, 'RACE_CATALOG_CACHE_SIZE', 1) # Set after the cache was built
+    cache.put(RaceCatalog(1, 0, [], None))
+    cache.put(RaceCatalog(2, 0, [], None))
+    assert cache.get(1, 0) is None and cache.get(2, 0) is not None
+
+
+def _answer_every_question(db_session, race, player):
+    """Answers every MC question of the race with its first two options, plus an ORDERING question stored as option ids."""
+    from backend.models import UserAnswer, UserAnswerMultipleChoiceOption
+    ordering_type = QuestionType.get_or_create(name='ORDERING')[0]
+    ordering = Question(race_id=race.id, question_type_id=ordering_type.id, text="Orden")
+    db_session.add(ordering)
+    db_session.flush()
+    ordering_options = [QuestionOption(question_id=ordering.id, option_text=f"Orden {index}") for index in range(3)]
+    db_session.add_all(ordering_options)
+    db_session.flush()
+    db_session.add(UserAnswer(user_id=player.id, race_id=race.id, question_id=ordering.id,
+                              answer_text=f"{ordering_options[2].id}, Libre, {ordering_options[0].id}"))
+    for question in Question.query.filter_by(race_id=race.id, is_mc_multiple_correct=True):
+        answer = UserAnswer(user_id=player.id, race_id=race.id, question_id=question.id)
+        db_session.add(answer)
+        db_session.flush()
+        for option in question.options.order_by(QuestionOption.id).limit(2):
+            db_session.add(UserAnswerMultipleChoiceOption(user_answer_id=answer.id, question_option_id=option.id))
+    db_session.commit()
+    return ordering, ordering_options
+
+
+def test_prediction_review_query_count_does_not_grow_with_options(authenticated_client, catalog_race, db_session):
+    client, player = authenticated_client("PLAYER")
+
+    def _review(num_mc):
+        race, _ = catalog_race(num_mc=num_mc, registered=player)
+        _answer_every_question(db_session, race, player)
+        client.get(f'/race/{race.id}/user_predictions_modal_content') # Re-load the logged-in user after the commits
+        counts = []
+        for url in (f'/race/{race.id}/user_predictions_modal_content', f'/api/races/{race.id}/participants/{player.id}/answers'):
+            response, statements = _statements(lambda: client.get(url))
+            assert response.status_code in (200, 403), url
+            counts.append(len(statements))
+        return counts
+
+    assert _review(2) == _review(20)
+
+
+def test_predictions_modal_resolves_option_texts(authenticated_client, catalog_race, db_session):
+    client, player = authenticated_client("PLAYER")
+    race, _ = catalog_race(num_mc=1, registered=player)
+    _answer_every_question(db_session, race, player)
+
+    html = client.get(f'/race/{race.id}/user_predictions_modal_content').get_json()['html_content']
+    assert html.index("<li>Orden 2</li>") < html.index("<li>Libre</li>") < html.index("<li>Orden 0</li>") # Ids resolved, free text kept
+    assert "Orden 1" not in html
+    assert "MC 0 opt 0" in html and "MC 0 opt 1" in html and "MC 0 opt 2" not in html
+
+
+def test_option_text_resolver_checks_the_question():
+    from backend.race_catalog import OptionEntry, OptionTextResolver, QuestionEntry, QUESTION_COLUMNS
+    def _question(question_id, *options):
+        fields = dict.fromkeys(QUESTION_COLUMNS)
+        fields.update(id=question_id, type_name='MULTIPLE_CHOICE', official=None, max_points=0,
+                      options=tuple(OptionEntry(option_id, text, None, None, None) for option_id, text in options))
+        return QuestionEntry(**fields)
+
+    resolver = OptionTextResolver([_question(1, (10, "Uno"), (11, "Dos")), _question(2, (20, "Tres"))])
+    assert resolver.text(20) == "Tres" and resolver.text(20, question_id=1) is None
+    assert resolver.option(10) == {"id": 10, "text": "Uno"} and resolver.option(99) is None
+    assert resolver.options([11, 99, 10]) == [{"id": 11, "text": "Dos"}, {"id": 10, "text": "Uno"}]
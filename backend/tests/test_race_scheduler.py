@@ -0,0 +1,103 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from backend.models import db, Race, RaceFormat, RaceStatus
+
+
+@pytest.fixture
+def scheduler(app):
+    from backend.race_scheduler import RaceCloseScheduler
+    return RaceCloseScheduler(app) # Not started: no timer in tests, run_due() is called directly
+
+
+@pytest.fixture
+def make_race(db_session, admin_user):
+    def _make(close_in, status=RaceStatus.PLANNED, is_deleted=False):
+        race = Race(title=f"Scheduler Race {close_in}", race_format_id=RaceFormat.query.first().id,
+                    event_date=datetime.utcnow() + timedelta(days=3), user_id=admin_user.id, gender_category="Ambos",
+                    quiniela_close_date=datetime.utcnow() + close_in if close_in is not None else None,
+                    status=status, is_deleted=is_deleted)
+        db_session.add(race)
+        db_session.commit()
+        return race
+    return _make
+
+
+def test_heap_returns_earliest_close_and_skips_rescheduled_entries(scheduler):
+    now = datetime.utcnow()
+    scheduler.schedule(1, now + timedelta(hours=3))
+    scheduler.schedule(2, now + timedelta(hours=1))
+    scheduler.schedule(3, now + timedelta(hours=2))
+    assert scheduler.next_close() == (now + timedelta(hours=1), 2)
+
+    scheduler.schedule(2, now + timedelta(hours=5)) # Edited close date: the old heap entry is stale
+    assert scheduler.next_close() == (now + timedelta(hours=2), 3)
+    scheduler.unschedule(3)
+    assert scheduler.next_close() == (now + timedelta(hours=3), 1)
+
+
+def test_run_due_closes_due_races_in_one_update(scheduler, make_race, db_session):
+    due = make_race(timedelta(minutes=-5))
+    also_due = make_race(timedelta(seconds=-1))
+    future = make_race(timedelta(hours=2))
+    deleted = make_race(timedelta(minutes=-5), is_deleted=True)
+    no_date = make_race(None)
+
+    closed_by_hook = []
+    scheduler.on_close(closed_by_hook.extend)
+
+    updates = []
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("UPDATE"):
+            updates.append(statement)
+    event.listen(db.engine, "before_cursor_execute", _count)
+    try:
+        closed = scheduler.run_due()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", _count)
+
+    assert set(closed) >= {due.id, also_due.id}
+    assert not set(closed) & {future.id, deleted.id, no_date.id}
+    assert len(updates) == 1
+    assert closed_by_hook == closed
+
+    db_session.expire_all()
+    assert db.session.get(Race, due.id).status == RaceStatus.ACTIVE
+    assert db.session.get(Race, future.id).status == RaceStatus.PLANNED
+    assert db.session.get(Race, deleted.id).status == RaceStatus.PLANNED
+
+    # Already transitioned: a second run (e.g. another worker) does nothing and fires no hooks
+    assert scheduler.run_due() == []
+    assert closed_by_hook == closed
+
+
+def test_load_schedules_only_planned_races_with_close_date(scheduler, make_race):
+    planned = make_race(timedelta(minutes=1))
+    active = make_race(timedelta(minutes=-10), status=RaceStatus.ACTIVE)
+    undated = make_race(None)
+    scheduler.load()
+    scheduled_race_ids = {race_id for _, race_id in scheduler._heap}
+    assert planned.id in scheduled_race_ids
+    assert active.id not in scheduled_race_ids and undated.id not in scheduled_race_ids
+
+
+def test_failing_hook_does_not_block_other_hooks(scheduler, make_race):
+    race = make_race(timedelta(minutes=-1))
+    seen = []
+
+    @scheduler.on_close
+    def broken_hook(race_ids):
+        raise RuntimeError("boom")
+
+    scheduler.on_close(seen.extend)
+    assert race.id in scheduler.run_due()
+    assert race.id in seen
+
+
+def test_dashboard_does_not_transition_races(authenticated_client, make_race, db_session):
+    client, _ = authenticated_client("ADMIN")
+    race = make_race(timedelta(minutes=-30))
+
+    assert client.get('/Hello-world').status_code == 200
+    db_session.expire_all()
+    assert db.session.get(Race, race.id).status == RaceStatus.PLANNED # Pure read: the scheduler owns the transition
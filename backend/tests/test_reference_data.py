@@ -0,0 +1,81 @@
+import uuid
+import pytest
+from sqlalchemy import event
+from backend.models import db, Role, RaceFormat, QuestionType
+
+
+def _statements(fn):
+    statements = []
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(db.engine, "before_cursor_execute", _record)
+    try:
+        result = fn()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", _record)
+    return result, statements
+
+
+def _reference_reads(statements):
+    tables = ('FROM roles', 'FROM question_types', 'FROM race_formats', 'FROM segments')
+    return [statement for statement in statements if any(table in statement for table in tables)]
+
+
+def test_snapshot_lookups_are_immutable(db_session):
+    from backend.reference_data import reference_data
+    snapshot = reference_data.refresh()
+    admin = Role.query.filter_by(code='ADMIN').first()
+
+    assert reference_data.role_code(admin.id) == 'ADMIN' and reference_data.role_id('ADMIN') == admin.id
+    assert [entry.name for entry in reference_data.race_formats()] == sorted(entry.name for entry in snapshot.race_formats)
+    triathlon = RaceFormat.query.filter_by(name="Triatlón").first()
+    assert reference_data.race_format(triathlon.id) == (triathlon.id, "Triatlón")
+    with pytest.raises(TypeError):
+        snapshot.roles[admin.id] = 'PLAYER'
+
+
+def test_unknown_ids_refresh_the_snapshot_once(db_session):
+    from backend.reference_data import reference_data
+    reference_data.refresh()
+    question_type = QuestionType(name=f"TYPE_{uuid.uuid4().hex[:6]}")
+    db_session.add(question_type)
+    db_session.commit()
+
+    assert reference_data.question_type_name(question_type.id) == question_type.name # Missed, reloaded
+    _, statements = _statements(lambda: reference_data.question_type_name(question_type.id))
+    assert statements == []
+    assert reference_data.role_code(987654) is None
+
+
+def test_unknown_ids_that_do_not_exist_do_not_reload_the_snapshot(db_session):
+    from backend.reference_data import reference_data
+    snapshot = reference_data.refresh()
+
+    for _ in range(3):
+        value, statements = _statements(lambda: reference_data.question_type_name(987654))
+        assert value is None
+        assert len(statements) == 1 and 'FROM question_types' in statements[0] # The missing row only
+    _, statements = _statements(lambda: reference_data.role_id('NOT_A_ROLE'))
+    assert len(statements) == 1 and 'FROM roles' in statements[0]
+    assert reference_data.snapshot() is snapshot
+
+
+def test_seed_commands_refresh_the_registry(app, db_session):
+    from backend import seed
+    from backend.reference_data import reference_data
+    reference_data.refresh()
+    name = f"Aquabike {uuid.uuid4().hex[:6]}"
+    db_session.add(RaceFormat(name=name))
+    db_session.commit()
+    assert name not in [entry.name for entry in reference_data.race_formats()] # Lists are not reloaded on their own
+
+    seed.create_initial_roles(app)
+    assert name in [entry.name for entry in reference_data.race_formats()]
+
+
+def test_hot_paths_do_not_read_reference_tables(authenticated_client):
+    client, _ = authenticated_client("ADMIN")
+    for url in ('/Hello-world', '/races', '/create-race', '/api/race-formats'):
+        response, statements = _statements(lambda: client.get(url))
+        assert response.status_code == 200, url
+        assert _reference_reads(statements) == [], url
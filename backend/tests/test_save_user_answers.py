@@ -0,0 +1,248 @@
+import uuid
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from backend.models import (db, Race, RaceFormat, Question, QuestionType, QuestionOption, UserRaceRegistration,
+                            UserAnswer, UserAnswerMultipleChoiceOption)
+
+
+@pytest.fixture
+def quiniela(db_session, admin_user):
+    """Open race with one question of each type (plus `extra_free_text` more free text questions)."""
+    def _create(player, extra_free_text=0):
+        race = Race(title=f"Bulk Answers {uuid.uuid4().hex[:6]}", race_format_id=RaceFormat.query.first().id,
+                    event_date=datetime.utcnow() + timedelta(days=5), user_id=admin_user.id, gender_category="Ambos",
+                    quiniela_close_date=datetime.utcnow() + timedelta(days=4))
+        db_session.add(race)
+        db_session.flush()
+        types = {name: QuestionType.get_or_create(name=name)[0] for name in ('FREE_TEXT', 'MULTIPLE_CHOICE', 'ORDERING', 'SLIDER')}
+        questions = {
+            'text': Question(race_id=race.id, question_type_id=types['FREE_TEXT'].id, text="Ganador"),
+            'single': Question(race_id=race.id, question_type_id=types['MULTIPLE_CHOICE'].id, text="Podio", is_mc_multiple_correct=False),
+            'multi': Question(race_id=race.id, question_type_id=types['MULTIPLE_CHOICE'].id, text="Top 5", is_mc_multiple_correct=True),
+            'order': Question(race_id=race.id, question_type_id=types['ORDERING'].id, text="Orden"),
+            'slider': Question(race_id=race.id, question_type_id=types['SLIDER'].id, text="Tiempo"),
+        }
+        for index in range(extra_free_text):
+            questions[f'text{index}'] = Question(race_id=race.id, question_type_id=types['FREE_TEXT'].id, text=f"Extra {index}")
+        db_session.add_all(questions.values())
+        db_session.flush()
+        options = {key: [QuestionOption(question_id=questions[key].id, option_text=f"{key} {index}") for index in range(3)]
+                   for key in ('single', 'multi')}
+        db_session.add_all(options['single'] + options['multi'])
+        db_session.add(UserRaceRegistration(user_id=player.id, race_id=race.id))
+        db_session.commit()
+        return race, questions, options
+    return _create
+
+
+def _answers(race, user):
+    db.session.expire_all()
+    return {answer.question_id: answer for answer in UserAnswer.query.filter_by(race_id=race.id, user_id=user.id)}
+
+
+def test_save_answers_upserts_every_question_type(authenticated_client, quiniela):
+    client, player = authenticated_client("PLAYER")
+    race, questions, options = quiniela(player)
+    payload = {
+        str(questions['text'].id): {'answer_text': "Alistair"},
+        str(questions['single'].id): {'selected_option_id': options['single'][1].id},
+        str(questions['multi'].id): {'selected_option_ids': [options['multi'][0].id, options['multi'][2].id, options['single'][0].id]},
+        str(questions['order'].id): {'ordered_options_text': "B,A,C"},
+        str(questions['slider'].id): {'slider_answer_value': "1.5"},
+    }
+    assert client.post(f'/api/races/{race.id}/answers', json=payload).status_code == 201
+
+    answers = _answers(race, player)
+    assert answers[questions['text'].id].answer_text == "Alistair"
+    assert answers[questions['single'].id].selected_option_id == options['single'][1].id
+    # The option of another question is dropped
+    assert {mc.question_option_id for mc in answers[questions['multi'].id].selected_mc_options} == \
+        {options['multi'][0].id, options['multi'][2].id}
+    assert answers[questions['order'].id].answer_text == "B,A,C"
+    assert answers[questions['slider'].id].slider_answer_value == 1.5
+
+    # Re-submitting updates in place: same primary keys, MC selections replaced
+    answer_ids = {question_id: answer.id for question_id, answer in answers.items()}
+    payload[str(questions['text'].id)] = {'answer_text': "Hayden"}
+    payload[str(questions['multi'].id)] = {'selected_option_ids': [options['multi'][1].id]}
+    assert client.post(f'/api/races/{race.id}/answers', json=payload).status_code == 201
+
+    answers = _answers(race, player)
+    assert {question_id: answer.id for question_id, answer in answers.items()} == answer_ids
+    assert answers[questions['text'].id].answer_text == "Hayden"
+    assert [mc.question_option_id for mc in answers[questions['multi'].id].selected_mc_options] == [options['multi'][1].id]
+    assert UserAnswerMultipleChoiceOption.query.filter_by(user_answer_id=answer_ids[questions['multi'].id]).count() == 1
+
+
+def test_save_answers_skips_questions_of_other_races(authenticated_client, quiniela):
+    client, player = authenticated_client("PLAYER")
+    race, questions, _ = quiniela(player)
+    other_race, other_questions, _ = quiniela(player)
+    payload = {
+        str(questions['text'].id): {'answer_text': "mine"},
+        str(other_questions['text'].id): {'answer_text': "not this race"},
+        "not-an-id": {'answer_text': "ignored"},
+    }
+    assert client.post(f'/api/races/{race.id}/answers', json=payload).status_code == 201
+    assert set(_answers(race, player)) == {questions['text'].id}
+    assert _answers(other_race, player) == {}
+
+
+def test_save_answers_statement_count_does_not_grow_with_questions(authenticated_client, quiniela):
+    client, player = authenticated_client("PLAYER")
+
+    def _statements(extra_free_text):
+        race, questions, options = quiniela(player, extra_free_text=extra_free_text)
+        payload = {str(question.id): {'answer_text': "x"} for key, question in questions.items() if key.startswith('text')}
+        payload[str(questions['multi'].id)] = {'selected_option_ids': [option.id for option in options['multi']]}
+        client.post(f'/api/races/{race.id}/answers', json=payload) # Warm-up (insert path)
+
+        statements = []
+        def _count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        event.listen(db.engine, "before_cursor_execute", _count)
+        try:
+            response = client.post(f'/api/races/{race.id}/answers', json=payload) # Update path
+        finally:
+            event.remove(db.engine, "before_cursor_execute", _count)
+        assert response.status_code == 201
+        return len(statements)
+
+    assert _statements(0) == _statements(20)
+
+
+def test_resubmitting_unchanged_answers_writes_nothing(authenticated_client, quiniela):
+    client, player = authenticated_client("PLAYER")
+    race, questions, options = quiniela(player)
+    multi_ids = [options['multi'][0].id, options['multi'][2].id]
+    payload = {
+        str(questions['text'].id): {'answer_text': "Alistair"},
+        str(questions['multi'].id): {'selected_option_ids': multi_ids},
+        str(questions['slider'].id): {'slider_answer_value': 2},
+    }
+    first = client.post(f'/api/races/{race.id}/answers', json=payload).json
+    assert (first['created'], first['updated'], first['unchanged']) == (3, 0, 0)
+    updated_at = {question_id: answer.updated_at for question_id, answer in _answers(race, player).items()}
+
+    # Same answers, different formatting: option order, numeric string, float vs int
+    payload[str(questions['multi'].id)] = {'selected_option_ids': [str(multi_ids[1]), multi_ids[0]]}
+    payload[str(questions['slider'].id)] = {'slider_answer_value': "2.0"}
+    writes = []
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("INSERT", "UPDATE", "DELETE")):
+            writes.append(statement)
+    event.listen(db.engine, "before_cursor_execute", _count)
+    try:
+        second = client.post(f'/api/races/{race.id}/answers', json=payload).json
+    finally:
+        event.remove(db.engine, "before_cursor_execute", _count)
+    assert (second['created'], second['updated'], second['unchanged']) == (0, 0, 3)
+    assert writes == []
+    assert {question_id: answer.updated_at for question_id, answer in _answers(race, player).items()} == updated_at
+
+    payload[str(questions['text'].id)] = {'answer_text': "Hayden"}
+    payload[str(questions['order'].id)] = {'ordered_options_text': "A,B"}
+    third = client.post(f'/api/races/{race.id}/answers', json=payload).json
+    assert (third['created'], third['updated'], third['unchanged']) == (1, 1, 2)
+    assert _answers(race, player)[questions['text'].id].answer_text == "Hayden"
+
+
+def test_answer_edited_by_id_is_rewritten_on_next_save(authenticated_client, quiniela):
+    client, player = authenticated_client("PLAYER")
+    race, questions, _ = quiniela(player)
+    payload = {str(questions['text'].id): {'answer_text': "Alistair"}}
+    client.post(f'/api/races/{race.id}/answers', json=payload)
+    answer = _answers(race, player)[questions['text'].id]
+
+    assert client.put(f'/api/user_answers/{answer.id}', json={'answer_text': "Hayden"}).status_code == 200
+    assert _answers(race, player)[questions['text'].id].answer_digest is None
+    # Back to the original text: the stored digest must not make it look unchanged
+    result = client.post(f'/api/races/{race.id}/answers', json=payload).json
+    assert result['updated'] == 1
+    assert _answers(race, player)[questions['text'].id].answer_text == "Alistair"
+
+
+def test_autosave_upserts_single_questions_with_versions(authenticated_client, quiniela):
+    client, player = authenticated_client("PLAYER")
+    race, questions, options = quiniela(player)
+    url = f'/api/races/{race.id}/answers'
+    text_id, multi_id = str(questions['text'].id), str(questions['multi'].id)
+
+    first = client.patch(url, json={'answers': {text_id: {'answer_text': "Alistair", 'version': 0}}})
+    assert first.status_code == 200
+    assert first.json['answers'] == {text_id: {'status': 'created', 'version': 1}}
+    assert (first.json['num_answered_questions'], first.json['num_total_questions']) == (1, 5)
+
+    second = client.patch(url, json={'answers': {
+        text_id: {'answer_text': "Hayden", 'version': 1},
+        multi_id: {'selected_option_ids': [options['multi'][1].id], 'version': 0},
+    }})
+    assert second.status_code == 200
+    assert second.json['answers'] == {text_id: {'status': 'updated', 'version': 2},
+                                      multi_id: {'status': 'created', 'version': 1}}
+    assert second.json['num_answered_questions'] == 2
+    answers = _answers(race, player)
+    assert answers[questions['text'].id].answer_text == "Hayden"
+    assert [mc.question_option_id for mc in answers[questions['multi'].id].selected_mc_options] == [options['multi'][1].id]
+
+    # A full save also moves the versions forward
+    client.post(url, json={text_id: {'answer_text': "Javier"}})
+    assert _answers(race, player)[questions['text'].id].version == 3
+
+
+def test_autosave_rejects_stale_versions_without_writing(authenticated_client, quiniela):
+    client, player = authenticated_client("PLAYER")
+    race, questions, _ = quiniela(player)
+    url = f'/api/races/{race.id}/answers'
+    text_id, order_id = str(questions['text'].id), str(questions['order'].id)
+    client.patch(url, json={'answers': {text_id: {'answer_text': "tab A", 'version': 0}}})
+    client.patch(url, json={'answers': {text_id: {'answer_text': "tab B", 'version': 1}}})
+
+    stale = client.patch(url, json={'answers': {
+        text_id: {'answer_text': "tab A again", 'version': 1},
+        order_id: {'ordered_options_text': "A,B", 'version': 0},
+    }})
+    assert stale.status_code == 409
+    assert stale.json['conflicts'] == {text_id: {'version': 2}}
+    answers = _answers(race, player)
+    assert answers[questions['text'].id].answer_text == "tab B"
+    assert questions['order'].id not in answers # All or nothing
+
+    # Re-sending what is already stored never conflicts (e.g. a retried request)
+    retried = client.patch(url, json={'answers': {text_id: {'answer_text': "tab B", 'version': 1}}})
+    assert retried.status_code == 200
+    assert retried.json['answers'] == {text_id: {'status': 'unchanged', 'version': 2}}
+
+
+@pytest.mark.parametrize("body", [
+    {},
+    {'answers': {}},
+    {'answers': {'QUESTION': {'answer_text': "x"}}}, # No version
+    {'answers': {'QUESTION': {'answer_text': "x", 'version': -1}}},
+    {'answers': {'999999': {'answer_text': "x", 'version': 0}}}, # Not a question of the race
+])
+def test_autosave_rejects_invalid_payloads(authenticated_client, quiniela, body):
+    client, player = authenticated_client("PLAYER")
+    race, questions, _ = quiniela(player)
+    if 'answers' in body and 'QUESTION' in body['answers']:
+        body = {'answers': {str(questions['text'].id): body['answers']['QUESTION']}}
+    assert client.patch(f'/api/races/{race.id}/answers', json=body).status_code == 400
+    assert _answers(race, player) == {}
+
+
+def test_versioned_upsert_skips_rows_written_concurrently(authenticated_client, quiniela, db_session):
+    from backend.user_answers import upsert_user_answers
+    client, player = authenticated_client("PLAYER")
+    race, questions, _ = quiniela(player)
+    url = f'/api/races/{race.id}/answers'
+    client.patch(url, json={'answers': {str(questions['text'].id): {'answer_text': "v1", 'version': 0}}})
+    client.patch(url, json={'answers': {str(questions['text'].id): {'answer_text': "v2", 'version': 1}}})
+
+    now = datetime.utcnow()
+    row = dict(user_id=player.id, race_id=race.id, question_id=questions['text'].id, answer_text="lost update",
+               selected_option_id=None, slider_answer_value=None, answer_digest="x", version=2,
+               created_at=now, updated_at=now) # Based on version 1, but version 2 is stored
+    assert upsert_user_answers([row], check_versions=True) is False
+    db_session.rollback()
+    assert _answers(race, player)[questions['text'].id].answer_text == "v2"
@@ -0,0 +1,190 @@
+import pytest
+from backend.models import ScoringJob, ScoringJobStatus
+
+
+@pytest.fixture
+def scoring_queue(app):
+    """A queue whose jobs only run when the test calls run_job, recording the calls to the scorer."""
+    from backend.scoring_jobs import ScoringJobQueue
+    calls = []
+
+    def fake_score_race(race_id, question_ids=None):
+        calls.append((race_id, question_ids))
+        return {"success": True, "message": "ok"}
+
+    queue = ScoringJobQueue(app, fake_score_race)
+    queue._is_eager = lambda: False
+    queue._get_executor = lambda: type("NoopExecutor", (), {"submit": lambda self, *args: None})()
+    queue.calls = calls
+    return queue
+
+
+def test_merge_question_ids():
+    from backend.scoring_jobs import merge_question_ids
+    assert merge_question_ids([3, 1], [2, 3]) == [1, 2, 3]
+    assert merge_question_ids(None, [2]) is None
+    assert merge_question_ids([2], None) is None
+
+
+def test_pending_jobs_for_a_race_are_coalesced(db_session, sample_race, scoring_queue):
+    first = scoring_queue.enqueue(sample_race.id, question_ids={5})
+    second = scoring_queue.enqueue(sample_race.id, question_ids={7, 5})
+    assert second.id == first.id
+
+    job = ScoringJob.query.get(first.id)
+    assert job.status == ScoringJobStatus.PENDING
+    assert job.question_ids == [5, 7]
+    assert job.coalesced_requests == 2
+
+    # A full rescore request absorbs the changed-question list
+    scoring_queue.enqueue(sample_race.id)
+    db_session.refresh(job)
+    assert job.question_ids is None
+
+    scoring_queue.run_job(job.id)
+    db_session.refresh(job)
+    assert job.status == ScoringJobStatus.COMPLETED
+    assert scoring_queue.calls == [(sample_race.id, None)]
+
+    # Once the job left PENDING, a new request gets a new job; running a finished job again is a no-op
+    third = scoring_queue.enqueue(sample_race.id, question_ids={9})
+    assert third.id != job.id
+    scoring_queue.run_job(job.id)
+    assert len(scoring_queue.calls) == 1
+
+
+def test_concurrent_merges_into_a_pending_job_keep_every_question(app, db_session, sample_race, scoring_queue, monkeypatch):
+    from backend import scoring_jobs
+    from backend.scoring_jobs import ScoringJobQueue
+    other_process = ScoringJobQueue(app, scoring_queue.score_race) # Its own lock, as in another worker
+    other_process._is_eager = scoring_queue._is_eager
+    other_process._get_executor = scoring_queue._get_executor
+    job = scoring_queue.enqueue(sample_race.id, question_ids={5})
+
+    merge = scoring_jobs.merge_question_ids
+    interleaved = []
+    def merge_then_let_the_other_process_merge(current, new):
+        merged = merge(current, new)
+        if not interleaved: # Between this process' read of the job and its update
+            interleaved.append(True)
+            other_process.enqueue(sample_race.id, question_ids={9})
+        return merged
+    monkeypatch.setattr(scoring_jobs, 'merge_question_ids', merge_then_let_the_other_process_merge)
+
+    assert scoring_queue.enqueue(sample_race.id, question_ids={7}).id == job.id
+    job = ScoringJob.query.get(job.id)
+    db_session.refresh(job)
+    assert job.question_ids == [5, 7, 9]
+    assert job.coalesced_requests == 3
+
+
+def test_failed_scoring_marks_job_failed(db_session, sample_race, scoring_queue):
+    scoring_queue.score_race = lambda race_id, question_ids=None: {"success": False, "message": "Race not found"}
+    job = scoring_queue.enqueue(sample_race.id + 1000)
+    scoring_queue.run_job(job.id)
+    job = ScoringJob.query.get(job.id)
+    assert job.status == ScoringJobStatus.FAILED
+    assert job.message == "Race not found"
+
+
+def test_the_job_after_a_failed_one_rescores_the_whole_race(db_session, sample_race, scoring_queue):
+    results = [{"success": False, "message": "Database went away"}]
+    def flaky_score_race(race_id, question_ids=None):
+        scoring_queue.calls.append((race_id, question_ids))
+        return results.pop(0) if results else {"success": True, "message": "ok"}
+    scoring_queue.score_race = flaky_score_race
+
+    failed = scoring_queue.enqueue(sample_race.id, question_ids={5})
+    scoring_queue.run_job(failed.id)
+    assert ScoringJob.query.get(failed.id).status == ScoringJobStatus.FAILED
+
+    # Question 5 was never rescored: the next job covers the whole race, not only question 7
+    retry = scoring_queue.enqueue(sample_race.id, question_ids={7})
+    scoring_queue.run_job(retry.id)
+    retry = ScoringJob.query.get(retry.id)
+    assert retry.status == ScoringJobStatus.COMPLETED and retry.question_ids is None
+
+    # Once a run succeeded, deltas are back
+    delta = scoring_queue.enqueue(sample_race.id, question_ids={8})
+    scoring_queue.run_job(delta.id)
+    assert scoring_queue.calls == [(sample_race.id, [5]), (sample_race.id, None), (sample_race.id, [8])]
+
+
+def test_get_scoring_job_status(authenticated_client, sample_race, db_session):
+    job = ScoringJob(race_id=sample_race.id, status=ScoringJobStatus.RUNNING, question_ids=[1])
+    db_session.add(job)
+    db_session.commit()
+
+    client, _ = authenticated_client("ADMIN")
+    response = client.get(f"/api/races/{sample_race.id}/scoring_jobs/{job.id}")
+    assert response.status_code == 200
+    assert response.json["status"] == "running"
+    assert response.json["question_ids"] == [1]
+
+    assert client.get(f"/api/races/{sample_race.id + 1}/scoring_jobs/{job.id}").status_code == 404
+
+    player_client, _ = authenticated_client("PLAYER")
+    assert player_client.get(f"/api/races/{sample_race.id}/scoring_jobs/{job.id}").status_code == 403
+
+
+def _finish_race_jobs(db_session, race_id):
+    ScoringJob.query.filter(ScoringJob.race_id == race_id,
+                            ScoringJob.status.in_([ScoringJobStatus.PENDING, ScoringJobStatus.RUNNING]))\
+                    .update({ScoringJob.status: ScoringJobStatus.COMPLETED}, synchronize_session=False)
+    db_session.commit()
+
+
+def test_a_running_job_leases_its_race_and_drains_the_waiting_ones(db_session, sample_race, scoring_queue):
+    _finish_race_jobs(db_session, sample_race.id)
+    first = scoring_queue.enqueue(sample_race.id, question_ids={1})
+    first_id = first.id
+    queued_while_running = []
+
+    def score_race(race_id, question_ids=None):
+        if not queued_while_running:
+            # Another process enqueues and tries to run a job while this one holds the lease
+            second = scoring_queue.enqueue(race_id, question_ids={2})
+            queued_while_running.append(second.id)
+            scoring_queue.run_job(second.id)
+            assert ScoringJob.query.get(second.id).status == ScoringJobStatus.PENDING
+        scoring_queue.calls.append((race_id, question_ids))
+        return {"success": True, "message": "ok"}
+    scoring_queue.score_race = score_race
+
+    scoring_queue.run_job(first_id)
+    assert scoring_queue.calls == [(sample_race.id, [1]), (sample_race.id, [2])] # One after the other
+    assert {ScoringJob.query.get(job_id).status for job_id in [first_id] + queued_while_running} == {ScoringJobStatus.COMPLETED}
+
+
+def test_stale_jobs_are_recovered(app, db_session, sample_race, scoring_queue):
+    from datetime import datetime, timedelta
+    _finish_race_jobs(db_session, sample_race.id)
+    long_ago = datetime.utcnow() - timedelta(hours=2)
+    dead = ScoringJob(race_id=sample_race.id, status=ScoringJobStatus.RUNNING, question_ids=[4], started_at=long_ago)
+    db_session.add(dead)
+    db_session.commit()
+
+    # A job can not wait behind a dead lease: it takes it over with the unfinished questions
+    waiting = scoring_queue.enqueue(sample_race.id, question_ids={6})
+    scoring_queue.run_job(waiting.id)
+    assert ScoringJob.query.get(dead.id).status == ScoringJobStatus.FAILED
+    assert scoring_queue.calls[-1] == (sample_race.id, [4, 6])
+
+    # On startup: stale RUNNING jobs are failed and requeued, orphaned PENDING ones resubmitted
+    dead = ScoringJob(race_id=sample_race.id, status=ScoringJobStatus.RUNNING, question_ids=[8], started_at=long_ago)
+    db_session.add(dead)
+    db_session.commit()
+    submitted = []
+    scoring_queue._submit = submitted.append
+    scoring_queue.recover_stale_jobs()
+    requeued = ScoringJob.query.filter_by(race_id=sample_race.id, status=ScoringJobStatus.PENDING).one()
+    assert ScoringJob.query.get(dead.id).status == ScoringJobStatus.FAILED
+    assert requeued.question_ids == [8] and submitted == [requeued.id]
+
+    requeued.created_at = long_ago
+    db_session.commit()
+    submitted.clear()
+    assert scoring_queue.recover_stale_jobs() == [requeued.id] and submitted == [requeued.id]
+    scoring_queue.enqueue(sample_race.id, question_ids={9}) # Merging into it resubmits it too
+    assert submitted == [requeued.id, requeued.id]
+    _finish_race_jobs(db_session, sample_race.id)
@@ -1029,3 +1029,322 @@ def test_ordering_no_bonus_if_points_per_item_is_zero(db_session, ordering_quest
 
     assert user_score is not None
     assert user_score.score == 0
+
+
+# --- Bulk scoring engine: many users, fixed number of queries ---
+
+@pytest.fixture
+def bulk_scoring_setup(db_session, sample_race, new_user_factory):
+    """Race with a FREE_TEXT and a SLIDER question, official answers and several registered players."""
+    from backend.models import UserRaceRegistration
+
+    ft_type, _ = QuestionType.get_or_create(name='FREE_TEXT')
+    slider_type, _ = QuestionType.get_or_create(name='SLIDER')
+    ft_question = Question(race_id=sample_race.id, question_type_id=ft_type.id, text="Winner?", is_active=True, max_score_free_text=10)
+    slider_question = Question(
+        race_id=sample_race.id, question_type_id=slider_type.id, text="Water temperature?", is_active=True,
+        slider_points_exact=20, slider_threshold_partial=1.0, slider_points_partial=5
+    )
+    db_session.add_all([ft_question, slider_question])
+    db_session.flush()
+    db_session.add_all([
+        OfficialAnswer(race_id=sample_race.id, question_id=ft_question.id, answer_text="Alice"),
+        OfficialAnswer(race_id=sample_race.id, question_id=slider_question.id, correct_slider_value=18.0),
+    ])
+
+    users = []
+    for i in range(6):
+        user = new_user_factory(f"bulk_player_{sample_race.id}_{i}", f"bulk{sample_race.id}_{i}@test.com", "pw", "PLAYER")
+        db_session.add(UserRaceRegistration(user_id=user.id, race_id=sample_race.id))
+        users.append(user)
+    db_session.commit()
+    return {"race": sample_race, "users": users, "ft": ft_question, "slider": slider_question}
+
+def test_bulk_scoring_scores_every_registered_user(db_session, bulk_scoring_setup):
+    from backend.app import calculate_and_store_scores
+    setup = bulk_scoring_setup
+    race, users = setup["race"], setup["users"]
+
+    # user 0: both exact (30), user 1: only free text (10), user 2: slider partial (5), others: nothing answered
+    db_session.add_all([
+        UserAnswer(user_id=users[0].id, race_id=race.id, question_id=setup["ft"].id, answer_text=" alice "),
+        UserAnswer(user_id=users[0].id, race_id=race.id, question_id=setup["slider"].id, slider_answer_value=18.0),
+        UserAnswer(user_id=users[1].id, race_id=race.id, question_id=setup["ft"].id, answer_text="Alice"),
+        UserAnswer(user_id=users[2].id, race_id=race.id, question_id=setup["slider"].id, slider_answer_value=17.2),
+    ])
+    # A stale score must be overwritten by the upsert, not duplicated
+    db_session.add(UserScore(user_id=users[1].id, race_id=race.id, score=999))
+    db_session.commit()
+
+    result = calculate_and_store_scores(race.id)
+    assert result["success"] is True
+
+    scores = {s.user_id: s.score for s in UserScore.query.filter_by(race_id=race.id).all()}
+    assert len(scores) == len(users)
+    assert scores[users[0].id] == 30
+    assert scores[users[1].id] == 10
+    assert scores[users[2].id] == 5
+    assert all(scores[u.id] == 0 for u in users[3:])
+
+def test_bulk_scoring_query_count_independent_of_users(db_session, bulk_scoring_setup):
+    from sqlalchemy import event
+    from backend.app import calculate_and_store_scores
+    from backend.models import db
+    setup = bulk_scoring_setup
+    race, users = setup["race"], setup["users"]
+
+    for user in users:
+        db_session.add(UserAnswer(user_id=user.id, race_id=race.id, question_id=setup["ft"].id, answer_text="Bob"))
+        db_session.add(UserAnswer(user_id=user.id, race_id=race.id, question_id=setup["slider"].id, slider_answer_value=10.0))
+    db_session.commit()
+
+    statements = []
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    engine = db.engine
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        assert calculate_and_store_scores(race.id)["success"] is True
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+
+    # race, questions, official answers (+MC selections), option counts, registrations, answers,
+    # per-question scores (delete + bulk insert), upsert, score version bump, leagues of the race
+    assert len(statements) <= 14
+    assert sum(1 for s in statements if "user_scores" in s.lower()) == 1
+
+
+# --- Compiled per-race scorer ---
+
+def test_compiled_scorer_mc_multiple_penalty_sign_is_normalized(mc_question_multiple_correct_base):
+    from backend.scoring import compile_question_scorer
+    question = mc_question_multiple_correct_base # 50 per correct
+    official_ans = MockOfficialAnswer(question_id=question.id)
+
+    for stored_penalty in (-20, 20):
+        question.points_per_incorrect_mc = stored_penalty
+        score = compile_question_scorer(question, official_ans, official_option_ids={1, 2})
+        # One correct (1) and one incorrect (3) pick: 50 - 20 whichever sign the penalty was stored with
+        assert score(None, None, None, [1, 3]) == (30, False)
+        assert score(None, None, None, [1, 2]) == (100, True)
+
+def test_compiled_scorer_without_official_answer_scores_zero(slider_question_scoring):
+    from backend.scoring import compile_question_scorer, CompiledRaceScorer
+    assert compile_question_scorer(slider_question_scoring, None) is None
+
+    scorer = CompiledRaceScorer(race_id=1, questions=[slider_question_scoring], official_answers=[])
+    assert scorer.score(slider_question_scoring.id, slider_value=75.0) == (0, False)
+    assert scorer.max_points[slider_question_scoring.id] == 100
+
+def test_compiled_scorer_ordering_ignores_empty_official_items(ordering_question_for_calc_score_helper):
+    from backend.scoring import CompiledRaceScorer
+    question = ordering_question_for_calc_score_helper
+    question.points_per_correct_order = 10
+    question.bonus_for_full_order = 5
+    official_ans = MockOfficialAnswer(question_id=question.id, answer_text="Alpha, Beta,,Gamma,")
+
+    scorer = CompiledRaceScorer(race_id=1, questions=[question], official_answers=[official_ans])
+    assert scorer.official_ordering_texts[question.id] == ["alpha", "beta", "gamma"]
+    assert scorer.score(question.id, answer_text="alpha,beta,gamma") == (35, True)
+    assert scorer.max_points[question.id] == 35
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_compiled_scorer_total_scores_matches_per_answer_scoring(
+        monkeypatch, use_numpy, slider_question_scoring, mc_question_single_correct_base, mc_question_multiple_correct_base):
+    from collections import namedtuple
+    from backend import scoring
+    if use_numpy and scoring.np is None:
+        pytest.skip("numpy not installed")
+    if not use_numpy:
+        monkeypatch.setattr(scoring, "np", None)
+
+    slider_q, mc_single_q, mc_multi_q = slider_question_scoring, mc_question_single_correct_base, mc_question_multiple_correct_base
+    official_answers = [
+        MockOfficialAnswer(question_id=slider_q.id, correct_slider_value=75.0),
+        MockOfficialAnswer(question_id=mc_single_q.id, selected_option_id=7),
+        MockOfficialAnswer(question_id=mc_multi_q.id, official_selected_mc_options=[
+            MockOfficialAnswerMultipleChoiceOption(question_option_id=1),
+            MockOfficialAnswerMultipleChoiceOption(question_option_id=2),
+        ]),
+    ]
+    scorer = scoring.CompiledRaceScorer(race_id=1, questions=[slider_q, mc_single_q, mc_multi_q], official_answers=official_answers)
+
+    Row = namedtuple("Row", "id user_id question_id answer_text selected_option_id slider_answer_value")
+    rows = [
+        Row(1, 10, slider_q.id, None, None, 75.0),      # exact: 100
+        Row(2, 10, mc_single_q.id, None, 7, None),      # correct: 100
+        Row(3, 11, slider_q.id, None, None, 79.5),      # partial: 50
+        Row(4, 11, mc_single_q.id, None, 8, None),      # wrong: 0
+        Row(5, 11, mc_multi_q.id, None, None, None),    # 1 correct + 1 incorrect: 30
+        Row(6, 12, slider_q.id, None, None, None),      # no value: 0
+        Row(7, 12, mc_single_q.id, None, None, None),   # nothing selected: 0
+        Row(8, 99, slider_q.id, None, None, 75.0),      # user not in the scored set: ignored
+    ]
+    mc_selections = {5: {1, 3}}
+
+    totals = scorer.total_scores(rows, [10, 11, 12, 13], mc_selections)
+    assert totals == {10: 200, 11: 80, 12: 0, 13: 0}
+
+    expected = {10: 0, 11: 0, 12: 0, 13: 0}
+    for row in rows:
+        if row.user_id in expected:
+            expected[row.user_id] += scorer.score(row.question_id, row.answer_text, row.selected_option_id,
+                                                  row.slider_answer_value, mc_selections.get(row.id, ()))[0]
+    assert totals == expected
+
+def test_delta_rescore_updates_only_changed_question(db_session, bulk_scoring_setup):
+    from backend.app import calculate_and_store_scores
+    from backend.models import UserQuestionScore
+    setup = bulk_scoring_setup
+    race, users = setup["race"], setup["users"]
+
+    db_session.add_all([
+        UserAnswer(user_id=users[0].id, race_id=race.id, question_id=setup["ft"].id, answer_text="Alice"),
+        UserAnswer(user_id=users[0].id, race_id=race.id, question_id=setup["slider"].id, slider_answer_value=18.0),
+        UserAnswer(user_id=users[1].id, race_id=race.id, question_id=setup["ft"].id, answer_text="Alice"),
+        UserAnswer(user_id=users[2].id, race_id=race.id, question_id=setup["slider"].id, slider_answer_value=17.2),
+    ])
+    db_session.commit()
+    assert calculate_and_store_scores(race.id)["success"] is True
+
+    # The per-question breakdown adds up to the stored totals
+    breakdown = {(s.user_id, s.question_id): (s.points, s.is_correct)
+                 for s in UserQuestionScore.query.filter_by(race_id=race.id).all()}
+    assert breakdown[(users[0].id, setup["slider"].id)] == (20, True)
+    assert breakdown[(users[2].id, setup["slider"].id)] == (5, True)
+    assert breakdown[(users[1].id, setup["ft"].id)] == (10, True)
+
+    # Totals are only adjusted by delta: a total the changed question does not affect is left as stored
+    UserScore.query.filter_by(user_id=users[1].id, race_id=race.id).first().score = 77
+    OfficialAnswer.query.filter_by(question_id=setup["slider"].id).first().correct_slider_value = 17.2
+    db_session.commit()
+
+    version_before = race.score_version
+    assert calculate_and_store_scores(race.id, question_ids={setup["slider"].id})["success"] is True
+    assert race.score_version == version_before + 1 # Leaderboard snapshots of the race are invalidated
+    scores = {s.user_id: s.score for s in UserScore.query.filter_by(race_id=race.id).all()}
+    assert scores[users[0].id] == 15  # 10 + partial 5
+    assert scores[users[1].id] == 77
+    assert scores[users[2].id] == 20  # exact
+    assert UserQuestionScore.query.filter_by(user_id=users[2].id, question_id=setup["slider"].id).first().points == 20
+
+def test_delta_rescore_fully_scores_users_registered_or_edited_since_the_last_rescore(db_session, bulk_scoring_setup, new_user_factory):
+    from backend.app import calculate_and_store_scores
+    from backend.models import UserQuestionScore, UserRaceRegistration
+    setup = bulk_scoring_setup
+    race, users = setup["race"], setup["users"]
+
+    edited = UserAnswer(user_id=users[0].id, race_id=race.id, question_id=setup["ft"].id, answer_text="Bob")
+    db_session.add_all([
+        edited,
+        UserAnswer(user_id=users[1].id, race_id=race.id, question_id=setup["ft"].id, answer_text="Alice"),
+    ])
+    db_session.commit()
+    assert calculate_and_store_scores(race.id)["success"] is True
+
+    # After the full rescore: a new player registers and answers both questions, and users[0] fixes an answer
+    late = new_user_factory(f"late_player_{race.id}", f"late{race.id}@test.com", "pw", "PLAYER")
+    db_session.add_all([
+        UserRaceRegistration(user_id=late.id, race_id=race.id),
+        UserAnswer(user_id=late.id, race_id=race.id, question_id=setup["ft"].id, answer_text="Alice"),
+        UserAnswer(user_id=late.id, race_id=race.id, question_id=setup["slider"].id, slider_answer_value=18.0),
+    ])
+    edited.answer_text = "Alice"
+    db_session.commit()
+
+    # Only the slider's official answer changes: a pure delta would miss both free-text answers
+    OfficialAnswer.query.filter_by(question_id=setup["slider"].id).first().correct_slider_value = 18.5
+    db_session.commit()
+    assert calculate_and_store_scores(race.id, question_ids={setup["slider"].id})["success"] is True
+
+    scores = {s.user_id: s.score for s in UserScore.query.filter_by(race_id=race.id).all()}
+    assert scores[late.id] == 15 # Free text 10 + slider partial 5
+    assert scores[users[0].id] == 10
+    assert scores[users[1].id] == 10
+    points = {s.question_id: s.points for s in UserQuestionScore.query.filter_by(race_id=race.id, user_id=late.id).all()}
+    assert points == {setup["ft"].id: 10, setup["slider"].id: 5}
+
+def test_editing_and_deleting_a_scored_question_rescores_the_race(db_session, bulk_scoring_setup, authenticated_client):
+    from backend.app import calculate_and_store_scores
+    from backend.models import UserQuestionScore
+    setup = bulk_scoring_setup
+    race, users = setup["race"], setup["users"]
+    db_session.add_all([
+        UserAnswer(user_id=users[0].id, race_id=race.id, question_id=setup["ft"].id, answer_text="Alice"),
+        UserAnswer(user_id=users[1].id, race_id=race.id, question_id=setup["slider"].id, slider_answer_value=18.0),
+    ])
+    db_session.commit()
+    assert calculate_and_store_scores(race.id)["success"] is True
+    client, _ = authenticated_client("ADMIN")
+
+    def _scores():
+        db_session.expire_all()
+        return {s.user_id: s.score for s in UserScore.query.filter_by(race_id=race.id).all()}
+
+    response = client.put(f"/api/questions/free-text/{setup['ft'].id}", json={"max_score_free_text": 50})
+    assert response.status_code == 200
+    assert response.json["scoring_job_id"] is not None
+    assert _scores()[users[0].id] == 50
+    assert _scores()[users[1].id] == 20
+
+    response = client.put(f"/api/questions/free-text/{setup['ft'].id}", json={"text": "Who wins?"})
+    assert response.json["scoring_job_id"] is not None # Has an official answer: rescored anyway
+
+    ft_id = setup["ft"].id
+    response = client.delete(f"/api/questions/{ft_id}")
+    assert response.status_code == 200
+    assert response.json["scoring_job_id"] is not None
+    scores = _scores()
+    assert scores[users[0].id] == 0 and scores[users[1].id] == 20
+    assert UserQuestionScore.query.filter_by(question_id=ft_id).count() == 0
+
+    response = client.delete(f"/api/questions/{setup['slider'].id}") # The last question: totals are cleared
+    assert response.status_code == 200
+    assert _scores()[users[1].id] == 0
+
+
+def test_editing_a_question_without_official_answer_or_scoring_fields_does_not_rescore(db_session, sample_race, authenticated_client):
+    ft_type, _ = QuestionType.get_or_create(name='FREE_TEXT')
+    question = Question(race_id=sample_race.id, question_type_id=ft_type.id, text="Winner?", is_active=True, max_score_free_text=10)
+    db_session.add(question)
+    db_session.commit()
+    client, _ = authenticated_client("ADMIN")
+
+    response = client.put(f"/api/questions/free-text/{question.id}", json={"text": "Who wins?"})
+    assert response.status_code == 200
+    assert response.json["scoring_job_id"] is None
+    response = client.delete(f"/api/questions/{question.id}")
+    assert response.status_code == 200
+    assert response.json["scoring_job_id"] is None
+
+
+def test_rescore_refreshes_league_standings(db_session, bulk_scoring_setup):
+    from backend.app import calculate_and_store_scores
+    from backend.models import League, LeagueParticipant, LeagueStanding
+    setup = bulk_scoring_setup
+    race, users = setup["race"], setup["users"]
+
+    league = League(name=f"Rescore League {race.id}", creator_id=race.user_id)
+    league.races.append(race)
+    db_session.add(league)
+    db_session.flush()
+    db_session.add_all([LeagueParticipant(user_id=user.id, league_id=league.id) for user in users[:3]])
+    db_session.add_all([
+        UserAnswer(user_id=users[1].id, race_id=race.id, question_id=setup["ft"].id, answer_text="Alice"),
+        UserAnswer(user_id=users[2].id, race_id=race.id, question_id=setup["slider"].id, slider_answer_value=18.0),
+    ])
+    db_session.commit()
+
+    assert calculate_and_store_scores(race.id)["success"] is True
+    standings = {s.user_id: s for s in LeagueStanding.query.filter_by(league_id=league.id).all()}
+    assert set(standings) == {user.id for user in users[:3]} # Only league participants
+    assert (standings[users[2].id].total_score, standings[users[2].id].rank) == (20, 1)
+    assert (standings[users[1].id].total_score, standings[users[1].id].rank) == (10, 2)
+    assert standings[users[0].id].per_race[str(race.id)] == {"points": 0, "rank": 3}
+
+    # A delta rescore that changes the order is reflected as well
+    OfficialAnswer.query.filter_by(question_id=setup["slider"].id).first().correct_slider_value = 30.0
+    db_session.commit()
+    assert calculate_and_store_scores(race.id, question_ids={setup["slider"].id})["success"] is True
+    standings = {s.user_id: s for s in LeagueStanding.query.filter_by(league_id=league.id).all()}
+    assert (standings[users[1].id].rank, standings[users[2].id].rank, standings[users[0].id].rank) == (1, 2, 2)
@@ -0,0 +1,375 @@
+"""
+Saving a user's quiniela answers.
+
+A submit carries {question_id: answer_data} for many questions of one race. Instead of loading
+each question, deleting its previous answer (and MC selections) and inserting it again, the
+payload is validated against one prefetch of the race's questions and option ids, and written
+with a fixed number of statements whatever the number of questions:
+    - one SELECT of the stored answers (id and digest);
+    - one INSERT ... ON CONFLICT (user_id, question_id) DO UPDATE for every changed answer, so
+      answer rows keep their primary key across saves;
+    - one DELETE plus one INSERT replacing the MC selections of those answers.
+
+Every answer stores answer_digest, a hash of its canonical value (columns plus MC option set).
+Players re-save the whole wizard many times; answers whose digest did not change are skipped.
+
+Every answer also has a version, bumped on each write. The wizard autosave sends the version
+it last saw and write_answer_rows(expected_versions=...) refuses (AnswerVersionConflict) to
+overwrite a newer answer, e.g. one saved from another tab.
+
+Callers own the transaction: nothing here commits.
+"""
+import hashlib
+import json
+from collections import namedtuple
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import func, select
+from sqlalchemy.orm import selectinload
+
+from backend.models import db, Question, QuestionType, QuestionOption, UserAnswer, UserAnswerMultipleChoiceOption
+
+RaceQuestionSpec = namedtuple('RaceQuestionSpec', ['id', 'type_name', 'is_mc_multiple_correct', 'option_ids'])
+AnswerSaveResult = namedtuple('AnswerSaveResult', ['created', 'updated', 'unchanged', 'versions'])
+
+
+class AnswerVersionConflict(Exception):
+    """Raised when an autosave was based on an answer version that is no longer the stored one."""
+
+    def __init__(self, conflicts):
+        """
+        Args:
+            conflicts (dict): {question_id: stored_version} (0 if the answer does not exist).
+        """
+        super().__init__(f"Answer version conflict for questions {sorted(conflicts)}")
+        self.conflicts = conflicts
+
+# Columnas de la respuesta que un guardado reemplaza (las que no aplican al tipo quedan a None)
+ANSWER_VALUE_COLUMNS = ('answer_text', 'selected_option_id', 'slider_answer_value')
+
+
+def prefetch_race_questions(race_id):
+    """
+    Question type, MC mode and option ids of every question of a race, in one query.
+
+    Returns:
+        dict: {question_id: RaceQuestionSpec}
+    """
+    rows = db.session.query(
+        Question.id, QuestionType.name, Question.is_mc_multiple_correct, QuestionOption.id.label('option_id')
+    ).join(QuestionType, QuestionType.id == Question.question_type_id)\
+     .outerjoin(QuestionOption, QuestionOption.question_id == Question.id)\
+     .filter(Question.race_id == race_id).all()
+
+    option_ids = {}
+    specs = {}
+    for row in rows:
+        option_ids.setdefault(row.id, set())
+        if row.option_id is not None:
+            option_ids[row.id].add(row.option_id)
+        specs[row.id] = (row.name, row.is_mc_multiple_correct)
+    return {
+        question_id: RaceQuestionSpec(question_id, type_name, is_multiple, frozenset(option_ids[question_id]))
+        for question_id, (type_name, is_multiple) in specs.items()
+    }
+
+
+def _option_id(value):
+    """Option id sent by the client as an int (or numeric string); None if it is not one."""
+    if isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def build_answer_row(question, answer_data, user_id):
+    """
+    Validates one question's answer_data and returns (values, mc_option_ids).
+
+    values has every column of ANSWER_VALUE_COLUMNS; mc_option_ids is the sorted list of valid
+    selected options for multiple-answer MC questions and None otherwise. Returns None if the
+    question type is not supported. Invalid option ids are dropped (and logged), as before.
+    """
+    logger = current_app.logger
+    values = dict.fromkeys(ANSWER_VALUE_COLUMNS)
+    mc_option_ids = None
+    answer_data = answer_data if isinstance(answer_data, dict) else {}
+
+    if question.type_name == 'FREE_TEXT':
+        values['answer_text'] = answer_data.get('answer_text')
+        if values['answer_text'] is None:
+            logger.debug(f"No answer_text provided for FREE_TEXT question {question.id}")
+
+    elif question.type_name == 'MULTIPLE_CHOICE':
+        if question.is_mc_multiple_correct:
+            selected_ids = answer_data.get('selected_option_ids', [])
+            if not isinstance(selected_ids, list): # Basic validation
+                logger.warning(f"selected_option_ids for Q {question.id} is not a list: {selected_ids}")
+                selected_ids = []
+            mc_option_ids = set()
+            for opt_id in selected_ids:
+                if _option_id(opt_id) in question.option_ids:
+                    mc_option_ids.add(_option_id(opt_id))
+                else:
+                    logger.warning(f"Invalid option_id {opt_id} for question {question.id} submitted by user {user_id}")
+            mc_option_ids = sorted(mc_option_ids)
+        else: # Single correct
+            selected_id = answer_data.get('selected_option_id')
+            if selected_id is not None:
+                if _option_id(selected_id) in question.option_ids:
+                    values['selected_option_id'] = _option_id(selected_id)
+                else:
+                    logger.warning(f"Invalid selected_option_id {selected_id} for question {question.id} submitted by user {user_id}")
+
+    elif question.type_name == 'ORDERING':
+        # Currently, frontend sends ordered_options_text
+        values['answer_text'] = answer_data.get('ordered_options_text')
+        if values['answer_text'] is None:
+            logger.debug(f"No ordered_options_text provided for ORDERING question {question.id}")
+
+    elif question.type_name == 'SLIDER':
+        slider_value = answer_data.get('slider_answer_value')
+        if slider_value is not None:
+            try:
+                values['slider_answer_value'] = float(slider_value)
+            except (ValueError, TypeError):
+                logger.warning(f"Invalid slider_answer_value '{slider_value}' for SLIDER question {question.id}. Storing as None.")
+
+    else:
+        logger.warning(f"Unsupported question type '{question.type_name}' encountered for question {question.id}")
+        return None
+
+    return values, mc_option_ids
+
+
+def upsert_user_answers(rows, check_versions=False):
+    """
+    Writes answer rows in a single INSERT ... ON CONFLICT (user_id, question_id) DO UPDATE.
+
+    Other dialects than PostgreSQL and SQLite fall back to one SELECT of the existing rows plus
+    bulk insert/update mappings.
+
+    Args:
+        rows (list): Dicts with user_id, race_id, question_id, answer_digest, version, created_at, updated_at
+            and ANSWER_VALUE_COLUMNS.
+        check_versions (bool): Only overwrite stored answers whose version is the row's version - 1.
+            (ON CONFLICT dialects only; the fallback relies on the check done by write_answer_rows.)
+
+    Returns:
+        bool: False if check_versions skipped a row (it was written concurrently), True otherwise.
+    """
+    if not rows:
+        return True
+    updated_columns = ANSWER_VALUE_COLUMNS + ('answer_digest', 'version', 'updated_at')
+
+    dialect_name = db.session.get_bind().dialect.name
+    if dialect_name in ('postgresql', 'sqlite'):
+        if dialect_name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(UserAnswer.__table__).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UserAnswer.__table__.c.user_id, UserAnswer.__table__.c.question_id],
+            set_={column: stmt.excluded[column] for column in updated_columns},
+            where=(UserAnswer.__table__.c.version == stmt.excluded.version - 1) if check_versions else None
+        )
+        result = db.session.execute(stmt)
+        # Las filas que el WHERE descarta no cuentan en rowcount
+        return not check_versions or result.rowcount == len(rows)
+
+    # Fallback genérico: una sola consulta para los existentes + escrituras en bloque
+    user_ids = {row['user_id'] for row in rows}
+    existing_ids = {
+        (user_id, question_id): answer_id for answer_id, user_id, question_id in
+        db.session.query(UserAnswer.id, UserAnswer.user_id, UserAnswer.question_id)
+        .filter(UserAnswer.user_id.in_(user_ids), UserAnswer.question_id.in_([row['question_id'] for row in rows]))
+        .all()
+    }
+    to_update = []
+    to_insert = []
+    for row in rows:
+        answer_id = existing_ids.get((row['user_id'], row['question_id']))
+        if answer_id is None:
+            to_insert.append(row)
+        else:
+            to_update.append(dict({column: row[column] for column in updated_columns}, id=answer_id))
+    if to_update:
+        db.session.bulk_update_mappings(UserAnswer, to_update)
+    if to_insert:
+        db.session.bulk_insert_mappings(UserAnswer, to_insert)
+    return True
+
+
+def replace_mc_selections(answer_ids_by_question, mc_option_ids_by_question, now=None):
+    """
+    Replaces the MC selections of the given answers: one DELETE and one bulk INSERT.
+
+    Args:
+        answer_ids_by_question (dict): {question_id: user_answer_id} of the answers whose selections are replaced.
+        mc_option_ids_by_question (dict): {question_id: [question_option_id]}; questions absent end with no selection.
+    """
+    if not answer_ids_by_question:
+        return
+    now = now or datetime.utcnow()
+    UserAnswerMultipleChoiceOption.query\
+        .filter(UserAnswerMultipleChoiceOption.user_answer_id.in_(list(answer_ids_by_question.values())))\
+        .delete(synchronize_session=False)
+    selections = [
+        {'user_answer_id': answer_ids_by_question[question_id], 'question_option_id': option_id, 'created_at': now}
+        for question_id, option_ids in mc_option_ids_by_question.items()
+        if question_id in answer_ids_by_question
+        for option_id in option_ids
+    ]
+    if selections:
+        db.session.execute(UserAnswerMultipleChoiceOption.__table__.insert(), selections)
+
+
+def answer_digest(values, mc_option_ids):
+    """
+    Canonical digest of an answer: its value columns plus the (sorted) MC option set.
+
+    Two saves of the same answer give the same digest whatever the payload formatting
+    (option order, numeric strings, missing vs null fields), so an unchanged answer can be
+    detected without loading its MC selections.
+    """
+    canonical = [values.get(column) for column in ANSWER_VALUE_COLUMNS]
+    canonical.append(sorted(mc_option_ids) if mc_option_ids is not None else None)
+    raw = json.dumps(canonical, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def prepare_answer_rows(race_id, user_id, answers_payload, questions):
+    """
+    Validates a {question_id: answer_data} payload against the prefetched questions of the race.
+
+    Unknown question ids, questions of other races and unsupported question types are skipped
+    (and logged), as the per-question path did.
+
+    Returns:
+        tuple: ({question_id: row}, {question_id: mc_option_ids}) ready for write_answer_rows().
+    """
+    logger = current_app.logger
+    now = datetime.utcnow()
+    rows = {} # {question_id: row}; una sola fila por pregunta aunque el payload la repita ("5" y "05")
+    mc_option_ids_by_question = {}
+    for question_id_str, answer_data in answers_payload.items():
+        try:
+            question_id = int(question_id_str)
+        except (ValueError, TypeError):
+            logger.warning(f"Invalid question_id format '{question_id_str}' in payload for race {race_id}.")
+            continue
+        question = questions.get(question_id)
+        if question is None:
+            logger.warning(f"Question {question_id} not found in race {race_id}. User {user_id} attempting to answer.")
+            continue
+        built = build_answer_row(question, answer_data, user_id)
+        if built is None:
+            continue
+        values, mc_option_ids = built
+        rows[question_id] = dict(values, user_id=user_id, race_id=race_id, question_id=question_id,
+                                 answer_digest=answer_digest(values, mc_option_ids), version=1,
+                                 created_at=now, updated_at=now)
+        mc_option_ids_by_question.pop(question_id, None)
+        if mc_option_ids is not None:
+            mc_option_ids_by_question[question_id] = mc_option_ids
+    return rows, mc_option_ids_by_question
+
+
+def write_answer_rows(user_id, rows, mc_option_ids_by_question, expected_versions=None):
+    """
+    Writes the prepared rows whose digest differs from the stored one.
+
+    Rows whose stored digest matches are not written at all (not even updated_at or version).
+    Stored answers without digest (saved before digests, or edited through update_user_answer)
+    count as changed.
+
+    Args:
+        expected_versions (dict, optional): {question_id: version the client last saw (0 = none)}.
+            Changed answers whose stored version differs raise AnswerVersionConflict and nothing
+            is written. Unchanged answers never conflict, so a retried autosave is harmless.
+
+    Returns:
+        AnswerSaveResult: Question ids created, updated and left unchanged, and the resulting
+            {question_id: version} of every row.
+
+    Raises:
+        AnswerVersionConflict: Only with expected_versions. The caller must roll back if it is
+            raised after the write (concurrent save between the read and the upsert).
+    """
+    if not rows:
+        return AnswerSaveResult([], [], [], {})
+    existing = {
+        row.question_id: row for row in db.session.execute(
+            select(UserAnswer.question_id, UserAnswer.id, UserAnswer.answer_digest, UserAnswer.version)
+            .where(UserAnswer.user_id == user_id, UserAnswer.question_id.in_(list(rows)))
+        )
+    }
+    created, updated, unchanged = [], [], []
+    versions = {}
+    conflicts = {}
+    for question_id, row in rows.items():
+        stored = existing.get(question_id)
+        stored_version = stored.version if stored is not None else 0
+        if stored is not None and stored.answer_digest == row['answer_digest']:
+            unchanged.append(question_id)
+            versions[question_id] = stored_version
+            continue
+        if expected_versions is not None and expected_versions.get(question_id) != stored_version:
+            conflicts[question_id] = stored_version
+            continue
+        row['version'] = stored_version + 1
+        versions[question_id] = row['version']
+        (created if stored is None else updated).append(question_id)
+    if conflicts:
+        raise AnswerVersionConflict(conflicts)
+
+    changed = created + updated
+    if changed:
+        if not upsert_user_answers([rows[question_id] for question_id in changed],
+                                   check_versions=expected_versions is not None):
+            raise AnswerVersionConflict({question_id: None for question_id in changed})
+        answer_ids_by_question = {question_id: existing[question_id].id for question_id in updated}
+        created_mc = [question_id for question_id in created if question_id in mc_option_ids_by_question]
+        if created_mc: # Solo las respuestas nuevas con selecciones necesitan leer su id
+            answer_ids_by_question.update(db.session.execute(
+                select(UserAnswer.question_id, UserAnswer.id)
+                .where(UserAnswer.user_id == user_id, UserAnswer.question_id.in_(created_mc))
+            ).all())
+        replace_mc_selections(answer_ids_by_question, mc_option_ids_by_question)
+    return AnswerSaveResult(created, updated, unchanged, versions)
+
+
+def user_answers_by_question(race_id, user_id):
+    """{question_id: UserAnswer} of a user in a race, with their MC selections loaded by one extra query."""
+    answers = UserAnswer.query.options(selectinload(UserAnswer.selected_mc_options))\
+                              .filter_by(user_id=user_id, race_id=race_id).all()
+    return {answer.question_id: answer for answer in answers}
+
+
+def answer_progress(race_id, user_id):
+    """
+    Progress of a user's quiniela in one query.
+
+    Returns:
+        tuple: (num_answered_questions, num_total_questions) where the total counts active questions.
+    """
+    answered = select(func.count(UserAnswer.id))\
+        .where(UserAnswer.race_id == race_id, UserAnswer.user_id == user_id).scalar_subquery()
+    total = select(func.count(Question.id))\
+        .where(Question.race_id == race_id, Question.is_active == True).scalar_subquery()
+    row = db.session.execute(select(answered.label('answered'), total.label('total'))).one()
+    return row.answered, row.total
+
+
+def stored_answer_versions(user_id, question_ids):
+    """{question_id: stored version} of a user's answers (0 for questions without answer)."""
+    versions = dict.fromkeys(question_ids, 0)
+    versions.update(db.session.execute(
+        select(UserAnswer.question_id, UserAnswer.version)
+        .where(UserAnswer.user_id == user_id, UserAnswer.question_id.in_(list(question_ids)))
+    ).all())
+    return versions
@@ -0,0 +1,25 @@
+# Configuración de gunicorn: gunicorn -c gunicorn.conf.py (desde la raíz del proyecto)
+#
+# El master importa la app una sola vez (preload_app) y create_app() precarga plantillas y
+# datos de referencia antes del fork; los workers los comparten copy-on-write y cada uno abre
+# sus propios pools de conexiones tras el fork (ver backend/preload.py).
+import os
+import resource
+import time
+
+wsgi_app = 'backend.app:create_app()'
+preload_app = True
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 3))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+
+def pre_fork(server, worker):
+    worker.forked_at = time.perf_counter()
+
+
+def post_worker_init(worker):
+    # Tiempo de arranque y memoria de cada worker, para comparar con y sin preload
+    spawn_ms = (time.perf_counter() - getattr(worker, 'forked_at', time.perf_counter())) * 1000
+    max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    worker.log.info(f"Worker {worker.pid} ready in {spawn_ms:.1f}ms, max RSS {max_rss_kb} KB")